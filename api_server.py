@@ -0,0 +1,414 @@
+"""
+Local HTTP API for machine access to the portal's point time-series sources.
+
+Same fetchers, job runner, checkpoints and chunk coalescing as the app and
+batch_fetch.py, behind a small JSON-over-HTTP interface, so a client pays
+for its fetch and nothing else (no Streamlit script execution per call).
+Standard library only, like the /metrics endpoint in utils/tracing.py.
+
+Endpoints:
+
+    GET    /health                      liveness + job counts
+    GET    /sources                     source keys, parameter codes, resolutions
+    POST   /jobs                        submit a fetch (JSON body, see below)
+    GET    /jobs/<job_id>               status, progress, errors
+    GET    /jobs/<job_id>/result        result as CSV (default), JSON Lines or
+                                        Parquet (?format=jsonl|parquet or
+                                        Accept header)
+    DELETE /jobs/<job_id>               cancel a queued / running job
+
+POST /jobs body:
+
+    {"source": "nasa_power", "parameters": ["T2M"],
+     "start_date": "2024-01-01", "end_date": "2024-01-31",
+     "resolution": "Daily",
+     "locations": [[9.08, 7.49, "Abuja"], ...],     # and/or
+     "admin": ["Nigeria/Lagos/*"]}
+
+It answers 202 with the job id and its status / result URLs. The job's
+ETag is its canonical request key (the same key the checkpoint store
+uses), so resubmitting an identical request while it runs, or after it
+finished in this process, returns the existing job (200 when its result
+is ready); result downloads honour If-None-Match with 304.
+
+Concurrency is bounded twice: at most API_MAX_CONNECTIONS requests are
+handled at once (503 beyond that) and fetches run on the shared job
+runner's JOB_WORKERS threads, with at most API_MAX_QUEUED_JOBS waiting
+(429 beyond that). Set API_TOKEN to require "Authorization: Bearer <token>".
+
+Usage:
+    python api_server.py --port 8600
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import batch_fetch  # noqa: E402
+from data_sources import registry  # noqa: E402
+from utils import checkpoint, export_handler, jobs, planner, tracing  # noqa: E402
+
+log = logging.getLogger("weather_portal.api")
+
+_MAX_BODY_BYTES = 1 << 20
+_STREAM_ROWS = 20_000
+_STREAM_BLOCK = 1 << 16
+
+
+def _config(name: str, default):
+    try:
+        import config
+        return getattr(config, name, default)
+    except Exception:
+        return default
+
+
+class APIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _etag(request_key: str, suffix: str = "") -> str:
+    return f'"{request_key}{suffix}"'
+
+
+# ---------------------------------------------------------------------------
+# Job submission
+# ---------------------------------------------------------------------------
+
+def submit_job(body: Dict, credentials: Dict) -> Dict:
+    """Validate a POST /jobs body and queue (or reuse) its job."""
+    source = body.get("source")
+    if source not in batch_fetch.SOURCES:
+        raise APIError(400, f"unknown source {source!r}; see GET /sources")
+    try:
+        params = batch_fetch.resolve_parameters([source], [
+            f"{source}={','.join(body.get('parameters') or [])}"
+        ])[source]
+        locations = batch_fetch.resolve_locations(
+            admin=body.get("admin") or [], points=body.get("locations") or [],
+        )
+        start, end = body.get("start_date"), body.get("end_date")
+        if not (isinstance(start, str) and isinstance(end, str)):
+            raise ValueError("start_date and end_date (YYYY-MM-DD) are required")
+        if datetime.strptime(start, "%Y-%m-%d") > datetime.strptime(end, "%Y-%m-%d"):
+            raise ValueError(f"start_date {start} is after end_date {end}")
+        resolution = body.get("resolution", "Daily")
+        resolutions = registry.get_temporal_resolutions(source)
+        if resolution not in resolutions:
+            raise ValueError(f"resolution {resolution!r} not offered by {source}; one of {resolutions}")
+    except (ValueError, TypeError, IndexError) as e:
+        raise APIError(400, str(e))
+    if not locations:
+        raise APIError(400, "no locations: give 'locations' and/or 'admin'")
+    max_locations = _config("API_MAX_LOCATIONS", 1000)
+    if len(locations) > max_locations:
+        raise APIError(400, f"{len(locations)} locations exceeds the limit of {max_locations}")
+
+    needs_ee = registry.get(source)["needs_ee"]
+    if needs_ee and not credentials["ee"]:
+        raise APIError(503, "Earth Engine credentials are not configured on this server")
+    if source == "openweather" and not credentials["openweather"]:
+        raise APIError(503, "OPENWEATHER_API_KEY is not configured on this server")
+
+    coords = [(lat, lon) for lat, lon, _ in locations]
+    request_key = checkpoint.job_id_for(
+        source, locations=coords, parameters=sorted(params),
+        start_date=start, end_date=end, resolution=resolution,
+    )
+    runner = jobs.get_runner()
+    existing = runner.find(request_key)
+    if existing is not None:
+        return existing
+
+    queued = runner.counts().get("queued", 0)
+    if queued >= _config("API_MAX_QUEUED_JOBS", 100):
+        raise APIError(429, f"{queued} jobs already queued; retry later")
+
+    fetch_args = dict(
+        locations=coords, parameters=params, start_date=start, end_date=end,
+        temporal_resolution=resolution,
+    )
+    if needs_ee:
+        fetch_args["credentials_dict"] = credentials["ee"]
+    if source == "openweather":
+        fetch_args["api_key"] = credentials["openweather"]
+    plan = planner.estimate_fetch(source, len(coords), params, start, end, resolution)
+    if plan:
+        fetch_args.update(plan["fetch_options"])
+    names = dict(enumerate(name for _, _, name in locations))
+    fetch_source = registry.fetcher(source)
+
+    def fetch():
+        df = fetch_source(**fetch_args)
+        if df is not None and "location_id" in df.columns:
+            df["location_name"] = df["location_id"].map(names)
+        return df
+
+    job_id = runner.submit(
+        source, fetch, request_key=request_key, label=f"api:{source}",
+        attrs={"n_locations": len(coords), "n_params": len(params), "resolution": resolution},
+    )
+    return runner.get(job_id)
+
+
+def _public(job: Dict) -> Dict:
+    keys = ("job_id", "source", "status", "submitted_at", "started_at", "finished_at",
+            "rows", "error", "outstanding", "progress")
+    out = {k: job.get(k) for k in keys}
+    out["status_url"] = f"/jobs/{job['job_id']}"
+    out["result_url"] = f"/jobs/{job['job_id']}/result"
+    return out
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "WeatherPortalAPI/1.0"
+
+    # -- plumbing -----------------------------------------------------------
+
+    def _send_json(self, status: int, payload, headers: Optional[Dict] = None) -> None:
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorised(self) -> bool:
+        token = os.getenv("API_TOKEN") or _config("API_TOKEN", "")
+        return not token or self.headers.get("Authorization") == f"Bearer {token}"
+
+    def _dispatch(self, method: str) -> None:
+        try:
+            if not self._authorised():
+                raise APIError(401, "missing or invalid bearer token")
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            query = parse_qs(url.query)
+            if method == "GET" and parts == ["health"]:
+                self._send_json(200, {"status": "ok", "jobs": jobs.get_runner().counts()})
+            elif method == "GET" and parts == ["sources"]:
+                self._send_json(200, _sources())
+            elif method == "POST" and parts == ["jobs"]:
+                self._post_job()
+            elif len(parts) == 2 and parts[0] == "jobs" and method in ("GET", "DELETE"):
+                self._job(parts[1], method)
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result" and method == "GET":
+                self._result(parts[1], query)
+            else:
+                raise APIError(404, f"no route for {method} {url.path}")
+        except APIError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            log.exception(f"{method} {self.path} failed")
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        log.info("%s %s", self.address_string(), format % args)
+
+    # -- routes -------------------------------------------------------------
+
+    def _post_job(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > _MAX_BODY_BYTES:
+            raise APIError(413, "request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise APIError(400, "body is not valid JSON")
+        if not isinstance(body, dict):
+            raise APIError(400, "body must be a JSON object")
+        job = submit_job(body, self.server.credentials)
+        status = 200 if job["status"] == "done" else 202
+        self._send_json(status, _public(job), {
+            "ETag": _etag(job["request_key"]),
+            "Location": f"/jobs/{job['job_id']}",
+        })
+
+    def _job(self, job_id: str, method: str) -> None:
+        runner = jobs.get_runner()
+        job = runner.get(job_id)
+        if job is None:
+            raise APIError(404, f"unknown job {job_id}")
+        if method == "DELETE":
+            runner.cancel(job_id)
+            job = runner.get(job_id)
+        self._send_json(200, _public(job), {"ETag": _etag(job["request_key"])})
+
+    def _result(self, job_id: str, query: Dict) -> None:
+        runner = jobs.get_runner()
+        job = runner.get(job_id)
+        if job is None:
+            raise APIError(404, f"unknown job {job_id}")
+        if job["status"] in jobs.ACTIVE_STATES:
+            self._send_json(202, _public(job), {"Retry-After": "2"})
+            return
+        if job["status"] != "done":
+            raise APIError(409, f"job is {job['status']}: {job.get('error') or 'no result'}")
+
+        fmt = (query.get("format") or [""])[0]
+        if not fmt:
+            fmt = "parquet" if "parquet" in (self.headers.get("Accept") or "") else "csv"
+        if fmt not in ("csv", "jsonl", "parquet"):
+            raise APIError(400, "format must be csv, jsonl or parquet")
+        etag = _etag(job["request_key"], f"-{fmt}")
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        df = runner.result(job_id)
+        if df is None:
+            raise APIError(410, "result no longer available")
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, max-age=3600",
+            "Content-Disposition": f'attachment; filename="{job["source"]}_{job_id}.{fmt}"',
+        }
+        if fmt == "csv":
+            self._stream_text(export_handler.iter_csv(df, _STREAM_ROWS),
+                              "text/csv; charset=utf-8", headers)
+        elif fmt == "jsonl":
+            self._stream_text(export_handler.iter_jsonl(df, _STREAM_ROWS),
+                              "application/x-ndjson", headers)
+        else:
+            self._stream_parquet(df, headers)
+
+    def _stream_text(self, pieces, content_type: str, headers: Dict) -> None:
+        # Chunked transfer: rows go out in slices as they are formatted, so
+        # a large result is never held as one string.
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        for piece in pieces:
+            if piece:
+                self._write_chunk(piece.encode("utf-8"))
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _stream_parquet(self, df, headers: Dict) -> None:
+        with tempfile.TemporaryFile() as tmp:
+            df.to_parquet(tmp, index=False)
+            size = tmp.tell()
+            tmp.seek(0)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.apache.parquet")
+            self.send_header("Content-Length", str(size))
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            while True:
+                block = tmp.read(_STREAM_BLOCK)
+                if not block:
+                    break
+                self.wfile.write(block)
+
+
+def _sources() -> Dict:
+    out = {}
+    for source in batch_fetch.SOURCES:
+        out[source] = {
+            "label": registry.get(source)["label"],
+            "resolutions": registry.get_temporal_resolutions(source),
+            "parameters": {
+                code: label
+                for group in registry.get_available_parameters(source).values()
+                for code, label in group.items()
+            },
+        }
+    return out
+
+
+class APIServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with a cap on concurrently handled requests."""
+
+    daemon_threads = True
+
+    def __init__(self, address, credentials: Dict, max_connections: int):
+        super().__init__(address, _Handler)
+        self.credentials = credentials
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(
+                    b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                    b"Content-Length: 0\r\nConnection: close\r\n\r\n"
+                )
+            finally:
+                self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=_config("API_PORT", 8600))
+    parser.add_argument("--max-connections", type=int,
+                        default=_config("API_MAX_CONNECTIONS", 32))
+    parser.add_argument("--ee-credentials", default=None, help="service-account JSON")
+    args = parser.parse_args(argv)
+
+    tracing.configure_logging()
+    credentials = {
+        "ee": batch_fetch.load_ee_credentials(args.ee_credentials),
+        "openweather": os.getenv("OPENWEATHER_API_KEY") or _config("OPENWEATHER_API_KEY", ""),
+    }
+    server = APIServer((args.host, args.port), credentials, args.max_connections)
+    log.info(f"Serving on http://{args.host}:{args.port} "
+             f"(max {args.max_connections} connections, "
+             f"{jobs.get_runner().max_workers} fetch workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
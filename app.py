@@ -1,18 +1,48 @@
 import streamlit as st
 import pandas as pd
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import partial
 import os
+import shutil
 import tempfile
+import time
 import json
-
-# Import data source modules
-from data_sources import (
-    nasa_power, openweather, era5, modis, chirps, lulc, drought_indices, phenology,
-    hydrology, soil_moisture, land_degradation, productivity, forest_biomass,
-    africa_stack, population, air_quality,
-)
+import uuid
+
+from utils import profiling
+
+# Whole-rerun profile, opt-in (PROFILE_MODE=rerun or the admin toggle).
+# Started before anything else so imports and credential loading count;
+# stopped by the diagnostics panel at the bottom of the script. A rerun
+# that raised before getting there leaves its profiler behind, so stop
+# that one first.
+_stale_profiler = st.session_state.pop("diag_rerun_profiler", None)
+if _stale_profiler is not None:
+    _stale_profiler.stop()
+_rerun_profiler = None
+if profiling.profiling_enabled("rerun", st.session_state.get("diag_profile_reruns")):
+    _rerun_profiler = profiling.Profiler("app.py", scope="rerun").start()
+    st.session_state.diag_rerun_profiler = _rerun_profiler
+
+# Data source modules are imported on first use (see data_sources/registry.py);
+# these proxies keep the per-source UI code below readable.
+from data_sources import registry
+lulc = registry.lazy("lulc")
+hydrology = registry.lazy("hydrology")
+forest_biomass = registry.lazy("forest_biomass")
+africa_stack = registry.lazy("africa_stack")
+population = registry.lazy("population")
+from utils import checkpoint
 from utils import cross_layer
+from utils import cube_export
+from utils import export_bundle
+from utils import jobs
+from utils import planner
 from utils import reproducibility
+from utils import result_store
+from utils import schema
+from utils import tracing
 
 # Import utilities
 from utils.africa_locations import (
@@ -37,9 +67,18 @@ from utils.kml_handler import (
 from utils.export_handler import (
     export_to_csv,
     export_to_json,
+    export_to_jsonl,
     export_to_geojson,
-    export_to_shapefile,
+    export_to_geojson_seq,
+    export_to_shapefile_bytes,
     export_to_excel,
+    export_to_parquet,
+    export_to_geoparquet,
+    export_to_feather,
+    export_to_geopackage_normalized,
+    export_to_parquet_normalized,
+    export_to_location_arrays,
+    geodataframe_to_geoparquet,
     get_export_filename,
     get_export_mime_type,
 )
@@ -79,6 +118,15 @@ def load_ee_credentials():
 
 ee_credentials = load_ee_credentials()
 
+# Structured fetch logs go to stderr; set METRICS_PORT to also expose
+# Prometheus counters for every fetch on http://<host>:<port>/metrics.
+tracing.configure_logging()
+if os.environ.get("METRICS_PORT"):
+    try:
+        tracing.start_metrics_server(int(os.environ["METRICS_PORT"]))
+    except (OSError, ValueError) as e:
+        st.sidebar.warning(f"Could not start metrics endpoint: {e}")
+
 # Initialize analytics
 analytics = init_analytics()
 
@@ -124,8 +172,12 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if "fetched_data" not in st.session_state:
-    st.session_state.fetched_data = None
+if "result_store" not in st.session_state:
+    # This session's handle on the process-wide result store; the fetched
+    # result and snapshots live there and session state keeps their keys.
+    st.session_state.result_store = result_store.SessionResults(result_store.get_store())
+if "result_key" not in st.session_state:
+    st.session_state.result_key = None
 if "selected_locations" not in st.session_state:
     st.session_state.selected_locations = None
 if "current_data_source" not in st.session_state:
@@ -135,9 +187,15 @@ if "uploaded_geodataframe" not in st.session_state:
 if "lulc_change_long" not in st.session_state:
     st.session_state.lulc_change_long = None
 if "cross_layer_snapshots" not in st.session_state:
-    st.session_state.cross_layer_snapshots = {}  # label -> DataFrame
+    st.session_state.cross_layer_snapshots = {}  # label -> result store key
 if "lulc_composition_long" not in st.session_state:
     st.session_state.lulc_composition_long = None
+if "last_fetch_trace" not in st.session_state:
+    st.session_state.last_fetch_trace = None
+if "last_fetch_profile" not in st.session_state:
+    st.session_state.last_fetch_profile = None
+if "fetch_jobs" not in st.session_state:
+    st.session_state.fetch_jobs = []  # this session's background fetches, oldest first
 if "lulc_aoi_gdf" not in st.session_state:
     st.session_state.lulc_aoi_gdf = None
 if "lulc_last_dataset" not in st.session_state:
@@ -146,286 +204,74 @@ if "lulc_last_year" not in st.session_state:
     st.session_state.lulc_last_year = None
 if "lulc_last_year_to" not in st.session_state:
     st.session_state.lulc_last_year_to = None
+if "result_version" not in st.session_state:
+    st.session_state.result_version = None
 
-# Track page visit (once per session)
-analytics.track_visit()
-
-# Sidebar for data source and parameters
-st.sidebar.header("📊 Data Source Selection")
-
-# Data source selection
-data_sources = {
-    "NASA POWER": "nasa_power",
-    "OpenWeather API": "openweather",
-    "ERA5 (Copernicus)": "era5",
-    "MODIS": "modis",
-    "CHIRPS": "chirps",
-    "Land Cover (LULC)": "lulc",
-    "Drought & Vegetation Indices": "drought_indices",
-    "Vegetation Phenology (annual)": "phenology",
-    "Hydrology (Global Surface Water)": "hydrology",
-    "Soil Moisture (SMAP)": "soil_moisture",
-    "Fire + Forest Loss (MODIS + FIRMS + Hansen)": "land_degradation",
-    "Vegetation Productivity (LAI/FAPAR/ET/GPP)": "productivity",
-    "Forest Biomass & Structure": "forest_biomass",
-    "Africa Stack (iSDA soils + WorldCereal)": "africa_stack",
-    "Population & Built-up": "population",
-    "Air Quality (TROPOMI + MODIS AOD)": "air_quality",
-}
-
-selected_source = st.sidebar.selectbox(
-    "Select Data Source",
-    options=list(data_sources.keys()),
-    help="Choose the weather data source to query"
-)
-
-source_key = data_sources[selected_source]
-
-# Show data source information
-if source_key == "nasa_power":
-    st.sidebar.info("📡 **NASA POWER**: Historical data with ~7 day latency. Data available from 1981 to ~7 days ago.")
-elif source_key == "openweather":
-    st.sidebar.warning("""
-    🌤️ **OpenWeather Free Tier**:
-    - ✅ Current weather
-    - ✅ 7-day forecast
-    - ❌ Historical data (requires paid subscription)
-    
-    **For historical weather data**, use **NASA POWER** instead (free, no API key needed).
-    """)
-elif source_key == "era5":
-    st.sidebar.success("""
-    🌍 **ERA5-Land via Google Earth Engine**
-    
-    ✅ Now using Earth Engine (No CDS token needed!)
-    
-    **Available Data:**
-    - Temperature, precipitation, wind
-    - Hourly resolution (aggregates to daily)
-    - Global coverage at ~11km resolution
-    
-    **Benefits:**
-    - No CDS account/token required
-    - Faster than CDS API (seconds vs minutes)
-    - Uses same Earth Engine credentials as MODIS/CHIRPS
-    """)
-elif source_key == "modis":
-    st.sidebar.success("""
-    🛰️ **MODIS via Google Earth Engine**
-    
-    ✅ Now functional!
-    
-    **Available Data:**
-    - Land Surface Temperature (LST)
-    - Vegetation Indices (NDVI, EVI)
-    - Real satellite data from Earth Engine
-    
-    **Requirements:**
-    Earth Engine service account credentials (provided)
-    """)
-elif source_key == "chirps":
-    st.sidebar.success("""
-    🌧️ **CHIRPS via Google Earth Engine**
-
-    ✅ Now functional!
-
-    **Available Data:**
-    - Daily precipitation (mm)
-    - Global coverage
-    - Real CHIRPS data from Earth Engine
-
-    **Requirements:**
-    Earth Engine service account credentials (provided)
-    """)
-elif source_key == "phenology":
-    st.sidebar.success("""
-    🌱 **Vegetation Phenology (annual)**
-
-    For each location and year, extracts seasonal timing and magnitude
-    from the MODIS 16-day NDVI series:
-
-    - **SOS_DOY / EOS_DOY** — Start / End of Season, day-of-year of the
-      NDVI ascending / descending crossing at 20 % of amplitude.
-    - **LOS_DAYS** — Length of Season (EOS − SOS).
-    - **PEAK_NDVI / PEAK_DOY** — annual maximum NDVI and its day-of-year.
-    - **NDVI_INTEGRAL** — sum of NDVI over the growing season
-      (proxy for total productivity).
-
-    **Source:** MODIS MOD13A1 (500 m, 16-day, 2000-present).
-
-    **Note:** single-season detection. Bimodal regimes (East African
-    long / short rains) collapse to the strongest peak. First fetch
-    for a location can take a minute per year of data.
-    """)
-elif source_key == "drought_indices":
-    st.sidebar.success("""
-    💧 **Drought & Vegetation Indices**
-
-    **SPI** (1 / 3 / 6 / 12 month, CHIRPS) — precipitation-only
-    drought / wetness. Gamma-fit vs. 1991–2020 baseline.
-
-    **SPEI** (1 / 3 / 6 / 12 month, CHIRPS + TerraClimate PET) —
-    drought accounting for evaporative demand (P − PET). Catches
-    heat-driven drought that SPI misses. Normal-fit vs. 1991–2020.
-    Both indices: ≤ −1.5 = drought, ≥ +1.5 = very wet.
-
-    **VCI / TCI / VHI** (0–100, MODIS) — vegetation-health composites
-    from NDVI and daytime LST vs. 2001–2020 climatology. VHI < 40 =
-    drought / vegetation stress.
-
-    **Raw inputs:** precipitation, PET, water balance, NDVI, LST.
-
-    **Requires:** Earth Engine credentials (already configured).
-    **First fetch is slow** — 20–30 year baselines mean hundreds of
-    Earth Engine calls per index family.
-    """)
-elif source_key == "productivity":
-    st.sidebar.success("""
-    🌿 **Vegetation Productivity (LAI / FAPAR / ET / GPP)**
-
-    Monthly per-location time series from three complementary MODIS
-    products, requestable together or independently.
-
-    **MOD15A2H (structure):**
-    - `LAI_M2M2` — Leaf Area Index (m²/m², monthly mean)
-    - `FAPAR` — Fraction of Absorbed PAR (0–1, monthly mean)
-
-    **MOD16A2 gap-filled (water flux):**
-    - `ET_MM` — actual evapotranspiration (mm/month)
-    - `PET_MM_MODIS` — potential evapotranspiration (mm/month)
-
-    **PML_V2 (carbon flux):**
-    - `GPP_GC_M2` — Gross Primary Productivity (gC/m²/month)
 
-    **Coverage:** 2000–present, 500 m native, monthly aggregate.
-    """)
-elif source_key == "land_degradation":
-    st.sidebar.success("""
-    🔥 **Fire + Forest Loss (MODIS + FIRMS + Hansen)**
-
-    Three complementary products, requestable together or
-    independently. All emit one row per polygon per time step.
-
-    **MODIS MCD64A1 (monthly burned area, ~60–90 day latency):**
-    - `BURNED_AREA_KM2`, `PERCENT_BURNED`
-
-    **FIRMS active fires (monthly aggregate, ~3-hour latency):**
-    - `FIRE_DETECTIONS`, `MEAN_BRIGHTNESS_K`, `MEAN_CONFIDENCE`
-
-    **Hansen Global Forest Change (annual, 30 m):**
-    - `TREE_LOSS_KM2`, `PERCENT_LOSS`
-    - `FOREST_2000_KM2`, `PERCENT_FOREST_2000` (year-2000 baseline
-      at >30 % canopy cover)
-    - Coverage: 2001–2025 loss years, refreshed annually.
-
-    **Input:** upload a shapefile / KML polygon, or pick an African
-    country / division. Point-only input is not supported for this
-    source — these statistics need a real polygon.
-    """)
-elif source_key == "soil_moisture":
-    st.sidebar.success("""
-    🌊 **Soil Moisture (SMAP L4)**
-
-    Monthly-mean **surface (0–5 cm)** and **root-zone (0–100 cm)**
-    soil moisture at each point, plus anomalies against the 2015–2024
-    per-calendar-month climatology.
+def _new_result_version():
+    """Give the current result a fresh version token. Export caches key on
+    it instead of hashing the table, so a rerun costs nothing however big
+    the result is; every place that replaces the result must bump it."""
+    st.session_state.result_version = uuid.uuid4().hex
 
-    **Source:** SMAP L4 Global 9 km 3-hourly Soil Moisture (SPL4SMGP v7),
-    aggregated to monthly means server-side.
 
-    **Coverage:** 2015-04 → present, global.
+def _set_result(df):
+    results = st.session_state.result_store
+    old_key = st.session_state.result_key
+    # Normalised here too for results that don't come through a job.
+    df = schema.normalize(df)
+    st.session_state.result_key = results.put(df) if df is not None else None
+    results.release(old_key)
+    _new_result_version()
 
-    **Requires:** Earth Engine credentials.
-    """)
-elif source_key == "air_quality":
-    st.sidebar.success("""
-    🏭 **Air Quality (TROPOMI + MODIS AOD)**
-
-    Monthly per-location time series of:
-    - **NO₂, SO₂, CO** — Sentinel-5P TROPOMI tropospheric column
-      densities (mol/m²).
-    - **CH₄** — column volume mixing ratio (ppb).
-    - **AOD 550 nm** — MODIS MCD19A2 daily AOD, aggregated monthly.
-
-    **Coverage:** TROPOMI Sept 2018 → present, MODIS AOD 2000 →
-    present. Point time series, weather-schema output.
-    """)
-elif source_key == "population":
-    st.sidebar.success("""
-    👥 **Population & Built-up**
 
-    Per-polygon summary of three human-footprint gridded datasets:
+def _current_result():
+    """The fetched result, or None. It may come back from the store's
+    spill file; treat it as read-only (snapshots share it)."""
+    return st.session_state.result_store.get(st.session_state.result_key)
 
-    - **WorldPop 2020** (100 m) — population count and density.
-    - **GHS-BUILT-S R2023A** (100 m, 2000 or 2020 epoch) — built-up
-      surface area (km²) and percent of polygon.
-    - **VIIRS nighttime lights** (500 m, monthly) — mean radiance
-      as a proxy for electrification / economic activity.
-
-    Input: upload a shapefile / KML polygon or pick an African
-    country / division.
-    """)
-elif source_key == "africa_stack":
-    st.sidebar.success("""
-    🌍 **Africa Stack** — iSDA soils + ESA WorldCereal
 
-    Per-polygon summary of Africa-tuned reference layers:
+@contextmanager
+def observed_fetch(source, **attrs):
+    """Trace (and, when enabled, profile) one fetch; keeps both in session
+    state for the performance / diagnostics panels."""
+    prof = None
+    try:
+        with profiling.maybe_profile(
+            "fetch", source, enabled=st.session_state.get("diag_profile_fetches")
+        ) as prof:
+            with tracing.trace_fetch(source, **attrs) as fetch_trace:
+                st.session_state.last_fetch_trace = fetch_trace
+                yield fetch_trace
+    finally:
+        if prof is not None:
+            st.session_state.last_fetch_profile = prof.report
 
-    - **iSDA-Africa soils** (30 m, 2021 v2): pH, organic carbon,
-      nitrogen, sand/clay/silt (0–20 cm topsoil; pH and OC also
-      available at 20–50 cm subsoil).
-    - **ESA WorldCereal 2021** (10 m): cropland area, active vs
-      irrigated cropland, cropland percent of polygon.
 
-    Input: upload a shapefile / KML polygon, or pick an African
-    country / division.
-    """)
-elif source_key == "forest_biomass":
-    st.sidebar.success("""
-    🌳 **Forest Biomass & Structure**
+# Track page visit (once per session)
+analytics.track_visit()
 
-    Static per-polygon statistics from three global forest datasets:
+# Sidebar for data source and parameters
+st.sidebar.header("📊 Data Source Selection")
 
-    - **ESA CCI Biomass v6.1** (100 m, 2015 or 2022 epoch) — mean AGB
-      in t/ha, total biomass in megatonnes, area with biomass.
-    - **Potapov Canopy Height 2020** (30 m) — mean tree-canopy height
-      in metres, area with trees > 3 m.
-    - **Global Mangrove Watch v3** (30 m, 2020) — mangrove area (km²)
-      and percent of polygon.
+# Data source selection (labels, blurbs and fetchers come from the
+# registry; a source's module is only imported once it is used)
+source_labels = registry.labels()
 
-    Input: upload a shapefile / KML polygon, or pick an African
-    country / division.
-    """)
-elif source_key == "hydrology":
-    st.sidebar.success("""
-    💦 **Hydrology (Global Surface Water)**
-
-    Per-polygon water statistics from **JRC Global Surface Water v1.4**
-    (Pekel et al. 2016, 30 m, 1984–2021).
-
-    **Outputs per AOI:**
-    - Total polygon area (km²)
-    - Water-ever area (any pixel with water history)
-    - **Permanent water** (occurrence > 90 %)
-    - **Seasonal water** (5 % < occurrence ≤ 90 %)
-    - Water percent of polygon
-    - Area-weighted mean occurrence and change in occurrence
-
-    Great for reservoirs, lakes, wetlands, and river-corridor
-    monitoring at national or watershed scale.
-    """)
-elif source_key == "lulc":
-    st.sidebar.success("""
-    🗺️ **Land Cover (LULC) via Google Earth Engine**
+selected_source = st.sidebar.selectbox(
+    "Select Data Source",
+    options=list(source_labels.keys()),
+    help="Choose the weather data source to query"
+)
 
-    **Available datasets:**
-    - **ESRI Sentinel-2 LULC** (10 m, 2017–2024) — best for annual change
-    - **ESA WorldCover** (10 m, 2020 / 2021) — single-year accuracy benchmark
-    - **Dynamic World** (10 m, 2015–present) — newest data, sub-annual
+source_key = source_labels[selected_source]
+source_spec = registry.get(source_key)
 
-    **Output:** per-polygon class composition (area & percent per class)
-    on uploaded shapefile / KML or African admin divisions.
-    """)
+# Show data source information
+if source_spec["sidebar"]:
+    style, text = source_spec["sidebar"]
+    getattr(st.sidebar, style)(text)
+api_key = None
 
 # Sidebar: LULC-specific controls OR weather-style parameter + date controls
 # ---------------------------------------------------------------------------
@@ -443,6 +289,7 @@ max_date = datetime.now()
 lulc_dataset = None
 lulc_year = None
 lulc_year_to = None
+lulc_years = None
 lulc_analysis_mode = None
 lulc_output_mode = None
 lulc_show_sankey = False
@@ -523,9 +370,13 @@ elif source_key == "lulc":
 
     lulc_analysis_mode = st.sidebar.radio(
         "Analysis mode",
-        options=["Composition (single year)", "Change (two years)"],
+        options=["Composition (single year)", "Composition (multi-year)", "Change (two years)"],
         index=0,
-        help="Composition = land-cover breakdown at one point in time. Change = transition matrix between two years.",
+        help=(
+            "Composition = land-cover breakdown at one point in time. Multi-year = the "
+            "breakdown for several years in one request. Change = transition matrix "
+            "between two years."
+        ),
     )
 
     if lulc_analysis_mode == "Composition (single year)":
@@ -541,6 +392,22 @@ elif source_key == "lulc":
             index=0,
             help="Long: one row per polygon × class. Wide: one row per polygon, one column per class.",
         )
+    elif lulc_analysis_mode == "Composition (multi-year)":
+        lulc_years = st.sidebar.multiselect(
+            "Years",
+            options=years,
+            default=years[-3:],
+            key="lulc_years",
+            help="All selected years are computed in a single Earth Engine request.",
+        )
+        lulc_year = max(lulc_years) if lulc_years else None
+        lulc_output_mode = st.sidebar.selectbox(
+            "Output format",
+            options=["Composition (long)", "Composition (wide pivot)"],
+            index=0,
+            key="lulc_years_output",
+            help="Long: one row per polygon × year × class. Wide: one row per polygon × year, one column per class.",
+        )
     else:
         # Change mode. Requires at least two years available.
         if len(years) < 2:
@@ -598,42 +465,8 @@ elif source_key == "lulc":
 
 else:
     # ----- Weather-data sidebar (NASA POWER / OpenWeather / ERA5 / MODIS / CHIRPS) -----
-    if source_key == "nasa_power":
-        available_params = nasa_power.get_available_parameters()
-        temporal_options = nasa_power.get_temporal_resolutions()
-    elif source_key == "openweather":
-        available_params = openweather.get_available_parameters()
-        temporal_options = openweather.get_temporal_resolutions()
-    elif source_key == "era5":
-        available_params = era5.get_available_parameters()
-        temporal_options = era5.get_temporal_resolutions()
-    elif source_key == "modis":
-        available_params = modis.get_available_parameters()
-        temporal_options = modis.get_temporal_resolutions()
-    elif source_key == "drought_indices":
-        available_params = drought_indices.get_available_parameters()
-        temporal_options = drought_indices.get_temporal_resolutions()
-    elif source_key == "phenology":
-        available_params = phenology.get_available_parameters()
-        temporal_options = phenology.get_temporal_resolutions()
-    elif source_key == "africa_stack":
-        available_params = africa_stack.get_available_parameters()
-        temporal_options = africa_stack.get_temporal_resolutions()
-    elif source_key == "air_quality":
-        available_params = air_quality.get_available_parameters()
-        temporal_options = air_quality.get_temporal_resolutions()
-    elif source_key == "soil_moisture":
-        available_params = soil_moisture.get_available_parameters()
-        temporal_options = soil_moisture.get_temporal_resolutions()
-    elif source_key == "land_degradation":
-        available_params = land_degradation.get_available_parameters()
-        temporal_options = land_degradation.get_temporal_resolutions()
-    elif source_key == "productivity":
-        available_params = productivity.get_available_parameters()
-        temporal_options = productivity.get_temporal_resolutions()
-    else:  # chirps
-        available_params = chirps.get_available_parameters()
-        temporal_options = chirps.get_temporal_resolutions()
+    available_params = registry.get_available_parameters(source_key)
+    temporal_options = registry.get_temporal_resolutions(source_key)
 
     # Display available parameters by category
     st.sidebar.subheader("📋 Available Parameters")
@@ -662,69 +495,13 @@ else:
     # Date range selection
     st.sidebar.subheader("📅 Date Range")
 
-    # Set date ranges based on data source and their latency
-    if source_key == "openweather":
-        # OpenWeather allows forecasts up to 7 days
-        max_date = datetime.now() + timedelta(days=7)
-        default_start = datetime.now() - timedelta(days=7)
-        default_end = datetime.now() + timedelta(days=2)
-        data_latency_days = 0
-    elif source_key == "nasa_power":
-        # NASA POWER has ~3-7 day data latency
-        data_latency_days = 7
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        default_start = datetime.now() - timedelta(days=60)  # 2 months ago
-        default_end = datetime.now() - timedelta(days=data_latency_days)
-    elif source_key == "era5":
-        # ERA5 has ~5 day latency
-        data_latency_days = 5
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        default_start = datetime.now() - timedelta(days=60)
-        default_end = datetime.now() - timedelta(days=data_latency_days)
-    elif source_key == "drought_indices":
-        # CHIRPS monthly settles about a month after the month ends.
-        data_latency_days = 45
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        # Default to a 3-year window so SPI-12 has enough context to show trends.
-        default_start = datetime.now().replace(month=1, day=1) - timedelta(days=365 * 3)
-        default_end = max_date
-    elif source_key == "phenology":
-        # MOD13A1 composites have ~30-day latency; a full-season summary
-        # needs a completed calendar year.
-        data_latency_days = 30
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        default_start = datetime(datetime.now().year - 5, 1, 1)
-        default_end = datetime(datetime.now().year - 1, 12, 31)
-    elif source_key == "soil_moisture":
-        # SMAP L4 has ~7-day latency; default to a 3-year window.
-        data_latency_days = 7
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        default_start = datetime(datetime.now().year - 3, 1, 1)
-        default_end = max_date
-    elif source_key == "land_degradation":
-        # MCD64A1 typically has ~60-90 day latency.
-        data_latency_days = 90
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        default_start = datetime(datetime.now().year - 2, 1, 1)
-        default_end = max_date
-    elif source_key == "productivity":
-        # MOD15A2H / MOD16A2 latency ~30-60 days.
-        data_latency_days = 45
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        default_start = datetime(datetime.now().year - 3, 1, 1)
-        default_end = max_date
-    elif source_key == "air_quality":
-        # TROPOMI has ~7-day latency; default to a 3-year window.
-        data_latency_days = 14
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        default_start = datetime(max(2019, datetime.now().year - 3), 1, 1)
-        default_end = max_date
-    else:
-        # Other sources - historical data with some latency
-        data_latency_days = 3
-        max_date = datetime.now() - timedelta(days=data_latency_days)
-        default_start = datetime.now() - timedelta(days=30)
-        default_end = datetime.now() - timedelta(days=data_latency_days)
+    # Date bounds and defaults follow the source's latency (or forecast
+    # horizon, for OpenWeather)
+    window = registry.date_window(source_key)
+    data_latency_days = window["latency_days"]
+    max_date = window["max_date"]
+    default_start = window["default_start"]
+    default_end = window["default_end"]
 
     col1, col2 = st.sidebar.columns(2)
 
@@ -754,26 +531,44 @@ else:
         st.sidebar.info(f"📅 Date range: {date_range_days + 1} days")
 
         # Show data latency warning
-        if source_key != "openweather" and data_latency_days > 0:
+        if data_latency_days > 0:
             days_from_today = (datetime.now().date() - end_date).days
             if days_from_today < data_latency_days:
                 st.sidebar.warning(f"⏱️ {selected_source} has ~{data_latency_days} day data latency. Latest available data is from {max_date.strftime('%Y-%m-%d')}.")
 
     # API Keys (if needed)
-    if source_key == "openweather":
+    if source_spec["api_key"]:
         st.sidebar.subheader("🔑 API Configuration")
         api_key = st.sidebar.text_input(
-            "OpenWeather API Key",
+            source_spec["api_key"],
             type="password",
-            help="Enter your OpenWeather API key"
+            help=f"Enter your {source_spec['api_key']}"
         )
-    elif source_key == "era5":
-        st.sidebar.info("""
-        ℹ️ **No API Key Required!**
+    if source_spec["note"]:
+        style, text = source_spec["note"]
+        getattr(st.sidebar, style)(text)
+
+# Parsing an upload (and sampling points inside its polygons) is the most
+# expensive thing in the location panel; cache it on the upload's file_id
+# so reruns reuse it until a different file is uploaded.
+@st.cache_data(show_spinner=False, max_entries=8)
+def _load_shapefile_upload(file_id, _upload):
+    gdf = read_shapefile(extract_shapefile_from_zip(_upload))
+    return gdf, extract_locations_from_shapefile(gdf, use_polygon_sampling=True)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _load_kml_upload(file_id, _upload):
+    suffix = "." + _upload.name.split(".")[-1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        tmp_file.write(_upload.getvalue())
+        kml_path = tmp_file.name
+    try:
+        gdf = read_kml_file(kml_path)
+    finally:
+        os.unlink(kml_path)
+    return gdf, extract_locations_from_kml(gdf, use_polygon_sampling=True)
 
-        ERA5 now uses the same Earth Engine credentials as MODIS/CHIRPS.
-        No separate CDS account or token needed.
-        """)
 
 # Location selection with glassmorphism header
 st.markdown("""
@@ -905,12 +700,10 @@ with left_col:
         
         if uploaded_file is not None:
             try:
-                # Extract shapefile from ZIP
-                shp_path = extract_shapefile_from_zip(uploaded_file)
-                
-                # Read shapefile
-                gdf = read_shapefile(shp_path)
-                
+                # Extract + read the shapefile and sample its polygons once
+                # per upload, not on every rerun
+                gdf, locations_dict = _load_shapefile_upload(uploaded_file.file_id, uploaded_file)
+
                 # Store GeoDataFrame in session state
                 st.session_state.uploaded_geodataframe = gdf
                 
@@ -920,9 +713,6 @@ with left_col:
                 # Show preview
                 if st.checkbox("📋 Preview Shapefile Data", key="preview_shp"):
                     st.dataframe(gdf.head(10))
-                
-                # Extract locations with polygon sampling
-                locations_dict = extract_locations_from_shapefile(gdf, use_polygon_sampling=True)
 
                 # Sampling summary is only meaningful for weather sources that
                 # actually query per-point. LULC uses the polygon directly.
@@ -979,14 +769,9 @@ with left_col:
         
         if uploaded_file is not None:
             try:
-                # Save uploaded file to temporary location
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-                    tmp_file.write(uploaded_file.read())
-                    kml_path = tmp_file.name
-                
-                # Read KML/KMZ file
-                gdf = read_kml_file(kml_path)
-                
+                # Read the KML/KMZ and sample its polygons once per upload
+                gdf, locations_dict = _load_kml_upload(uploaded_file.file_id, uploaded_file)
+
                 # Store GeoDataFrame in session state
                 st.session_state.uploaded_geodataframe = gdf
                 
@@ -996,9 +781,6 @@ with left_col:
                 # Show preview
                 if st.checkbox("📋 Preview KML/KMZ Data", key="preview_kml"):
                     st.dataframe(gdf.head(10))
-                
-                # Extract locations with polygon sampling
-                locations_dict = extract_locations_from_kml(gdf, use_polygon_sampling=True)
 
                 # Sampling summary is only meaningful for weather sources that
                 # actually query per-point. LULC uses the polygon directly.
@@ -1032,16 +814,10 @@ with left_col:
                 
                 # Convert to expected tuple format: (lat, lon, name)
                 locations_list = [(loc["lat"], loc["lon"], loc["name"]) for loc in locations_dict]
-                
-                # Clean up temporary file
-                os.unlink(kml_path)
-                
+
             except Exception as e:
                 st.error(f"❌ Error processing KML/KMZ file: {str(e)}")
                 st.session_state.uploaded_geodataframe = None
-                # Clean up temporary file if it exists
-                if 'kml_path' in locals() and os.path.exists(kml_path):
-                    os.unlink(kml_path)
 
     elif location_method == "HydroBASINS Watershed":
         st.subheader("HydroBASINS Watershed")
@@ -1100,24 +876,24 @@ with left_col:
                     c = row.geometry.centroid
                     locations_list.append((c.y, c.x, row.get("name", f"HYBAS_{i}")))
 
-# Add satellite view in the right column
-with right_col:
+# Add satellite view in the right column. A fragment, so the map is only
+# rebuilt when the location selection changes (a full rerun), and with no
+# returned objects, so panning / zooming it doesn't rerun anything.
+@st.fragment
+def _render_satellite_view(locations, gdf):
+    from streamlit_folium import st_folium
+
     st.subheader("🛰️ Google Satellite View")
-    
-    if locations_list:
+
+    if locations:
         try:
             # Create satellite map with Google imagery
             # Pass GeoDataFrame if available (for polygons/actual geometries)
-            satellite_map = create_satellite_map(
-                locations_list, 
-                height=600,
-                gdf=st.session_state.uploaded_geodataframe
-            )
-            
+            satellite_map = create_satellite_map(locations, height=600, gdf=gdf)
+
             # Display the map
-            from streamlit_folium import st_folium
-            st_folium(satellite_map, width=None, height=600)
-            
+            st_folium(satellite_map, width=None, height=600, returned_objects=[])
+
         except Exception as e:
             st.warning(f"⚠️ Satellite view unavailable: {str(e)}")
             st.info("💡 Select locations on the left to view satellite imagery")
@@ -1126,11 +902,14 @@ with right_col:
         # Show placeholder map of Africa
         try:
             placeholder_map = create_satellite_map([], height=600)
-            from streamlit_folium import st_folium
-            st_folium(placeholder_map, width=None, height=600)
+            st_folium(placeholder_map, width=None, height=600, returned_objects=[])
         except:
             pass
 
+
+with right_col:
+    _render_satellite_view(locations_list, st.session_state.uploaded_geodataframe)
+
 # Display selected locations
 if locations_list:
     if (
@@ -1200,33 +979,35 @@ if source_key == "population":
         else:
             with st.spinner(f"Sampling {pop_dataset}..."):
                 try:
-                    if have_uploaded_gdf:
-                        aoi_gdf = st.session_state.uploaded_geodataframe.copy()
-                    else:
-                        admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
-                        admin_divisions = (
-                            dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
-                        )
-                        st.info("Resolving admin polygons via FAO GAUL 2015...")
-                        aoi_gdf = lulc.gdf_from_admin_selection(
-                            countries=admin_countries,
-                            divisions=admin_divisions,
+                    with observed_fetch("population", dataset=pop_dataset) as fetch_trace:
+                        if have_uploaded_gdf:
+                            aoi_gdf = st.session_state.uploaded_geodataframe.copy()
+                        else:
+                            admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
+                            admin_divisions = (
+                                dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
+                            )
+                            st.info("Resolving admin polygons via FAO GAUL 2015...")
+                            aoi_gdf = lulc.gdf_from_admin_selection(
+                                countries=admin_countries,
+                                divisions=admin_divisions,
+                                credentials_dict=ee_credentials,
+                            )
+                        date_range = None
+                        if population.get_dataset_info(pop_dataset)["family"] == "lights":
+                            date_range = (
+                                pop_lights_start.strftime("%Y-%m-%d") if pop_lights_start else "2023-01-01",
+                                pop_lights_end.strftime("%Y-%m-%d") if pop_lights_end else "2024-01-01",
+                            )
+                        df = population.fetch_population_stats_from_gdf(
+                            aoi_gdf=aoi_gdf,
+                            dataset_name=pop_dataset,
                             credentials_dict=ee_credentials,
+                            date_range=date_range,
                         )
-                    date_range = None
-                    if population.get_dataset_info(pop_dataset)["family"] == "lights":
-                        date_range = (
-                            pop_lights_start.strftime("%Y-%m-%d") if pop_lights_start else "2023-01-01",
-                            pop_lights_end.strftime("%Y-%m-%d") if pop_lights_end else "2024-01-01",
-                        )
-                    df = population.fetch_population_stats_from_gdf(
-                        aoi_gdf=aoi_gdf,
-                        dataset_name=pop_dataset,
-                        credentials_dict=ee_credentials,
-                        date_range=date_range,
-                    )
+                        tracing.count("rows", len(df))
                     if df is not None and not df.empty:
-                        st.session_state.fetched_data = df
+                        _set_result(df)
                         st.session_state.current_data_source = f"{selected_source} | {pop_dataset}"
                         st.session_state.lulc_change_long = None
                         st.session_state.lulc_composition_long = None
@@ -1264,26 +1045,28 @@ elif source_key == "africa_stack":
         else:
             with st.spinner("Sampling iSDA + WorldCereal..."):
                 try:
-                    if have_uploaded_gdf:
-                        aoi_gdf = st.session_state.uploaded_geodataframe.copy()
-                    else:
-                        admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
-                        admin_divisions = (
-                            dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
-                        )
-                        st.info("Resolving admin polygons via FAO GAUL 2015...")
-                        aoi_gdf = lulc.gdf_from_admin_selection(
-                            countries=admin_countries,
-                            divisions=admin_divisions,
+                    with observed_fetch("africa_stack") as fetch_trace:
+                        if have_uploaded_gdf:
+                            aoi_gdf = st.session_state.uploaded_geodataframe.copy()
+                        else:
+                            admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
+                            admin_divisions = (
+                                dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
+                            )
+                            st.info("Resolving admin polygons via FAO GAUL 2015...")
+                            aoi_gdf = lulc.gdf_from_admin_selection(
+                                countries=admin_countries,
+                                divisions=admin_divisions,
+                                credentials_dict=ee_credentials,
+                            )
+                        df = africa_stack.fetch_africa_stack_from_gdf(
+                            aoi_gdf=aoi_gdf,
+                            parameters=selected_params,
                             credentials_dict=ee_credentials,
                         )
-                    df = africa_stack.fetch_africa_stack_from_gdf(
-                        aoi_gdf=aoi_gdf,
-                        parameters=selected_params,
-                        credentials_dict=ee_credentials,
-                    )
+                        tracing.count("rows", len(df))
                     if df is not None and not df.empty:
-                        st.session_state.fetched_data = df
+                        _set_result(df)
                         st.session_state.current_data_source = f"{selected_source}"
                         st.session_state.lulc_change_long = None
                         st.session_state.lulc_composition_long = None
@@ -1320,26 +1103,28 @@ elif source_key == "forest_biomass":
         else:
             with st.spinner(f"Computing {forest_dataset} statistics..."):
                 try:
-                    if have_uploaded_gdf:
-                        aoi_gdf = st.session_state.uploaded_geodataframe.copy()
-                    else:
-                        admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
-                        admin_divisions = (
-                            dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
-                        )
-                        st.info("Resolving admin polygons via FAO GAUL 2015...")
-                        aoi_gdf = lulc.gdf_from_admin_selection(
-                            countries=admin_countries,
-                            divisions=admin_divisions,
+                    with observed_fetch("forest_biomass", dataset=forest_dataset) as fetch_trace:
+                        if have_uploaded_gdf:
+                            aoi_gdf = st.session_state.uploaded_geodataframe.copy()
+                        else:
+                            admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
+                            admin_divisions = (
+                                dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
+                            )
+                            st.info("Resolving admin polygons via FAO GAUL 2015...")
+                            aoi_gdf = lulc.gdf_from_admin_selection(
+                                countries=admin_countries,
+                                divisions=admin_divisions,
+                                credentials_dict=ee_credentials,
+                            )
+                        df = forest_biomass.fetch_biomass_stats_from_gdf(
+                            aoi_gdf=aoi_gdf,
+                            dataset_name=forest_dataset,
                             credentials_dict=ee_credentials,
                         )
-                    df = forest_biomass.fetch_biomass_stats_from_gdf(
-                        aoi_gdf=aoi_gdf,
-                        dataset_name=forest_dataset,
-                        credentials_dict=ee_credentials,
-                    )
+                        tracing.count("rows", len(df))
                     if df is not None and not df.empty:
-                        st.session_state.fetched_data = df
+                        _set_result(df)
                         st.session_state.current_data_source = f"{selected_source} | {forest_dataset}"
                         st.session_state.lulc_change_long = None
                         st.session_state.lulc_composition_long = None
@@ -1389,27 +1174,29 @@ elif source_key == "hydrology":
         else:
             with st.spinner(f"Computing Global Surface Water statistics..."):
                 try:
-                    if have_uploaded_gdf:
-                        aoi_gdf = st.session_state.uploaded_geodataframe.copy()
-                    else:
-                        admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
-                        admin_divisions = (
-                            dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
-                        )
-                        st.info("Resolving admin polygons via FAO GAUL 2015...")
-                        aoi_gdf = lulc.gdf_from_admin_selection(
-                            countries=admin_countries,
-                            divisions=admin_divisions,
+                    with observed_fetch("hydrology", dataset=hydro_dataset) as fetch_trace:
+                        if have_uploaded_gdf:
+                            aoi_gdf = st.session_state.uploaded_geodataframe.copy()
+                        else:
+                            admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
+                            admin_divisions = (
+                                dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
+                            )
+                            st.info("Resolving admin polygons via FAO GAUL 2015...")
+                            aoi_gdf = lulc.gdf_from_admin_selection(
+                                countries=admin_countries,
+                                divisions=admin_divisions,
+                                credentials_dict=ee_credentials,
+                            )
+
+                        df = hydrology.fetch_gsw_stats_from_gdf(
+                            aoi_gdf=aoi_gdf,
+                            dataset_name=hydro_dataset,
                             credentials_dict=ee_credentials,
                         )
-
-                    df = hydrology.fetch_gsw_stats_from_gdf(
-                        aoi_gdf=aoi_gdf,
-                        dataset_name=hydro_dataset,
-                        credentials_dict=ee_credentials,
-                    )
+                        tracing.count("rows", len(df))
                     if df is not None and not df.empty:
-                        st.session_state.fetched_data = df
+                        _set_result(df)
                         st.session_state.current_data_source = (
                             f"{selected_source} | {hydro_dataset}"
                         )
@@ -1448,6 +1235,7 @@ elif source_key == "lulc":
         and bool(locations_list)  # locations_list non-empty implies countries chosen
     )
     is_change_mode = lulc_analysis_mode == "Change (two years)"
+    is_multi_year = lulc_analysis_mode == "Composition (multi-year)"
     years_ok = (
         (not is_change_mode and lulc_year is not None)
         or (is_change_mode and lulc_year is not None and lulc_year_to is not None and lulc_year != lulc_year_to)
@@ -1469,6 +1257,8 @@ elif source_key == "lulc":
             aoi_desc = f"{n_polys} admin division(s) (will resolve via FAO GAUL)"
         if is_change_mode:
             year_desc = f"{lulc_year} → {lulc_year_to}"
+        elif is_multi_year:
+            year_desc = ", ".join(str(y) for y in sorted(lulc_years))
         else:
             year_desc = str(lulc_year)
         st.info(f"""
@@ -1494,57 +1284,76 @@ elif source_key == "lulc":
             spinner_msg = (
                 f"Computing {lulc_dataset} change {lulc_year} → {lulc_year_to}..."
                 if is_change_mode else
-                f"Fetching {lulc_dataset} for {lulc_year}..."
+                f"Fetching {lulc_dataset} for {year_desc}..."
             )
             with st.spinner(spinner_msg):
                 try:
-                    # Resolve AOI: uploaded gdf takes precedence over admin selection.
-                    if have_uploaded_gdf:
-                        aoi_gdf = st.session_state.uploaded_geodataframe.copy()
-                    else:
-                        admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
-                        admin_divisions = (
-                            dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
-                        )
-                        st.info("Resolving admin polygons via FAO GAUL 2015...")
-                        aoi_gdf = lulc.gdf_from_admin_selection(
-                            countries=admin_countries,
-                            divisions=admin_divisions,
-                            credentials_dict=ee_credentials,
-                        )
-
-                    if is_change_mode:
-                        df_long = lulc.fetch_lulc_change_from_gdf(
-                            gdf=aoi_gdf,
-                            dataset_name=lulc_dataset,
-                            year_from=int(lulc_year),
-                            year_to=int(lulc_year_to),
-                            credentials_dict=ee_credentials,
-                            drop_unchanged=lulc_drop_unchanged,
-                        )
-                        # Keep long form around for Sankey; pivot for display if asked.
-                        if (
-                            lulc_output_mode == "Change (wide pivot: from x to matrix)"
-                            and not df_long.empty
-                        ):
-                            df = lulc.change_to_wide(df_long, value="area_km2")
+                    with observed_fetch(
+                        "lulc",
+                        dataset=lulc_dataset,
+                        mode="change" if is_change_mode else (
+                            "composition_years" if is_multi_year else "composition"
+                        ),
+                    ) as fetch_trace:
+                        # Resolve AOI: uploaded gdf takes precedence over admin selection.
+                        if have_uploaded_gdf:
+                            aoi_gdf = st.session_state.uploaded_geodataframe.copy()
                         else:
-                            df = df_long
-                        st.session_state.lulc_change_long = df_long  # for Sankey + spatial exports
-                        st.session_state.lulc_composition_long = None
-                    else:
-                        df_long = lulc.fetch_lulc_composition_from_gdf(
-                            gdf=aoi_gdf,
-                            dataset_name=lulc_dataset,
-                            year=int(lulc_year),
-                            credentials_dict=ee_credentials,
-                        )
-                        if lulc_output_mode == "Composition (wide pivot)" and not df_long.empty:
-                            df = lulc.composition_to_wide(df_long, value="percent")
+                            admin_countries = list(selected_countries) if 'selected_countries' in dir() else []
+                            admin_divisions = (
+                                dict(selected_divisions) if 'selected_divisions' in dir() and selected_divisions else None
+                            )
+                            st.info("Resolving admin polygons via FAO GAUL 2015...")
+                            aoi_gdf = lulc.gdf_from_admin_selection(
+                                countries=admin_countries,
+                                divisions=admin_divisions,
+                                credentials_dict=ee_credentials,
+                            )
+
+                        if is_change_mode:
+                            # Transitions and both years' compositions
+                            # come back from one combined reduction.
+                            df_long, comp_long = lulc.fetch_lulc_change_and_composition_from_gdf(
+                                gdf=aoi_gdf,
+                                dataset_name=lulc_dataset,
+                                year_from=int(lulc_year),
+                                year_to=int(lulc_year_to),
+                                credentials_dict=ee_credentials,
+                                drop_unchanged=lulc_drop_unchanged,
+                            )
+                            # Keep long form around for Sankey; pivot for display if asked.
+                            if (
+                                lulc_output_mode == "Change (wide pivot: from x to matrix)"
+                                and not df_long.empty
+                            ):
+                                df = lulc.change_to_wide(df_long, value="area_km2")
+                            else:
+                                df = df_long
+                            st.session_state.lulc_change_long = df_long  # for Sankey + spatial exports
+                            st.session_state.lulc_composition_long = comp_long
                         else:
-                            df = df_long
-                        st.session_state.lulc_change_long = None
-                        st.session_state.lulc_composition_long = df_long  # for spatial exports
+                            if is_multi_year:
+                                df_long = lulc.fetch_lulc_composition_years_from_gdf(
+                                    gdf=aoi_gdf,
+                                    dataset_name=lulc_dataset,
+                                    years=[int(y) for y in lulc_years],
+                                    credentials_dict=ee_credentials,
+                                )
+                            else:
+                                df_long = lulc.fetch_lulc_composition_from_gdf(
+                                    gdf=aoi_gdf,
+                                    dataset_name=lulc_dataset,
+                                    year=int(lulc_year),
+                                    credentials_dict=ee_credentials,
+                                )
+                            if lulc_output_mode == "Composition (wide pivot)" and not df_long.empty:
+                                df = lulc.composition_to_wide(df_long, value="percent")
+                            else:
+                                df = df_long
+                            st.session_state.lulc_change_long = None
+                            st.session_state.lulc_composition_long = df_long  # for spatial exports
+
+                        tracing.count("rows", len(df_long))
 
                     # Cache AOI + dataset/year for downstream spatial exports and raster clips.
                     st.session_state.lulc_aoi_gdf = aoi_gdf
@@ -1553,9 +1362,10 @@ elif source_key == "lulc":
                     st.session_state.lulc_last_year_to = (
                         int(lulc_year_to) if is_change_mode else None
                     )
+                    _new_result_version()
 
                     if df is not None and not df.empty:
-                        st.session_state.fetched_data = df
+                        _set_result(df)
                         st.session_state.current_data_source = (
                             f"{selected_source} | {lulc_dataset} | {year_desc}"
                         )
@@ -1634,6 +1444,21 @@ elif source_key == "lulc":
         except Exception as e:
             st.info(f"Sankey unavailable: {e}")
 
+        # Both years' compositions arrive with the change result.
+        comp_long = st.session_state.get("lulc_composition_long")
+        if comp_long is not None and not comp_long.empty:
+            comp_sub = comp_long[
+                (comp_long["polygon_name"] == sankey_polygon) & ~comp_long["is_nodata"]
+            ]
+            if not comp_sub.empty:
+                st.caption(f"Class composition of {sankey_polygon} (% of observed area)")
+                comp_table = comp_sub.pivot_table(
+                    index="class_name", columns="year", values="percent",
+                    aggfunc="sum", fill_value=0,
+                )
+                comp_table.columns = [str(c) for c in comp_table.columns]
+                st.dataframe(comp_table, use_container_width=True)
+
 # --- Weather-data preflight + fetch button (existing flow, gated) ----------
 elif selected_params and locations_list and start_date <= end_date:
     date_range_days = (end_date - start_date).days + 1
@@ -1720,6 +1545,184 @@ elif selected_params and locations_list and start_date <= end_date:
     - 📅 Date Range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')} ({date_range_days} days)
     """)
 
+# Pre-flight cost estimate. Also picks the fetcher's sizing knobs
+# (e.g. ERA5 chunk/batch), which the fetch below passes through.
+fetch_plan = None
+if source_key != "lulc" and selected_params and locations_list and start_date <= end_date:
+    fetch_plan = planner.estimate_fetch(
+        source_key,
+        n_locations=len(locations_list),
+        parameters=selected_params,
+        start_date=start_date.strftime("%Y-%m-%d"),
+        end_date=end_date.strftime("%Y-%m-%d"),
+        temporal_resolution=temporal_resolution,
+    )
+if fetch_plan:
+    st.markdown("**🧮 Estimated cost**")
+    pc1, pc2, pc3, pc4 = st.columns(4)
+    pc1.metric("Upstream calls", f"{fetch_plan['round_trips']:,}")
+    pc2.metric("EE elements", f"{fetch_plan['ee_elements']:,}" if fetch_plan["ee_elements"] else "—")
+    pc3.metric("Download", planner.format_bytes(fetch_plan["bytes"]))
+    pc4.metric("Time", planner.format_duration(fetch_plan["wall_s"]))
+    basis = (
+        "from timings observed in this session"
+        if fetch_plan["basis"] == "observed" else "from the source cost model"
+    )
+    st.caption(
+        f"~{fetch_plan['rows']:,} rows; time estimated {basis}."
+        + (" Plan: " + "; ".join(fetch_plan["notes"]) + "." if fetch_plan["notes"] else "")
+    )
+    for msg in fetch_plan["warnings"]:
+        st.warning(f"⚠️ {msg}")
+
+def _show_no_data_guidance(source_key):
+    """Source-specific hints for a fetch that came back empty."""
+    if source_key == "nasa_power":
+        latest_available = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        st.info(f"""
+        **NASA POWER Data Availability:**
+        - ⏱️ Data has ~7 day latency
+        - 📅 Latest available data: {latest_available}
+        - 🔄 Try selecting dates at least 7 days in the past
+        - ✅ Recommended: Use dates from last month or earlier
+        
+        **Example:** Select dates from 2024-09-01 to 2024-09-30
+        """)
+    elif source_key == "openweather":
+        st.error("""
+        **OpenWeather Free Tier Limitation:**
+        - ❌ Historical data NOT available on free tier
+        - ✅ Only current weather + 7-day forecast available
+        
+        **Solution:**
+        Switch to **NASA POWER** for free historical weather data!
+        
+        **Steps:**
+        1. In the sidebar, change "Data Source" to **NASA POWER**
+        2. Select your dates (at least 7 days in the past)
+        3. No API key needed!
+        4. Click "Fetch Weather Data"
+        """)
+    elif source_key == "era5":
+        st.info("""
+        **ERA5 Data Availability:**
+        - Data has ~5 day latency
+        - Requests can take 5-30 minutes to process
+        - Try dates at least 5 days in the past
+        """)
+    else:
+        st.info("""
+        **Possible reasons:**
+        - Selected parameters may not be available for the chosen date range
+        - Data source might be temporarily unavailable
+        - Try selecting different parameters or a different date range
+        """)
+
+
+def _load_fetch_job(entry, job):
+    """Move a finished job's result into the session (once)."""
+    runner = jobs.get_runner()
+    entry["loaded"] = True
+    st.session_state.last_fetch_trace = runner.trace(job["job_id"])
+    if runner.profile(job["job_id"]) is not None:
+        st.session_state.last_fetch_profile = runner.profile(job["job_id"])
+    df = runner.result(job["job_id"]) if job["status"] in ("done", "incomplete") else None
+    if df is None or df.empty:
+        return
+    # Add location names to the dataframe
+    location_map = dict(enumerate(entry["location_names"]))
+    if "location_id" in df.columns:
+        df["location_name"] = df["location_id"].map(location_map)
+
+    _set_result(df)
+    st.session_state.current_data_source = entry["source_label"]
+
+    # Track data source usage
+    analytics.track_data_source_usage(
+        data_source=entry["source_label"],
+        parameters=entry["parameters"],
+        locations_count=len(entry["location_names"]),
+        date_range=entry["date_range"],
+    )
+    st.session_state.fetch_job_celebrate = job["status"] == "done"
+
+
+def _render_fetch_jobs():
+    """Status of this session's fetch jobs; loads results as they finish."""
+    runner = jobs.get_runner()
+    entries = st.session_state.fetch_jobs
+    by_id = {job["job_id"]: job for job in runner.jobs([e["job_id"] for e in entries])}
+
+    newly_loaded = False
+    for entry in entries:
+        job = by_id.get(entry["job_id"])
+        if job is not None and job["status"] in jobs.FINAL_STATES and not entry["loaded"]:
+            _load_fetch_job(entry, job)
+            newly_loaded = True
+    if newly_loaded:
+        # The results section lives outside this fragment: redraw the page.
+        st.rerun()
+
+    if st.session_state.pop("fetch_job_celebrate", False):
+        st.balloons()
+
+    for entry in reversed(entries):
+        job = by_id.get(entry["job_id"])
+        if job is None:
+            continue
+        status = job["status"]
+        started = job["started_at"] or job["submitted_at"]
+        elapsed = (job["finished_at"] or time.time()) - started
+        title = f"**{entry['source_label']}** · {entry['summary']}"
+        if status in jobs.ACTIVE_STATES:
+            prog = job.get("progress") or {}
+            done, total = prog.get("done", 0), prog.get("total", 0)
+            if status == "queued":
+                text = f"⏳ {title} — queued"
+            else:
+                text = f"🔄 {title} — {done:,}/{total:,} {prog.get('unit', 'requests')}"
+                if prog.get("bytes"):
+                    text += f" · {planner.format_bytes(prog['bytes'])}"
+                text += f" · {planner.format_duration(elapsed)} elapsed"
+                if prog.get("eta_s") is not None:
+                    text += f" · {planner.format_duration(prog['eta_s'])} left"
+            col_bar, col_stop = st.columns([5, 1])
+            col_bar.progress(min(done / total, 1.0) if total else 0.0, text=text)
+            if col_stop.button("⏹️ Stop", key=f"stop_job_{entry['job_id']}"):
+                runner.cancel(entry["job_id"])
+                st.toast("Stopping after the current chunk…")
+        elif status == "done" and job["rows"]:
+            st.success(
+                f"✅ {title} — {job['rows']:,} records in {planner.format_duration(elapsed)}"
+            )
+        elif status == "done":
+            st.warning(f"⚠️ {title} — no data retrieved. Please check your parameters and try again.")
+            if entry["job_id"] == entries[-1]["job_id"]:
+                _show_no_data_guidance(job["source"])
+        elif status == "incomplete":
+            n_out = len(job["outstanding"] or {})
+            shown = f" The {job['rows']:,} records fetched so far are shown below." if job.get("rows") else ""
+            st.warning(
+                f"⚠️ {title} — fetch incomplete: {n_out} chunk(s) failed.{shown} Completed "
+                f"chunks are saved; click **Fetch Weather Data** again to retry only "
+                f"the missing ones."
+            )
+            with st.expander("Outstanding chunks"):
+                st.json(job["outstanding"])
+        elif status == "cancelled":
+            st.warning(
+                f"⏹️ {title} — stopped. Chunks fetched so far are saved; click "
+                f"**Fetch Weather Data** again to resume."
+            )
+        elif status == "interrupted":
+            st.warning(
+                f"⚠️ {title} — interrupted by a server restart. Click **Fetch "
+                f"Weather Data** again to resume it."
+            )
+        else:
+            st.error(f"❌ {title} — error fetching data: {job['error']}")
+
+
 # Weather Fetch button (only renders for non-LULC sources)
 if source_key != "lulc" and st.button("Fetch Weather Data", type="primary", disabled=not (selected_params and locations_list)):
     if not selected_params:
@@ -1730,323 +1733,240 @@ if source_key != "lulc" and st.button("Fetch Weather Data", type="primary", disa
         # Prepare location tuples (lat, lon)
         # locations_list format: [(lat, lon, name), ...]
         location_coords = [(loc[0], loc[1]) for loc in locations_list]
-        
-        # Show progress
-        with st.spinner(f"Fetching data from {selected_source}..."):
-            try:
-                # Debug information
-                st.info(f"""
-                **Fetching:**
-                - {len(selected_params)} parameter(s): {', '.join(selected_params[:3])}{'...' if len(selected_params) > 3 else ''}
-                - {len(location_coords)} location(s)
-                - From {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}
-                """)
-                
-                # Fetch data based on source
-                df = None
-                if source_key == "nasa_power":
-                    df = nasa_power.fetch_nasa_power_data(
-                        locations=location_coords,
-                        parameters=selected_params,
-                        start_date=start_date.strftime("%Y-%m-%d"),
-                        end_date=end_date.strftime("%Y-%m-%d"),
-                        temporal_resolution=temporal_resolution,
-                    )
-                
-                elif source_key == "openweather":
-                    if not api_key:
-                        st.error("❌ OpenWeather API key is required")
-                    else:
-                        df = openweather.fetch_openweather_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
-                            api_key=api_key,
-                        )
-                
-                elif source_key == "era5":
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found. Please add ee_credentials.json file.")
-                        df = pd.DataFrame()
-                    else:
-                        df = era5.fetch_era5_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
-                            credentials_dict=ee_credentials,
-                        )
-                
-                elif source_key == "modis":
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found. Please add ee_credentials.json file.")
-                        df = pd.DataFrame()
-                    else:
-                        df = modis.fetch_modis_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
-                            credentials_dict=ee_credentials,
-                        )
-                
-                elif source_key == "chirps":
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found. Please add ee_credentials.json file.")
-                        df = pd.DataFrame()
-                    else:
-                        df = chirps.fetch_chirps_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
-                            credentials_dict=ee_credentials,
-                        )
+        fetch_args = dict(
+            locations=location_coords,
+            parameters=selected_params,
+            start_date=start_date.strftime("%Y-%m-%d"),
+            end_date=end_date.strftime("%Y-%m-%d"),
+            temporal_resolution=temporal_resolution,
+        )
 
-                elif source_key == "drought_indices":
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found. Please add ee_credentials.json file.")
-                        df = pd.DataFrame()
-                    else:
-                        df = drought_indices.fetch_drought_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
-                            credentials_dict=ee_credentials,
-                        )
+        # Build the fetch call here (credential / input checks need the
+        # widgets) and run it as a background job so reruns don't block
+        # on it or cancel it.
+        fetch_fn = None
+        if source_spec["api_key"] and not api_key:
+            st.error(f"❌ {source_spec['api_key']} is required")
+
+        elif source_spec["needs_ee"] and not ee_credentials:
+            st.error("❌ Earth Engine credentials not found. Please add ee_credentials.json file.")
+
+        elif source_spec["input"] == "points":
+            fetch_kwargs = dict(fetch_args, **(fetch_plan["fetch_options"] if fetch_plan else {}))
+            if source_spec["needs_ee"]:
+                fetch_kwargs["credentials_dict"] = ee_credentials
+            if source_spec["api_key"]:
+                fetch_kwargs["api_key"] = api_key
+            fetch_fn = partial(registry.fetcher(source_key), **fetch_kwargs)
+
+        else:  # polygon statistics (burned area) — polygon input required
+            have_uploaded_gdf_ld = (
+                st.session_state.uploaded_geodataframe is not None
+            )
+            have_admin_ld = (
+                location_method == "African Countries/Divisions"
+                and bool(locations_list)
+            )
+            if not (have_uploaded_gdf_ld or have_admin_ld):
+                st.error(
+                    f"❌ {selected_source} needs polygon input. "
+                    "Upload a shapefile / KML, or pick an African "
+                    "country / division."
+                )
+            else:
+                uploaded_gdf_ld = (
+                    st.session_state.uploaded_geodataframe.copy()
+                    if have_uploaded_gdf_ld else None
+                )
+                admin_countries_ld = (
+                    list(selected_countries)
+                    if 'selected_countries' in dir() else []
+                )
+                admin_divisions_ld = (
+                    dict(selected_divisions)
+                    if 'selected_divisions' in dir() and selected_divisions
+                    else None
+                )
+                fetch_from_gdf = registry.fetcher(source_key)
 
-                elif source_key == "phenology":
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found. Please add ee_credentials.json file.")
-                        df = pd.DataFrame()
+                def fetch_fn():
+                    if uploaded_gdf_ld is not None:
+                        aoi_gdf_ld = uploaded_gdf_ld
                     else:
-                        df = phenology.fetch_phenology_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
+                        # Resolving admin polygons via FAO GAUL 2015.
+                        aoi_gdf_ld = lulc.gdf_from_admin_selection(
+                            countries=admin_countries_ld,
+                            divisions=admin_divisions_ld,
                             credentials_dict=ee_credentials,
                         )
+                    return fetch_from_gdf(
+                        aoi_gdf=aoi_gdf_ld,
+                        parameters=fetch_args["parameters"],
+                        start_date=fetch_args["start_date"],
+                        end_date=fetch_args["end_date"],
+                        credentials_dict=ee_credentials,
+                    )
 
-                elif source_key == "soil_moisture":
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found. Please add ee_credentials.json file.")
-                        df = pd.DataFrame()
-                    else:
-                        df = soil_moisture.fetch_smap_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
-                            credentials_dict=ee_credentials,
-                        )
-
-                elif source_key == "air_quality":
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found.")
-                        df = pd.DataFrame()
-                    else:
-                        df = air_quality.fetch_air_quality_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
-                            credentials_dict=ee_credentials,
-                        )
-
-                elif source_key == "productivity":
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found.")
-                        df = pd.DataFrame()
-                    else:
-                        df = productivity.fetch_productivity_data(
-                            locations=location_coords,
-                            parameters=selected_params,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            temporal_resolution=temporal_resolution,
-                            credentials_dict=ee_credentials,
-                        )
-
-                else:  # land_degradation (burned area) — polygon input required
-                    if not ee_credentials:
-                        st.error("❌ Earth Engine credentials not found.")
-                        df = pd.DataFrame()
-                    else:
-                        have_uploaded_gdf_ld = (
-                            st.session_state.uploaded_geodataframe is not None
-                        )
-                        have_admin_ld = (
-                            location_method == "African Countries/Divisions"
-                            and bool(locations_list)
-                        )
-                        if not (have_uploaded_gdf_ld or have_admin_ld):
-                            st.error(
-                                "❌ Burned Area needs polygon input. "
-                                "Upload a shapefile / KML, or pick an African "
-                                "country / division."
-                            )
-                            df = pd.DataFrame()
-                        else:
-                            if have_uploaded_gdf_ld:
-                                aoi_gdf_ld = st.session_state.uploaded_geodataframe.copy()
-                            else:
-                                admin_countries_ld = (
-                                    list(selected_countries)
-                                    if 'selected_countries' in dir() else []
-                                )
-                                admin_divisions_ld = (
-                                    dict(selected_divisions)
-                                    if 'selected_divisions' in dir() and selected_divisions
-                                    else None
-                                )
-                                st.info("Resolving admin polygons via FAO GAUL 2015...")
-                                aoi_gdf_ld = lulc.gdf_from_admin_selection(
-                                    countries=admin_countries_ld,
-                                    divisions=admin_divisions_ld,
-                                    credentials_dict=ee_credentials,
-                                )
-                            df = land_degradation.fetch_burned_area_from_gdf(
-                                aoi_gdf=aoi_gdf_ld,
-                                parameters=selected_params,
-                                start_date=start_date.strftime("%Y-%m-%d"),
-                                end_date=end_date.strftime("%Y-%m-%d"),
-                                credentials_dict=ee_credentials,
-                            )
-                
-                if df is not None and not df.empty:
-                    # Add location names to the dataframe
-                    # locations_list format: [(lat, lon, name), ...]
-                    location_map = {i: loc[2] for i, loc in enumerate(locations_list)}
-                    if "location_id" in df.columns:
-                        df["location_name"] = df["location_id"].map(location_map)
-                    
-                    st.session_state.fetched_data = df
-                    st.session_state.current_data_source = selected_source
-                    
-                    # Track data source usage
-                    date_range = f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-                    analytics.track_data_source_usage(
-                        data_source=selected_source,
-                        parameters=selected_params,
-                        locations_count=len(locations_list),
-                        date_range=date_range
-                    )
-                    
-                    st.success(f"✅ Data fetched successfully! {len(df)} records retrieved.")
-                    st.balloons()
-                else:
-                    st.warning("⚠️ No data retrieved. Please check your parameters and try again.")
-                    
-                    # Source-specific guidance
-                    if source_key == "nasa_power":
-                        latest_available = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-                        st.info(f"""
-                        **NASA POWER Data Availability:**
-                        - ⏱️ Data has ~7 day latency
-                        - 📅 Latest available data: {latest_available}
-                        - 🔄 Try selecting dates at least 7 days in the past
-                        - ✅ Recommended: Use dates from last month or earlier
-                        
-                        **Example:** Select dates from 2024-09-01 to 2024-09-30
-                        """)
-                    elif source_key == "openweather":
-                        st.error("""
-                        **OpenWeather Free Tier Limitation:**
-                        - ❌ Historical data NOT available on free tier
-                        - ✅ Only current weather + 7-day forecast available
-                        
-                        **Solution:**
-                        Switch to **NASA POWER** for free historical weather data!
-                        
-                        **Steps:**
-                        1. In the sidebar, change "Data Source" to **NASA POWER**
-                        2. Select your dates (at least 7 days in the past)
-                        3. No API key needed!
-                        4. Click "Fetch Weather Data"
-                        """)
-                    elif source_key == "era5":
-                        st.info("""
-                        **ERA5 Data Availability:**
-                        - Data has ~5 day latency
-                        - Requests can take 5-30 minutes to process
-                        - Try dates at least 5 days in the past
-                        """)
-                    else:
-                        st.info("""
-                        **Possible reasons:**
-                        - Selected parameters may not be available for the chosen date range
-                        - Data source might be temporarily unavailable
-                        - Try selecting different parameters or a different date range
-                        """)
-            
-            except Exception as e:
-                st.error(f"❌ Error fetching data: {str(e)}")
-                if st.checkbox("🔍 View Error Details", key="error_details"):
-                    st.code(str(e))
+        if fetch_fn is not None:
+            # Same request -> same request key, so pressing Fetch again after
+            # a partial failure resumes from the chunks already on disk, and
+            # pressing it while the job is still running doesn't start a twin.
+            request_key = checkpoint.job_id_for(
+                source_key,
+                locations=location_coords,
+                parameters=sorted(selected_params),
+                start_date=fetch_args["start_date"],
+                end_date=fetch_args["end_date"],
+                resolution=temporal_resolution,
+            )
+            job_id = jobs.get_runner().submit(
+                source_key,
+                fetch_fn,
+                request_key=request_key,
+                label=selected_source,
+                attrs={
+                    "n_locations": len(location_coords),
+                    "n_params": len(selected_params),
+                    "resolution": temporal_resolution,
+                },
+                profile=bool(st.session_state.get("diag_profile_fetches")),
+            )
+            if job_id not in {e["job_id"] for e in st.session_state.fetch_jobs}:
+                st.session_state.fetch_jobs.append({
+                    "job_id": job_id,
+                    "source_label": selected_source,
+                    "parameters": list(selected_params),
+                    "location_names": [loc[2] for loc in locations_list],
+                    "date_range": f"{fetch_args['start_date']} to {fetch_args['end_date']}",
+                    "summary": (
+                        f"{len(selected_params)} parameter(s), {len(location_coords)} "
+                        f"location(s), {fetch_args['start_date']} → {fetch_args['end_date']}"
+                    ),
+                    "loaded": False,
+                })
+
+# Background fetch jobs for this session. While any is queued or running
+# the panel re-polls itself every couple of seconds without rerunning the
+# rest of the page, so the other widgets stay usable.
+if st.session_state.fetch_jobs:
+    st.subheader("🗂️ Fetch Jobs")
+    _fetch_jobs_active = any(
+        job["status"] in jobs.ACTIVE_STATES
+        for job in jobs.get_runner().jobs([e["job_id"] for e in st.session_state.fetch_jobs])
+    )
+    st.fragment(run_every=jobs.POLL_SECONDS if _fetch_jobs_active else None)(_render_fetch_jobs)()
+    if not _fetch_jobs_active and st.button("Clear finished jobs", key="clear_fetch_jobs"):
+        for entry in st.session_state.fetch_jobs:
+            jobs.get_runner().discard(entry["job_id"])
+        st.session_state.fetch_jobs = []
+        st.rerun()
 
 # --- Cached export builders ---------------------------------------------------
 # Streamlit reruns the script on every interaction. Without caching, the
 # shapefile / Excel / GeoJSON byte payloads (and a fresh temp directory for the
-# shapefile) would be rebuilt on every checkbox toggle. We key the cache on a
-# hash of the dataframe so it invalidates whenever new data is fetched.
+# shapefile) would be rebuilt on every checkbox toggle. The cache key is the
+# result's version token (see _new_result_version), not a hash of the data:
+# the DataFrame arguments are underscore-prefixed so Streamlit doesn't hash
+# them, and `version` changes whenever a new result is fetched.
+#
+# The cache is process-wide and every fetch brings a new version, so each
+# builder keeps only its few most recent payloads, for at most an hour;
+# anything older is simply rebuilt if it is downloaded again.
+_EXPORT_CACHE_ENTRIES = 4
+_EXPORT_CACHE_TTL_S = 3600
 
-def _df_fingerprint(df: pd.DataFrame) -> str:
-    """Stable, cheap-ish fingerprint of a DataFrame for cache keying."""
-    return f"{df.shape}-{int(pd.util.hash_pandas_object(df, index=True).sum())}"
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_csv(_df, version, compress=False):
+    return export_to_csv(_df, compress=compress)
 
 
-@st.cache_data(show_spinner=False)
-def _build_csv(_df, _fp):
-    return export_to_csv(_df)
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_json(_df, version, compress=False):
+    return export_to_json(_df, compress=compress)
 
 
-@st.cache_data(show_spinner=False)
-def _build_json(_df, _fp):
-    return export_to_json(_df)
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_jsonl(_df, version, compress=False):
+    return export_to_jsonl(_df, compress=compress)
 
 
-@st.cache_data(show_spinner=False)
-def _build_geojson(_df, _fp):
-    return export_to_geojson(_df)
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_geojson(_df, version, compress=False):
+    return export_to_geojson(_df, compress=compress)
 
 
-@st.cache_data(show_spinner=False)
-def _build_excel(_df, _fp):
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_geojson_seq(_df, version, compress=False):
+    return export_to_geojson_seq(_df, compress=compress)
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_excel(_df, version):
     return export_to_excel(_df)
 
 
-@st.cache_data(show_spinner=False)
-def _build_shapefile_bytes(_df, _fp):
-    """Build shapefile ZIP and return bytes (so the temp dir can be cleaned up)."""
-    zip_path = export_to_shapefile(_df)
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_parquet(_df, version):
+    return export_to_parquet(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_geoparquet(_df, version):
+    return export_to_geoparquet(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_feather(_df, version):
+    return export_to_feather(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_geopackage_normalized(_df, version):
+    return export_to_geopackage_normalized(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_parquet_normalized(_df, version):
+    return export_to_parquet_normalized(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_location_arrays(_df, version):
+    return export_to_location_arrays(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_netcdf(_df, version, source_label):
+    return cube_export.export_to_netcdf(
+        _df, variable_attrs=_cube_variable_attrs(source_label), source=source_label or ""
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_zarr(_df, version, source_label):
+    return cube_export.export_to_zarr(
+        _df, variable_attrs=_cube_variable_attrs(source_label), source=source_label or ""
+    )
+
+
+def _cube_variable_attrs(source_label):
+    """CF long_name / units for the result's parameters, from its source."""
+    key = registry.labels().get(source_label)
+    if key is None or registry.get(key)["form"] != "series":
+        return {}
     try:
-        with open(zip_path, "rb") as f:
-            return f.read()
-    finally:
-        # Best-effort cleanup of the temp ZIP and its parent dir.
-        try:
-            parent = os.path.dirname(zip_path)
-            if os.path.exists(zip_path):
-                os.remove(zip_path)
-            if parent and os.path.isdir(parent):
-                # Remove parent only if empty after ZIP removal.
-                try:
-                    os.rmdir(parent)
-                except OSError:
-                    pass
-        except Exception:
-            pass
+        groups = registry.get_available_parameters(key)
+    except Exception:
+        return {}
+    return cube_export.variable_attrs_from_labels(
+        {code: label for group in groups.values() for code, label in group.items()}
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_shapefile_bytes(_df, version):
+    """Build shapefile ZIP and return bytes (so the temp dir can be cleaned up)."""
+    return export_to_shapefile_bytes(_df)
 
 
 # --- LULC spatial export builders (polygon-attributed) -------------------
@@ -2055,70 +1975,33 @@ def _build_shapefile_bytes(_df, _fp):
 # written out to Shapefile/GeoJSON. The output preserves the input
 # polygon geometry and decorates each feature with the LULC attributes.
 
-def _lulc_gdf_fingerprint(long_df, aoi_gdf):
-    """Fingerprint covers both the LULC values and the AOI geometry so the
-    cache invalidates if either the AOI or the data changes."""
-    a = _df_fingerprint(long_df) if long_df is not None else "none"
-    b = (
-        int(pd.util.hash_pandas_object(aoi_gdf.drop(columns="geometry"), index=True).sum())
-        if aoi_gdf is not None and not aoi_gdf.empty else 0
-    )
-    c = len(aoi_gdf) if aoi_gdf is not None else 0
-    return f"{a}-{b}-{c}"
-
-
-@st.cache_data(show_spinner=False)
-def _build_lulc_polygon_gdf(_long_df, _aoi_gdf, _is_change, _fp):
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_lulc_polygon_gdf(_long_df, _aoi_gdf, is_change, version, _comp_df=None):
     """Polygon summary GDF: ONE feature per input AOI with attributes
-    describing dominant class / change statistics. Used in change mode."""
-    if _is_change:
-        return lulc.build_change_geodataframe(_long_df, _aoi_gdf)
+    describing dominant class / change statistics. Used in change mode,
+    where `_comp_df` (both years' compositions) adds the dominant classes."""
+    if is_change:
+        return lulc.build_change_geodataframe(_long_df, _aoi_gdf, _comp_df)
     return lulc.build_polygon_geodataframe(_long_df, _aoi_gdf)
 
 
-# Cache the vectorized land-cover GDF separately — different inputs and a
-# different runtime cost. Keyed on (aoi fingerprint, dataset, year).
-
-def _lulc_vector_fingerprint(aoi_gdf, dataset, year):
-    a = (
-        int(pd.util.hash_pandas_object(aoi_gdf.drop(columns="geometry"), index=True).sum())
-        if aoi_gdf is not None and not aoi_gdf.empty else 0
-    )
-    return f"{a}-{len(aoi_gdf) if aoi_gdf is not None else 0}-{dataset}-{year}"
-
-
-@st.cache_data(show_spinner=False)
-def _build_lulc_vector_gdf(_aoi_gdf, _dataset, _year, _scale, _creds_token, _fp):
-    """Vectorize the LULC raster inside each AOI into many class polygons.
-    `_creds_token` is included so the cache invalidates if credentials change.
-    `_scale` is an explicit override (None = use dataset's native scale)."""
-    gdf, meta = lulc.build_lulc_vector_polygons_gdf(
-        aoi_gdf=_aoi_gdf,
-        dataset_name=_dataset,
-        year=int(_year),
-        credentials_dict=ee_credentials,
-        scale_override=_scale,
-    )
-    return gdf, meta
-
-
-@st.cache_data(show_spinner=False)
-def _build_lulc_geojson_bytes(_long_df, _aoi_gdf, _is_change, _fp):
-    gdf = _build_lulc_polygon_gdf(_long_df, _aoi_gdf, _is_change, _fp)
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_lulc_geojson_bytes(_long_df, _aoi_gdf, is_change, version, _comp_df=None):
+    gdf = _build_lulc_polygon_gdf(_long_df, _aoi_gdf, is_change, version, _comp_df)
     return gdf.to_json().encode("utf-8")
 
 
-@st.cache_data(show_spinner=False)
-def _build_lulc_vector_geojson_bytes(_aoi_gdf, _dataset, _year, _scale, _creds_token, _fp):
-    gdf, meta = _build_lulc_vector_gdf(_aoi_gdf, _dataset, _year, _scale, _creds_token, _fp)
-    return gdf.to_json().encode("utf-8"), meta
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_lulc_geoparquet_bytes(_long_df, _aoi_gdf, is_change, version, _comp_df=None):
+    gdf = _build_lulc_polygon_gdf(_long_df, _aoi_gdf, is_change, version, _comp_df)
+    return geodataframe_to_geoparquet(gdf)
 
 
-@st.cache_data(show_spinner=False)
-def _build_lulc_shapefile_bytes(_long_df, _aoi_gdf, _is_change, _fp):
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_lulc_shapefile_bytes(_long_df, _aoi_gdf, is_change, version, _comp_df=None):
     """Write the polygon-summary GDF to a zipped shapefile (change mode)."""
     from utils.shapefile_handler import create_shapefile_zip
-    gdf = _build_lulc_polygon_gdf(_long_df, _aoi_gdf, _is_change, _fp)
+    gdf = _build_lulc_polygon_gdf(_long_df, _aoi_gdf, is_change, version, _comp_df)
     # Truncate + dedupe columns to obey the .dbf 10-char limit (same
     # algorithm as the weather Shapefile export in utils/export_handler.py).
     new_cols = []
@@ -2162,55 +2045,40 @@ def _build_lulc_shapefile_bytes(_long_df, _aoi_gdf, _is_change, _fp):
             pass
 
 
-@st.cache_data(show_spinner=False)
-def _build_lulc_vector_shapefile_bytes(_aoi_gdf, _dataset, _year, _scale, _creds_token, _fp):
-    """Write the *vectorized* land-cover GDF (many class polygons per AOI)
-    to a zipped shapefile suitable for QGIS/ArcGIS styling."""
-    from utils.shapefile_handler import create_shapefile_zip
-    gdf, meta = _build_lulc_vector_gdf(_aoi_gdf, _dataset, _year, _scale, _creds_token, _fp)
-    if gdf.empty:
-        raise RuntimeError("Vectorize returned no polygons — AOI may not intersect dataset coverage.")
-    # 10-char column-dedup, same algorithm used in utils/export_handler.py
-    new_cols = []
-    seen = {}
-    for col in gdf.columns:
-        if col == "geometry":
-            new_cols.append(col)
-            continue
-        base = col[:10]
-        if base not in seen:
-            seen[base] = 0
-            new_cols.append(base)
-        else:
-            seen[base] += 1
-            suffix = f"_{seen[base]}"
-            trimmed = base[: 10 - len(suffix)] + suffix
-            while trimmed in new_cols:
-                seen[base] += 1
-                suffix = f"_{seen[base]}"
-                trimmed = base[: 10 - len(suffix)] + suffix
-            new_cols.append(trimmed)
-    gdf = gdf.copy()
-    gdf.columns = new_cols
+_LULC_VECTOR_FORMATS = {"FlatGeobuf (.fgb)": "FlatGeobuf", "GeoPackage (.gpkg)": "GPKG"}
+_LULC_VECTOR_MIME = {
+    "FlatGeobuf": "application/flatgeobuf",
+    "GPKG": "application/geopackage+sqlite3",
+    "GeoJSON": "application/geo+json",
+}
+
+# Vectorized land cover (many class polygons per AOI) is streamed AOI by
+# AOI into a FlatGeobuf / GeoPackage / GeoJSON file rather than built as
+# one GeoDataFrame. Keyed on (result version, dataset, year, scale, driver).
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _build_lulc_vector_file_bytes(_aoi_gdf, dataset, year, scale, driver, creds_token, version):
+    """Vectorize the LULC raster inside each AOI and return (file bytes, meta).
+    `creds_token` is included so the cache invalidates if credentials change.
+    `scale` is an explicit override (None = use dataset's native scale)."""
     temp_dir = tempfile.mkdtemp()
-    output_path = os.path.join(temp_dir, "lulc_vector")
-    gdf.to_file(f"{output_path}.shp")
-    zip_path = create_shapefile_zip(output_path)
+    path = os.path.join(temp_dir, f"lulc_vector{lulc.VECTOR_DRIVERS[driver]}")
     try:
-        with open(zip_path, "rb") as f:
+        meta = lulc.write_lulc_vector_file(
+            path,
+            aoi_gdf=_aoi_gdf,
+            dataset_name=dataset,
+            year=int(year),
+            credentials_dict=ee_credentials,
+            driver=driver,
+            scale_override=scale,
+        )
+        if meta["total_polygons"] == 0:
+            raise RuntimeError("Vectorize returned no polygons — AOI may not intersect dataset coverage.")
+        with open(path, "rb") as f:
             return f.read(), meta
     finally:
-        for ext in (".shp", ".shx", ".dbf", ".prj", ".cpg", ".zip"):
-            try:
-                p = f"{output_path}{ext}"
-                if os.path.exists(p):
-                    os.remove(p)
-            except Exception:
-                pass
-        try:
-            os.rmdir(temp_dir)
-        except OSError:
-            pass
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 def _track_download_cb(fmt: str, rows: int, locs: int):
@@ -2223,12 +2091,42 @@ def _track_download_cb(fmt: str, rows: int, locs: int):
     )
 
 
-# Display fetched data
-if st.session_state.fetched_data is not None:
+# --- Result panels -------------------------------------------------------------
+# Each panel below is a fragment: interacting with a widget inside one (an
+# export checkbox, a vectorize scale, the cross-layer pickers) reruns just
+# that panel instead of the whole script. A full rerun still redraws all of
+# them, so they always reflect the latest fetch and sidebar state.
+
+def _result_kind(df: pd.DataFrame) -> str:
+    """Schema of a result table: hydrology / forest / africa / population /
+    lulc, or series for the weather-style tables."""
+    cols = df.columns
+    if "water_ever_km2" in cols:
+        return "hydrology"
+    if any(c in cols for c in ("AGB_MEAN_T_HA", "CANOPY_MEAN_M", "MANGROVE_KM2")):
+        return "forest"
+    if any(c in cols for c in ("SOIL_PH_0_20", "SOIL_OC_0_20", "CROPLAND_KM2")):
+        return "africa"
+    if any(c in cols for c in ("POPULATION_TOTAL", "BUILT_UP_KM2", "MEAN_RADIANCE")):
+        return "population"
+    if any(c in cols for c in ("polygon_id", "class_name", "class_code", "polygon_name")):
+        return "lulc"
+    return "series"
+
+
+@st.cache_data(show_spinner=False, max_entries=_EXPORT_CACHE_ENTRIES, ttl=_EXPORT_CACHE_TTL_S)
+def _describe(_df, version):
+    return _df.describe()
+
+
+@st.fragment
+def _render_results_panel():
     st.header("📊 Retrieved Data")
 
-    df = st.session_state.fetched_data.copy()
-    
+    # Only the first 20 rows are shown, so only those get reformatted.
+    original_df = _current_result()
+    df = original_df.head(20).copy()
+
     # Fix datetime columns for Streamlit display (PyArrow compatibility)
     for col in df.columns:
         if col in ['date', 'datetime'] or 'date' in col.lower():
@@ -2251,28 +2149,9 @@ if st.session_state.fetched_data is not None:
     # weather tables have location_id + date/datetime columns; LULC tables
     # have polygon_id + class_name/class_code; hydrology tables have
     # polygon_id + water_ever_km2 (no class column).
-    original_df = st.session_state.fetched_data
-    is_hydrology_result = "water_ever_km2" in original_df.columns
-    is_forest_result = any(
-        c in original_df.columns
-        for c in ("AGB_MEAN_T_HA", "CANOPY_MEAN_M", "MANGROVE_KM2")
-    )
-    is_africa_result = any(
-        c in original_df.columns
-        for c in ("SOIL_PH_0_20", "SOIL_OC_0_20", "CROPLAND_KM2")
-    )
-    is_population_result = any(
-        c in original_df.columns
-        for c in ("POPULATION_TOTAL", "BUILT_UP_KM2", "MEAN_RADIANCE")
-    )
-    is_lulc_result = (
-        not is_hydrology_result and not is_forest_result
-        and not is_africa_result and not is_population_result
-    ) and (
-        "polygon_id" in original_df.columns
-        or "class_name" in original_df.columns
-        or any(c in original_df.columns for c in ("class_code", "polygon_name"))
-    )
+    kind = _result_kind(original_df)
+    is_hydrology_result = kind == "hydrology"
+    is_lulc_result = kind == "lulc"
     col1, col2, col3, col4 = st.columns(4)
     if is_hydrology_result:
         with col1:
@@ -2333,8 +2212,53 @@ if st.session_state.fetched_data is not None:
     
     # Data statistics (use original data)
     if st.checkbox("📈 View Data Statistics", key="view_stats"):
-        st.dataframe(original_df.describe())
+        st.dataframe(_describe(original_df, st.session_state.result_version))
+
+    # Where the last fetch spent its time (auth / server / network / decode ...).
+    fetch_trace = st.session_state.last_fetch_trace
+    if fetch_trace is not None:
+        trace_summary = fetch_trace.summary()
+        with st.expander(f"⏱️ Fetch performance ({trace_summary['total_s'] or 0:.1f}s)"):
+            span_rows = [
+                {
+                    "phase": name,
+                    "seconds": entry["seconds"],
+                    "calls": entry["count"],
+                    "share_%": round(
+                        100 * entry["seconds"] / trace_summary["total_s"], 1
+                    ) if trace_summary["total_s"] else None,
+                }
+                for name, entry in sorted(
+                    trace_summary["spans"].items(), key=lambda kv: -kv[1]["seconds"]
+                )
+            ]
+            if span_rows:
+                st.dataframe(pd.DataFrame(span_rows), hide_index=True)
+            counters = trace_summary["counters"]
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Round-trips", f"{counters.get('round_trips', 0):,}")
+            c2.metric("Bytes received", f"{counters.get('bytes', 0):,}")
+            c3.metric("Rows", f"{counters.get('rows', 0):,}")
+            c4.metric(
+                "Chunks reused",
+                f"{counters.get('cache_hits', 0) + counters.get('coalesced', 0):,}",
+                help="Served from a saved checkpoint or shared with another "
+                     "session's identical in-flight request.",
+            )
+            st.caption(
+                f"Trace `{trace_summary['trace_id']}` · source `{trace_summary['source']}` · "
+                f"status {trace_summary['status']}"
+            )
     
+
+
+@st.fragment
+def _render_export_panel():
+    original_df = _current_result()
+    kind = _result_kind(original_df)
+    is_hydrology_result = kind == "hydrology"
+    is_lulc_result = kind == "lulc"
+
     # Export section
     st.header("💾 Export Data")
     
@@ -2348,7 +2272,10 @@ if st.session_state.fetched_data is not None:
         base_filename = f"gsw_stats_{ds_tag}_{timestamp}"
     elif is_lulc_result:
         ds_tag = (lulc_dataset or "lulc").replace(" ", "_").replace("/", "_")
-        yr_tag = str(lulc_year or "year")
+        yr_tag = (
+            f"{min(lulc_years)}-{max(lulc_years)}" if lulc_years and len(lulc_years) > 1
+            else str(lulc_year or "year")
+        )
         base_filename = f"landcover_{ds_tag}_{yr_tag}_{timestamp}"
     else:
         date_range_str = (
@@ -2358,8 +2285,7 @@ if st.session_state.fetched_data is not None:
         base_filename = f"weather_data_{selected_source.replace(' ', '_')}_{date_range_str}"
 
     # Use original (unformatted) data for all exports; compute counts once.
-    original_df = st.session_state.fetched_data
-    _fp = _df_fingerprint(original_df)
+    _fp = st.session_state.result_version
     _rows = len(original_df)
     if is_lulc_result:
         _locs = (
@@ -2374,6 +2300,12 @@ if st.session_state.fetched_data is not None:
             if "location_id" in original_df.columns else 0
         )
 
+    compress = st.checkbox(
+        "🗜️ gzip text downloads (CSV / JSON / GeoJSON)",
+        key="export_gzip",
+        help="Typically 5–10× smaller. Opens directly in pandas, R, DuckDB and QGIS.",
+    )
+
     # Create three columns for the main export formats
     col1, col2, col3 = st.columns(3)
 
@@ -2381,12 +2313,12 @@ if st.session_state.fetched_data is not None:
         st.subheader("📊 CSV")
         st.caption("Tabular format for Excel/Python/R")
         try:
-            csv_data = _build_csv(original_df, _fp)
+            csv_data = _build_csv(original_df, _fp, compress)
             st.download_button(
                 label="📥 Download CSV",
                 data=csv_data,
-                file_name=f"{base_filename}.csv",
-                mime="text/csv",
+                file_name=get_export_filename(base_filename, "CSV", compress),
+                mime=get_export_mime_type("CSV", compress),
                 use_container_width=True,
                 key="download_csv",
                 on_click=_track_download_cb,
@@ -2421,9 +2353,9 @@ if st.session_state.fetched_data is not None:
                     "One feature per AOI with `percent_changed`, top loss / top gain attributes."
                 )
                 try:
-                    fp_lulc = _lulc_gdf_fingerprint(long_df, lulc_aoi)
                     shapefile_data = _build_lulc_shapefile_bytes(
-                        long_df, lulc_aoi, True, fp_lulc
+                        long_df, lulc_aoi, True, _fp,
+                        st.session_state.lulc_composition_long,
                     )
                     st.download_button(
                         label="📥 Download Shapefile",
@@ -2443,8 +2375,8 @@ if st.session_state.fetched_data is not None:
                 st.caption(
                     "Vectorized land cover — many polygons, one per class patch. "
                     "Style by `class_name` or `color` in QGIS/ArcGIS. "
-                    "**CSV/JSON composition is computed over the entire AOI** — only "
-                    "this vectorized export is subject to a per-AOI polygon cap."
+                    "Large AOIs are vectorized as tiles in parallel and joined back "
+                    "together, so the whole AOI is covered."
                 )
                 ds_native = lulc.get_dataset_info(
                     st.session_state.lulc_last_dataset
@@ -2458,60 +2390,59 @@ if st.session_state.fetched_data is not None:
                     key="lulc_vec_shp_scale",
                     help=(
                         f"Native is {ds_native} m. Coarser scales (30 / 100 / 250 m) "
-                        "produce far fewer polygons — use them for large AOIs so "
-                        "the output fits in the 50,000-polygons-per-AOI cap."
+                        "produce far fewer polygons and smaller files, and finish "
+                        "faster on large AOIs."
+                    ),
+                )
+                vec_format = st.selectbox(
+                    "Vector format",
+                    options=list(_LULC_VECTOR_FORMATS),
+                    index=0,
+                    key="lulc_vec_format",
+                    help=(
+                        "Both carry a spatial index and open directly in QGIS / ArcGIS Pro. "
+                        "Unlike Shapefile there is no 2 GB or 10-character field-name limit."
                     ),
                 )
+                vec_driver = _LULC_VECTOR_FORMATS[vec_format]
                 if st.button(
-                    "🧩 Build & download vectorized Shapefile",
+                    f"🧩 Build & download vectorized {vec_format.split(' ')[0]}",
                     key="lulc_build_vector_shp",
                     use_container_width=True,
                     help="Calls Earth Engine to vectorize the LULC raster inside your AOI(s). Can take 10–60 s.",
                 ):
                     try:
                         with st.spinner(f"Vectorizing land cover at {vec_scale} m via Earth Engine…"):
-                            fp_v = _lulc_vector_fingerprint(
-                                lulc_aoi,
-                                st.session_state.lulc_last_dataset,
-                                st.session_state.lulc_last_year,
-                            ) + f"-s{vec_scale}"
-                            shp_bytes, shp_meta = _build_lulc_vector_shapefile_bytes(
+                            vec_bytes, vec_meta = _build_lulc_vector_file_bytes(
                                 lulc_aoi,
                                 st.session_state.lulc_last_dataset,
                                 int(st.session_state.lulc_last_year),
                                 int(vec_scale),
+                                vec_driver,
                                 "v1",  # creds token
-                                fp_v,
+                                _fp,
                             )
-                        st.session_state["_lulc_vec_shp_bytes"] = shp_bytes
-                        st.session_state["_lulc_vec_shp_meta"] = shp_meta
+                        st.session_state["_lulc_vec_file"] = {
+                            "bytes": vec_bytes, "meta": vec_meta, "driver": vec_driver,
+                        }
                     except Exception as e:
                         st.error(f"Vectorize failed: {e}")
-                if st.session_state.get("_lulc_vec_shp_meta"):
-                    m = st.session_state["_lulc_vec_shp_meta"]
+                vec_file = st.session_state.get("_lulc_vec_file")
+                if vec_file:
+                    m = vec_file["meta"]
                     st.caption(
                         f"📊 {m['total_polygons']:,} polygons at {m['scale_m']} m"
                     )
-                    if m["truncated"]:
-                        st.warning(
-                            f"⚠️ {m['truncated_count']} AOI(s) hit the "
-                            f"{m['max_polygons_per_aoi']:,}-polygon cap — visible "
-                            "coverage in QGIS is partial. **The CSV composition is "
-                            "still correct over the entire AOI.** To export a "
-                            "complete vectorized map, rebuild at a coarser scale "
-                            "(30, 100, or 250 m) — accuracy of class assignment "
-                            "is preserved; only the polygon count drops."
-                        )
-                if st.session_state.get("_lulc_vec_shp_bytes"):
+                    ext = lulc.VECTOR_DRIVERS[vec_file["driver"]]
                     st.download_button(
-                        label="📥 Download Shapefile (ready)",
-                        data=st.session_state["_lulc_vec_shp_bytes"],
-                        file_name=f"{base_filename}_vector_{vec_scale}m.zip",
-                        mime="application/zip",
+                        label=f"📥 Download {ext} (ready)",
+                        data=vec_file["bytes"],
+                        file_name=f"{base_filename}_vector_{m['scale_m']}m{ext}",
+                        mime=_LULC_VECTOR_MIME[vec_file["driver"]],
                         use_container_width=True,
                         key="download_lulc_vector_shp",
                         on_click=_track_download_cb,
-                        kwargs={"fmt": f"Shapefile (vectorized LULC {vec_scale}m)", "rows": _rows, "locs": _locs},
+                        kwargs={"fmt": f"{vec_file['driver']} (vectorized LULC {m['scale_m']}m)", "rows": _rows, "locs": _locs},
                     )
         else:
             try:
@@ -2533,12 +2464,12 @@ if st.session_state.fetched_data is not None:
         st.subheader("📝 JSON")
         st.caption("For web apps and APIs")
         try:
-            json_data = _build_json(original_df, _fp)
+            json_data = _build_json(original_df, _fp, compress)
             st.download_button(
                 label="📥 Download JSON",
                 data=json_data,
-                file_name=f"{base_filename}.json",
-                mime="application/json",
+                file_name=get_export_filename(base_filename, "JSON", compress),
+                mime=get_export_mime_type("JSON", compress),
                 use_container_width=True,
                 key="download_json",
                 on_click=_track_download_cb,
@@ -2571,9 +2502,9 @@ if st.session_state.fetched_data is not None:
                 elif is_change_res:
                     st.caption("One feature per AOI with change-summary attributes.")
                     try:
-                        fp_lulc = _lulc_gdf_fingerprint(long_df, lulc_aoi)
                         geojson_data = _build_lulc_geojson_bytes(
-                            long_df, lulc_aoi, True, fp_lulc
+                            long_df, lulc_aoi, True, _fp,
+                            st.session_state.lulc_composition_long,
                         )
                         st.download_button(
                             label="📥 Download GeoJSON",
@@ -2590,8 +2521,7 @@ if st.session_state.fetched_data is not None:
                 else:
                     st.caption(
                         "Vectorized land cover — many polygons per AOI, one per class patch. "
-                        "**CSV/JSON composition is over the entire AOI**; only this "
-                        "export is subject to the per-AOI polygon cap."
+                        "Large AOIs are vectorized as tiles in parallel and joined back together."
                     )
                     ds_native_gj = lulc.get_dataset_info(
                         st.session_state.lulc_last_dataset
@@ -2605,7 +2535,7 @@ if st.session_state.fetched_data is not None:
                         key="lulc_vec_gj_scale",
                         help=(
                             f"Native is {ds_native_gj} m. Use 30/100/250 m for large "
-                            "AOIs that exceed the 50,000-polygon cap."
+                            "AOIs: far fewer polygons and a smaller file."
                         ),
                     )
                     if st.button(
@@ -2616,18 +2546,14 @@ if st.session_state.fetched_data is not None:
                     ):
                         try:
                             with st.spinner(f"Vectorizing land cover at {vec_scale_gj} m via Earth Engine…"):
-                                fp_v = _lulc_vector_fingerprint(
-                                    lulc_aoi,
-                                    st.session_state.lulc_last_dataset,
-                                    st.session_state.lulc_last_year,
-                                ) + f"-s{vec_scale_gj}"
-                                gj_bytes, gj_meta = _build_lulc_vector_geojson_bytes(
+                                gj_bytes, gj_meta = _build_lulc_vector_file_bytes(
                                     lulc_aoi,
                                     st.session_state.lulc_last_dataset,
                                     int(st.session_state.lulc_last_year),
                                     int(vec_scale_gj),
+                                    "GeoJSON",
                                     "v1",
-                                    fp_v,
+                                    _fp,
                                 )
                             st.session_state["_lulc_vec_gj_bytes"] = gj_bytes
                             st.session_state["_lulc_vec_gj_meta"] = gj_meta
@@ -2636,13 +2562,6 @@ if st.session_state.fetched_data is not None:
                     if st.session_state.get("_lulc_vec_gj_meta"):
                         m = st.session_state["_lulc_vec_gj_meta"]
                         st.caption(f"📊 {m['total_polygons']:,} polygons at {m['scale_m']} m")
-                        if m["truncated"]:
-                            st.warning(
-                                f"⚠️ {m['truncated_count']} AOI(s) hit the "
-                                f"{m['max_polygons_per_aoi']:,}-polygon cap. "
-                                "**CSV composition is unaffected.** Rebuild at a "
-                                "coarser scale (30/100/250 m) for full coverage."
-                            )
                     if st.session_state.get("_lulc_vec_gj_bytes"):
                         st.download_button(
                             label="📥 Download GeoJSON (ready)",
@@ -2656,22 +2575,35 @@ if st.session_state.fetched_data is not None:
                         )
             else:
                 try:
-                    geojson_data = _build_geojson(original_df, _fp)
+                    geojson_data = _build_geojson(original_df, _fp, compress)
                     st.download_button(
                         label="📥 Download GeoJSON",
                         data=geojson_data,
-                        file_name=f"{base_filename}.geojson",
-                        mime="application/geo+json",
+                        file_name=get_export_filename(base_filename, "GeoJSON", compress),
+                        mime=get_export_mime_type("GeoJSON", compress),
                         use_container_width=True,
                         key="download_geojson",
                         on_click=_track_download_cb,
                         kwargs={"fmt": "GeoJSON", "rows": _rows, "locs": _locs},
                     )
+                    # One feature per line: streams into tools that can't
+                    # hold a whole FeatureCollection (ogr2ogr, tippecanoe).
+                    st.download_button(
+                        label="📥 Download GeoJSON-seq",
+                        data=_build_geojson_seq(original_df, _fp, compress),
+                        file_name=get_export_filename(base_filename, "GeoJSONSeq", compress),
+                        mime=get_export_mime_type("GeoJSONSeq", compress),
+                        use_container_width=True,
+                        key="download_geojson_seq",
+                        on_click=_track_download_cb,
+                        kwargs={"fmt": "GeoJSONSeq", "rows": _rows, "locs": _locs},
+                    )
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
 
         with col_b:
             st.markdown("**Excel** (XLSX)")
+            st.caption("Summary sheet first; results past Excel's row limit are split across sheets.")
             try:
                 excel_data = _build_excel(original_df, _fp)
                 st.download_button(
@@ -2687,6 +2619,241 @@ if st.session_state.fetched_data is not None:
             except Exception as e:
                 st.error(f"Error: {str(e)}")
 
+            st.markdown("**JSON Lines** (one record per line)")
+            try:
+                st.download_button(
+                    label="📥 Download JSONL",
+                    data=_build_jsonl(original_df, _fp, compress),
+                    file_name=get_export_filename(base_filename, "JSONL", compress),
+                    mime=get_export_mime_type("JSONL", compress),
+                    use_container_width=True,
+                    key="download_jsonl",
+                    on_click=_track_download_cb,
+                    kwargs={"fmt": "JSONL", "rows": _rows, "locs": _locs},
+                )
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+
+        # Columnar formats: an order of magnitude smaller and faster to
+        # write than CSV/Excel, and keep dtypes (dates, categories, float32).
+        st.markdown("**Columnar** — for pandas / Polars / DuckDB / QGIS on large results")
+        col_p, col_g, col_f = st.columns(3)
+
+        with col_p:
+            try:
+                st.download_button(
+                    label="📥 Download Parquet",
+                    data=_build_parquet(original_df, _fp),
+                    file_name=get_export_filename(base_filename, "Parquet"),
+                    mime=get_export_mime_type("Parquet"),
+                    use_container_width=True,
+                    key="download_parquet",
+                    on_click=_track_download_cb,
+                    kwargs={"fmt": "Parquet", "rows": _rows, "locs": _locs},
+                )
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+
+        with col_g:
+            geoparquet_data = None
+            geoparquet_name = get_export_filename(base_filename, "GeoParquet")
+            try:
+                if is_hydrology_result:
+                    st.caption("No geometry in hydrology results; use Parquet.")
+                elif is_lulc_result:
+                    lulc_aoi = st.session_state.get("lulc_aoi_gdf")
+                    is_change_res = st.session_state.get("lulc_change_long") is not None
+                    long_df = (
+                        st.session_state.lulc_change_long
+                        if is_change_res
+                        else st.session_state.lulc_composition_long
+                    )
+                    if lulc_aoi is None or long_df is None or long_df.empty:
+                        st.caption("GeoParquet requires a successful LULC fetch first.")
+                    else:
+                        # One polygon feature per AOI with the LULC attributes.
+                        geoparquet_data = _build_lulc_geoparquet_bytes(
+                            long_df, lulc_aoi, is_change_res, _fp,
+                            st.session_state.lulc_composition_long if is_change_res else None,
+                        )
+                        geoparquet_name = get_export_filename(
+                            f"{base_filename}_{'change_summary' if is_change_res else 'polygons'}",
+                            "GeoParquet",
+                        )
+                elif "latitude" in original_df.columns and "longitude" in original_df.columns:
+                    geoparquet_data = _build_geoparquet(original_df, _fp)
+                else:
+                    st.caption("No coordinates in this result; use Parquet.")
+                if geoparquet_data is not None:
+                    st.download_button(
+                        label="📥 Download GeoParquet",
+                        data=geoparquet_data,
+                        file_name=geoparquet_name,
+                        mime=get_export_mime_type("GeoParquet"),
+                        use_container_width=True,
+                        key="download_geoparquet",
+                        on_click=_track_download_cb,
+                        kwargs={"fmt": "GeoParquet", "rows": _rows, "locs": _locs},
+                    )
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+
+        with col_f:
+            try:
+                st.download_button(
+                    label="📥 Download Feather",
+                    data=_build_feather(original_df, _fp),
+                    file_name=get_export_filename(base_filename, "Feather"),
+                    mime=get_export_mime_type("Feather"),
+                    use_container_width=True,
+                    key="download_feather",
+                    on_click=_track_download_cb,
+                    kwargs={"fmt": "Feather", "rows": _rows, "locs": _locs},
+                )
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+
+        # Point time series: the GeoJSON / Shapefile above repeat every
+        # location's geometry on each of its rows. These write it once.
+        if (
+            kind == "series"
+            and "latitude" in original_df.columns
+            and "longitude" in original_df.columns
+        ):
+            st.markdown(
+                "**Location-normalized GIS** — one feature per location; "
+                "observations join on `location_id`"
+            )
+            col_n1, col_n2, col_n3 = st.columns(3)
+            normalized = (
+                (col_n1, "GeoPackage", "📥 GeoPackage (locations + observations)",
+                 _build_geopackage_normalized, "download_gpkg_normalized"),
+                (col_n2, "NormalizedParquet", "📥 GeoParquet + Parquet (ZIP)",
+                 _build_parquet_normalized, "download_parquet_normalized"),
+                (col_n3, "LocationArrays", "📥 Per-location arrays (GeoParquet)",
+                 _build_location_arrays, "download_location_arrays"),
+            )
+            for col, fmt, label, builder, key in normalized:
+                with col:
+                    try:
+                        st.download_button(
+                            label=label,
+                            data=builder(original_df, _fp),
+                            file_name=get_export_filename(f"{base_filename}_by_location", fmt),
+                            mime=get_export_mime_type(fmt),
+                            use_container_width=True,
+                            key=key,
+                            on_click=_track_download_cb,
+                            kwargs={"fmt": fmt, "rows": _rows, "locs": _locs},
+                        )
+                    except Exception as e:
+                        st.error(f"Error: {str(e)}")
+
+        # xarray users: the same result as a (time, location) or
+        # (time, lat, lon) cube instead of a long table.
+        if (
+            kind == "series"
+            and cube_export.time_column(original_df) is not None
+            and "latitude" in original_df.columns
+            and "longitude" in original_df.columns
+        ):
+            st.markdown("**Data cube** — NetCDF4 / Zarr with CF metadata, for xarray")
+            _src_label = st.session_state.get("current_data_source") or ""
+            col_c1, col_c2 = st.columns(2)
+            with col_c1:
+                try:
+                    st.download_button(
+                        label="📥 Download NetCDF",
+                        data=_build_netcdf(original_df, _fp, _src_label),
+                        file_name=get_export_filename(base_filename, "NetCDF"),
+                        mime=get_export_mime_type("NetCDF"),
+                        use_container_width=True,
+                        key="download_netcdf",
+                        on_click=_track_download_cb,
+                        kwargs={"fmt": "NetCDF", "rows": _rows, "locs": _locs},
+                    )
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+            with col_c2:
+                if not cube_export.zarr_available():
+                    st.caption("Zarr export needs the optional `zarr` package.")
+                else:
+                    try:
+                        st.download_button(
+                            label="📥 Download Zarr (ZIP)",
+                            data=_build_zarr(original_df, _fp, _src_label),
+                            file_name=get_export_filename(base_filename, "Zarr"),
+                            mime=get_export_mime_type("Zarr"),
+                            use_container_width=True,
+                            key="download_zarr",
+                            on_click=_track_download_cb,
+                            kwargs={"fmt": "Zarr", "rows": _rows, "locs": _locs},
+                        )
+                    except Exception as e:
+                        st.error(f"Error: {str(e)}")
+
+    # -------- Bundle: several formats + provenance in one ZIP --------------
+    # Formats are built concurrently (export_bundle), so the bundle takes
+    # about as long as its slowest format. Built on click, not on rerun.
+    if st.checkbox("🗂️ Download bundle (several formats in one ZIP)", key="export_bundle"):
+        bundle_options = export_bundle.available_formats(original_df)
+        bundle_formats = st.multiselect(
+            "Formats",
+            options=bundle_options,
+            default=[f for f in ("CSV", "GeoJSON", "Shapefile") if f in bundle_options],
+            key="bundle_formats",
+        )
+        bundle_provenance = st.checkbox(
+            "Include provenance JSON + reproduction notebook",
+            value=True,
+            key="bundle_provenance",
+        )
+        if st.button("🗂️ Build bundle", key="bundle_build", disabled=not bundle_formats,
+                     use_container_width=True):
+            extras = {}
+            if bundle_provenance:
+                try:
+                    prov_bytes, nb_bytes = _reproducibility_artifacts(original_df)
+                    extras = {"provenance.json": prov_bytes,
+                              "reproduction_notebook.ipynb": nb_bytes}
+                except Exception as e:
+                    st.warning(f"Provenance unavailable: {e}")
+            _src_label = st.session_state.get("current_data_source") or ""
+            try:
+                with st.spinner(f"Building {len(bundle_formats)} formats…"):
+                    st.session_state["_bundle"] = {
+                        "version": _fp,
+                        "formats": list(bundle_formats),
+                        "data": export_bundle.build_bundle(
+                            original_df, bundle_formats, base_filename, extras=extras,
+                            format_kwargs={"NetCDF": {
+                                "variable_attrs": _cube_variable_attrs(_src_label),
+                                "source": _src_label,
+                            }},
+                        ),
+                    }
+            except Exception as e:
+                st.error(f"Bundle failed: {e}")
+        bundle = st.session_state.get("_bundle")
+        if bundle and bundle["version"] == _fp:
+            manifest = export_bundle.read_manifest(bundle["data"])
+            st.caption(
+                f"{len(manifest['files'])} files, {len(bundle['data']) / 1e6:.1f} MB, "
+                f"built in {manifest['seconds']:.1f} s"
+            )
+            for name, err in manifest["errors"].items():
+                st.warning(f"⚠️ {name} skipped: {err}")
+            st.download_button(
+                label="📥 Download bundle (ZIP)",
+                data=bundle["data"],
+                file_name=f"{base_filename}_bundle.zip",
+                mime="application/zip",
+                use_container_width=True,
+                key="download_bundle",
+                on_click=_track_download_cb,
+                kwargs={"fmt": "Bundle: " + ", ".join(bundle["formats"]), "rows": _rows, "locs": _locs},
+            )
+
     # -------- LULC: raster clip (per-polygon GeoTIFF) ----------------------
     # Only renders for LULC results. Streams the clip from Earth Engine via
     # a signed download URL — synchronous, capped at ~33 MP. For very large
@@ -2758,10 +2925,48 @@ if st.session_state.fetched_data is not None:
                     if st.checkbox("🔍 Show error", key="lulc_clip_err"):
                         st.code(str(e))
 
+
 # ---------------------------------------------------------------------------
 # Reproducibility (Phase 12): provenance JSON + Jupyter notebook download
 # ---------------------------------------------------------------------------
-if st.session_state.fetched_data is not None:
+def _reproducibility_artifacts(_df_cur):
+    """(provenance.json bytes, reproduction notebook bytes) for the current
+    fetch; shared by the reproducibility panel and the download bundle."""
+    _prov = reproducibility.build_provenance_record(
+        source=st.session_state.get("current_data_source", ""),
+        parameters=list(selected_params) if selected_params else None,
+        dataset=(
+            lulc_dataset if source_key == "lulc" else (
+                hydro_dataset if source_key == "hydrology" else (
+                    forest_dataset if source_key == "forest_biomass" else (
+                        pop_dataset if source_key == "population" else None
+                    )
+                )
+            )
+        ),
+        start_date=start_date.strftime("%Y-%m-%d") if start_date else None,
+        end_date=end_date.strftime("%Y-%m-%d") if end_date else None,
+        year=int(lulc_year) if lulc_year else None,
+        year_to=int(lulc_year_to) if lulc_year_to else None,
+        temporal_resolution=temporal_resolution,
+        extra={"years": sorted(int(y) for y in lulc_years)} if lulc_years else None,
+        n_rows=len(_df_cur),
+        n_locations=int(_df_cur["location_id"].nunique()) if "location_id" in _df_cur.columns else None,
+        n_polygons=int(_df_cur["polygon_id"].nunique()) if "polygon_id" in _df_cur.columns else None,
+        columns=list(_df_cur.columns),
+        attribution=(
+            _df_cur["attribution"].dropna().iloc[0]
+            if "attribution" in _df_cur.columns and not _df_cur["attribution"].dropna().empty
+            else None
+        ),
+    )
+    prov_bytes = json.dumps(_prov, indent=2, default=str).encode("utf-8")
+    nb_bytes = reproducibility.build_reproduction_notebook(_prov).encode("utf-8")
+    return prov_bytes, nb_bytes
+
+
+@st.fragment
+def _render_reproducibility_panel():
     st.markdown("---")
     with st.expander("🧾 **Reproducibility** — provenance JSON + Jupyter notebook", expanded=False):
         st.markdown(
@@ -2769,48 +2974,7 @@ if st.session_state.fetched_data is not None:
             "and a stand-alone Jupyter notebook that re-runs the same query."
         )
         try:
-            _df_cur = st.session_state.fetched_data
-            _prov = reproducibility.build_provenance_record(
-                source=st.session_state.get("current_data_source", ""),
-                parameters=(
-                    list(selected_params)
-                    if 'selected_params' in dir() and selected_params else None
-                ),
-                dataset=(
-                    lulc_dataset if source_key == "lulc" else (
-                        hydro_dataset if source_key == "hydrology" else (
-                            forest_dataset if source_key == "forest_biomass" else (
-                                pop_dataset if source_key == "population" else None
-                            )
-                        )
-                    )
-                ),
-                start_date=(
-                    start_date.strftime("%Y-%m-%d")
-                    if 'start_date' in dir() and start_date else None
-                ),
-                end_date=(
-                    end_date.strftime("%Y-%m-%d")
-                    if 'end_date' in dir() and end_date else None
-                ),
-                year=int(lulc_year) if 'lulc_year' in dir() and lulc_year else None,
-                year_to=int(lulc_year_to) if 'lulc_year_to' in dir() and lulc_year_to else None,
-                temporal_resolution=(
-                    temporal_resolution if 'temporal_resolution' in dir() else None
-                ),
-                n_rows=len(_df_cur),
-                n_locations=int(_df_cur["location_id"].nunique()) if "location_id" in _df_cur.columns else None,
-                n_polygons=int(_df_cur["polygon_id"].nunique()) if "polygon_id" in _df_cur.columns else None,
-                columns=list(_df_cur.columns),
-                attribution=(
-                    _df_cur["attribution"].dropna().iloc[0]
-                    if "attribution" in _df_cur.columns and not _df_cur["attribution"].dropna().empty
-                    else None
-                ),
-            )
-            import json as _json
-            prov_bytes = _json.dumps(_prov, indent=2, default=str).encode("utf-8")
-            nb_bytes = reproducibility.build_reproduction_notebook(_prov).encode("utf-8")
+            prov_bytes, nb_bytes = _reproducibility_artifacts(_current_result())
 
             r1, r2 = st.columns(2)
             with r1:
@@ -2833,134 +2997,157 @@ if st.session_state.fetched_data is not None:
         except Exception as e:
             st.info(f"Provenance unavailable: {e}")
 
+
 # ---------------------------------------------------------------------------
 # Cross-layer analytics (Phase 11)
 # ---------------------------------------------------------------------------
-st.markdown("---")
-with st.expander("🔗 **Cross-Layer Analytics** — snapshot two or more fetches and combine them", expanded=False):
-    st.markdown(
-        "Save the current fetch as a snapshot, run another fetch, then "
-        "come back here to join and derive ratios / differences / "
-        "correlations across the two."
-    )
-
-    col_a, col_b = st.columns([2, 1])
-    with col_a:
-        snap_label = st.text_input(
-            "Label for the current fetch",
-            value=(st.session_state.get("current_data_source") or "snapshot")[:60],
-            key="cross_snap_label",
+@st.fragment
+def _render_cross_layer_panel():
+    st.markdown("---")
+    with st.expander("🔗 **Cross-Layer Analytics** — snapshot two or more fetches and combine them", expanded=False):
+        st.markdown(
+            "Save the current fetch as a snapshot, run another fetch, then "
+            "come back here to join and derive ratios / differences / "
+            "correlations across the two."
         )
-    with col_b:
-        if st.button(
-            "📌 Save snapshot",
-            key="cross_save_snap",
-            disabled=st.session_state.fetched_data is None,
-        ):
-            st.session_state.cross_layer_snapshots[snap_label] = (
-                st.session_state.fetched_data.copy()
-            )
-            st.success(f"Saved snapshot: {snap_label}")
 
-    snaps = st.session_state.cross_layer_snapshots
-    if snaps:
-        st.markdown(f"**Saved snapshots ({len(snaps)}):**")
-        for lbl, sdf in snaps.items():
-            schema = cross_layer.detect_schema(sdf)
-            st.markdown(
-                f"- **{lbl}** — {schema['n_rows']:,} rows, "
-                f"{len(schema['value_columns'])} value column(s), "
-                f"has_time={schema['has_time']}, has_location={schema['has_location']}, "
-                f"has_polygon={schema['has_polygon']}"
-            )
-        if st.button("🗑️ Clear all snapshots", key="cross_clear"):
-            st.session_state.cross_layer_snapshots = {}
-            st.rerun()
-
-    if len(snaps) >= 2:
-        st.markdown("---")
-        st.subheader("Join two snapshots")
-        labels = list(snaps.keys())
-        c1, c2 = st.columns(2)
-        with c1:
-            la = st.selectbox("Left snapshot", options=labels, key="cross_la")
-        with c2:
-            lb = st.selectbox(
-                "Right snapshot",
-                options=[x for x in labels if x != la],
-                key="cross_lb",
+        col_a, col_b = st.columns([2, 1])
+        with col_a:
+            snap_label = st.text_input(
+                "Label for the current fetch",
+                value=(st.session_state.get("current_data_source") or "snapshot")[:60],
+                key="cross_snap_label",
             )
-        how = st.selectbox("Join type", options=["inner", "outer", "left"], index=0)
-        if st.button("🔗 Join", key="cross_do_join"):
-            try:
-                merged = cross_layer.cross_join(snaps[la], snaps[lb], how=how)
-                st.session_state["_cross_merged"] = merged
-                st.success(f"Joined: {len(merged):,} rows")
-            except Exception as e:
-                st.error(f"Join failed: {e}")
-
-    if st.session_state.get("_cross_merged") is not None:
-        merged = st.session_state["_cross_merged"]
-        st.markdown(f"**Merged table** ({len(merged):,} rows, {len(merged.columns)} cols):")
-        st.dataframe(merged.head(20))
-
-        # Derived-column workshop
-        st.markdown("**Derive a new column**")
-        numeric_cols = sorted([
-            c for c in merged.columns
-            if pd.api.types.is_numeric_dtype(merged[c])
-            and c not in cross_layer.RESERVED_JOIN_COLS
-        ])
-        if len(numeric_cols) >= 2:
-            op = st.selectbox("Operation", ["ratio (a/b)", "difference (a-b)", "product (a*b)", "z-score of a"])
-            colx, coly = st.columns(2)
-            with colx:
-                a_col = st.selectbox("A", options=numeric_cols, key="cx_a")
-            with coly:
-                b_col = st.selectbox(
-                    "B", options=numeric_cols,
-                    key="cx_b",
-                    disabled=(op == "z-score of a"),
+        with col_b:
+            if st.button(
+                "📌 Save snapshot",
+                key="cross_save_snap",
+                disabled=st.session_state.result_key is None,
+            ):
+                # Shares the result's frame in the store rather than copying it.
+                results = st.session_state.result_store
+                results.release(st.session_state.cross_layer_snapshots.get(snap_label))
+                st.session_state.cross_layer_snapshots[snap_label] = results.retain(
+                    st.session_state.result_key
+                )
+                st.success(f"Saved snapshot: {snap_label}")
+
+        snap_keys = st.session_state.cross_layer_snapshots
+        snaps = {lbl: st.session_state.result_store.get(k) for lbl, k in snap_keys.items()}
+        snaps = {lbl: sdf for lbl, sdf in snaps.items() if sdf is not None}
+        if snaps:
+            st.markdown(f"**Saved snapshots ({len(snaps)}):**")
+            for lbl, sdf in snaps.items():
+                schema = cross_layer.detect_schema(sdf)
+                st.markdown(
+                    f"- **{lbl}** — {schema['n_rows']:,} rows, "
+                    f"{len(schema['value_columns'])} value column(s), "
+                    f"has_time={schema['has_time']}, has_location={schema['has_location']}, "
+                    f"has_polygon={schema['has_polygon']}"
+                )
+            if st.button("🗑️ Clear all snapshots", key="cross_clear"):
+                for key in snap_keys.values():
+                    st.session_state.result_store.release(key)
+                st.session_state.cross_layer_snapshots = {}
+                st.rerun(scope="fragment")
+
+        if len(snaps) >= 2:
+            st.markdown("---")
+            st.subheader("Join two snapshots")
+            labels = list(snaps.keys())
+            c1, c2 = st.columns(2)
+            with c1:
+                la = st.selectbox("Left snapshot", options=labels, key="cross_la")
+            with c2:
+                lb = st.selectbox(
+                    "Right snapshot",
+                    options=[x for x in labels if x != la],
+                    key="cross_lb",
                 )
-            out_name = st.text_input("Output column name", value="derived", key="cx_out")
-            if st.button("➕ Add derived column", key="cx_add_derived"):
+            how = st.selectbox("Join type", options=["inner", "outer", "left"], index=0)
+            if st.button("🔗 Join", key="cross_do_join"):
                 try:
-                    if op.startswith("ratio"):
-                        merged[out_name] = cross_layer.derive_ratio(merged, a_col, b_col)
-                    elif op.startswith("difference"):
-                        merged[out_name] = cross_layer.derive_difference(merged, a_col, b_col)
-                    elif op.startswith("product"):
-                        merged[out_name] = cross_layer.derive_product(merged, a_col, b_col)
-                    else:
-                        group = ["location_id"] if "location_id" in merged.columns else None
-                        merged[out_name] = cross_layer.derive_zscore(merged, a_col, group_cols=group)
+                    merged = cross_layer.cross_join(snaps[la], snaps[lb], how=how)
                     st.session_state["_cross_merged"] = merged
-                    st.success(f"Added column `{out_name}`.")
+                    st.success(f"Joined: {len(merged):,} rows")
                 except Exception as e:
-                    st.error(f"Derivation failed: {e}")
+                    st.error(f"Join failed: {e}")
+
+        if st.session_state.get("_cross_merged") is not None:
+            merged = st.session_state["_cross_merged"]
+            st.markdown(f"**Merged table** ({len(merged):,} rows, {len(merged.columns)} cols):")
+            st.dataframe(merged.head(20))
+
+            # Derived-column workshop
+            st.markdown("**Derive a new column**")
+            numeric_cols = sorted([
+                c for c in merged.columns
+                if pd.api.types.is_numeric_dtype(merged[c])
+                and c not in cross_layer.RESERVED_JOIN_COLS
+            ])
+            if len(numeric_cols) >= 2:
+                op = st.selectbox("Operation", ["ratio (a/b)", "difference (a-b)", "product (a*b)", "z-score of a"])
+                colx, coly = st.columns(2)
+                with colx:
+                    a_col = st.selectbox("A", options=numeric_cols, key="cx_a")
+                with coly:
+                    b_col = st.selectbox(
+                        "B", options=numeric_cols,
+                        key="cx_b",
+                        disabled=(op == "z-score of a"),
+                    )
+                out_name = st.text_input("Output column name", value="derived", key="cx_out")
+                if st.button("➕ Add derived column", key="cx_add_derived"):
+                    try:
+                        if op.startswith("ratio"):
+                            merged[out_name] = cross_layer.derive_ratio(merged, a_col, b_col)
+                        elif op.startswith("difference"):
+                            merged[out_name] = cross_layer.derive_difference(merged, a_col, b_col)
+                        elif op.startswith("product"):
+                            merged[out_name] = cross_layer.derive_product(merged, a_col, b_col)
+                        else:
+                            group = ["location_id"] if "location_id" in merged.columns else None
+                            merged[out_name] = cross_layer.derive_zscore(merged, a_col, group_cols=group)
+                        st.session_state["_cross_merged"] = merged
+                        st.success(f"Added column `{out_name}`.")
+                    except Exception as e:
+                        st.error(f"Derivation failed: {e}")
 
-            if st.button("📈 Compute per-location correlations", key="cx_corr"):
-                try:
-                    if "location_id" in merged.columns:
-                        corr_df = cross_layer.per_location_correlation(merged, a_col, b_col)
-                        st.dataframe(corr_df)
-                    else:
-                        st.warning("Correlation is only defined when a location_id column exists.")
-                except Exception as e:
-                    st.error(f"Correlation failed: {e}")
+                if st.button("📈 Compute per-location correlations", key="cx_corr"):
+                    try:
+                        if "location_id" in merged.columns:
+                            corr_df = cross_layer.per_location_correlation(merged, a_col, b_col)
+                            st.dataframe(corr_df)
+                        else:
+                            st.warning("Correlation is only defined when a location_id column exists.")
+                    except Exception as e:
+                        st.error(f"Correlation failed: {e}")
 
-        # Download the merged table
-        try:
-            merged_csv = merged.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                "📥 Download merged CSV",
-                data=merged_csv,
-                file_name="cross_layer_merged.csv",
-                mime="text/csv",
-                key="cross_dl_csv",
-            )
-        except Exception:
-            pass
+            # Download the merged table
+            try:
+                merged_csv = merged.to_csv(index=False).encode("utf-8")
+                st.download_button(
+                    "📥 Download merged CSV",
+                    data=merged_csv,
+                    file_name="cross_layer_merged.csv",
+                    mime="text/csv",
+                    key="cross_dl_csv",
+                )
+            except Exception:
+                pass
+
+
+if st.session_state.result_key is not None and _current_result() is None:
+    st.warning("The previous result has expired from the server's result store. Fetch it again.")
+    st.session_state.result_key = None
+if st.session_state.result_key is not None:
+    if st.session_state.result_version is None:
+        _new_result_version()
+    _render_results_panel()
+    _render_export_panel()
+    _render_reproducibility_panel()
+
+_render_cross_layer_panel()
 
 # Footer
 st.markdown("---")
@@ -3012,3 +3199,49 @@ st.markdown("""
     </p>
 </div>
 """, unsafe_allow_html=True)
+
+# --- Diagnostics (PORTAL_ADMIN or PROFILE_MODE only) -------------------------
+# Profiling toggles and downloadable profiles for the last fetch and for
+# this rerun. Hidden, and free, unless profiling has been opted into.
+
+def _render_profile_report(report, key):
+    st.caption(
+        f"{report.wall_s:.2f}s wall · peak traced memory "
+        f"{report.alloc_peak_bytes / 1e6:.1f} MB · {report.mode}"
+    )
+    top = report.top_functions(15)
+    if top:
+        st.dataframe(pd.DataFrame(top), hide_index=True)
+    if report.alloc_top:
+        st.markdown("**Top allocation sites**")
+        st.dataframe(pd.DataFrame(report.alloc_top), hide_index=True)
+    if report.mode == "deterministic":
+        data, name, mime = report.pstats_bytes(), report.filename("pstats"), "application/octet-stream"
+    else:
+        data, name, mime = report.speedscope_bytes(), report.filename("speedscope.json"), "application/json"
+    st.download_button(
+        "📥 Download profile", data=data, file_name=name, mime=mime, key=f"diag_dl_{key}"
+    )
+
+
+if profiling.admin_enabled() or profiling.profile_mode():
+    rerun_report = None
+    if _rerun_profiler is not None:
+        rerun_report = _rerun_profiler.stop()
+        st.session_state.pop("diag_rerun_profiler", None)
+    env_scopes = profiling.profile_mode()
+    with st.sidebar.expander("🛠️ Diagnostics"):
+        st.checkbox("Profile fetches", value="fetch" in env_scopes, key="diag_profile_fetches")
+        st.checkbox("Profile every rerun", value="rerun" in env_scopes, key="diag_profile_reruns")
+        if st.session_state.last_fetch_profile is not None:
+            st.markdown(f"**Last fetch:** `{st.session_state.last_fetch_profile.label}`")
+            _render_profile_report(st.session_state.last_fetch_profile, "fetch")
+        if rerun_report is not None:
+            st.markdown("**This rerun**")
+            _render_profile_report(rerun_report, "rerun")
+        _usage = result_store.get_store().usage()
+        st.caption(
+            f"Result store: {_usage['entries']} result(s) from {_usage['sessions']} session(s) · "
+            f"{_usage['resident_bytes'] / 1e6:.1f} MB in memory · "
+            f"{_usage['spilled']} spilled ({_usage['disk_bytes'] / 1e6:.1f} MB on disk)"
+        )
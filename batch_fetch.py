@@ -0,0 +1,455 @@
+"""
+Headless batch extraction: the portal's point time-series fetchers without
+a browser session.
+
+Takes an AOI (shapefile / ZIP / KML / KMZ, admin names, or explicit points),
+one or more sources, parameters and a date range. The AOI's locations are
+split into batches, and every (source, batch) pair runs as one unit on a
+thread pool. Units reuse the app's caching and chunking layers: the ERA5
+chunk plan from utils/planner.py, checkpointed chunks (utils/checkpoint.py,
+so a re-run resumes a half-finished unit), and in-flight coalescing of
+identical chunks (utils/singleflight.py). Each unit's result is written as
+its own partition:
+
+    <out>/source=<source>/part-<batch>-<request>.parquet   (or .csv)
+    <out>/manifest.json               per-unit status, rows, timing
+
+<request> is a digest of the unit's request (dates, parameters,
+resolution and the batch's locations). A unit whose fetch returns no rows
+writes no partition; the manifest records it as "empty". Partitions that
+already exist, and units recorded as empty, are skipped, so re-running a
+nightly job after a failure only fetches what is missing (--overwrite to
+redo all); a changed request gets new partitions rather than reusing the
+old ones.
+
+Usage:
+    python batch_fetch.py sources                       # list sources / parameters
+    python batch_fetch.py fetch --source nasa_power --params T2M,PRECTOTCORR \\
+        --admin "Nigeria/*/*" --start 2024-01-01 --end 2024-12-31 --out out/
+    python batch_fetch.py fetch --source era5 --source chirps \\
+        --params era5=2m_temperature --params chirps=precipitation \\
+        --aoi lgas.zip --resolution Daily --format csv --out out/ --dry-run
+
+--admin takes COUNTRY, COUNTRY/DIVISION or COUNTRY/DIVISION/SUB-DIVISION;
+"*" selects every division (or sub-division) at that level, so
+"Nigeria/*/*" is every LGA in utils/africa_locations.py. Earth Engine sources read credentials from
+--ee-credentials, $EE_CREDENTIALS or ./ee_credentials.json.
+
+Exit status: 0 when every unit finished (with data or empty), 2 when some failed or are
+incomplete (re-run to resume), 1 on bad arguments.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_sources import registry  # noqa: E402
+from utils import checkpoint, planner, progress, schema, tracing  # noqa: E402
+
+log = logging.getLogger("weather_portal.batch")
+
+# Point time-series sources only; the polygon statistics sources (LULC,
+# population, biomass, hydrology, burned area) take GeoDataFrames instead.
+SOURCES: List[str] = registry.point_sources()
+
+
+# ---------------------------------------------------------------------------
+# AOI -> locations
+# ---------------------------------------------------------------------------
+
+def _admin_locations(spec: str) -> List[Tuple[float, float, str]]:
+    from utils.africa_locations import (
+        get_divisions_for_country, get_selected_locations, get_sub_divisions,
+    )
+    parts = [p.strip() for p in spec.split("/")]
+    country = parts[0]
+    if len(parts) == 1:
+        return get_selected_locations(countries=[country])
+    divisions = get_divisions_for_country(country) if parts[1] == "*" else [parts[1]]
+    if len(parts) == 2:
+        return get_selected_locations(divisions={country: divisions})
+    subs = {
+        div: (get_sub_divisions(country, div) if parts[2] == "*" else [parts[2]])
+        for div in divisions
+    }
+    return get_selected_locations(sub_divisions={country: subs})
+
+
+def _file_locations(path: str, centroids: bool) -> List[Tuple[float, float, str]]:
+    lower = path.lower()
+    if lower.endswith((".kml", ".kmz")):
+        from utils.kml_handler import extract_locations_from_kml, read_kml_file
+        gdf = read_kml_file(path)
+        locs = extract_locations_from_kml(gdf, use_polygon_sampling=not centroids)
+    else:
+        from utils.shapefile_handler import (
+            extract_locations_from_shapefile, extract_shapefile_from_zip, read_shapefile,
+        )
+        if lower.endswith(".zip"):
+            with open(path, "rb") as f:
+                path = extract_shapefile_from_zip(f)
+        gdf = read_shapefile(path)
+        locs = extract_locations_from_shapefile(gdf, use_polygon_sampling=not centroids)
+    return [(loc["lat"], loc["lon"], str(loc["name"])) for loc in locs]
+
+
+def resolve_locations(aoi=(), admin=(), points=(), centroids: bool = False
+                      ) -> List[Tuple[float, float, str]]:
+    """(lat, lon, name) for AOI files, admin specs and "LAT,LON[,NAME]"
+    points, de-duplicated on coordinates."""
+    locations: List[Tuple[float, float, str]] = []
+    for path in aoi:
+        locations += _file_locations(path, centroids)
+    for spec in admin:
+        found = _admin_locations(spec)
+        if not found:
+            raise ValueError(f"No locations found for admin {spec!r}")
+        locations += found
+    for point in points:
+        parts = [p.strip() for p in point.split(",")] if isinstance(point, str) else list(point)
+        lat, lon = float(parts[0]), float(parts[1])
+        locations.append((lat, lon, str(parts[2]) if len(parts) > 2 else f"{lat},{lon}"))
+    # Drop duplicate coordinates, keeping the first name seen.
+    seen, unique = set(), []
+    for lat, lon, name in locations:
+        key = (round(lat, 6), round(lon, 6))
+        if key not in seen:
+            seen.add(key)
+            unique.append((lat, lon, name))
+    return unique
+
+
+def resolve_parameters(sources: List[str], specs: List[str]) -> Dict[str, List[str]]:
+    """--params A,B applies to every source; --params era5=A,B to one."""
+    shared: List[str] = []
+    per_source: Dict[str, List[str]] = {}
+    for spec in specs:
+        if "=" in spec:
+            source, codes = spec.split("=", 1)
+            per_source.setdefault(source.strip(), []).extend(
+                c.strip() for c in codes.split(",") if c.strip()
+            )
+        else:
+            shared.extend(c.strip() for c in spec.split(",") if c.strip())
+    params = {}
+    for source in sources:
+        chosen = per_source.get(source) or shared
+        available = {
+            code
+            for group in registry.get_available_parameters(source).values()
+            for code in group
+        }
+        unknown = [c for c in chosen if c not in available]
+        if unknown:
+            raise ValueError(f"{source}: unknown parameter(s) {', '.join(unknown)}")
+        if not chosen:
+            raise ValueError(f"{source}: no parameters given (see `batch_fetch.py sources`)")
+        params[source] = chosen
+    return params
+
+
+def load_ee_credentials(path: Optional[str]) -> Optional[Dict]:
+    for candidate in (path, os.getenv("EE_CREDENTIALS"), "ee_credentials.json"):
+        if candidate and os.path.exists(candidate):
+            with open(candidate) as f:
+                return json.load(f)
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Units
+# ---------------------------------------------------------------------------
+
+def plan_units(args, locations, params) -> List[Dict]:
+    units = []
+    for source in args.source:
+        for batch_no, offset in enumerate(range(0, len(locations), args.batch_size)):
+            batch = locations[offset:offset + args.batch_size]
+            request = checkpoint.digest({
+                "start_date": args.start,
+                "end_date": args.end,
+                "resolution": args.resolution,
+                "parameters": sorted(params[source]),
+                "locations": batch,
+            })
+            units.append({
+                "source": source,
+                "batch": batch_no,
+                "locations": batch,
+                "parameters": params[source],
+                "request": request,
+                "path": os.path.join(
+                    args.out, f"source={source}",
+                    f"part-{batch_no:05d}-{request}.{args.format}",
+                ),
+            })
+    return units
+
+
+def run_unit(unit: Dict, args, credentials: Dict, cancel: progress.CancelToken) -> Dict:
+    source = unit["source"]
+    coords = [(lat, lon) for lat, lon, _ in unit["locations"]]
+    fetch_args = dict(
+        locations=coords,
+        parameters=unit["parameters"],
+        start_date=args.start,
+        end_date=args.end,
+        temporal_resolution=args.resolution,
+    )
+    if registry.get(source)["needs_ee"]:
+        fetch_args["credentials_dict"] = credentials["ee"]
+    if source == "openweather":
+        fetch_args["api_key"] = credentials["openweather"]
+    plan = planner.estimate_fetch(
+        source, len(coords), unit["parameters"], args.start, args.end, args.resolution
+    )
+    if plan:
+        fetch_args.update(plan["fetch_options"])
+
+    job_id = checkpoint.job_id_for(
+        source, locations=coords, parameters=sorted(unit["parameters"]),
+        start_date=args.start, end_date=args.end, resolution=args.resolution,
+    )
+    t0 = time.perf_counter()
+    result = {"source": source, "batch": unit["batch"], "path": unit["path"],
+              "request": unit["request"], "locations": len(coords), "rows": 0}
+    try:
+        with tracing.trace_fetch(source, batch=unit["batch"], n_locations=len(coords)) as trace:
+            with checkpoint.resumable_job(job_id):
+                df = registry.fetcher(source)(**fetch_args, cancel_token=cancel)
+            if df is not None:
+                tracing.count("rows", len(df))
+        if df is not None and not df.empty:
+            if "location_id" in df.columns:
+                names = dict(enumerate(name for _, _, name in unit["locations"]))
+                df["location_name"] = df["location_id"].map(names)
+            df = schema.normalize(df)
+            write_partition(df, unit["path"], args.format)
+            result.update(status="done", rows=int(len(df)))
+        else:
+            # No partition is written: the manifest records the unit as
+            # empty so a re-run neither refetches it nor mistakes it for data.
+            result["status"] = "empty"
+        result["counters"] = trace.summary()["counters"]
+    except checkpoint.IncompleteFetchError as e:
+        result.update(status="incomplete", error=str(e), outstanding=sorted(e.outstanding))
+    except progress.FetchCancelled:
+        result["status"] = "cancelled"
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = round(time.perf_counter() - t0, 2)
+    return result
+
+
+def write_partition(df: pd.DataFrame, path: str, fmt: str) -> None:
+    """Write one partition atomically, so an existing file is always whole."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+def cmd_sources(args) -> int:
+    for source in SOURCES:
+        resolutions = registry.get_temporal_resolutions(source)
+        print(f"{source}  (resolutions: {', '.join(resolutions)})")
+        for group, codes in registry.get_available_parameters(source).items():
+            print(f"  {group}")
+            for code, label in codes.items():
+                print(f"    {code:32s} {label}")
+    return 0
+
+
+def cmd_fetch(args) -> int:
+    try:
+        start = datetime.strptime(args.start, "%Y-%m-%d")
+        end = datetime.strptime(args.end, "%Y-%m-%d")
+        if start > end:
+            raise ValueError(f"--start {args.start} is after --end {args.end}")
+        locations = resolve_locations(args.aoi, args.admin, args.point, args.centroids)
+        if not locations:
+            raise ValueError("No locations: give --aoi, --admin or --point")
+        params = resolve_parameters(args.source, args.params)
+    except (ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    units = plan_units(args, locations, params)
+    previous = _read_manifest(args.out)
+    todo = [u for u in units if args.overwrite or not _finished(u, previous)]
+    log.info(
+        f"{len(locations)} location(s) x {len(args.source)} source(s) -> {len(units)} unit(s) "
+        f"of <= {args.batch_size} locations; {len(units) - len(todo)} already written or empty"
+    )
+    stale = _foreign_partitions(args, units)
+    if stale:
+        log.warning(
+            f"{len(stale)} partition(s) in {args.out} belong to a different request "
+            f"and are not part of this run (e.g. {stale[0]}); use a fresh --out "
+            f"or remove them before reading the output as one dataset."
+        )
+
+    if args.dry_run:
+        for source in args.source:
+            est = planner.estimate_fetch(
+                source, len(locations), params[source], args.start, args.end, args.resolution
+            )
+            if est:
+                print(
+                    f"{source}: ~{est['round_trips']:,} upstream call(s), "
+                    f"{planner.format_bytes(est['bytes'])}, {est['rows']:,} rows, "
+                    f"{planner.format_duration(est['wall_s'])} sequential"
+                )
+            else:
+                print(f"{source}: no cost model")
+        return 0
+
+    credentials = {
+        "ee": load_ee_credentials(args.ee_credentials),
+        "openweather": args.openweather_key or os.getenv("OPENWEATHER_API_KEY", ""),
+    }
+    if any(registry.get(s)["needs_ee"] for s in args.source) and not credentials["ee"]:
+        print("error: Earth Engine credentials not found (--ee-credentials)", file=sys.stderr)
+        return 1
+    if "openweather" in args.source and not credentials["openweather"]:
+        print("error: OpenWeather needs --openweather-key or $OPENWEATHER_API_KEY", file=sys.stderr)
+        return 1
+
+    cancel = progress.CancelToken()
+    results: List[Dict] = []
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="batch-fetch")
+    try:
+        futures = {pool.submit(run_unit, u, args, credentials, cancel): u for u in todo}
+        for n, future in enumerate(as_completed(futures), 1):
+            r = future.result()
+            results.append(r)
+            log.info(
+                f"[{n}/{len(todo)}] {r['source']} part {r['batch']:05d}: {r['status']} "
+                f"{r['rows']:,} rows in {r['seconds']:.1f}s"
+                + (f" — {r['error']}" if r.get("error") else "")
+            )
+    except KeyboardInterrupt:
+        log.warning("Interrupted: stopping units at their next chunk boundary...")
+        cancel.cancel()
+    finally:
+        pool.shutdown(wait=True)
+
+    write_manifest(args, units, results, time.perf_counter() - started)
+    bad = [r for r in results if r["status"] not in ("done", "empty")]
+    if bad or cancel.cancelled:
+        log.warning(f"{len(bad)} unit(s) not finished; re-run the same command to resume.")
+        return 2
+    return 0
+
+
+def _foreign_partitions(args, units: List[Dict]) -> List[str]:
+    """Partition files under --out that no unit of this run would write."""
+    planned = {os.path.normpath(u["path"]) for u in units}
+    found = []
+    for source in args.source:
+        folder = os.path.join(args.out, f"source={source}")
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            path = os.path.normpath(os.path.join(folder, name))
+            if name.startswith("part-") and name.endswith(f".{args.format}") and path not in planned:
+                found.append(path)
+    return found
+
+
+def _read_manifest(out: str) -> Dict[str, Dict]:
+    """Unit records of an earlier run's manifest, by partition path."""
+    path = os.path.join(out, "manifest.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {r["path"]: r for r in json.load(f).get("units", [])}
+
+
+def _finished(unit: Dict, previous: Dict[str, Dict]) -> bool:
+    """A unit is finished once its partition exists, or once an earlier run
+    found no data for the same request (status "empty", nothing written)."""
+    if os.path.exists(unit["path"]):
+        return True
+    return previous.get(unit["path"], {}).get("status") == "empty"
+
+
+def write_manifest(args, units: List[Dict], results: List[Dict], seconds: float) -> None:
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, "manifest.json")
+    previous = _read_manifest(args.out)
+    for r in results:
+        previous[r["path"]] = r
+    manifest = {
+        "written_at": datetime.now().isoformat(timespec="seconds"),
+        "sources": args.source,
+        "start_date": args.start,
+        "end_date": args.end,
+        "resolution": args.resolution,
+        "format": args.format,
+        "run_seconds": round(seconds, 1),
+        "units": [previous[u["path"]] for u in units if u["path"] in previous],
+    }
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-v", "--verbose", action="store_true", help="show fetcher logs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("sources", help="list sources and their parameter codes")
+
+    f = sub.add_parser("fetch", help="fetch sources for an AOI and write partitions")
+    f.add_argument("--source", action="append", required=True, choices=sorted(SOURCES))
+    f.add_argument("--params", action="append", default=[],
+                   help="A,B for every source, or SOURCE=A,B (repeatable)")
+    f.add_argument("--start", required=True, help="YYYY-MM-DD")
+    f.add_argument("--end", required=True, help="YYYY-MM-DD")
+    f.add_argument("--resolution", default="Daily")
+    f.add_argument("--aoi", action="append", default=[], help="shapefile, .zip, .kml or .kmz")
+    f.add_argument("--admin", action="append", default=[],
+                   help="COUNTRY[/DIVISION[/SUB-DIVISION]], '*' for all at a level")
+    f.add_argument("--point", action="append", default=[], help="LAT,LON[,NAME]")
+    f.add_argument("--centroids", action="store_true",
+                   help="one point per polygon instead of grid sampling")
+    f.add_argument("--out", required=True, help="output directory")
+    f.add_argument("--format", choices=("parquet", "csv"), default="parquet")
+    f.add_argument("--batch-size", type=int, default=50, help="locations per unit")
+    f.add_argument("--workers", type=int, default=4, help="units fetched concurrently")
+    f.add_argument("--overwrite", action="store_true", help="refetch partitions that exist")
+    f.add_argument("--dry-run", action="store_true", help="print cost estimates only")
+    f.add_argument("--ee-credentials", default=None, help="service-account JSON")
+    f.add_argument("--openweather-key", default=None)
+
+    args = parser.parse_args(argv)
+    tracing.configure_logging("INFO" if args.verbose else "WARNING")
+    log.setLevel(logging.INFO)
+
+    if args.command == "sources":
+        return cmd_sources(args)
+    if args.batch_size < 1 or args.workers < 1:
+        parser.error("--batch-size and --workers must be >= 1")
+    return cmd_fetch(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
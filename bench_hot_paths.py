@@ -0,0 +1,404 @@
+"""
+CPU hot-path micro-benchmarks with synthetic data at production scale.
+
+Covers the pure-Python / pandas code that runs after the upstream fetch
+has returned, i.e. the parts whose cost we control:
+
+  - drought_indices  SPI / SPEI / VCI per-location computations
+  - phenology        _extract_phenology_for_year
+  - polygon_sampler  grid sampling inside polygons
+  - cross_layer      cross_join / per_location_correlation / anomaly_vs_baseline
+  - export_handler   CSV / JSON / GeoJSON / Shapefile / Excel writers
+
+No network or Earth Engine credentials are needed — every input is
+generated with a fixed seed so runs are comparable.
+
+Usage:
+    python bench_hot_paths.py                      # production preset
+    python bench_hot_paths.py --preset smoke       # seconds, for a quick check
+    python bench_hot_paths.py --only spi,export    # substring filter on case names
+    python bench_hot_paths.py --save               # write the baseline
+    python bench_hot_paths.py --compare            # diff against the baseline
+
+Baselines live in .benchmarks/hot_paths_<preset>.json. The script exits
+with status 1 if any case raises, and --compare also if any case's
+median is slower than the baseline by more than --tolerance (default 20 %).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks")
+
+# Sizes mirror real requests: 5,000 locations x 40 years of monthly
+# drought inputs, and 100 points x 5 years of hourly weather.
+PRESETS = {
+    "production": {
+        "monthly_locations": 5000,
+        "monthly_years": 40,
+        "phenology_locations": 1000,
+        "phenology_years": 20,
+        "polygons": 200,
+        "hourly_locations": 100,
+        "hourly_years": 5,
+        "export_rows": 438000,
+        "rounds": 3,
+    },
+    "smoke": {
+        "monthly_locations": 20,
+        "monthly_years": 40,
+        "phenology_locations": 20,
+        "phenology_years": 5,
+        "polygons": 10,
+        "hourly_locations": 5,
+        "hourly_years": 1,
+        "export_rows": 5000,
+        "rounds": 3,
+    },
+}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic inputs
+# ---------------------------------------------------------------------------
+
+def make_monthly_frame(n_locations: int, n_years: int, seed: int = 0) -> pd.DataFrame:
+    """Long monthly table shaped like drought_indices' internal frames:
+    (location_id, latitude, longitude, year, month, precip_mm, pet_mm, ndvi, lst_c)."""
+    rng = np.random.default_rng(seed)
+    start_year = 2020 - n_years + 1
+    n_months = n_years * 12
+    loc = np.repeat(np.arange(n_locations), n_months)
+    year = np.tile(np.repeat(np.arange(start_year, start_year + n_years), 12), n_locations)
+    month = np.tile(np.tile(np.arange(1, 13), n_years), n_locations)
+    season = np.sin((month - 3) / 12.0 * 2 * np.pi)
+    n = loc.size
+    precip = rng.gamma(2.0, 40.0, n) * (1.2 + season)
+    precip[rng.random(n) < 0.08] = 0.0
+    return pd.DataFrame({
+        "location_id": loc,
+        "latitude": 4.0 + (loc % 100) * 0.1,
+        "longitude": 3.0 + (loc // 100) * 0.1,
+        "year": year,
+        "month": month,
+        "precip_mm": precip,
+        "pet_mm": 120.0 + 30.0 * season + rng.normal(0, 8, n),
+        "ndvi": 0.45 + 0.2 * season + rng.normal(0, 0.05, n),
+        "lst_c": 31.0 - 4.0 * season + rng.normal(0, 1.5, n),
+    })
+
+
+def make_ndvi_16day_frame(n_locations: int, n_years: int, seed: int = 1) -> pd.DataFrame:
+    """16-day NDVI composites, 23 per year, like phenology._ndvi_16day_series."""
+    rng = np.random.default_rng(seed)
+    doy = np.arange(1, 366, 16)
+    rows = []
+    for loc_id in range(n_locations):
+        for year in range(2020 - n_years + 1, 2021):
+            peak = rng.integers(150, 260)
+            ndvi = 0.25 + 0.45 * np.exp(-((doy - peak) / 55.0) ** 2) + rng.normal(0, 0.03, doy.size)
+            ndvi[rng.random(doy.size) < 0.05] = np.nan
+            rows.append(pd.DataFrame({
+                "location_id": loc_id, "year": year, "doy": doy, "ndvi": ndvi,
+            }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def make_polygon_gdf(n_polygons: int, seed: int = 2):
+    """Irregular polygons of LGA-to-state size across Nigeria's bbox."""
+    import geopandas as gpd
+    from shapely.geometry import Polygon
+
+    rng = np.random.default_rng(seed)
+    geoms = []
+    for _ in range(n_polygons):
+        cx, cy = rng.uniform(3.0, 14.0), rng.uniform(5.0, 13.0)
+        r = rng.uniform(0.2, 1.0)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, 24))
+        radii = r * rng.uniform(0.6, 1.0, angles.size)
+        geoms.append(Polygon(zip(cx + radii * np.cos(angles), cy + radii * np.sin(angles))))
+    return gpd.GeoDataFrame(
+        {"name": [f"poly_{i}" for i in range(n_polygons)]},
+        geometry=geoms, crs="EPSG:4326",
+    )
+
+
+def make_hourly_frame(n_locations: int, n_years: int, seed: int = 3, value_prefix: str = "") -> pd.DataFrame:
+    """Weather-schema hourly table like the NASA POWER / ERA5 output."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2016-01-01", periods=n_years * 365 * 24, freq="h")
+    n = times.size * n_locations
+    loc = np.repeat(np.arange(n_locations), times.size)
+    return pd.DataFrame({
+        "datetime": np.tile(times.values, n_locations),
+        "latitude": 4.0 + loc * 0.05,
+        "longitude": 3.0 + loc * 0.05,
+        "location_id": loc,
+        f"{value_prefix}T2M": rng.normal(27.0, 3.0, n).round(2),
+        f"{value_prefix}RH2M": rng.uniform(20, 100, n).round(1),
+        f"{value_prefix}PRECTOTCORR": rng.gamma(0.3, 1.0, n).round(2),
+        "location_name": pd.Series(loc).map(lambda i: f"Location_{i}").values,
+    })
+
+
+def make_export_frame(n_rows: int, seed: int = 4) -> pd.DataFrame:
+    n_locations = 100
+    per_loc = max(1, n_rows // n_locations)
+    df = make_hourly_frame(n_locations, 1, seed=seed)
+    return df.groupby("location_id").head(per_loc).reset_index(drop=True)
+
+
+# ---------------------------------------------------------------------------
+# Cases — each returns a zero-arg callable to time
+# ---------------------------------------------------------------------------
+
+def case_spi(sizes):
+    from data_sources import drought_indices as di
+    monthly = make_monthly_frame(sizes["monthly_locations"], sizes["monthly_years"])
+    groups = [g.reset_index(drop=True) for _, g in monthly.groupby("location_id")]
+    baseline = (di.CLIMATOLOGY_START, di.CLIMATOLOGY_END)
+
+    def run():
+        for g in groups:
+            di._compute_spi_for_location(g, window=3, baseline_years=baseline)
+    return run
+
+
+def case_spei(sizes):
+    from data_sources import drought_indices as di
+    monthly = make_monthly_frame(sizes["monthly_locations"], sizes["monthly_years"])
+    groups = [g.reset_index(drop=True) for _, g in monthly.groupby("location_id")]
+    baseline = (di.CLIMATOLOGY_START, di.CLIMATOLOGY_END)
+
+    def run():
+        for g in groups:
+            di._compute_spei_for_location(g, window=3, baseline_years=baseline)
+    return run
+
+
+def case_vci(sizes):
+    from data_sources import drought_indices as di
+    monthly = make_monthly_frame(sizes["monthly_locations"], sizes["monthly_years"])
+    groups = [g.reset_index(drop=True) for _, g in monthly.groupby("location_id")]
+    baseline = (di.MODIS_CLIMATOLOGY_START, di.MODIS_CLIMATOLOGY_END)
+
+    def run():
+        for g in groups:
+            di._apply_condition_index(g, "ndvi", baseline, invert=False, out_col="VCI")
+    return run
+
+
+def case_phenology(sizes):
+    from data_sources import phenology
+    ndvi = make_ndvi_16day_frame(sizes["phenology_locations"], sizes["phenology_years"])
+    groups = [g for _, g in ndvi.groupby(["location_id", "year"])]
+
+    def run():
+        for g in groups:
+            phenology._extract_phenology_for_year(g)
+    return run
+
+
+def case_polygon_sampler(sizes):
+    from utils.polygon_sampler import sample_polygon_locations
+    gdf = make_polygon_gdf(sizes["polygons"])
+
+    def run():
+        sample_polygon_locations(gdf)
+    return run
+
+
+def case_cross_join(sizes):
+    from utils import cross_layer
+    left = make_hourly_frame(sizes["hourly_locations"], sizes["hourly_years"], seed=3)
+    right = make_hourly_frame(sizes["hourly_locations"], sizes["hourly_years"], seed=5, value_prefix="B_")
+
+    def run():
+        cross_layer.cross_join(left, right)
+    return run
+
+
+def case_per_location_correlation(sizes):
+    from utils import cross_layer
+    df = make_hourly_frame(sizes["hourly_locations"], sizes["hourly_years"])
+
+    def run():
+        cross_layer.per_location_correlation(df, "T2M", "RH2M")
+    return run
+
+
+def case_anomaly_vs_baseline(sizes):
+    from utils import cross_layer
+    df = make_hourly_frame(sizes["hourly_locations"], sizes["hourly_years"])
+    y0 = int(df["datetime"].dt.year.min())
+
+    def run():
+        cross_layer.anomaly_vs_baseline(df, "T2M", (y0, y0 + 2), time_col="datetime")
+    return run
+
+
+def _export_case(writer_name):
+    def factory(sizes):
+        from utils import export_handler
+        df = make_export_frame(sizes["export_rows"])
+        writer = getattr(export_handler, writer_name)
+
+        def run():
+            out = writer(df)
+            # Shapefile writer returns a path to a temp ZIP; clean it up.
+            if isinstance(out, str) and os.path.exists(out):
+                os.remove(out)
+        return run
+    return factory
+
+
+CASES = {
+    "drought.spi": case_spi,
+    "drought.spei": case_spei,
+    "drought.vci": case_vci,
+    "phenology.extract_year": case_phenology,
+    "polygon_sampler.grid": case_polygon_sampler,
+    "cross_layer.cross_join": case_cross_join,
+    "cross_layer.per_location_correlation": case_per_location_correlation,
+    "cross_layer.anomaly_vs_baseline": case_anomaly_vs_baseline,
+    "export.csv": _export_case("export_to_csv"),
+    "export.json": _export_case("export_to_json"),
+    "export.geojson": _export_case("export_to_geojson"),
+    "export.shapefile": _export_case("export_to_shapefile"),
+    "export.excel": _export_case("export_to_excel"),
+}
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def time_case(fn, rounds: int) -> dict:
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return {
+        "rounds": rounds,
+        "min_s": round(min(timings), 6),
+        "median_s": round(statistics.median(timings), 6),
+        "max_s": round(max(timings), 6),
+    }
+
+
+def baseline_path(preset: str) -> str:
+    return os.path.join(BASELINE_DIR, f"hot_paths_{preset}.json")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """Print a per-case comparison table. Returns True if nothing regressed."""
+    ok = True
+    print(f"\n{'case':40s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for name, cur in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            print(f"{name:40s} {'-':>10s} {cur['median_s']:>10.3f} {'new':>7s}")
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        elif ratio < 1.0 - tolerance:
+            flag = "  faster"
+        print(f"{name:40s} {base['median_s']:>10.3f} {cur['median_s']:>10.3f} {ratio:>6.2f}x{flag}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="production")
+    parser.add_argument("--only", default="", help="comma-separated substrings of case names")
+    parser.add_argument("--rounds", type=int, default=None)
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    args = parser.parse_args(argv)
+
+    sizes = dict(PRESETS[args.preset])
+    rounds = args.rounds or sizes["rounds"]
+    filters = [f.strip() for f in args.only.split(",") if f.strip()]
+    selected = {
+        name: factory for name, factory in CASES.items()
+        if not filters or any(f in name for f in filters)
+    }
+
+    print("=" * 70)
+    print(f"Hot-path benchmarks  preset={args.preset}  rounds={rounds}")
+    print("=" * 70)
+
+    results = {}
+    errors = []
+    for name, factory in selected.items():
+        try:
+            fn = factory(sizes)
+        except ImportError as e:
+            print(f"[SKIP] {name}: {e}")
+            continue
+        try:
+            stats_ = time_case(fn, rounds)
+        except Exception as e:
+            print(f"[ERROR] {name}: {type(e).__name__}: {e}")
+            errors.append(name)
+            continue
+        results[name] = stats_
+        print(f"  {name:40s} median {stats_['median_s']:.3f}s  (min {stats_['min_s']:.3f}s)")
+
+    exit_code = 0
+    if errors:
+        print(f"\n[ERROR] {len(errors)} case(s) failed: {', '.join(errors)}")
+        exit_code = 1
+    path = baseline_path(args.preset)
+    if args.compare:
+        if not os.path.exists(path):
+            print(f"\n[WARNING] No baseline at {path}; run with --save first.")
+        else:
+            with open(path) as f:
+                baseline = json.load(f)
+            if not compare(results, baseline, args.tolerance):
+                exit_code = 1
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        payload = {
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "preset": args.preset,
+            "sizes": sizes,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "cases": results,
+        }
+        # Keep cases that weren't run this time (e.g. with --only) so a
+        # partial run doesn't wipe the rest of the baseline.
+        if os.path.exists(path):
+            with open(path) as f:
+                previous = json.load(f)
+            merged = dict(previous.get("cases", {}))
+            merged.update(results)
+            payload["cases"] = merged
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=2)
+        print(f"\n[SUCCESS] Baseline saved to {path}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
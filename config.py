@@ -44,7 +44,12 @@ TEMPORAL_RESOLUTION_MAP = {
 }
 
 # Export Settings
-EXPORT_FORMATS = ["CSV", "JSON", "GeoJSON", "Shapefile", "Excel"]
+EXPORT_FORMATS = ["CSV", "JSON", "GeoJSON", "Shapefile", "Excel", "Parquet", "GeoParquet", "Feather",
+                  "JSONL", "GeoJSONSeq", "GeoPackage", "NormalizedParquet", "LocationArrays",
+                  "NetCDF", "Zarr"]
+
+# Worker threads used to build the formats of a download bundle in parallel
+BUNDLE_WORKERS = 4
 
 # Maximum number of locations per request
 MAX_LOCATIONS = 100
@@ -62,3 +67,47 @@ CACHE_TTL = 3600  # 1 hour in seconds
 
 # Logging
 LOG_LEVEL = "INFO"
+
+# Profiling (off by default). PROFILE_MODE is "fetch", "rerun" or "all";
+# PORTAL_ADMIN shows the diagnostics toggles in the sidebar.
+PROFILE_MODE = os.getenv("PROFILE_MODE", "")
+PORTAL_ADMIN = os.getenv("PORTAL_ADMIN", "")
+PROFILE_SAMPLE_INTERVAL_MS = 5
+PROFILE_TOP_ALLOCATIONS = 25
+
+# Checkpointed fetches: completed chunks of an interrupted fetch are kept
+# here (default: a private per-user folder under the system temp dir) so a
+# retry only requests what is missing. Abandoned jobs are pruned after
+# CHECKPOINT_MAX_AGE_S.
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "")
+CHECKPOINT_MAX_AGE_S = 7 * 24 * 3600
+
+# Background fetch jobs: worker threads shared by all sessions, where job
+# status / results are kept (default: a private per-user folder under the
+# system temp dir), and how long a finished job is kept (and reused).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOBS_DIR = os.getenv("JOBS_DIR", "")
+JOB_MAX_AGE_S = 7 * 24 * 3600
+JOB_POLL_SECONDS = 2
+
+# Concurrent Earth Engine requests (data_sources/earth_engine_utils.py),
+# shared by all sessions; used e.g. for tiled LULC vectorization.
+EE_WORKERS = int(os.getenv("EE_WORKERS", "8"))
+
+# Session result store (utils/result_store.py): fetched results and
+# cross-layer snapshots are kept in memory up to these budgets, then the
+# least recently used are spilled to Arrow files under RESULT_STORE_DIR
+# (default: under the system temp dir).
+RESULT_STORE_MAX_MB = int(os.getenv("RESULT_STORE_MAX_MB", "1024"))
+RESULT_STORE_SESSION_MAX_MB = int(os.getenv("RESULT_STORE_SESSION_MAX_MB", "256"))
+RESULT_STORE_DISK_MAX_MB = int(os.getenv("RESULT_STORE_DISK_MAX_MB", "10240"))
+RESULT_STORE_DIR = os.getenv("RESULT_STORE_DIR", "")
+RESULT_STORE_MAX_AGE_S = 7 * 24 * 3600
+
+# Local HTTP API (api_server.py). API_TOKEN, when set, is required as a
+# bearer token on every request.
+API_PORT = int(os.getenv("API_PORT", "8600"))
+API_TOKEN = os.getenv("API_TOKEN", "")
+API_MAX_CONNECTIONS = 32
+API_MAX_QUEUED_JOBS = 100
+API_MAX_LOCATIONS = 1000
@@ -19,6 +19,7 @@ Both produce per-polygon summary rows.
 
 from __future__ import annotations
 
+import logging
 from typing import Dict, List, Optional
 
 import ee
@@ -26,9 +27,13 @@ import geopandas as gpd
 import pandas as pd
 from shapely.geometry import mapping
 
+from utils import progress, tracing
+
 from .earth_engine_utils import EarthEngineClient
 from .lulc import _to_2d_geometry, best_polygon_name
 
+log = logging.getLogger(__name__)
+
 
 # ---------------------------------------------------------------------------
 # iSDA-Africa soils
@@ -120,6 +125,7 @@ def _prepare_features(aoi_gdf: gpd.GeoDataFrame):
     return features, meta
 
 
+@progress.reporting
 def fetch_africa_stack_from_gdf(
     aoi_gdf: gpd.GeoDataFrame,
     parameters: List[str],
@@ -151,7 +157,7 @@ def fetch_africa_stack_from_gdf(
     # ---- iSDA soils (mean reduce, one call per requested param) -----
     isda_params = [p for p in parameters if p in _ISDA_PARAMS]
     if isda_params:
-        print(f"[Africa] iSDA params: {isda_params}")
+        log.info(f"[Africa] iSDA params: {isda_params}")
     for p in isda_params:
         m = _ISDA_PARAMS[p]
         try:
@@ -162,9 +168,10 @@ def fetch_africa_stack_from_gdf(
                 scale=30,
                 tileScale=4,
             )
-            server_feats = reduced.getInfo().get("features", [])
+            with tracing.span("server_compute", round_trips=1):
+                server_feats = reduced.getInfo().get("features", [])
         except Exception as e:
-            print(f"  [WARN] {p}: {e}")
+            log.warning(f"{p}: {e}")
             continue
         for feat in server_feats:
             props = feat.get("properties") or {}
@@ -208,7 +215,8 @@ def fetch_africa_stack_from_gdf(
                 scale=100,
                 tileScale=4,
             )
-            server_feats = reduced.getInfo().get("features", [])
+            with tracing.span("server_compute", round_trips=1):
+                server_feats = reduced.getInfo().get("features", [])
             for feat in server_feats:
                 props = feat.get("properties") or {}
                 try:
@@ -232,9 +240,10 @@ def fetch_africa_stack_from_gdf(
                         round(crop_m2 / total_m2 * 100, 3) if total_m2 > 0 else 0.0
                     )
         except Exception as e:
-            print(f"[WARN] WorldCereal failed: {e}")
-            print("  (WorldCereal has known EE catalog changes; if all values")
-            print("   are missing, catalog path may need updating.)")
+            log.warning(
+                f"WorldCereal failed: {e} (WorldCereal has known EE catalog "
+                "changes; if all values are missing, catalog path may need updating.)"
+            )
 
     df = pd.DataFrame(list(output_by_polygon.values()))
     # Column ordering: id, name, then requested params in order.
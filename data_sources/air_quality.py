@@ -19,6 +19,7 @@ Output is weather-schema: (date, latitude, longitude, location_id,
 
 from __future__ import annotations
 
+import logging
 from datetime import datetime
 from typing import Dict, List, Tuple
 
@@ -26,7 +27,13 @@ import ee
 import numpy as np
 import pandas as pd
 
-from .earth_engine_utils import EarthEngineClient
+from utils import checkpoint, progress
+
+from .earth_engine_utils import (
+    EarthEngineClient, get_features, monthly_windows, reduce_if_nonempty,
+)
+
+log = logging.getLogger(__name__)
 
 
 AIR_QUALITY_PARAMETERS: Dict[str, Dict[str, str]] = {
@@ -86,40 +93,46 @@ def _monthly_series(
     fc = ee.FeatureCollection(feats)
 
     rows: List[Dict] = []
-    for year in range(start_year, end_year + 1):
-        for month in range(1, 13):
-            m_start = ee.Date.fromYMD(year, month, 1)
-            m_end = m_start.advance(1, "month")
-            monthly_img = coll.filterDate(m_start, m_end).mean().rename(band)
-            try:
-                reduced = monthly_img.reduceRegions(
-                    collection=fc,
-                    reducer=ee.Reducer.mean().setOutputs([out_field]),
-                    scale=scale_m,
-                    tileScale=4,
-                )
-                server_feats = reduced.getInfo().get("features", [])
-            except Exception as e:
-                print(f"[WARN] {asset_id} {year}-{month:02d}: {e}")
-                continue
-            for feat in server_feats:
-                props = feat.get("properties") or {}
-                raw = props.get(out_field)
-                if raw is None:
+    loc_key = checkpoint.digest(locations)
+    months = monthly_windows(start_year, end_year)
+    progress.add_total(len(months), "months")
+    for year, month in months:
+        m_start = ee.Date.fromYMD(year, month, 1)
+        m_end = m_start.advance(1, "month")
+        month_images = coll.filterDate(m_start, m_end)
+        monthly_img = month_images.mean().rename(band)
+        try:
+            reduced = monthly_img.reduceRegions(
+                collection=fc,
+                reducer=ee.Reducer.mean().setOutputs([out_field]),
+                scale=scale_m,
+                tileScale=4,
+            )
+            server_feats = checkpoint.fetch_chunk(
+                f"{asset_id}/{band}/{scale_m}/{loc_key}/{year}-{month:02d}",
+                lambda: get_features(reduce_if_nonempty(month_images, reduced)),
+            )
+        except Exception as e:
+            log.warning(f"{asset_id} {year}-{month:02d}: {e}")
+            continue
+        for feat in server_feats:
+            props = feat.get("properties") or {}
+            raw = props.get(out_field)
+            if raw is None:
+                v = np.nan
+            else:
+                try:
+                    v = float(raw) * value_scale
+                except (TypeError, ValueError):
                     v = np.nan
-                else:
-                    try:
-                        v = float(raw) * value_scale
-                    except (TypeError, ValueError):
-                        v = np.nan
-                rows.append({
-                    "location_id": int(props.get("location_id", -1)),
-                    "latitude": props.get("latitude"),
-                    "longitude": props.get("longitude"),
-                    "year": year,
-                    "month": month,
-                    out_field: v,
-                })
+            rows.append({
+                "location_id": int(props.get("location_id", -1)),
+                "latitude": props.get("latitude"),
+                "longitude": props.get("longitude"),
+                "year": year,
+                "month": month,
+                out_field: v,
+            })
 
     if not rows:
         return pd.DataFrame(columns=[
@@ -128,6 +141,7 @@ def _monthly_series(
     return pd.DataFrame(rows).sort_values(["location_id", "year", "month"]).reset_index(drop=True)
 
 
+@progress.reporting
 def fetch_air_quality_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
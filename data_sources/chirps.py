@@ -1,3 +1,4 @@
+import logging
 import requests
 import pandas as pd
 import numpy as np
@@ -6,6 +7,10 @@ from typing import List, Tuple, Dict
 import tempfile
 import os
 
+from utils import progress
+
+log = logging.getLogger(__name__)
+
 # Available CHIRPS parameters
 CHIRPS_PARAMETERS = {
     "Precipitation": {
@@ -26,6 +31,7 @@ def get_temporal_resolutions() -> List[str]:
     return TEMPORAL_RESOLUTIONS
 
 
+@progress.reporting
 def fetch_chirps_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -51,9 +57,7 @@ def fetch_chirps_data(
     
     from .earth_engine_utils import fetch_chirps_precipitation
     
-    print("=" * 70)
-    print("CHIRPS via Google Earth Engine")
-    print("=" * 70)
+    log.info("CHIRPS via Google Earth Engine")
     
     if not credentials_dict:
         raise ValueError("Earth Engine credentials required. Please provide service account credentials.")
@@ -68,14 +72,14 @@ def fetch_chirps_data(
         )
         
         if not df.empty:
-            print(f"\n[SUCCESS] CHIRPS fetch complete: {len(df)} records")
+            log.info(f"CHIRPS fetch complete: {len(df)} records")
             return df
         else:
-            print("\n[WARNING] No data retrieved")
+            log.warning("No data retrieved")
             return pd.DataFrame()
     
     except Exception as e:
-        print(f"\n[ERROR] Error fetching CHIRPS data: {str(e)}")
+        log.error(f"Error fetching CHIRPS data: {str(e)}")
         raise
 
 
@@ -150,5 +154,5 @@ def extract_chirps_values(geotiff_path: str, locations: List[Tuple[float, float]
         return values
     
     except Exception as e:
-        print(f"Error extracting CHIRPS values: {str(e)}")
+        log.error(f"Error extracting CHIRPS values: {str(e)}")
         return [None] * len(locations)
@@ -41,6 +41,7 @@ Data:
 
 from __future__ import annotations
 
+import logging
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 
@@ -49,7 +50,13 @@ import numpy as np
 import pandas as pd
 from scipy import stats
 
-from .earth_engine_utils import EarthEngineClient
+from utils import checkpoint, progress
+
+from .earth_engine_utils import (
+    EarthEngineClient, get_features, monthly_windows, reduce_if_nonempty,
+)
+
+log = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
@@ -150,47 +157,53 @@ def _monthly_chirps_series(
     fc = ee.FeatureCollection(feats)
 
     rows: List[Dict] = []
-    for year in range(start_year, end_year + 1):
-        for month in range(1, 13):
-            m_start = ee.Date.fromYMD(year, month, 1)
-            m_end = m_start.advance(1, "month")
-            monthly_img = daily.filterDate(m_start, m_end).sum().rename("precip_mm")
-
-            try:
-                reduced = monthly_img.reduceRegions(
-                    collection=fc,
-                    # setOutputs forces the property name; without it EE
-                    # names the field 'first' regardless of band name.
-                    reducer=ee.Reducer.first().setOutputs(["precip_mm"]),
-                    scale=5566,  # CHIRPS native ~5.5 km
-                )
-                server_feats = reduced.getInfo().get("features", [])
-            except Exception as e:
-                # Skip individual month failures — don't abandon the fetch.
-                # The SPI computation downstream drops NaNs so a few holes
-                # are recoverable.
-                print(f"[WARN] CHIRPS {year}-{month:02d}: {e}")
-                continue
+    loc_key = checkpoint.digest(locations)
+    months = monthly_windows(start_year, end_year)
+    progress.add_total(len(months), "months")
+    for year, month in months:
+        m_start = ee.Date.fromYMD(year, month, 1)
+        m_end = m_start.advance(1, "month")
+        month_images = daily.filterDate(m_start, m_end)
+        monthly_img = month_images.sum().rename("precip_mm")
+
+        try:
+            reduced = monthly_img.reduceRegions(
+                collection=fc,
+                # setOutputs forces the property name; without it EE
+                # names the field 'first' regardless of band name.
+                reducer=ee.Reducer.first().setOutputs(["precip_mm"]),
+                scale=5566,  # CHIRPS native ~5.5 km
+            )
+            server_feats = checkpoint.fetch_chunk(
+                f"chirps_monthly/{loc_key}/{year}-{month:02d}",
+                lambda: get_features(reduce_if_nonempty(month_images, reduced)),
+            )
+        except Exception as e:
+            # Skip individual month failures — don't abandon the fetch.
+            # The SPI computation downstream drops NaNs so a few holes
+            # are recoverable.
+            log.warning(f"CHIRPS {year}-{month:02d}: {e}")
+            continue
 
-            for feat in server_feats:
-                props = feat.get("properties") or {}
-                val = props.get("precip_mm")
-                # ee.Reducer.first returns None if the pixel is masked.
-                if val is None:
+        for feat in server_feats:
+            props = feat.get("properties") or {}
+            val = props.get("precip_mm")
+            # ee.Reducer.first returns None if the pixel is masked.
+            if val is None:
+                precip = np.nan
+            else:
+                try:
+                    precip = float(val)
+                except (TypeError, ValueError):
                     precip = np.nan
-                else:
-                    try:
-                        precip = float(val)
-                    except (TypeError, ValueError):
-                        precip = np.nan
-                rows.append({
-                    "location_id": int(props.get("location_id", -1)),
-                    "latitude": props.get("latitude"),
-                    "longitude": props.get("longitude"),
-                    "year": year,
-                    "month": month,
-                    "precip_mm": precip,
-                })
+            rows.append({
+                "location_id": int(props.get("location_id", -1)),
+                "latitude": props.get("latitude"),
+                "longitude": props.get("longitude"),
+                "year": year,
+                "month": month,
+                "precip_mm": precip,
+            })
 
     if not rows:
         return pd.DataFrame(columns=[
@@ -340,41 +353,47 @@ def _monthly_modis_series(
     fc = ee.FeatureCollection(feats)
 
     rows: List[Dict] = []
-    for year in range(start_year, end_year + 1):
-        for month in range(1, 13):
-            m_start = ee.Date.fromYMD(year, month, 1)
-            m_end = m_start.advance(1, "month")
-            monthly_img = coll.filterDate(m_start, m_end).mean().rename(band)
-
-            try:
-                reduced = monthly_img.reduceRegions(
-                    collection=fc,
-                    reducer=ee.Reducer.mean().setOutputs([out_field]),
-                    scale=scale_m,
-                )
-                server_feats = reduced.getInfo().get("features", [])
-            except Exception as e:
-                print(f"[WARN] {asset_id} {year}-{month:02d}: {e}")
-                continue
+    loc_key = checkpoint.digest(locations)
+    months = monthly_windows(start_year, end_year)
+    progress.add_total(len(months), "months")
+    for year, month in months:
+        m_start = ee.Date.fromYMD(year, month, 1)
+        m_end = m_start.advance(1, "month")
+        month_images = coll.filterDate(m_start, m_end)
+        monthly_img = month_images.mean().rename(band)
+
+        try:
+            reduced = monthly_img.reduceRegions(
+                collection=fc,
+                reducer=ee.Reducer.mean().setOutputs([out_field]),
+                scale=scale_m,
+            )
+            server_feats = checkpoint.fetch_chunk(
+                f"{asset_id}/{band}/{scale_m}/{loc_key}/{year}-{month:02d}",
+                lambda: get_features(reduce_if_nonempty(month_images, reduced)),
+            )
+        except Exception as e:
+            log.warning(f"{asset_id} {year}-{month:02d}: {e}")
+            continue
 
-            for feat in server_feats:
-                props = feat.get("properties") or {}
-                raw = props.get(out_field)
-                if raw is None:
+        for feat in server_feats:
+            props = feat.get("properties") or {}
+            raw = props.get(out_field)
+            if raw is None:
+                v = np.nan
+            else:
+                try:
+                    v = float(raw) * value_scale + value_offset
+                except (TypeError, ValueError):
                     v = np.nan
-                else:
-                    try:
-                        v = float(raw) * value_scale + value_offset
-                    except (TypeError, ValueError):
-                        v = np.nan
-                rows.append({
-                    "location_id": int(props.get("location_id", -1)),
-                    "latitude": props.get("latitude"),
-                    "longitude": props.get("longitude"),
-                    "year": year,
-                    "month": month,
-                    out_field: v,
-                })
+            rows.append({
+                "location_id": int(props.get("location_id", -1)),
+                "latitude": props.get("latitude"),
+                "longitude": props.get("longitude"),
+                "year": year,
+                "month": month,
+                out_field: v,
+            })
 
     if not rows:
         return pd.DataFrame(columns=[
@@ -591,7 +610,7 @@ def _compute_spi_frame(
     fetch_start_year = min(warmup_start_year, CLIMATOLOGY_START)
     fetch_end_year = max(end_dt.year, CLIMATOLOGY_END)
 
-    print(
+    log.info(
         f"[SPI] Locations={len(locations)}  "
         f"target={start_dt.date()}..{end_dt.date()}  "
         f"pulling CHIRPS monthly {fetch_start_year}-{fetch_end_year}"
@@ -661,7 +680,7 @@ def _compute_spei_frame(
     fetch_start_year = min(warmup_start_year, CLIMATOLOGY_START)
     fetch_end_year = max(end_dt.year, CLIMATOLOGY_END)
 
-    print(
+    log.info(
         f"[SPEI] Locations={len(locations)}  "
         f"target={start_dt.date()}..{end_dt.date()}  "
         f"pulling CHIRPS P + TerraClimate PET {fetch_start_year}-{fetch_end_year}"
@@ -730,7 +749,7 @@ def _compute_veg_health_frame(
     frames_by_loc: Dict[int, pd.DataFrame] = {}
 
     if need_ndvi:
-        print(
+        log.info(
             f"[VegHealth] Pulling MODIS NDVI monthly "
             f"{fetch_start_year}-{fetch_end_year}"
         )
@@ -748,7 +767,7 @@ def _compute_veg_health_frame(
             frames_by_loc[loc_id] = loc_df
 
     if need_lst:
-        print(
+        log.info(
             f"[VegHealth] Pulling MODIS LST monthly "
             f"{fetch_start_year}-{fetch_end_year}"
         )
@@ -794,6 +813,7 @@ def _compute_veg_health_frame(
     return pd.concat(out_frames, ignore_index=True)
 
 
+@progress.reporting
 def fetch_drought_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -885,8 +905,8 @@ def fetch_drought_data(
             keep_cols.append(p)
     result = result[keep_cols]
     result = result.sort_values(["location_id", "date"]).reset_index(drop=True)
-    print(
-        f"[SUCCESS] Drought/veg indices: {len(result)} rows across "
+    log.info(
+        f"Drought/veg indices: {len(result)} rows across "
         f"{len(locations)} location(s), params={parameters}."
     )
     return result
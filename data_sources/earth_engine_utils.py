@@ -1,13 +1,95 @@
 """
 Google Earth Engine utilities for MODIS and CHIRPS data
 """
+import contextvars
+import logging
+import threading
 import ee
 import pandas as pd
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Tuple, Dict
+from typing import Callable, Dict, List, Optional, Tuple
 import json
 import os
 
+from utils import checkpoint, progress, tracing
+
+log = logging.getLogger(__name__)
+
+# Earth Engine refuses to materialise more than 5,000 elements in a single
+# getInfo(); keep a little headroom so borderline requests don't hit it.
+EE_GETINFO_MAX = 5000
+EE_GETINFO_HEADROOM = 200
+# Upper bound on one ERA5 request window, whatever the element budget
+# allows, so a single call never asks EE for more than a year of images.
+ERA5_MAX_CHUNK_DAYS = 366
+
+
+def get_features(collection) -> List[Dict]:
+    """Materialise a FeatureCollection's features in one traced getInfo()."""
+    with tracing.span("server_compute", round_trips=1):
+        return collection.getInfo().get('features', [])
+
+
+def monthly_windows(start_year: int, end_year: int) -> List[Tuple[int, int]]:
+    """(year, month) pairs from January of `start_year` to December of
+    `end_year`, stopping at the current month: later months have no
+    imagery yet, so there is nothing to request."""
+    today = datetime.utcnow()
+    return [
+        (year, month)
+        for year in range(start_year, end_year + 1)
+        for month in range(1, 13)
+        if (year, month) <= (today.year, today.month)
+    ]
+
+
+def reduce_if_nonempty(images, reduced):
+    """`reduced` (a reduceRegions result over a composite of `images`), or
+    an empty FeatureCollection when `images` has no image at all.
+
+    Compositing an empty collection gives a band-less image, and renaming
+    or reducing it fails on the server. That is not a transient error: the
+    month just has no data (before a product starts, or a gap), so it
+    should come back empty, not fail on every retry of a checkpointed job.
+    The branch is chosen server-side, at no extra round-trip.
+    """
+    return ee.FeatureCollection(
+        ee.Algorithms.If(images.size().gt(0), reduced, ee.FeatureCollection([]))
+    )
+
+
+# Process-wide pool for independent Earth Engine requests. getInfo() is a
+# blocking HTTP call, so threads overlap the server-side compute; the cap
+# keeps one session from using up the service account's concurrent
+# request quota.
+_ee_executor: Optional[ThreadPoolExecutor] = None
+_ee_executor_lock = threading.Lock()
+
+
+def ee_executor() -> ThreadPoolExecutor:
+    """Shared thread pool for concurrent Earth Engine calls (EE_WORKERS)."""
+    global _ee_executor
+    with _ee_executor_lock:
+        if _ee_executor is None:
+            try:
+                import config
+                workers = getattr(config, "EE_WORKERS", 8)
+            except Exception:
+                workers = 8
+            _ee_executor = ThreadPoolExecutor(
+                max_workers=int(workers), thread_name_prefix="weather-portal-ee"
+            )
+    return _ee_executor
+
+
+def submit_ee(fn: Callable, *args, **kwargs) -> Future:
+    """Run `fn` on the EE pool. The caller's context (active trace and
+    progress reporter) goes with it, so spans and counters still add up
+    to the calling fetch."""
+    ctx = contextvars.copy_context()
+    return ee_executor().submit(ctx.run, fn, *args, **kwargs)
+
 
 class EarthEngineClient:
     """Client for Google Earth Engine API"""
@@ -23,29 +105,30 @@ class EarthEngineClient:
         self.initialized = False
         
         try:
-            if credentials_dict:
-                # Use provided credentials dictionary
-                credentials = ee.ServiceAccountCredentials(
-                    email=credentials_dict['client_email'],
-                    key_data=credentials_dict['private_key']
-                )
-                ee.Initialize(credentials)
-            elif credentials_path and os.path.exists(credentials_path):
-                # Use credentials file
-                credentials = ee.ServiceAccountCredentials(
-                    email=None,
-                    key_file=credentials_path
-                )
-                ee.Initialize(credentials)
-            else:
-                # Try default authentication
-                ee.Initialize()
+            with tracing.span("auth"):
+                if credentials_dict:
+                    # Use provided credentials dictionary
+                    credentials = ee.ServiceAccountCredentials(
+                        email=credentials_dict['client_email'],
+                        key_data=credentials_dict['private_key']
+                    )
+                    ee.Initialize(credentials)
+                elif credentials_path and os.path.exists(credentials_path):
+                    # Use credentials file
+                    credentials = ee.ServiceAccountCredentials(
+                        email=None,
+                        key_file=credentials_path
+                    )
+                    ee.Initialize(credentials)
+                else:
+                    # Try default authentication
+                    ee.Initialize()
             
             self.initialized = True
-            print("[SUCCESS] Earth Engine initialized successfully")
+            log.info("Earth Engine initialized successfully")
             
         except Exception as e:
-            print(f"[ERROR] Earth Engine initialization failed: {str(e)}")
+            log.error(f"Earth Engine initialization failed: {str(e)}")
             raise
     
     def test_connection(self) -> bool:
@@ -56,10 +139,11 @@ class EarthEngineClient:
             info = image.getInfo()
             return True
         except Exception as e:
-            print(f"Connection test failed: {str(e)}")
+            log.error(f"Connection test failed: {str(e)}")
             return False
 
 
+@progress.reporting
 def fetch_modis_lst(
     locations: List[Tuple[float, float]],
     start_date: str,
@@ -94,10 +178,10 @@ def fetch_modis_lst(
     days = (end_dt - start_dt).days
     
     if days > 90:
-        print(f"[WARNING] Large date range ({days} days) may take several minutes or timeout.")
-        print(f"[TIP] For faster results, try <90 days at a time.")
+        log.warning(f"Large date range ({days} days) may take several minutes or timeout.")
+        log.info(f"For faster results, try <90 days at a time.")
     
-    print(f"Fetching MODIS LST ({product}) from {start_date} to {end_date}...")
+    log.info(f"Fetching MODIS LST ({product}) from {start_date} to {end_date}...")
     
     # Select appropriate band
     band_name = 'LST_Day_1km' if product == "day" else 'LST_Night_1km'
@@ -111,7 +195,7 @@ def fetch_modis_lst(
     
     # Extract data for each location
     for idx, (lat, lon) in enumerate(locations):
-        print(f"  Processing location {idx + 1}/{len(locations)}: ({lat}, {lon})")
+        log.info(f"Processing location {idx + 1}/{len(locations)}: ({lat}, {lon})")
         
         # Create point geometry
         point = ee.Geometry.Point([lon, lat])
@@ -143,11 +227,13 @@ def fetch_modis_lst(
             
             # Convert to list and get info
             # Limit to reasonable size to avoid timeout
-            count = dataset.size().getInfo()
+            with tracing.span("server_compute", round_trips=1):
+                count = dataset.size().getInfo()
             if count > 1000:
-                print(f"  [WARNING] {count} images found. This may take a while...")
+                log.warning(f"{count} images found. This may take a while...")
             
-            feature_list = features.toList(count if count < 5000 else 5000).getInfo()
+            with tracing.span("server_compute", round_trips=1):
+                feature_list = features.toList(count if count < 5000 else 5000).getInfo()
             
             # Parse features into records
             for feature in feature_list:
@@ -165,19 +251,20 @@ def fetch_modis_lst(
                     })
         
         except Exception as e:
-            print(f"  Error processing location {idx}: {str(e)}")
+            log.error(f"Error processing location {idx}: {str(e)}")
             continue
     
     if all_data:
         df = pd.DataFrame(all_data)
         df['datetime'] = pd.to_datetime(df['datetime'])
-        print(f"[SUCCESS] Retrieved {len(df)} records")
+        log.info(f"Retrieved {len(df)} records")
         return df
     else:
-        print("[WARNING] No data retrieved")
+        log.warning("No data retrieved")
         return pd.DataFrame()
 
 
+@progress.reporting
 def fetch_modis_ndvi(
     locations: List[Tuple[float, float]],
     start_date: str,
@@ -200,7 +287,7 @@ def fetch_modis_ndvi(
     # Initialize Earth Engine
     client = EarthEngineClient(credentials_dict=credentials_dict)
     
-    print(f"Fetching MODIS NDVI from {start_date} to {end_date}...")
+    log.info(f"Fetching MODIS NDVI from {start_date} to {end_date}...")
     
     # Get MODIS NDVI collection (16-day composite, using latest version)
     dataset = ee.ImageCollection('MODIS/061/MOD13Q1') \
@@ -210,7 +297,7 @@ def fetch_modis_ndvi(
     all_data = []
     
     for idx, (lat, lon) in enumerate(locations):
-        print(f"  Processing location {idx + 1}/{len(locations)}: ({lat}, {lon})")
+        log.info(f"Processing location {idx + 1}/{len(locations)}: ({lat}, {lon})")
         
         point = ee.Geometry.Point([lon, lat])
         
@@ -233,7 +320,8 @@ def fetch_modis_ndvi(
                 })
             
             features = dataset.map(extract_values)
-            feature_list = features.toList(1000).getInfo()
+            with tracing.span("server_compute", round_trips=1):
+                feature_list = features.toList(1000).getInfo()
             
             for feature in feature_list:
                 props = feature['properties']
@@ -250,18 +338,19 @@ def fetch_modis_ndvi(
                     })
         
         except Exception as e:
-            print(f"  Error processing location {idx}: {str(e)}")
+            log.error(f"Error processing location {idx}: {str(e)}")
             continue
     
     if all_data:
         df = pd.DataFrame(all_data)
         df['datetime'] = pd.to_datetime(df['datetime'])
-        print(f"[SUCCESS] Retrieved {len(df)} records")
+        log.info(f"Retrieved {len(df)} records")
         return df
     else:
         return pd.DataFrame()
 
 
+@progress.reporting
 def fetch_chirps_precipitation(
     locations: List[Tuple[float, float]],
     start_date: str,
@@ -284,7 +373,7 @@ def fetch_chirps_precipitation(
     # Initialize Earth Engine
     client = EarthEngineClient(credentials_dict=credentials_dict)
     
-    print(f"Fetching CHIRPS precipitation from {start_date} to {end_date}...")
+    log.info(f"Fetching CHIRPS precipitation from {start_date} to {end_date}...")
     
     # Get CHIRPS daily precipitation
     dataset = ee.ImageCollection('UCSB-CHG/CHIRPS/DAILY') \
@@ -294,7 +383,7 @@ def fetch_chirps_precipitation(
     all_data = []
     
     for idx, (lat, lon) in enumerate(locations):
-        print(f"  Processing location {idx + 1}/{len(locations)}: ({lat}, {lon})")
+        log.info(f"Processing location {idx + 1}/{len(locations)}: ({lat}, {lon})")
         
         point = ee.Geometry.Point([lon, lat])
         
@@ -317,7 +406,8 @@ def fetch_chirps_precipitation(
                 })
             
             features = dataset.map(extract_values)
-            feature_list = features.toList(10000).getInfo()
+            with tracing.span("server_compute", round_trips=1):
+                feature_list = features.toList(10000).getInfo()
             
             for feature in feature_list:
                 props = feature['properties']
@@ -331,33 +421,99 @@ def fetch_chirps_precipitation(
                     })
         
         except Exception as e:
-            print(f"  Error processing location {idx}: {str(e)}")
+            log.error(f"Error processing location {idx}: {str(e)}")
             continue
     
     if all_data:
         df = pd.DataFrame(all_data)
         df['datetime'] = pd.to_datetime(df['datetime'])
-        print(f"[SUCCESS] Retrieved {len(df)} records")
+        log.info(f"Retrieved {len(df)} records")
         return df
     else:
         return pd.DataFrame()
 
 
+def plan_era5_chunks(
+    n_locations: int,
+    n_days: int,
+    use_daily_aggregate: bool = False,
+    chunk_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> Dict:
+    """
+    Choose the ERA5 (chunk_days, batch_size) pair for a request.
+
+    One getInfo() returns batch_size * images_per_chunk features and the
+    fetch makes one round-trip per (point batch, date chunk). Any fixed
+    pair is only right for one request shape; a 30-day window wastes most
+    of the element budget on a single point and still costs 12 calls a
+    year. This searches every window length that fits the budget and keeps
+    the one with the fewest round-trips (ties go to the lighter call).
+
+    Args:
+        n_locations: number of points
+        n_days: days between start and end date (end exclusive)
+        use_daily_aggregate: DAILY_AGGR (1 image/day) vs HOURLY (24/day)
+        chunk_days: force a window length instead of searching
+        batch_size: force a (smaller) point batch
+
+    Returns:
+        Dict with chunk_days, batch_size, images_per_chunk, max_batch_size,
+        n_batches, n_chunks, round_trips and max_elements_per_call.
+    """
+    per_day = 1 if use_daily_aggregate else 24
+    budget = EE_GETINFO_MAX - EE_GETINFO_HEADROOM
+    n_locations = max(int(n_locations), 0)
+    n_days = max(int(n_days), 0)
+
+    if chunk_days:
+        candidates = [int(chunk_days)]
+    else:
+        longest = max(1, min(n_days, budget // per_day, ERA5_MAX_CHUNK_DAYS))
+        candidates = range(1, longest + 1)
+
+    best = None
+    for c in candidates:
+        images_per_chunk = c * per_day
+        max_batch_size = max(1, budget // max(images_per_chunk, 1))
+        batch = min(max(n_locations, 1), max_batch_size)
+        if batch_size:
+            batch = max(1, min(batch, int(batch_size)))
+        n_batches = -(-n_locations // batch) if n_locations else 0
+        n_chunks = -(-n_days // c) if n_days else 0
+        plan = {
+            "chunk_days": c,
+            "batch_size": batch,
+            "images_per_chunk": images_per_chunk,
+            "max_batch_size": max_batch_size,
+            "n_batches": n_batches,
+            "n_chunks": n_chunks,
+            "round_trips": n_batches * n_chunks,
+            "max_elements_per_call": batch * images_per_chunk,
+        }
+        key = (plan["round_trips"], plan["max_elements_per_call"])
+        if best is None or key < best[0]:
+            best = (key, plan)
+    return best[1]
+
+
+@progress.reporting
 def fetch_era5_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
     start_date: str,
     end_date: str,
     credentials_dict: Dict = None,
-    chunk_days: int = 30,
+    chunk_days: Optional[int] = None,
     use_daily_aggregate: bool = False,
+    batch_size: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Fetch ERA5-Land hourly data via Google Earth Engine.
 
     Key correctness properties:
-      * Date range is chunked (default 30 days = ~720 hourly images) so we
-        never silently truncate at GEE's element-list limits.
+      * Date range is chunked and points are batched (see plan_era5_chunks)
+        so we never silently truncate at GEE's element-list limits.
       * All requested bands are sampled in a single reduceRegion call per
         image, yielding one *wide* row per (timestamp, location_id) with one
         column per user-facing parameter — not one row per (timestamp, param).
@@ -367,7 +523,9 @@ def fetch_era5_data(
         parameters: user-facing ERA5 parameter codes
         start_date / end_date: 'YYYY-MM-DD'
         credentials_dict: EE service account credentials
-        chunk_days: window size in days per GEE request
+        chunk_days: window size in days per GEE request (None = auto)
+        use_daily_aggregate: sample DAILY_AGGR instead of HOURLY
+        batch_size: cap on points per GEE request (None = auto)
     """
 
     # Initialize Earth Engine
@@ -410,7 +568,7 @@ def fetch_era5_data(
         }
         ts_fmt = 'YYYY-MM-dd HH:mm'
 
-    print(f"Fetching ERA5-Land from {asset_id}  {start_date}..{end_date}  ({len(locations)} pts)")
+    log.info(f"Fetching ERA5-Land from {asset_id}  {start_date}..{end_date}  ({len(locations)} pts)")
 
     # 2m relative humidity is not an ERA5-Land band but can be derived from
     # temperature and dewpoint via the Magnus formula. Silently upgrade the
@@ -437,9 +595,9 @@ def fetch_era5_data(
             band_names.append(b)
             band_to_user_param[b] = p
     if skipped:
-        print(f"  [WARN] ERA5 params not available on this EE asset and skipped: {', '.join(skipped)}")
+        log.warning(f"ERA5 params not available on this EE asset and skipped: {', '.join(skipped)}")
     if not band_names:
-        print("[WARNING] No supported ERA5 bands selected; nothing to fetch.")
+        log.warning("No supported ERA5 bands selected; nothing to fetch.")
         return pd.DataFrame()
 
     collection = ee.ImageCollection(asset_id).select(band_names)
@@ -450,24 +608,23 @@ def fetch_era5_data(
         return pd.DataFrame()
 
     # Batch points to stay under Earth Engine's 5,000-elements-per-getInfo
-    # limit. Every reduceRegions call now samples ALL points in a batch
-    # in one round-trip. If a chunk's expected feature count (batch_size
-    # * images_per_chunk) would exceed the limit we shrink batch_size
-    # accordingly. Effective throughput: one HTTP round-trip per
-    # (batch, chunk) pair.
-    EE_GETINFO_MAX = 5000
-    # For DAILY_AGGR: images per chunk == chunk_days.
-    # For HOURLY: images per chunk == chunk_days * 24.
-    images_per_chunk = chunk_days * (1 if use_daily_aggregate else 24)
-    # Leave a small headroom so borderline cases don't hit the wall.
-    max_batch_size = max(1, (EE_GETINFO_MAX - 200) // max(images_per_chunk, 1))
-    batch_size = min(len(locations), max_batch_size)
-    if batch_size < len(locations):
-        print(
-            f"  [BATCHING] {len(locations)} points split into batches of "
-            f"{batch_size} (images/chunk={images_per_chunk}, "
-            f"batch*images={batch_size * images_per_chunk} < {EE_GETINFO_MAX})"
-        )
+    # limit. Every reduceRegions call samples ALL points in a batch in one
+    # round-trip, so the cost is one HTTP round-trip per (batch, chunk)
+    # pair; plan_era5_chunks picks the window length that minimises that.
+    plan = plan_era5_chunks(
+        len(locations), (end_dt - start_dt).days, use_daily_aggregate,
+        chunk_days=chunk_days, batch_size=batch_size,
+    )
+    chunk_days = plan["chunk_days"]
+    batch_size = plan["batch_size"]
+    progress.add_total(plan["round_trips"], "requests")
+    log.info(
+        f"[BATCHING] {len(locations)} points x {plan['n_chunks']} chunk(s) of "
+        f"{chunk_days} day(s): batches of {batch_size} "
+        f"(images/chunk={plan['images_per_chunk']}, "
+        f"{plan['max_elements_per_call']} <= {EE_GETINFO_MAX} elements/call, "
+        f"{plan['round_trips']} round-trip(s))"
+    )
 
     def _batch_fc(offset, batch_locs):
         feats = []
@@ -498,10 +655,11 @@ def fetch_era5_data(
         offset = batch_idx * batch_size
         batch = locations[offset:offset + batch_size]
         fc = _batch_fc(offset, batch)
+        batch_key = checkpoint.digest([band_names, offset, batch])
         sample_fn = _sample_image_factory(fc)
 
         if n_batches > 1:
-            print(f"  batch {batch_idx + 1}/{n_batches}  points {offset}..{offset + len(batch) - 1}")
+            log.info(f"batch {batch_idx + 1}/{n_batches}  points {offset}..{offset + len(batch) - 1}")
 
         cur = start_dt
         while cur < end_dt:
@@ -511,67 +669,73 @@ def fetch_era5_data(
             try:
                 filtered = collection.filterDate(cs, ce)
                 all_samples = filtered.map(sample_fn).flatten()
-                server_features = all_samples.getInfo().get('features', [])
-                print(f"    chunk {cs}..{ce}: {len(server_features):,} records")
+                server_features = checkpoint.fetch_chunk(
+                    f"era5/{asset_id}/{batch_key}/{cs}_{ce}",
+                    lambda: get_features(all_samples),
+                )
+                log.info(f"chunk {cs}..{ce}: {len(server_features):,} records")
             except Exception as e:
-                print(f"    [ERROR] chunk {cs}..{ce}: {e}")
+                log.error(f"chunk {cs}..{ce}: {e}")
                 cur = chunk_end
                 continue
 
-            for feat in server_features:
-                props = feat.get('properties') or {}
-                if not props:
-                    continue
-                record = {
-                    'datetime': props.get('datetime'),
-                    'latitude': props.get('lat'),
-                    'longitude': props.get('lon'),
-                    'location_id': int(props.get('location_id', -1)),
-                }
-                has_data = False
-                for band in band_names:
-                    v = props.get(band)
-                    out_col = band_to_user_param[band]
-                    if v is None:
-                        record[out_col] = None
-                        continue
-                    try:
-                        v = float(v)
-                    except (TypeError, ValueError):
-                        record[out_col] = None
+            with tracing.span("decode"):
+                for feat in server_features:
+                    props = feat.get('properties') or {}
+                    if not props:
                         continue
-                    # Unit conversions
-                    if 'temperature' in band:
-                        v = v - 273.15
-                    elif 'precipitation' in band:
-                        v = v * 1000
-                    elif 'pressure' in band:
-                        v = v / 100
-                    record[out_col] = round(v, 3)
-                    has_data = True
-                if has_data:
-                    all_records.append(record)
+                    record = {
+                        'datetime': props.get('datetime'),
+                        'latitude': props.get('lat'),
+                        'longitude': props.get('lon'),
+                        'location_id': int(props.get('location_id', -1)),
+                    }
+                    has_data = False
+                    for band in band_names:
+                        v = props.get(band)
+                        out_col = band_to_user_param[band]
+                        if v is None:
+                            record[out_col] = None
+                            continue
+                        try:
+                            v = float(v)
+                        except (TypeError, ValueError):
+                            record[out_col] = None
+                            continue
+                        # Unit conversions
+                        if 'temperature' in band:
+                            v = v - 273.15
+                        elif 'precipitation' in band:
+                            v = v * 1000
+                        elif 'pressure' in band:
+                            v = v / 100
+                        record[out_col] = round(v, 3)
+                        has_data = True
+                    if has_data:
+                        all_records.append(record)
 
             cur = chunk_end
 
     if not all_records:
-        print("[WARNING] No ERA5 data retrieved")
+        log.warning("No ERA5 data retrieved")
         return pd.DataFrame()
 
-    df = pd.DataFrame(all_records)
-    df['datetime'] = pd.to_datetime(df['datetime'])
-
-    # Derived: 2m relative humidity from Magnus-formula (Buck 1981), given
-    # T and Td already in degC after unit conversion above.
-    if need_rh and ('2m_temperature' in df.columns) and ('2m_dewpoint_temperature' in df.columns):
-        t_c = df['2m_temperature'].astype(float)
-        td_c = df['2m_dewpoint_temperature'].astype(float)
-        import numpy as np
-        e_s = 6.112 * np.exp((17.67 * t_c) / (t_c + 243.5))
-        e_a = 6.112 * np.exp((17.67 * td_c) / (td_c + 243.5))
-        rh = (100.0 * e_a / e_s).clip(0, 100)
-        df['2m_relative_humidity'] = rh.round(1)
-
-    df = df.sort_values(['location_id', 'datetime']).reset_index(drop=True)
-    print(f"[SUCCESS] ERA5: {len(df):,} rows across {len(locations)} location(s)")
+    with tracing.span("merge"):
+        df = pd.DataFrame(all_records)
+    with tracing.span("post_process"):
+        df['datetime'] = pd.to_datetime(df['datetime'])
+
+        # Derived: 2m relative humidity from Magnus-formula (Buck 1981), given
+        # T and Td already in degC after unit conversion above.
+        if need_rh and ('2m_temperature' in df.columns) and ('2m_dewpoint_temperature' in df.columns):
+            t_c = df['2m_temperature'].astype(float)
+            td_c = df['2m_dewpoint_temperature'].astype(float)
+            import numpy as np
+            e_s = 6.112 * np.exp((17.67 * t_c) / (t_c + 243.5))
+            e_a = 6.112 * np.exp((17.67 * td_c) / (td_c + 243.5))
+            rh = (100.0 * e_a / e_s).clip(0, 100)
+            df['2m_relative_humidity'] = rh.round(1)
+
+        df = df.sort_values(['location_id', 'datetime']).reset_index(drop=True)
+    log.info(f"ERA5: {len(df):,} rows across {len(locations)} location(s)")
     return df
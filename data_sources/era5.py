@@ -1,7 +1,12 @@
+import logging
 import pandas as pd
 from datetime import datetime
 from typing import List, Tuple, Dict
 
+from utils import progress
+
+log = logging.getLogger(__name__)
+
 # Available ERA5 parameters
 ERA5_PARAMETERS = {
     "Temperature": {
@@ -53,6 +58,7 @@ def get_temporal_resolutions() -> List[str]:
     return TEMPORAL_RESOLUTIONS
 
 
+@progress.reporting
 def fetch_era5_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -61,6 +67,8 @@ def fetch_era5_data(
     temporal_resolution: str,
     cds_api_key: str = None,
     credentials_dict: Dict = None,
+    chunk_days: int = None,
+    batch_size: int = None,
 ) -> pd.DataFrame:
     """
     Fetch ERA5-Land data via Google Earth Engine.
@@ -74,6 +82,8 @@ def fetch_era5_data(
         temporal_resolution: 'Hourly' or 'Daily'
         cds_api_key: Not used (kept for compatibility)
         credentials_dict: Earth Engine service account credentials
+        chunk_days: days per GEE request (None = pick automatically)
+        batch_size: points per GEE request (None = pick automatically)
     
     Returns:
         DataFrame with ERA5 hourly data
@@ -81,10 +91,7 @@ def fetch_era5_data(
     
     from .earth_engine_utils import fetch_era5_data as fetch_era5_ee
     
-    print("=" * 70)
-    print("ERA5-Land via Google Earth Engine")
-    print("(No CDS API token needed!)")
-    print("=" * 70)
+    log.info("ERA5-Land via Google Earth Engine (no CDS API token needed)")
     
     if not credentials_dict:
         raise ValueError("Earth Engine credentials required. Please provide service account credentials.")
@@ -102,13 +109,15 @@ def fetch_era5_data(
             start_date=start_date,
             end_date=end_date,
             credentials_dict=credentials_dict,
+            chunk_days=chunk_days,
             use_daily_aggregate=use_daily_aggregate,
+            batch_size=batch_size,
         )
 
         # DAILY_AGGR already delivers per-day rows; only aggregate here if
         # the user asked for Monthly on the hourly collection.
         if temporal_resolution == "Monthly" and not df.empty and 'datetime' in df.columns:
-            print("Aggregating to monthly...")
+            log.info("Aggregating to monthly...")
             df['month'] = df['datetime'].dt.to_period('M').dt.to_timestamp()
             numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns
             numeric_cols = [c for c in numeric_cols
@@ -120,11 +129,11 @@ def fetch_era5_data(
             df['datetime'] = pd.to_datetime(df['datetime'])
 
         if not df.empty:
-            print(f"\n[SUCCESS] ERA5 fetch complete: {len(df):,} records")
+            log.info(f"ERA5 fetch complete: {len(df):,} records")
             return df
-        print("\n[WARNING] No data retrieved")
+        log.warning("No data retrieved")
         return pd.DataFrame()
 
     except Exception as e:
-        print(f"\n[ERROR] Error fetching ERA5 data: {str(e)}")
+        log.error(f"Error fetching ERA5 data: {str(e)}")
         raise
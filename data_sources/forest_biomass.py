@@ -22,6 +22,8 @@ import geopandas as gpd
 import pandas as pd
 from shapely.geometry import mapping
 
+from utils import progress, tracing
+
 from .earth_engine_utils import EarthEngineClient
 from .lulc import _to_2d_geometry, best_polygon_name
 
@@ -109,6 +111,7 @@ def _load_image(info: Dict) -> ee.Image:
     return coll.mosaic()
 
 
+@progress.reporting
 def fetch_biomass_stats_from_gdf(
     aoi_gdf: gpd.GeoDataFrame,
     dataset_name: str,
@@ -179,7 +182,8 @@ def fetch_biomass_stats_from_gdf(
             scale=scale,
             tileScale=4,
         )
-        server_feats = reduced.getInfo().get("features", [])
+        with tracing.span("server_compute", round_trips=1):
+            server_feats = reduced.getInfo().get("features", [])
     except Exception as e:
         raise RuntimeError(
             f"Earth Engine biomass reduction failed: {e}. Try a smaller AOI "
@@ -39,6 +39,8 @@ import geopandas as gpd
 import pandas as pd
 from shapely.geometry import mapping
 
+from utils import progress, tracing
+
 from .earth_engine_utils import EarthEngineClient
 # Reuse the helpers already tested against KML / Shapefile input in lulc.py.
 from .lulc import _to_2d_geometry, best_polygon_name
@@ -75,6 +77,7 @@ def get_dataset_info(dataset_name: str) -> Dict:
 # Public fetch entry point
 # ---------------------------------------------------------------------------
 
+@progress.reporting
 def fetch_gsw_stats_from_gdf(
     aoi_gdf: gpd.GeoDataFrame,
     dataset_name: str,
@@ -173,7 +176,8 @@ def fetch_gsw_stats_from_gdf(
         tileScale=4,
     )
     try:
-        server_features = reduced.getInfo().get("features", [])
+        with tracing.span("server_compute", round_trips=1):
+            server_features = reduced.getInfo().get("features", [])
     except Exception as e:
         raise RuntimeError(
             f"Earth Engine could not compute GSW stats: {e}. "
@@ -34,6 +34,7 @@ and export path works without additional branching.
 
 from __future__ import annotations
 
+import logging
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 
@@ -42,9 +43,13 @@ import geopandas as gpd
 import pandas as pd
 from shapely.geometry import mapping
 
+from utils import progress, tracing
+
 from .earth_engine_utils import EarthEngineClient
 from .lulc import _to_2d_geometry, best_polygon_name
 
+log = logging.getLogger(__name__)
+
 
 # ---------------------------------------------------------------------------
 # Parameter registry
@@ -165,7 +170,8 @@ def _compute_burned_area_frame(
         tileScale=4,
     )
     try:
-        total_feats = total_reduced.getInfo().get("features", [])
+        with tracing.span("server_compute", round_trips=1):
+            total_feats = total_reduced.getInfo().get("features", [])
     except Exception as e:
         raise RuntimeError(f"Earth Engine total-area query failed: {e}") from e
 
@@ -181,20 +187,21 @@ def _compute_burned_area_frame(
     coll = ee.ImageCollection("MODIS/061/MCD64A1").select("BurnDate")
 
     rows: List[Dict] = []
-    print(
+    log.info(
         f"[BurnedArea] {len(meta_by_id)} polygon(s)  "
         f"{start_dt.date()}..{end_dt.date()}  MCD64A1 @ {scale_m} m"
     )
 
-    for cur in _monthly_iter(start_dt, end_dt):
+    for cur in progress.iterate(_monthly_iter(start_dt, end_dt), "months"):
         m_start = ee.Date.fromYMD(cur.year, cur.month, 1)
         m_end = m_start.advance(1, "month")
         month_coll = coll.filterDate(m_start, m_end)
 
         try:
-            n_imgs = month_coll.size().getInfo()
+            with tracing.span("server_compute", round_trips=1):
+                n_imgs = month_coll.size().getInfo()
         except Exception as e:
-            print(f"[WARN] MCD64A1 {cur.year}-{cur.month:02d} size: {e}")
+            log.warning(f"MCD64A1 {cur.year}-{cur.month:02d} size: {e}")
             n_imgs = 0
 
         server_feats: List = []
@@ -208,9 +215,10 @@ def _compute_burned_area_frame(
                     scale=scale_m,
                     tileScale=4,
                 )
-                server_feats = reduced.getInfo().get("features", [])
+                with tracing.span("server_compute", round_trips=1):
+                    server_feats = reduced.getInfo().get("features", [])
             except Exception as e:
-                print(f"[WARN] MCD64A1 {cur.year}-{cur.month:02d} reduce: {e}")
+                log.warning(f"MCD64A1 {cur.year}-{cur.month:02d} reduce: {e}")
 
         got_ids = set()
         for feat in server_feats:
@@ -264,20 +272,21 @@ def _compute_firms_frame(
     coll = ee.ImageCollection("FIRMS").select(["T21", "confidence"])
 
     rows: List[Dict] = []
-    print(
+    log.info(
         f"[FIRMS] {len(meta_by_id)} polygon(s)  "
         f"{start_dt.date()}..{end_dt.date()}  FIRMS @ {scale_m} m"
     )
 
-    for cur in _monthly_iter(start_dt, end_dt):
+    for cur in progress.iterate(_monthly_iter(start_dt, end_dt), "months"):
         m_start = ee.Date.fromYMD(cur.year, cur.month, 1)
         m_end = m_start.advance(1, "month")
         m_coll = coll.filterDate(m_start, m_end)
 
         try:
-            n_imgs = m_coll.size().getInfo()
+            with tracing.span("server_compute", round_trips=1):
+                n_imgs = m_coll.size().getInfo()
         except Exception as e:
-            print(f"[WARN] FIRMS {cur.year}-{cur.month:02d} size: {e}")
+            log.warning(f"FIRMS {cur.year}-{cur.month:02d} size: {e}")
             n_imgs = 0
 
         server_feats: List = []
@@ -303,9 +312,10 @@ def _compute_firms_frame(
                     scale=scale_m,
                     tileScale=4,
                 )
-                server_feats = reduced.getInfo().get("features", [])
+                with tracing.span("server_compute", round_trips=1):
+                    server_feats = reduced.getInfo().get("features", [])
             except Exception as e:
-                print(f"[WARN] FIRMS {cur.year}-{cur.month:02d} reduce: {e}")
+                log.warning(f"FIRMS {cur.year}-{cur.month:02d} reduce: {e}")
 
         got_ids = set()
         for feat in server_feats:
@@ -388,7 +398,8 @@ def _compute_hansen_frame(
             scale=scale_m,
             tileScale=4,
         )
-        baseline_feats = baseline_reduced.getInfo().get("features", [])
+        with tracing.span("server_compute", round_trips=1):
+            baseline_feats = baseline_reduced.getInfo().get("features", [])
     except Exception as e:
         raise RuntimeError(f"Earth Engine Hansen baseline query failed: {e}") from e
 
@@ -425,7 +436,8 @@ def _compute_hansen_frame(
             scale=scale_m,
             tileScale=4,
         )
-        loss_feats = loss_reduced.getInfo().get("features", [])
+        with tracing.span("server_compute", round_trips=1):
+            loss_feats = loss_reduced.getInfo().get("features", [])
     except Exception as e:
         raise RuntimeError(f"Earth Engine Hansen loss query failed: {e}") from e
 
@@ -441,7 +453,7 @@ def _compute_hansen_frame(
                 props.get(f"loss_{y}_m2") or 0.0
             )
 
-    print(
+    log.info(
         f"[Hansen] {len(meta_by_id)} polygon(s)  loss years "
         f"{y_from}-{y_to}  @ {scale_m} m"
     )
@@ -471,6 +483,7 @@ def _compute_hansen_frame(
     return pd.DataFrame(rows)
 
 
+@progress.reporting
 def fetch_burned_area_from_gdf(
     aoi_gdf: gpd.GeoDataFrame,
     parameters: List[str],
@@ -557,8 +570,8 @@ def fetch_burned_area_from_gdf(
     combined = combined[keep_cols].sort_values(
         ["location_id", "date"]
     ).reset_index(drop=True)
-    print(
-        f"[SUCCESS] Fire: {len(combined)} rows across "
+    log.info(
+        f"Fire: {len(combined)} rows across "
         f"{len(meta_by_id)} polygon(s), params={parameters}."
     )
     return combined
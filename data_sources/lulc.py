@@ -17,15 +17,20 @@ service account. ESRI is hosted as a community asset under sat-io.
 from __future__ import annotations
 
 import math
+from concurrent.futures import as_completed
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
 import ee
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-from shapely.geometry import mapping
+from shapely.geometry import MultiPolygon, mapping
 from shapely.ops import transform as shapely_transform
 
+from utils import progress, tracing
+from utils.progress import FetchCancelled
+
 
 def _to_2d_geometry(geom):
     """Drop any Z (altitude) coordinate from a shapely geometry. KMLs
@@ -62,7 +67,12 @@ def best_polygon_name(row, idx) -> str:
                 return s
     return f"polygon_{idx}"
 
-from .earth_engine_utils import EarthEngineClient
+from .earth_engine_utils import (
+    EE_GETINFO_HEADROOM,
+    EE_GETINFO_MAX,
+    EarthEngineClient,
+    submit_ee,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -371,6 +381,56 @@ def _composition_from_histogram(
 # Public fetch entry points
 # ---------------------------------------------------------------------------
 
+def _check_years(info: Dict, dataset_name: str, years) -> None:
+    for y in years:
+        if y not in info["years_available"]:
+            raise ValueError(
+                f"Year {y} not available for {dataset_name}. "
+                f"Available: {info['years_available']}"
+            )
+
+
+def _band_histogram(props: Dict, band: str, n_bands: int) -> Dict:
+    """A band's frequency histogram from a reduceRegions feature. A
+    single-output reducer names its property after the output for a
+    one-band image and after each band for a multi-band image."""
+    if n_bands == 1:
+        return props.get("histogram") or props.get(band) or {}
+    return props.get(band) or props.get(f"{band}_histogram") or {}
+
+
+def _composition_rows(meta: Dict, hist: Dict, dataset_name: str, year: int,
+                      info: Dict, scale_m: float) -> List[Dict]:
+    """Composition rows for one polygon and year (a single "No data" row
+    when no pixel intersected)."""
+    base = {
+        "polygon_id": meta["polygon_id"],
+        "polygon_name": meta["polygon_name"],
+        "dataset": dataset_name,
+        "year": year,
+    }
+    attrs = {f"attr_{k}": v for k, v in meta["attrs"].items()}
+    comp = _composition_from_histogram(
+        hist, info["classes"], info["nodata_classes"], scale_m
+    )
+    if not comp:
+        # No pixels intersected (off-globe, all masked). Record a zero row
+        # so the polygon still appears in output.
+        return [{
+            **base,
+            "class_code": None,
+            "class_name": "No data",
+            "pixel_count": 0,
+            "area_km2": 0.0,
+            "percent": None,
+            "is_nodata": True,
+            "attribution": info["attribution"],
+            **attrs,
+        }]
+    return [{**base, **r, "attribution": info["attribution"], **attrs} for r in comp]
+
+
+@progress.reporting
 def fetch_lulc_composition_from_gdf(
     gdf: gpd.GeoDataFrame,
     dataset_name: str,
@@ -386,91 +446,153 @@ def fetch_lulc_composition_from_gdf(
         pixel_count, area_km2, percent, is_nodata, attribution
     plus any original feature-attribute columns prefixed with `attr_`.
     """
+    return fetch_lulc_composition_years_from_gdf(
+        gdf, dataset_name, [year], credentials_dict,
+        name_col=name_col, scale_override=scale_override,
+    )
+
+
+@progress.reporting
+def fetch_lulc_composition_years_from_gdf(
+    gdf: gpd.GeoDataFrame,
+    dataset_name: str,
+    years: List[int],
+    credentials_dict: Dict,
+    name_col: Optional[str] = None,
+    scale_override: Optional[int] = None,
+) -> pd.DataFrame:
+    """Compute LULC class composition for every polygon in `gdf` and every
+    year in `years`, in a single Earth Engine round-trip.
+
+    The annual images are stacked as bands (`y<year>`) of one image, and
+    one batched reduceRegions computes every band's frequency histogram
+    for every polygon, so N years cost one call rather than N.
+
+    Returns the same long-form columns as fetch_lulc_composition_from_gdf,
+    one row per (polygon, year, class), sorted by polygon, year and class.
+    """
+    years = sorted({int(y) for y in years})
+    if not years:
+        raise ValueError("At least one year is required.")
+
     # Initialize EE (idempotent — earth_engine_utils handles re-init guard).
     client = EarthEngineClient(credentials_dict=credentials_dict)
     if not client.initialized:
         raise RuntimeError("Earth Engine initialization failed")
 
     info = get_dataset_info(dataset_name)
-    if year not in info["years_available"]:
-        raise ValueError(
-            f"Year {year} not available for {dataset_name}. "
-            f"Available: {info['years_available']}"
-        )
+    _check_years(info, dataset_name, years)
     scale_m = scale_override or info["scale"]
 
     fc, polygon_meta = _gdf_to_feature_collection(gdf, name_col=name_col)
-    img = _build_lulc_image(dataset_name, year)
+    bands = [f"y{y}" for y in years]
+    img = ee.Image.cat([
+        _build_lulc_image(dataset_name, y).rename(band) for y, band in zip(years, bands)
+    ])
 
-    # Batched per-polygon frequency histogram. `bestEffort=True` lets GEE
-    # auto-coarsen the analysis scale for very large polygons rather than
-    # erroring with "User memory limit exceeded".
+    # Batched per-polygon, per-band frequency histogram.
     reduced = img.reduceRegions(
         collection=fc,
-        reducer=ee.Reducer.frequencyHistogram().setOutputs(["histogram"]),
+        reducer=ee.Reducer.frequencyHistogram(),
         scale=scale_m,
     )
 
     # Pull results in one round-trip.
-    server_features = reduced.getInfo().get("features", [])
+    with tracing.span("server_compute", round_trips=1):
+        server_features = reduced.getInfo().get("features", [])
 
     # Index histograms by polygon_id.
-    histos: Dict[int, Dict] = {}
+    props_by_pid: Dict[int, Dict] = {}
     for feat in server_features:
         props = feat.get("properties", {}) or {}
         pid = props.get("polygon_id")
-        hist = props.get("histogram") or {}
         if pid is not None:
-            histos[int(pid)] = hist
-
-    classes = info["classes"]
-    nodata = info["nodata_classes"]
-    attribution = info["attribution"]
+            props_by_pid[int(pid)] = props
 
     rows: List[Dict] = []
-    for meta in polygon_meta:
-        pid = meta["polygon_id"]
-        comp = _composition_from_histogram(
-            histos.get(pid, {}), classes, nodata, scale_m
-        )
-        if not comp:
-            # No pixels intersected (off-globe, all masked). Record a zero row
-            # so the polygon still appears in output.
-            rows.append({
-                "polygon_id": pid,
-                "polygon_name": meta["polygon_name"],
-                "dataset": dataset_name,
-                "year": year,
-                "class_code": None,
-                "class_name": "No data",
-                "pixel_count": 0,
-                "area_km2": 0.0,
-                "percent": None,
-                "is_nodata": True,
-                "attribution": attribution,
-                **{f"attr_{k}": v for k, v in meta["attrs"].items()},
-            })
-            continue
-        for r in comp:
-            rows.append({
-                "polygon_id": pid,
-                "polygon_name": meta["polygon_name"],
-                "dataset": dataset_name,
-                "year": year,
-                **r,
-                "attribution": attribution,
-                **{f"attr_{k}": v for k, v in meta["attrs"].items()},
-            })
+    with tracing.span("decode"):
+        for meta in polygon_meta:
+            props = props_by_pid.get(meta["polygon_id"], {})
+            for y, band in zip(years, bands):
+                hist = _band_histogram(props, band, len(bands))
+                rows.extend(_composition_rows(meta, hist, dataset_name, y, info, scale_m))
 
     df = pd.DataFrame(rows)
-    # Stable sort: by polygon then by class.
+    # Stable sort: by polygon, then year, then class.
     if not df.empty:
         df = df.sort_values(
-            ["polygon_id", "class_code"], na_position="last"
+            ["polygon_id", "year", "class_code"], na_position="last"
         ).reset_index(drop=True)
     return df
 
 
+def _change_rows(meta: Dict, hist: Dict, dataset_name: str, year_from: int,
+                 year_to: int, info: Dict, scale_m: float,
+                 drop_unchanged: bool) -> List[Dict]:
+    """Transition rows for one polygon from its `from*1000 + to` histogram
+    (a single "No data" row when no observed pixel intersected)."""
+    nodata = set(info["nodata_classes"])
+    classes = info["classes"]
+    base = {
+        "polygon_id": meta["polygon_id"],
+        "polygon_name": meta["polygon_name"],
+        "dataset": dataset_name,
+        "year_from": year_from,
+        "year_to": year_to,
+    }
+    attrs = {f"attr_{k}": v for k, v in meta["attrs"].items()}
+
+    # Observed transitions only: any (from, to) where either class is in
+    # the dataset's nodata set is left out of the total and the rows.
+    counts: Dict[Tuple[int, int], int] = {}
+    for code_str, cnt in hist.items():
+        try:
+            code = int(code_str)
+            pixel_count = int(cnt)
+        except (TypeError, ValueError):
+            continue
+        f_code, t_code = code // 1000, code % 1000
+        if f_code in nodata or t_code in nodata:
+            continue
+        counts[(f_code, t_code)] = pixel_count
+    observed_total = sum(counts.values())
+
+    if observed_total == 0:
+        return [{
+            **base,
+            "from_code": None,
+            "from_class": "No data",
+            "to_code": None,
+            "to_class": "No data",
+            "area_km2": 0.0,
+            "percent": None,
+            "is_unchanged": False,
+            "attribution": info["attribution"],
+            **attrs,
+        }]
+
+    pixel_area_km2 = (scale_m / 1000.0) ** 2
+    rows: List[Dict] = []
+    for (f_code, t_code), pixel_count in counts.items():
+        unchanged = (f_code == t_code)
+        if drop_unchanged and unchanged:
+            continue
+        rows.append({
+            **base,
+            "from_code": f_code,
+            "from_class": classes.get(f_code, f"Unknown ({f_code})"),
+            "to_code": t_code,
+            "to_class": classes.get(t_code, f"Unknown ({t_code})"),
+            "area_km2": round(pixel_count * pixel_area_km2, 4),
+            "percent": round(pixel_count / observed_total * 100, 3),
+            "is_unchanged": unchanged,
+            "attribution": info["attribution"],
+            **attrs,
+        })
+    return rows
+
+
+@progress.reporting
 def fetch_lulc_change_from_gdf(
     gdf: gpd.GeoDataFrame,
     dataset_name: str,
@@ -489,9 +611,44 @@ def fetch_lulc_change_from_gdf(
         from_code, from_class, to_code, to_class, area_km2, percent
     plus original feature attributes prefixed with `attr_`.
 
-    The transition code is encoded server-side as `from*1000 + to` to keep
-    a single 32-bit channel for frequencyHistogram. Both years must be in
-    the dataset's `years_available` list.
+    See fetch_lulc_change_and_composition_from_gdf, which this wraps, for
+    the encoding of transitions.
+    """
+    change_df, _ = fetch_lulc_change_and_composition_from_gdf(
+        gdf, dataset_name, year_from, year_to, credentials_dict,
+        name_col=name_col, scale_override=scale_override,
+        drop_unchanged=drop_unchanged,
+    )
+    return change_df
+
+
+@progress.reporting
+def fetch_lulc_change_and_composition_from_gdf(
+    gdf: gpd.GeoDataFrame,
+    dataset_name: str,
+    year_from: int,
+    year_to: int,
+    credentials_dict: Dict,
+    name_col: Optional[str] = None,
+    scale_override: Optional[int] = None,
+    drop_unchanged: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Transition matrix between `year_from` and `year_to` and the class
+    composition of both years, for every polygon, in a single Earth Engine
+    round-trip.
+
+    The from-year class, the to-year class and the transition are stacked
+    as three bands of one image (`y<year_from>`, `y<year_to>`,
+    `transition`) and one batched reduceRegions computes each band's
+    frequency histogram. The transition code is encoded server-side as
+    `from*1000 + to` to keep a single 32-bit channel for
+    frequencyHistogram. Both years must be in the dataset's
+    `years_available` list.
+
+    Returns:
+        (change_df, composition_df): the long-form change DataFrame of
+        fetch_lulc_change_from_gdf and the long-form composition DataFrame
+        of fetch_lulc_composition_years_from_gdf for the two years
     """
     if year_from == year_to:
         raise ValueError("year_from and year_to must differ for change analysis.")
@@ -501,16 +658,8 @@ def fetch_lulc_change_from_gdf(
         raise RuntimeError("Earth Engine initialization failed")
 
     info = get_dataset_info(dataset_name)
-    years_ok = set(info["years_available"])
-    for y in (year_from, year_to):
-        if y not in years_ok:
-            raise ValueError(
-                f"Year {y} not available for {dataset_name}. "
-                f"Available: {sorted(years_ok)}"
-            )
+    _check_years(info, dataset_name, (year_from, year_to))
     scale_m = scale_override or info["scale"]
-    classes = info["classes"]
-    nodata = set(info["nodata_classes"])
 
     fc, polygon_meta = _gdf_to_feature_collection(gdf, name_col=name_col)
     img_a = _build_lulc_image(dataset_name, year_from).toInt()
@@ -518,103 +667,52 @@ def fetch_lulc_change_from_gdf(
     # Encode transition. Multiplier chosen so the largest valid class code
     # (100 for WorldCover "Moss and lichen") fits without overflow.
     transition = img_a.multiply(1000).add(img_b).rename("transition")
+    years = (year_from, year_to)
+    bands = [f"y{year_from}", f"y{year_to}", "transition"]
+    img = ee.Image.cat([img_a.rename(bands[0]), img_b.rename(bands[1]), transition])
 
-    reduced = transition.reduceRegions(
+    reduced = img.reduceRegions(
         collection=fc,
-        reducer=ee.Reducer.frequencyHistogram().setOutputs(["histogram"]),
+        reducer=ee.Reducer.frequencyHistogram(),
         scale=scale_m,
     )
-    server_features = reduced.getInfo().get("features", [])
+    with tracing.span("server_compute", round_trips=1):
+        server_features = reduced.getInfo().get("features", [])
 
-    histos: Dict[int, Dict] = {}
+    props_by_pid: Dict[int, Dict] = {}
     for feat in server_features:
         props = feat.get("properties") or {}
         pid = props.get("polygon_id")
-        h = props.get("histogram") or {}
         if pid is not None:
-            histos[int(pid)] = h
-
-    pixel_area_km2 = (scale_m / 1000.0) ** 2
-    attribution = info["attribution"]
-
-    rows: List[Dict] = []
-    for meta in polygon_meta:
-        pid = meta["polygon_id"]
-        hist = histos.get(pid) or {}
-        # Sum over observed pixels (excluding any (from, to) where either
-        # class is in the dataset's nodata set).
-        observed_total = 0
-        for code_str, cnt in hist.items():
-            try:
-                code = int(code_str)
-            except (TypeError, ValueError):
-                continue
-            f_code = code // 1000
-            t_code = code % 1000
-            if f_code in nodata or t_code in nodata:
-                continue
-            observed_total += int(cnt)
-
-        if observed_total == 0:
-            rows.append({
-                "polygon_id": pid,
-                "polygon_name": meta["polygon_name"],
-                "dataset": dataset_name,
-                "year_from": year_from,
-                "year_to": year_to,
-                "from_code": None,
-                "from_class": "No data",
-                "to_code": None,
-                "to_class": "No data",
-                "area_km2": 0.0,
-                "percent": None,
-                "is_unchanged": False,
-                "attribution": attribution,
-                **{f"attr_{k}": v for k, v in meta["attrs"].items()},
-            })
-            continue
-
-        for code_str, cnt in hist.items():
-            try:
-                code = int(code_str)
-                pixel_count = int(cnt)
-            except (TypeError, ValueError):
-                continue
-            f_code = code // 1000
-            t_code = code % 1000
-            if f_code in nodata or t_code in nodata:
-                continue
-            f_name = classes.get(f_code, f"Unknown ({f_code})")
-            t_name = classes.get(t_code, f"Unknown ({t_code})")
-            unchanged = (f_code == t_code)
-            if drop_unchanged and unchanged:
-                continue
-            area_km2 = round(pixel_count * pixel_area_km2, 4)
-            percent = round(pixel_count / observed_total * 100, 3)
-            rows.append({
-                "polygon_id": pid,
-                "polygon_name": meta["polygon_name"],
-                "dataset": dataset_name,
-                "year_from": year_from,
-                "year_to": year_to,
-                "from_code": f_code,
-                "from_class": f_name,
-                "to_code": t_code,
-                "to_class": t_name,
-                "area_km2": area_km2,
-                "percent": percent,
-                "is_unchanged": unchanged,
-                "attribution": attribution,
-                **{f"attr_{k}": v for k, v in meta["attrs"].items()},
-            })
-
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values(
+            props_by_pid[int(pid)] = props
+
+    change_rows: List[Dict] = []
+    comp_rows: List[Dict] = []
+    with tracing.span("decode"):
+        for meta in polygon_meta:
+            props = props_by_pid.get(meta["polygon_id"], {})
+            change_rows.extend(_change_rows(
+                meta, _band_histogram(props, "transition", len(bands)),
+                dataset_name, year_from, year_to, info, scale_m, drop_unchanged,
+            ))
+            for y, band in zip(years, bands):
+                comp_rows.extend(_composition_rows(
+                    meta, _band_histogram(props, band, len(bands)),
+                    dataset_name, y, info, scale_m,
+                ))
+
+    change_df = pd.DataFrame(change_rows)
+    if not change_df.empty:
+        change_df = change_df.sort_values(
             ["polygon_id", "area_km2"],
             ascending=[True, False],
         ).reset_index(drop=True)
-    return df
+    comp_df = pd.DataFrame(comp_rows)
+    if not comp_df.empty:
+        comp_df = comp_df.sort_values(
+            ["polygon_id", "year", "class_code"], na_position="last"
+        ).reset_index(drop=True)
+    return change_df, comp_df
 
 
 def build_polygon_geodataframe(
@@ -631,7 +729,9 @@ def build_polygon_geodataframe(
         polygon_name, dataset, year, dominant_class, dominant_pct,
         class_richness, plus pct_<class_name> and area_<class_name>
         columns for each class observed in the dataset.
-    Original geometry is preserved.
+    For a multi-year composition the class columns are per year
+    (pct_<class_name>_<year>) and the other attributes describe the
+    latest year. Original geometry is preserved.
     """
     if composition_df.empty or aoi_gdf.empty:
         return gpd.GeoDataFrame(columns=["geometry"], crs="EPSG:4326")
@@ -639,45 +739,56 @@ def build_polygon_geodataframe(
     # Drop nodata rows; they shouldn't drive dominant-class or percent fields.
     comp = composition_df[~composition_df["is_nodata"]].copy()
 
+    # Multi-year results: dominant class / richness describe the latest
+    # year; the percent and area columns are per year (pct_<class>_<year>).
+    years = sorted(comp["year"].dropna().unique())
+    multi_year = len(years) > 1
+    latest = comp[comp["year"] == years[-1]] if multi_year else comp
+
     # Find the dominant class per polygon.
-    idx_max = comp.groupby("polygon_id")["percent"].idxmax()
-    dominant = comp.loc[idx_max, ["polygon_id", "class_name", "percent"]].rename(
+    idx_max = latest.groupby("polygon_id")["percent"].idxmax()
+    dominant = latest.loc[idx_max, ["polygon_id", "class_name", "percent"]].rename(
         columns={"class_name": "dominant_class", "percent": "dominant_pct"}
     )
 
     # Class richness = number of distinct non-zero classes per polygon.
     richness = (
-        comp[comp["pixel_count"] > 0]
+        latest[latest["pixel_count"] > 0]
         .groupby("polygon_id")["class_name"]
         .nunique()
         .rename("class_richness")
         .reset_index()
     )
 
+    columns = ["class_name", "year"] if multi_year else "class_name"
+
+    def _suffix(c):
+        return f"{c[0]}_{c[1]}" if multi_year else c
+
     # Wide percent matrix.
     pct_wide = comp.pivot_table(
         index=["polygon_id"],
-        columns="class_name",
+        columns=columns,
         values="percent",
         aggfunc="sum",
         fill_value=0,
     )
-    pct_wide.columns = [f"pct_{c}" for c in pct_wide.columns]
+    pct_wide.columns = [f"pct_{_suffix(c)}" for c in pct_wide.columns]
 
     # Wide area matrix.
     area_wide = comp.pivot_table(
         index=["polygon_id"],
-        columns="class_name",
+        columns=columns,
         values="area_km2",
         aggfunc="sum",
         fill_value=0,
     )
-    area_wide.columns = [f"area_{c}" for c in area_wide.columns]
+    area_wide.columns = [f"area_{_suffix(c)}" for c in area_wide.columns]
 
-    # Pull dataset/year (the same for every row in a single fetch).
-    meta_cols = comp[["polygon_id", "polygon_name", "dataset", "year"]].drop_duplicates(
-        subset=["polygon_id"]
-    )
+    # Pull dataset/year (the latest observed year for a multi-year fetch).
+    meta_cols = comp.sort_values("year", ascending=False)[
+        ["polygon_id", "polygon_name", "dataset", "year"]
+    ].drop_duplicates(subset=["polygon_id"])
 
     attrs = (
         meta_cols
@@ -704,36 +815,140 @@ def build_polygon_geodataframe(
     return gpd.GeoDataFrame(merged, geometry="geometry", crs="EPSG:4326")
 
 
-def build_lulc_vector_polygons_gdf(
+# Attribute schema of vectorized land-cover patches, in column order.
+VECTOR_PATCH_FIELDS = {
+    "parent_id": "int",
+    "parent": "str",
+    "dataset": "str",
+    "year": "int",
+    "class_code": "int",
+    "class_name": "str",
+    "color": "str",
+    "attribution": "str",
+    "area_km2": "float",
+}
+
+# OGR drivers write_lulc_vector_file can stream into -> file extension.
+VECTOR_DRIVERS = {
+    "FlatGeobuf": ".fgb",
+    "GPKG": ".gpkg",
+    "GeoJSON": ".geojson",
+}
+
+
+# Large AOIs are vectorized as a grid of tiles of about this many pixels
+# on a side, requested concurrently on the EE pool; each tile's patches
+# come back in pages of at most VECTOR_PAGE_SIZE (under getInfo's
+# 5,000-element limit) until the tile is exhausted.
+VECTOR_TILE_PIXELS = 4096
+VECTOR_PAGE_SIZE = EE_GETINFO_MAX - EE_GETINFO_HEADROOM
+
+
+def _vector_tiles(geom, scale_m: float) -> List:
+    """Split an AOI into grid tiles of VECTOR_TILE_PIXELS pixels per side
+    (clipped to the AOI), or return [geom] when it fits in one tile."""
+    from shapely.geometry import box
+
+    tile_deg = VECTOR_TILE_PIXELS * scale_m / 111_320.0
+    minx, miny, maxx, maxy = geom.bounds
+    nx = max(1, math.ceil((maxx - minx) / tile_deg))
+    ny = max(1, math.ceil((maxy - miny) / tile_deg))
+    if nx == 1 and ny == 1:
+        return [geom]
+    tiles = []
+    for i in range(nx):
+        for j in range(ny):
+            cell = box(minx + i * tile_deg, miny + j * tile_deg,
+                       minx + (i + 1) * tile_deg, miny + (j + 1) * tile_deg)
+            part = geom.intersection(cell)
+            if not part.is_empty and part.area > 0:
+                tiles.append(part)
+    return tiles
+
+
+def _vectorize_tile(base_img: ee.Image, tile, scale_m: float,
+                    max_polygons: Optional[int]) -> Tuple[List[Dict], bool]:
+    """Vectorize one tile, paging through the result. Returns (features,
+    truncated); truncated only when `max_polygons` stopped the paging."""
+    ee_geom = ee.Geometry(mapping(tile))
+    vectors = base_img.clip(ee_geom).reduceToVectors(
+        reducer=ee.Reducer.countEvery(),
+        geometry=ee_geom,
+        scale=scale_m,
+        geometryType="polygon",
+        eightConnected=False,
+        labelProperty="class",
+        maxPixels=1e10,
+        bestEffort=True,
+    )
+    features: List[Dict] = []
+    while True:
+        progress.check_cancelled()
+        page_size = VECTOR_PAGE_SIZE
+        if max_polygons is not None:
+            # One over the cap so hitting it exactly is not "truncated".
+            page_size = min(page_size, max_polygons + 1 - len(features))
+        with tracing.span("server_compute", round_trips=1):
+            page = vectors.toList(page_size, len(features)).getInfo()
+        features.extend(page)
+        if max_polygons is not None and len(features) > max_polygons:
+            return features[:max_polygons], True
+        if len(page) < page_size:
+            return features, False
+
+
+def _dissolve_seams(codes: List[int], geoms: List, grid_size: float) -> Tuple[List[int], List]:
+    """Merge same-class patches that a tile seam cut in two.
+
+    Coordinates are snapped to `grid_size` (a small fraction of a pixel)
+    so the two halves share their seam edge exactly; the union per class
+    then joins edge-sharing pieces. Patches meeting only at a corner stay
+    separate parts, as with the 4-connected vectorization itself.
+    """
+    import shapely
+
+    if not geoms:
+        return [], []
+    snapped = shapely.set_precision(np.asarray(geoms, dtype=object), grid_size)
+    codes_arr = np.asarray(codes)
+    out_codes: List[int] = []
+    out_geoms: List = []
+    for code in np.unique(codes_arr):
+        merged = shapely.union_all(snapped[codes_arr == code], grid_size=grid_size)
+        parts = [g for g in shapely.get_parts(merged) if g.geom_type == "Polygon" and not g.is_empty]
+        out_codes.extend([int(code)] * len(parts))
+        out_geoms.extend(parts)
+    return out_codes, out_geoms
+
+
+def iter_lulc_vector_patches(
     aoi_gdf: gpd.GeoDataFrame,
     dataset_name: str,
     year: int,
     credentials_dict: Dict,
     scale_override: Optional[int] = None,
-    max_polygons_per_aoi: int = 50_000,
-) -> Tuple[gpd.GeoDataFrame, Dict]:
-    """Vectorize the LULC raster inside each AOI polygon into many small
-    class polygons — one feature per contiguous patch of one class. The
-    output is a GeoDataFrame ready to drop into QGIS or ArcGIS where it
-    will render as a proper land-cover map (style by `class_name` or by
-    `color` for the dataset's recommended palette).
-
-    Attribute columns:
-        parent_id          row index of the input polygon this patch
-                           was vectorized inside of
-        parent             best human-readable name for that polygon
-        dataset            LULC dataset name
-        year               year
-        class_code         numeric class code on the source raster
-        class_name         human-readable class name
-        color              dataset's recommended hex colour for the class
-        area_km2           area of the patch (equal-area projection)
-        attribution        dataset attribution string
-
-    Returns:
-        (gdf, info) where info has 'truncated' (bool), 'truncated_count'
-        (how many AOIs hit the cap), and 'attribution'.
+    max_polygons_per_aoi: Optional[int] = None,
+):
+    """Vectorize the LULC raster inside each AOI polygon.
+
+    An AOI larger than one tile (VECTOR_TILE_PIXELS) is split into grid
+    tiles that are vectorized concurrently on the shared EE pool, each
+    paged until complete, so large AOIs are no longer cut off at a
+    polygon cap. Patches entirely inside their tile are yielded as each
+    tile finishes; patches touching a tile edge are held back and, once
+    the AOI is done, the pieces a seam cut apart are dissolved locally
+    (see _dissolve_seams) and yielded last.
+
+    Yields:
+        (parent_id, patches, truncated) batches, several per AOI, where
+        `patches` is a GeoDataFrame with the VECTOR_PATCH_FIELDS columns
+        (see build_lulc_vector_polygons_gdf) and `truncated` is True when
+        a tile stopped at `max_polygons_per_aoi` (a per-tile cap; None =
+        page every tile to completion).
     """
+    import shapely
+    from shapely.geometry import box, shape
+
     client = EarthEngineClient(credentials_dict=credentials_dict)
     if not client.initialized:
         raise RuntimeError("Earth Engine initialization failed")
@@ -747,15 +962,35 @@ def build_lulc_vector_polygons_gdf(
     nodata = set(info["nodata_classes"])
     palette = info.get("palette") or {}
     attribution = info["attribution"]
+    # A hundredth of a pixel, in degrees: snapping tolerance at seams.
+    grid_size = scale_m / 111_320.0 / 100
 
     base_img = _build_lulc_image(dataset_name, year).toUint8()
 
-    from shapely.geometry import shape
-
-    all_features: List[Dict] = []
-    truncated_aois = 0
+    def _patches(parent_idx, parent_name, codes, geoms):
+        patches = gpd.GeoDataFrame(
+            {
+                "parent_id": int(parent_idx),
+                "parent": parent_name,
+                "dataset": dataset_name,
+                "year": int(year),
+                "class_code": codes,
+                "class_name": [classes.get(c, f"Unknown ({c})") for c in codes],
+                "color": [palette.get(c) for c in codes],
+                "attribution": attribution,
+            },
+            geometry=geoms,
+            crs="EPSG:4326",
+        )
+        # Equal-area projection for accurate km² figures.
+        try:
+            patches["area_km2"] = (patches.to_crs("ESRI:54034").area / 1_000_000).round(5)
+        except Exception:
+            patches["area_km2"] = None
+        return patches
 
     for parent_idx, row in aoi_gdf.iterrows():
+        progress.check_cancelled()
         geom = row.geometry
         if geom is None or geom.is_empty:
             continue
@@ -770,88 +1005,234 @@ def build_lulc_vector_polygons_gdf(
             if geom.is_empty or geom.geom_type not in ("Polygon", "MultiPolygon"):
                 continue
 
-        ee_geom = ee.Geometry(mapping(geom))
-        clipped = base_img.clip(ee_geom)
-
-        try:
-            vectors = clipped.reduceToVectors(
-                reducer=ee.Reducer.countEvery(),
-                geometry=ee_geom,
-                scale=scale_m,
-                geometryType="polygon",
-                eightConnected=False,
-                labelProperty="class",
-                maxPixels=1e10,
-                bestEffort=True,
-            )
-            # Pull max+1 so we can detect truncation.
-            v_list = vectors.toList(max_polygons_per_aoi + 1).getInfo()
-        except Exception as e:
-            raise RuntimeError(
-                f"Earth Engine could not vectorize polygon {parent_idx}: {e}. "
-                "Try a smaller AOI, or pass scale_override (e.g. 30 or 100)."
-            ) from e
-
-        if len(v_list) > max_polygons_per_aoi:
-            truncated_aois += 1
-            v_list = v_list[:max_polygons_per_aoi]
-
         parent_name = best_polygon_name(row, parent_idx)
-
-        for feat in v_list:
-            props = feat.get("properties") or {}
-            try:
-                class_code = int(props.get("class", -1))
-            except (TypeError, ValueError):
-                continue
-            if class_code < 0 or class_code in nodata:
-                continue
-            class_name = classes.get(class_code, f"Unknown ({class_code})")
-            color = palette.get(class_code)
-            geom_json = feat.get("geometry")
-            try:
-                geom_shp = shape(geom_json)
-            except Exception:
-                continue
-            all_features.append({
-                "parent_id": int(parent_idx),
-                "parent": parent_name,
-                "dataset": dataset_name,
-                "year": year,
-                "class_code": class_code,
-                "class_name": class_name,
-                "color": color,
-                "attribution": attribution,
-                "geometry": geom_shp,
-            })
-
-    if not all_features:
-        gdf_out = gpd.GeoDataFrame(columns=["geometry"], crs="EPSG:4326")
-    else:
-        gdf_out = gpd.GeoDataFrame(all_features, geometry="geometry", crs="EPSG:4326")
-        # Equal-area projection for accurate km² figures.
+        tiles = _vector_tiles(geom, scale_m)
+        tiled = len(tiles) > 1
+        progress.add_total(len(tiles), "tiles")
+        futures = {
+            submit_ee(_vectorize_tile, base_img, tile, scale_m, max_polygons_per_aoi): tile
+            for tile in tiles
+        }
+        seam_codes: List[int] = []
+        seam_geoms: List = []
+        truncated = False
         try:
-            gdf_proj = gdf_out.to_crs("ESRI:54034")  # World Cylindrical Equal Area
-            gdf_out["area_km2"] = (gdf_proj.area / 1_000_000).round(5)
-        except Exception:
-            gdf_out["area_km2"] = None
-
-    meta = {
+            for future in as_completed(futures):
+                tile = futures[future]
+                try:
+                    feats, tile_truncated = future.result()
+                except FetchCancelled:
+                    raise
+                except Exception as e:
+                    raise RuntimeError(
+                        f"Earth Engine could not vectorize polygon {parent_idx}: {e}. "
+                        "Try a smaller AOI, or pass scale_override (e.g. 30 or 100)."
+                    ) from e
+                truncated = truncated or tile_truncated
+                progress.advance()
+
+                codes: List[int] = []
+                geoms = []
+                for feat in feats:
+                    props = feat.get("properties") or {}
+                    try:
+                        class_code = int(props.get("class", -1))
+                    except (TypeError, ValueError):
+                        continue
+                    if class_code < 0 or class_code in nodata:
+                        continue
+                    try:
+                        geom_shp = shape(feat.get("geometry"))
+                    except Exception:
+                        continue
+                    codes.append(class_code)
+                    geoms.append(geom_shp)
+
+                if tiled and geoms:
+                    # Patches touching the tile's edge may continue in the
+                    # neighbouring tile: keep them for the seam dissolve.
+                    inner = box(*tile.bounds).buffer(-2 * grid_size * 100)
+                    on_seam = ~shapely.within(np.asarray(geoms, dtype=object), inner)
+                    for code, g, seam in zip(codes, geoms, on_seam):
+                        if seam:
+                            seam_codes.append(code)
+                            seam_geoms.append(g)
+                    codes = [c for c, seam in zip(codes, on_seam) if not seam]
+                    geoms = [g for g, seam in zip(geoms, on_seam) if not seam]
+                yield int(parent_idx), _patches(parent_idx, parent_name, codes, geoms), tile_truncated
+        finally:
+            for future in futures:
+                future.cancel()
+
+        if seam_geoms:
+            with tracing.span("dissolve_seams"):
+                codes, geoms = _dissolve_seams(seam_codes, seam_geoms, grid_size)
+            yield int(parent_idx), _patches(parent_idx, parent_name, codes, geoms), truncated
+
+
+def _vector_meta(dataset_name: str, year: int, scale_override: Optional[int],
+                 max_polygons_per_aoi: Optional[int], truncated_aois: int, total: int) -> Dict:
+    info = get_dataset_info(dataset_name)
+    return {
         "truncated": truncated_aois > 0,
         "truncated_count": truncated_aois,
         "max_polygons_per_aoi": max_polygons_per_aoi,
-        "attribution": attribution,
-        "scale_m": scale_m,
+        "attribution": info["attribution"],
+        "scale_m": scale_override or info["scale"],
         "dataset": dataset_name,
         "year": year,
-        "total_polygons": len(gdf_out),
+        "total_polygons": total,
     }
+
+
+def build_lulc_vector_polygons_gdf(
+    aoi_gdf: gpd.GeoDataFrame,
+    dataset_name: str,
+    year: int,
+    credentials_dict: Dict,
+    scale_override: Optional[int] = None,
+    max_polygons_per_aoi: Optional[int] = None,
+) -> Tuple[gpd.GeoDataFrame, Dict]:
+    """Vectorize the LULC raster inside each AOI polygon into many small
+    class polygons — one feature per contiguous patch of one class. The
+    output is a GeoDataFrame ready to drop into QGIS or ArcGIS where it
+    will render as a proper land-cover map (style by `class_name` or by
+    `color` for the dataset's recommended palette).
+
+    Holds every patch in memory; for file exports use
+    write_lulc_vector_file, which streams one AOI at a time.
+
+    Attribute columns:
+        parent_id          row index of the input polygon this patch
+                           was vectorized inside of
+        parent             best human-readable name for that polygon
+        dataset            LULC dataset name
+        year               year
+        class_code         numeric class code on the source raster
+        class_name         human-readable class name
+        color              dataset's recommended hex colour for the class
+        area_km2           area of the patch (equal-area projection)
+        attribution        dataset attribution string
+
+    Large AOIs are tiled and every tile is paged to completion (see
+    iter_lulc_vector_patches); `max_polygons_per_aoi` is an optional cap
+    on the patches requested per tile (an untiled AOI is one tile).
+
+    Returns:
+        (gdf, info) where info has 'truncated' (bool), 'truncated_count'
+        (how many AOIs hit the cap, 0 without one), and 'attribution'.
+    """
+    batches = []
+    truncated_aois = set()
+    for parent_id, patches, truncated in iter_lulc_vector_patches(
+        aoi_gdf, dataset_name, year, credentials_dict,
+        scale_override=scale_override, max_polygons_per_aoi=max_polygons_per_aoi,
+    ):
+        if truncated:
+            truncated_aois.add(parent_id)
+        if not patches.empty:
+            batches.append(patches)
+
+    if not batches:
+        gdf_out = gpd.GeoDataFrame(columns=["geometry"], crs="EPSG:4326")
+    else:
+        gdf_out = gpd.GeoDataFrame(
+            pd.concat(batches, ignore_index=True), geometry="geometry", crs="EPSG:4326"
+        )
+
+    meta = _vector_meta(dataset_name, year, scale_override, max_polygons_per_aoi,
+                        len(truncated_aois), len(gdf_out))
     return gdf_out, meta
 
 
+def write_lulc_vector_file(
+    path: str,
+    aoi_gdf: gpd.GeoDataFrame,
+    dataset_name: str,
+    year: int,
+    credentials_dict: Dict,
+    driver: str = "FlatGeobuf",
+    scale_override: Optional[int] = None,
+    max_polygons_per_aoi: Optional[int] = None,
+) -> Dict:
+    """Vectorize like build_lulc_vector_polygons_gdf, but stream each AOI's
+    patches straight into a FlatGeobuf, GeoPackage or GeoJSON file.
+
+    The file is opened once and written AOI by AOI, so memory is bounded
+    by the largest single AOI rather than the whole export. FlatGeobuf
+    and GeoPackage get a spatial index (built by GDAL when the file is
+    closed). Field names and sizes are kept as-is: none of the .dbf
+    limits of Shapefile apply.
+
+    Args:
+        path: Output file
+        driver: One of VECTOR_DRIVERS
+        (others as build_lulc_vector_polygons_gdf)
+
+    Returns:
+        The same info dict as build_lulc_vector_polygons_gdf
+    """
+    import fiona
+    from fiona.crs import CRS
+
+    if driver not in VECTOR_DRIVERS:
+        raise ValueError(f"Unsupported vector driver: {driver}")
+    options = {"SPATIAL_INDEX": "YES"} if driver in ("FlatGeobuf", "GPKG") else {}
+    schema = {"geometry": "MultiPolygon", "properties": dict(VECTOR_PATCH_FIELDS)}
+
+    truncated_aois = set()
+    total = 0
+    with fiona.open(path, "w", driver=driver, schema=schema, crs=CRS.from_epsg(4326),
+                    layer="lulc_vector", **options) as dst:
+        for parent_id, patches, truncated in iter_lulc_vector_patches(
+            aoi_gdf, dataset_name, year, credentials_dict,
+            scale_override=scale_override, max_polygons_per_aoi=max_polygons_per_aoi,
+        ):
+            if truncated:
+                truncated_aois.add(parent_id)
+            if patches.empty:
+                continue
+            # One geometry type per layer: patches with holes split into
+            # parts come back as MultiPolygon, so promote the rest.
+            patches["geometry"] = patches.geometry.apply(
+                lambda g: MultiPolygon([g]) if g.geom_type == "Polygon" else g
+            )
+            with tracing.span("write_vectors"):
+                dst.writerecords(
+                    {"geometry": f["geometry"], "properties": f["properties"]}
+                    for f in patches[list(VECTOR_PATCH_FIELDS) + ["geometry"]]
+                    .iterfeatures(na="null", drop_id=True)
+                )
+            total += len(patches)
+
+    return _vector_meta(dataset_name, year, scale_override, max_polygons_per_aoi,
+                        len(truncated_aois), total)
+
+
+def _top_flow(changed: pd.DataFrame, cls_col: str, other_col: str) -> pd.DataFrame:
+    """Per polygon, the `cls_col` class with the largest changed area and
+    the `other_col` class most of that area went to / came from.
+    Indexed by polygon_id, columns [cls_col, "area_km2", other_col]."""
+    def _largest(frame, keys):
+        # Stable sort so ties resolve to the first class by name.
+        return (
+            frame.sort_values("area_km2", ascending=False, kind="mergesort")
+            .drop_duplicates(subset=keys)
+        )
+
+    per_class = changed.groupby(["polygon_id", cls_col], as_index=False)["area_km2"].sum()
+    top = _largest(per_class, ["polygon_id"])
+    pairs = changed.groupby(
+        ["polygon_id", cls_col, other_col], as_index=False
+    )["area_km2"].sum().merge(top[["polygon_id", cls_col]], on=["polygon_id", cls_col])
+    top_other = _largest(pairs, ["polygon_id"])[["polygon_id", other_col]]
+    return top.merge(top_other, on="polygon_id").set_index("polygon_id")
+
+
 def build_change_geodataframe(
     change_df: pd.DataFrame,
     aoi_gdf: gpd.GeoDataFrame,
+    composition_df: Optional[pd.DataFrame] = None,
 ) -> gpd.GeoDataFrame:
     """Same idea as build_polygon_geodataframe but for change results.
 
@@ -860,79 +1241,56 @@ def build_change_geodataframe(
         changed_area_km2, percent_changed,
         top_loss_class, top_loss_km2, top_loss_to,
         top_gain_class, top_gain_km2, top_gain_from
+    plus dominant_from / dominant_to (the dominant class of each year)
+    when the composition_df of fetch_lulc_change_and_composition_from_gdf
+    is given.
     """
     if change_df.empty or aoi_gdf.empty:
         return gpd.GeoDataFrame(columns=["geometry"], crs="EPSG:4326")
 
     # Drop nodata-tagged rows (none of the real classes — these are the
     # "No data" placeholders we add when a polygon had no observed pixels).
-    df = change_df.dropna(subset=["from_code", "to_code"]).copy()
-    df["from_code"] = df["from_code"].astype(int)
-    df["to_code"] = df["to_code"].astype(int)
-
-    grouped = []
-    for pid, sub in df.groupby("polygon_id"):
-        changed = sub[~sub["is_unchanged"]]
-        total_area = sub["area_km2"].sum()
-        changed_area = changed["area_km2"].sum()
-        percent_changed = (
-            round(changed_area / total_area * 100, 2) if total_area > 0 else 0.0
-        )
-
-        # Top loss: class with largest outgoing area to a different class.
-        loss_per_class = (
-            changed.groupby("from_class")["area_km2"].sum().sort_values(ascending=False)
-        )
-        if not loss_per_class.empty:
-            top_loss_class = loss_per_class.index[0]
-            top_loss_km2 = round(float(loss_per_class.iloc[0]), 4)
-            # Which target did most of it go to?
-            top_loss_to = (
-                changed[changed["from_class"] == top_loss_class]
-                .groupby("to_class")["area_km2"]
-                .sum()
-                .sort_values(ascending=False)
-                .index[0]
-            )
-        else:
-            top_loss_class = top_loss_to = None
-            top_loss_km2 = 0.0
+    df = change_df.dropna(subset=["from_code", "to_code"])
+    by_pid = df.groupby("polygon_id")
+    attrs = by_pid[["polygon_name", "dataset", "year_from", "year_to"]].first()
+    attrs["year_from"] = attrs["year_from"].astype(int)
+    attrs["year_to"] = attrs["year_to"].astype(int)
+
+    changed = df[~df["is_unchanged"].astype(bool)]
+    total_area = by_pid["area_km2"].sum()
+    changed_area = (
+        changed.groupby("polygon_id")["area_km2"].sum()
+        .reindex(attrs.index, fill_value=0.0)
+    )
+    attrs["changed_area_km2"] = changed_area.astype(float).round(4)
+    attrs["percent_changed"] = (
+        (changed_area / total_area.where(total_area > 0) * 100).round(2).fillna(0.0)
+    )
 
-        # Top gain: class with largest incoming area from a different class.
-        gain_per_class = (
-            changed.groupby("to_class")["area_km2"].sum().sort_values(ascending=False)
+    # Top loss: class with the largest outgoing area to a different class,
+    # and where most of it went. Top gain: the reverse.
+    loss = _top_flow(changed, "from_class", "to_class").reindex(attrs.index)
+    gain = _top_flow(changed, "to_class", "from_class").reindex(attrs.index)
+    attrs["top_loss_class"] = loss["from_class"]
+    attrs["top_loss_km2"] = loss["area_km2"].astype(float).round(4).fillna(0.0)
+    attrs["top_loss_to"] = loss["to_class"]
+    attrs["top_gain_class"] = gain["to_class"]
+    attrs["top_gain_km2"] = gain["area_km2"].astype(float).round(4).fillna(0.0)
+    attrs["top_gain_from"] = gain["from_class"]
+
+    if composition_df is not None and not composition_df.empty:
+        comp = composition_df[~composition_df["is_nodata"].astype(bool)]
+        dominant = (
+            comp.sort_values("pixel_count", ascending=False, kind="mergesort")
+            .drop_duplicates(subset=["polygon_id", "year"])
+            .pivot(index="polygon_id", columns="year", values="class_name")
         )
-        if not gain_per_class.empty:
-            top_gain_class = gain_per_class.index[0]
-            top_gain_km2 = round(float(gain_per_class.iloc[0]), 4)
-            top_gain_from = (
-                changed[changed["to_class"] == top_gain_class]
-                .groupby("from_class")["area_km2"]
-                .sum()
-                .sort_values(ascending=False)
-                .index[0]
-            )
-        else:
-            top_gain_class = top_gain_from = None
-            top_gain_km2 = 0.0
-
-        grouped.append({
-            "polygon_id": int(pid),
-            "polygon_name": sub["polygon_name"].iloc[0],
-            "dataset": sub["dataset"].iloc[0],
-            "year_from": int(sub["year_from"].iloc[0]),
-            "year_to": int(sub["year_to"].iloc[0]),
-            "changed_area_km2": round(float(changed_area), 4),
-            "percent_changed": percent_changed,
-            "top_loss_class": top_loss_class,
-            "top_loss_km2": top_loss_km2,
-            "top_loss_to": top_loss_to,
-            "top_gain_class": top_gain_class,
-            "top_gain_km2": top_gain_km2,
-            "top_gain_from": top_gain_from,
-        })
+        for col, year_col in (("dominant_from", "year_from"), ("dominant_to", "year_to")):
+            year = int(attrs[year_col].iloc[0])
+            values = dominant[year] if year in dominant.columns else pd.Series(dtype="str")
+            attrs[col] = values.reindex(attrs.index)
 
-    attrs = pd.DataFrame(grouped)
+    attrs = attrs.reset_index()
 
     if aoi_gdf.crs is None or aoi_gdf.crs.to_epsg() != 4326:
         aoi_gdf = aoi_gdf.to_crs(4326)
@@ -1151,11 +1509,13 @@ def gdf_from_admin_selection(
             )
             for div in wanted_divs:
                 sub = fc.filter(_ieq("ADM1_NAME", div))
-                feats = sub.getInfo().get("features", [])
+                with tracing.span("server_compute", round_trips=1):
+                    feats = sub.getInfo().get("features", [])
                 if not feats:
                     # Try a contains-style match as fallback.
                     sub = fc.filter(ee.Filter.stringContains("ADM1_NAME", div))
-                    feats = sub.getInfo().get("features", [])
+                    with tracing.span("server_compute", round_trips=1):
+                        feats = sub.getInfo().get("features", [])
                 for f in feats:
                     geom = f.get("geometry")
                     props = f.get("properties", {}) or {}
@@ -1169,7 +1529,8 @@ def gdf_from_admin_selection(
             fc = ee.FeatureCollection("FAO/GAUL/2015/level0").filter(
                 _ieq("ADM0_NAME", country)
             )
-            feats = fc.getInfo().get("features", [])
+            with tracing.span("server_compute", round_trips=1):
+                feats = fc.getInfo().get("features", [])
             for f in feats:
                 geom = f.get("geometry")
                 props = f.get("properties", {}) or {}
@@ -1,9 +1,14 @@
+import logging
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Tuple, Dict
 import json
 
+from utils import progress
+
+log = logging.getLogger(__name__)
+
 # Available MODIS parameters via AppEEARS API
 MODIS_PARAMETERS = {
     "Land Surface Temperature": {
@@ -43,6 +48,7 @@ def get_temporal_resolutions() -> List[str]:
     return TEMPORAL_RESOLUTIONS
 
 
+@progress.reporting
 def fetch_modis_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -68,9 +74,7 @@ def fetch_modis_data(
     
     from .earth_engine_utils import fetch_modis_lst, fetch_modis_ndvi
     
-    print("=" * 70)
-    print("MODIS via Google Earth Engine")
-    print("=" * 70)
+    log.info("MODIS via Google Earth Engine")
     
     if not credentials_dict:
         raise ValueError("Earth Engine credentials required. Please provide service account credentials.")
@@ -79,8 +83,8 @@ def fetch_modis_data(
     
     try:
         # Process each parameter
-        for param in parameters:
-            print(f"\nFetching {param}...")
+        for param in progress.iterate(parameters, "parameters"):
+            log.info(f"Fetching {param}...")
             
             if "LST_Day" in param:
                 # Land Surface Temperature - Day
@@ -118,7 +122,7 @@ def fetch_modis_data(
                     all_dfs.append(df)
             
             else:
-                print(f"  [WARNING] Parameter {param} not yet implemented")
+                log.warning(f"Parameter {param} not yet implemented")
                 continue
         
         # Merge all dataframes
@@ -132,16 +136,14 @@ def fetch_modis_data(
                     how='outer'
                 )
             
-            print("\n" + "=" * 70)
-            print(f"[SUCCESS] MODIS fetch complete: {len(final_df)} total records")
-            print("=" * 70)
+            log.info(f"MODIS fetch complete: {len(final_df)} total records")
             return final_df
         else:
-            print("\n[WARNING] No data retrieved")
+            log.warning("No data retrieved")
             return pd.DataFrame()
     
     except Exception as e:
-        print(f"\n[ERROR] Error fetching MODIS data: {str(e)}")
+        log.error(f"Error fetching MODIS data: {str(e)}")
         raise
 
 
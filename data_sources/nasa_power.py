@@ -1,8 +1,15 @@
+import logging
+
+import numpy as np
 import requests
 import pandas as pd
 from datetime import datetime
 from typing import List, Tuple, Dict
 
+from utils import checkpoint, progress, tracing
+
+log = logging.getLogger(__name__)
+
 # Available NASA POWER parameters organized by category
 # Note: Not all parameters are available for all temporal resolutions
 NASA_POWER_PARAMETERS = {
@@ -56,6 +63,7 @@ def get_temporal_resolutions() -> List[str]:
     return TEMPORAL_RESOLUTIONS
 
 
+@progress.reporting
 def fetch_nasa_power_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -95,8 +103,8 @@ def fetch_nasa_power_data(
         
         removed = set(original_params) - set(parameters)
         if removed:
-            print(f"Note: Removed parameters not available for hourly data: {', '.join(removed)}")
-            print(f"Using parameters: {', '.join(parameters)}")
+            log.info("Removed parameters not available for hourly data: %s", ", ".join(removed))
+            log.info("Using parameters: %s", ", ".join(parameters))
         
         if not parameters:
             raise ValueError(f"No valid parameters for hourly data. Parameters like {', '.join(non_hourly_params)} are only available for Daily resolution.")
@@ -105,62 +113,83 @@ def fetch_nasa_power_data(
     start_date_api = datetime.strptime(start_date, "%Y-%m-%d").strftime("%Y%m%d")
     end_date_api = datetime.strptime(end_date, "%Y-%m-%d").strftime("%Y%m%d")
     
+    request_key = checkpoint.digest([parameters, start_date_api, end_date_api])
+    progress.add_total(len(locations), "locations")
     for idx, (lat, lon) in enumerate(locations):
         try:
             # Build API URL
-            base_url = "https://power.larc.nasa.gov/api/temporal/"
-            params_str = ",".join(parameters)
-            
-            url = (
-                f"{base_url}{temporal_api}/point?"
-                f"parameters={params_str}&"
-                f"community=AG&"
-                f"longitude={lon}&"
-                f"latitude={lat}&"
-                f"start={start_date_api}&"
-                f"end={end_date_api}&"
-                f"format=JSON"
-            )
-            
-            print(f"Fetching NASA POWER data for location {idx} ({lat}, {lon})...")
-            print(f"URL: {url}")
-            
-            response = requests.get(url, timeout=120)  # Increased timeout for large requests
-            
-            # Check for HTTP errors
-            if response.status_code != 200:
-                error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
-                print(f"Error for location {idx}: {error_msg}")
-                raise Exception(error_msg)
+            with tracing.span("request_build"):
+                base_url = "https://power.larc.nasa.gov/api/temporal/"
+                params_str = ",".join(parameters)
+                
+                url = (
+                    f"{base_url}{temporal_api}/point?"
+                    f"parameters={params_str}&"
+                    f"community=AG&"
+                    f"longitude={lon}&"
+                    f"latitude={lat}&"
+                    f"start={start_date_api}&"
+                    f"end={end_date_api}&"
+                    f"format=JSON"
+                )
             
-            data = response.json()
+            log.info("Fetching NASA POWER data for location %d/%d (%s, %s)", idx + 1, len(locations), lat, lon)
+            log.debug("URL: %s", url)
             
-            # Check for API errors in response
-            if "errors" in data:
-                error_msg = f"API Error: {data['errors']}"
-                print(error_msg)
-                raise Exception(error_msg)
+            def _pull() -> Dict:
+                # stream=True returns once headers arrive, so time-to-first-byte
+                # (server compute) and body transfer can be measured separately.
+                with tracing.span("server_compute", round_trips=1):
+                    response = requests.get(url, timeout=120, stream=True)  # Increased timeout for large requests
+                with tracing.span("network_wait"):
+                    body = response.content
+                tracing.count("bytes", len(body))
+
+                # Check for HTTP errors
+                if response.status_code != 200:
+                    error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
+                    log.warning("Error for location %d: %s", idx, error_msg)
+                    raise Exception(error_msg)
+
+                with tracing.span("decode"):
+                    payload = response.json()
+
+                # Check for API errors in response
+                if "errors" in payload:
+                    error_msg = f"API Error: {payload['errors']}"
+                    log.warning(error_msg)
+                    raise Exception(error_msg)
+                return payload
+
+            # One location = one checkpointed chunk: a resumed job only
+            # re-requests the locations it does not have yet, and sessions
+            # asking for the same point and period share one request.
+            data = checkpoint.fetch_chunk(
+                f"nasa_power/{temporal_api}/{lat},{lon}/{request_key}", _pull
+            )
             
             if "properties" in data and "parameter" in data["properties"]:
                 param_data = data["properties"]["parameter"]
                 
                 if not param_data:
-                    print(f"No parameter data returned for location {idx}")
+                    log.warning("No parameter data returned for location %d", idx)
                     continue
                 
                 # Convert to DataFrame
                 df_list = []
-                for param, values in param_data.items():
-                    if isinstance(values, dict) and len(values) > 0:
-                        param_df = pd.DataFrame(list(values.items()), columns=["date", param])
-                        df_list.append(param_df)
-                        print(f"Location {idx}: Got {len(values)} records for {param}")
+                with tracing.span("decode"):
+                    for param, values in param_data.items():
+                        if isinstance(values, dict) and len(values) > 0:
+                            param_df = pd.DataFrame(list(values.items()), columns=["date", param])
+                            df_list.append(param_df)
+                            log.debug("Location %d: Got %d records for %s", idx, len(values), param)
                 
                 if df_list:
                     # Merge all parameters
-                    result_df = df_list[0]
-                    for df in df_list[1:]:
-                        result_df = result_df.merge(df, on="date", how="outer")
+                    with tracing.span("merge"):
+                        result_df = df_list[0]
+                        for df in df_list[1:]:
+                            result_df = result_df.merge(df, on="date", how="outer")
                     
                     # Add location information
                     result_df["latitude"] = lat
@@ -168,35 +197,40 @@ def fetch_nasa_power_data(
                     result_df["location_id"] = idx
                     
                     all_data.append(result_df)
-                    print(f"Location {idx}: Successfully processed {len(result_df)} total records")
+                    log.info("Location %d: Successfully processed %d total records", idx, len(result_df))
                 else:
-                    print(f"Location {idx}: No valid data frames created")
+                    log.warning("Location %d: No valid data frames created", idx)
             else:
-                print(f"Location {idx}: Unexpected API response structure")
-                print(f"Response keys: {data.keys() if isinstance(data, dict) else 'Not a dict'}")
+                log.warning(
+                    "Location %d: Unexpected API response structure (keys: %s)",
+                    idx, list(data.keys()) if isinstance(data, dict) else "Not a dict",
+                )
         
         except requests.exceptions.Timeout:
             error_msg = f"Timeout fetching data for location {idx} ({lat}, {lon}). Try a smaller date range or daily/monthly resolution."
-            print(error_msg)
+            log.error(error_msg)
             raise Exception(error_msg)
         except Exception as e:
             error_msg = f"Error fetching data for location {idx} ({lat}, {lon}): {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             # Re-raise if it's the first location so user sees the error
             if idx == 0 and len(locations) == 1:
                 raise
             continue
     
     if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-        # Convert date column to datetime
-        if temporal_api == "hourly":
-            final_df["date"] = pd.to_datetime(final_df["date"], format="%Y%m%d%H")
-        else:  # daily
-            final_df["date"] = pd.to_datetime(final_df["date"], format="%Y%m%d")
-        
-        # Replace fill values (-999) with NaN
-        final_df = final_df.replace(-999, pd.NA)
+        with tracing.span("merge"):
+            final_df = pd.concat(all_data, ignore_index=True)
+        with tracing.span("post_process"):
+            # Convert date column to datetime
+            if temporal_api == "hourly":
+                final_df["date"] = pd.to_datetime(final_df["date"], format="%Y%m%d%H")
+            else:  # daily
+                final_df["date"] = pd.to_datetime(final_df["date"], format="%Y%m%d")
+            
+            # Replace fill values (-999) with NaN (np.nan, not pd.NA, which
+            # would turn the float columns into object)
+            final_df = final_df.replace(-999, np.nan)
         
         return final_df
     else:
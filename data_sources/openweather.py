@@ -1,9 +1,14 @@
+import logging
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Tuple, Dict
 import os
 
+from utils import progress
+
+log = logging.getLogger(__name__)
+
 # Available OpenWeather parameters
 OPENWEATHER_PARAMETERS = {
     "Current/Forecast": {
@@ -42,6 +47,7 @@ def get_temporal_resolutions() -> List[str]:
     return TEMPORAL_RESOLUTIONS
 
 
+@progress.reporting
 def fetch_openweather_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -79,15 +85,15 @@ def fetch_openweather_data(
     is_historical = end_dt < current_dt
     is_forecast = start_dt > current_dt
     
-    for idx, (lat, lon) in enumerate(locations):
+    for idx, (lat, lon) in enumerate(progress.iterate(locations, "locations")):
         try:
             location_data = []
             
             if is_historical:
                 # Use One Call API 3.0 for historical data (requires subscription)
                 # Note: Free tier users will get an error here
-                print(f"⚠️ Attempting to fetch historical data for location {idx}")
-                print(f"Note: Historical data requires OpenWeather One Call API 3.0 subscription")
+                log.warning(f"Attempting to fetch historical data for location {idx}")
+                log.info(f"Historical data requires OpenWeather One Call API 3.0 subscription")
                 
                 current_date = start_dt
                 while current_date <= end_dt:
@@ -228,7 +234,7 @@ def fetch_openweather_data(
                 all_data.extend(location_data)
         
         except Exception as e:
-            print(f"Error fetching OpenWeather data for location {idx} ({lat}, {lon}): {str(e)}")
+            log.error(f"Error fetching OpenWeather data for location {idx} ({lat}, {lon}): {str(e)}")
             continue
     
     if all_data:
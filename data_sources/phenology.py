@@ -37,6 +37,7 @@ column so display / CSV / GeoJSON / Shapefile exports work as-is.
 
 from __future__ import annotations
 
+import logging
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 
@@ -44,8 +45,12 @@ import ee
 import numpy as np
 import pandas as pd
 
+from utils import progress, tracing
+
 from .earth_engine_utils import EarthEngineClient
 
+log = logging.getLogger(__name__)
+
 
 # ---------------------------------------------------------------------------
 # Parameter registry
@@ -126,7 +131,8 @@ def _ndvi_16day_series(
     ).flatten()
 
     try:
-        raw = all_samples.getInfo().get("features", [])
+        with tracing.span("server_compute", round_trips=1):
+            raw = all_samples.getInfo().get("features", [])
     except Exception as e:
         raise RuntimeError(
             f"Earth Engine phenology fetch failed: {e}. "
@@ -265,6 +271,7 @@ def _extract_phenology_for_year(
 # Public fetch entry point (weather-schema compatible)
 # ---------------------------------------------------------------------------
 
+@progress.reporting
 def fetch_phenology_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -303,7 +310,7 @@ def fetch_phenology_data(
     fetch_start_year = start_dt.year
     fetch_end_year = end_dt.year
 
-    print(
+    log.info(
         f"[Phenology] Locations={len(locations)}  "
         f"pulling MOD13A1 16-day NDVI {fetch_start_year}-{fetch_end_year}"
     )
@@ -337,5 +344,5 @@ def fetch_phenology_data(
     result_df = result_df[keep_cols].sort_values(
         ["location_id", "date"]
     ).reset_index(drop=True)
-    print(f"[SUCCESS] Phenology: {len(result_df)} rows across {len(locations)} location(s).")
+    log.info(f"Phenology: {len(result_df)} rows across {len(locations)} location(s).")
     return result_df
@@ -33,6 +33,7 @@ JSON / Excel exports work without any new branching.
 
 from __future__ import annotations
 
+import logging
 from datetime import datetime
 from typing import Dict, List, Tuple
 
@@ -40,7 +41,13 @@ import ee
 import numpy as np
 import pandas as pd
 
-from .earth_engine_utils import EarthEngineClient
+from utils import checkpoint, progress
+
+from .earth_engine_utils import (
+    EarthEngineClient, get_features, monthly_windows, reduce_if_nonempty,
+)
+
+log = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
@@ -144,48 +151,53 @@ def _monthly_ee_series(
     fc = ee.FeatureCollection(feats)
 
     rows: List[Dict] = []
-    for year in range(start_year, end_year + 1):
-        for month in range(1, 13):
-            m_start = ee.Date.fromYMD(year, month, 1)
-            m_end = m_start.advance(1, "month")
-            m_coll = coll.filterDate(m_start, m_end)
-
-            if aggregation == "mean":
-                monthly_img = m_coll.mean().rename(band)
-            elif aggregation == "sum":
-                monthly_img = m_coll.sum().rename(band)
-            else:
-                raise ValueError(f"Unknown aggregation: {aggregation}")
+    loc_key = checkpoint.digest(locations)
+    months = monthly_windows(start_year, end_year)
+    progress.add_total(len(months), "months")
+    for year, month in months:
+        m_start = ee.Date.fromYMD(year, month, 1)
+        m_end = m_start.advance(1, "month")
+        m_coll = coll.filterDate(m_start, m_end)
+
+        if aggregation == "mean":
+            monthly_img = m_coll.mean().rename(band)
+        elif aggregation == "sum":
+            monthly_img = m_coll.sum().rename(band)
+        else:
+            raise ValueError(f"Unknown aggregation: {aggregation}")
+
+        try:
+            reduced = monthly_img.reduceRegions(
+                collection=fc,
+                reducer=ee.Reducer.mean().setOutputs([out_field]),
+                scale=scale_m,
+            )
+            server_feats = checkpoint.fetch_chunk(
+                f"{asset_id}/{band}/{aggregation}/{scale_m}/{loc_key}/{year}-{month:02d}",
+                lambda: get_features(reduce_if_nonempty(m_coll, reduced)),
+            )
+        except Exception as e:
+            log.warning(f"{asset_id} {year}-{month:02d}: {e}")
+            continue
 
-            try:
-                reduced = monthly_img.reduceRegions(
-                    collection=fc,
-                    reducer=ee.Reducer.mean().setOutputs([out_field]),
-                    scale=scale_m,
-                )
-                server_feats = reduced.getInfo().get("features", [])
-            except Exception as e:
-                print(f"[WARN] {asset_id} {year}-{month:02d}: {e}")
-                continue
-
-            for feat in server_feats:
-                props = feat.get("properties") or {}
-                raw = props.get(out_field)
-                if raw is None:
+        for feat in server_feats:
+            props = feat.get("properties") or {}
+            raw = props.get(out_field)
+            if raw is None:
+                v = np.nan
+            else:
+                try:
+                    v = float(raw) * value_scale
+                except (TypeError, ValueError):
                     v = np.nan
-                else:
-                    try:
-                        v = float(raw) * value_scale
-                    except (TypeError, ValueError):
-                        v = np.nan
-                rows.append({
-                    "location_id": int(props.get("location_id", -1)),
-                    "latitude": props.get("latitude"),
-                    "longitude": props.get("longitude"),
-                    "year": year,
-                    "month": month,
-                    out_field: v,
-                })
+            rows.append({
+                "location_id": int(props.get("location_id", -1)),
+                "latitude": props.get("latitude"),
+                "longitude": props.get("longitude"),
+                "year": year,
+                "month": month,
+                out_field: v,
+            })
 
     if not rows:
         return pd.DataFrame(columns=[
@@ -200,6 +212,7 @@ def _monthly_ee_series(
 # Public fetch entry point
 # ---------------------------------------------------------------------------
 
+@progress.reporting
 def fetch_productivity_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -230,7 +243,7 @@ def fetch_productivity_data(
     fetch_start_year = start_dt.year
     fetch_end_year = end_dt.year
 
-    print(
+    log.info(
         f"[Productivity] Locations={len(locations)}  "
         f"target={start_dt.date()}..{end_dt.date()}  "
         f"pulling {fetch_start_year}-{fetch_end_year}  "
@@ -293,5 +306,5 @@ def fetch_productivity_data(
 
     result = pd.concat(out_frames, ignore_index=True)
     result = result.sort_values(["location_id", "date"]).reset_index(drop=True)
-    print(f"[SUCCESS] Productivity: {len(result)} rows across {len(locations)} location(s).")
+    log.info(f"Productivity: {len(result)} rows across {len(locations)} location(s).")
     return result
@@ -0,0 +1,498 @@
+"""
+Data-source registry.
+
+One entry per source, declaring what the app, batch_fetch.py and
+api_server.py need to know about it *without importing it*: display
+label, sidebar blurb, date-window defaults, whether it needs Earth Engine
+or an API key, whether it takes points or polygons, and the name of its
+fetch entry point. The source module itself (and with it `ee`,
+`geopandas`, `scipy`, ...) is imported the first time something asks for
+its parameters or calls its fetcher, via `module()` / `fetcher()` or a
+`lazy()` proxy. Python caches the import, so reruns pay for it once per
+process.
+
+Entry fields (plain dict):
+
+    label         selectbox label in the app
+    module        data_sources submodule name
+    fetch         name of the fetch function in that module
+    input         "points"   -> fetch(locations=[(lat, lon), ...], parameters,
+                                      start_date, end_date, temporal_resolution)
+                  "polygons" -> fetch(aoi_gdf=GeoDataFrame, ...)
+    form          "series"  -> standard parameter / resolution / date sidebar
+                  "dataset" -> source has its own dataset picker in app.py
+    needs_ee      fetch takes credentials_dict (Earth Engine service account)
+    api_key       label of the API-key input the fetch needs, or None
+    sidebar       (st.sidebar method, markdown) shown when selected
+    note          optional (method, markdown) shown under the date range
+    latency_days  data latency; caps the end date picker
+    lead_days     days into the future the source serves (forecasts)
+    window        f(now, latest) -> (default_start, default_end)
+
+A new source plugs in with `register()` (or an entry below) plus its
+module; app.py, the CLI and the API pick it up from here.
+"""
+
+from __future__ import annotations
+
+import importlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def _days_back(days: int) -> Callable[[datetime, datetime], Tuple[datetime, datetime]]:
+    return lambda now, latest: (now - timedelta(days=days), latest)
+
+
+def _years_back(years: int, floor: int = 0) -> Callable[[datetime, datetime], Tuple[datetime, datetime]]:
+    return lambda now, latest: (datetime(max(floor, now.year - years), 1, 1), latest)
+
+
+_DEFAULTS: Dict[str, Any] = {
+    "input": "points",
+    "form": "series",
+    "needs_ee": True,
+    "api_key": None,
+    "sidebar": None,
+    "note": None,
+    "latency_days": 3,
+    "lead_days": 0,
+    "window": _days_back(30),
+}
+
+SOURCES: Dict[str, Dict[str, Any]] = {}
+
+
+def register(key: str, label: str, module: str, fetch: str, **spec: Any) -> None:
+    """Add (or replace) a source. Only metadata; nothing is imported."""
+    entry = dict(_DEFAULTS, key=key, label=label, module=module, fetch=fetch)
+    entry.update(spec)
+    SOURCES[key] = entry
+
+
+# ---------------------------------------------------------------------------
+# Sources, in selectbox order
+# ---------------------------------------------------------------------------
+
+register(
+    "nasa_power", "NASA POWER", "nasa_power", "fetch_nasa_power_data",
+    needs_ee=False,
+    latency_days=7,
+    window=_days_back(60),
+    sidebar=("info", "📡 **NASA POWER**: Historical data with ~7 day latency. "
+                     "Data available from 1981 to ~7 days ago."),
+)
+
+register(
+    "openweather", "OpenWeather API", "openweather", "fetch_openweather_data",
+    needs_ee=False,
+    api_key="OpenWeather API Key",
+    latency_days=0,
+    lead_days=7,
+    window=lambda now, latest: (now - timedelta(days=7), now + timedelta(days=2)),
+    sidebar=("warning", """
+🌤️ **OpenWeather Free Tier**:
+- ✅ Current weather
+- ✅ 7-day forecast
+- ❌ Historical data (requires paid subscription)
+
+**For historical weather data**, use **NASA POWER** instead (free, no API key needed).
+"""),
+)
+
+register(
+    "era5", "ERA5 (Copernicus)", "era5", "fetch_era5_data",
+    latency_days=5,
+    window=_days_back(60),
+    sidebar=("success", """
+🌍 **ERA5-Land via Google Earth Engine**
+
+✅ Now using Earth Engine (No CDS token needed!)
+
+**Available Data:**
+- Temperature, precipitation, wind
+- Hourly resolution (aggregates to daily)
+- Global coverage at ~11km resolution
+
+**Benefits:**
+- No CDS account/token required
+- Faster than CDS API (seconds vs minutes)
+- Uses same Earth Engine credentials as MODIS/CHIRPS
+"""),
+    note=("info", """
+ℹ️ **No API Key Required!**
+
+ERA5 now uses the same Earth Engine credentials as MODIS/CHIRPS.
+No separate CDS account or token needed.
+"""),
+)
+
+register(
+    "modis", "MODIS", "modis", "fetch_modis_data",
+    sidebar=("success", """
+🛰️ **MODIS via Google Earth Engine**
+
+✅ Now functional!
+
+**Available Data:**
+- Land Surface Temperature (LST)
+- Vegetation Indices (NDVI, EVI)
+- Real satellite data from Earth Engine
+
+**Requirements:**
+Earth Engine service account credentials (provided)
+"""),
+)
+
+register(
+    "chirps", "CHIRPS", "chirps", "fetch_chirps_data",
+    sidebar=("success", """
+🌧️ **CHIRPS via Google Earth Engine**
+
+✅ Now functional!
+
+**Available Data:**
+- Daily precipitation (mm)
+- Global coverage
+- Real CHIRPS data from Earth Engine
+
+**Requirements:**
+Earth Engine service account credentials (provided)
+"""),
+)
+
+register(
+    "lulc", "Land Cover (LULC)", "lulc", "fetch_lulc_composition_from_gdf",
+    input="polygons",
+    form="dataset",
+    sidebar=("success", """
+🗺️ **Land Cover (LULC) via Google Earth Engine**
+
+**Available datasets:**
+- **ESRI Sentinel-2 LULC** (10 m, 2017–2024) — best for annual change
+- **ESA WorldCover** (10 m, 2020 / 2021) — single-year accuracy benchmark
+- **Dynamic World** (10 m, 2015–present) — newest data, sub-annual
+
+**Output:** per-polygon class composition (area & percent per class)
+on uploaded shapefile / KML or African admin divisions.
+"""),
+)
+
+register(
+    "drought_indices", "Drought & Vegetation Indices", "drought_indices", "fetch_drought_data",
+    # CHIRPS monthly settles about a month after the month ends.
+    latency_days=45,
+    # A 3-year window so SPI-12 has enough context to show trends.
+    window=lambda now, latest: (now.replace(month=1, day=1) - timedelta(days=365 * 3), latest),
+    sidebar=("success", """
+💧 **Drought & Vegetation Indices**
+
+**SPI** (1 / 3 / 6 / 12 month, CHIRPS) — precipitation-only
+drought / wetness. Gamma-fit vs. 1991–2020 baseline.
+
+**SPEI** (1 / 3 / 6 / 12 month, CHIRPS + TerraClimate PET) —
+drought accounting for evaporative demand (P − PET). Catches
+heat-driven drought that SPI misses. Normal-fit vs. 1991–2020.
+Both indices: ≤ −1.5 = drought, ≥ +1.5 = very wet.
+
+**VCI / TCI / VHI** (0–100, MODIS) — vegetation-health composites
+from NDVI and daytime LST vs. 2001–2020 climatology. VHI < 40 =
+drought / vegetation stress.
+
+**Raw inputs:** precipitation, PET, water balance, NDVI, LST.
+
+**Requires:** Earth Engine credentials (already configured).
+**First fetch is slow** — 20–30 year baselines mean hundreds of
+Earth Engine calls per index family.
+"""),
+)
+
+register(
+    "phenology", "Vegetation Phenology (annual)", "phenology", "fetch_phenology_data",
+    # MOD13A1 composites have ~30-day latency; a full-season summary
+    # needs a completed calendar year.
+    latency_days=30,
+    window=lambda now, latest: (datetime(now.year - 5, 1, 1), datetime(now.year - 1, 12, 31)),
+    sidebar=("success", """
+🌱 **Vegetation Phenology (annual)**
+
+For each location and year, extracts seasonal timing and magnitude
+from the MODIS 16-day NDVI series:
+
+- **SOS_DOY / EOS_DOY** — Start / End of Season, day-of-year of the
+  NDVI ascending / descending crossing at 20 % of amplitude.
+- **LOS_DAYS** — Length of Season (EOS − SOS).
+- **PEAK_NDVI / PEAK_DOY** — annual maximum NDVI and its day-of-year.
+- **NDVI_INTEGRAL** — sum of NDVI over the growing season
+  (proxy for total productivity).
+
+**Source:** MODIS MOD13A1 (500 m, 16-day, 2000-present).
+
+**Note:** single-season detection. Bimodal regimes (East African
+long / short rains) collapse to the strongest peak. First fetch
+for a location can take a minute per year of data.
+"""),
+)
+
+register(
+    "hydrology", "Hydrology (Global Surface Water)", "hydrology", "fetch_gsw_stats_from_gdf",
+    input="polygons",
+    form="dataset",
+    sidebar=("success", """
+💦 **Hydrology (Global Surface Water)**
+
+Per-polygon water statistics from **JRC Global Surface Water v1.4**
+(Pekel et al. 2016, 30 m, 1984–2021).
+
+**Outputs per AOI:**
+- Total polygon area (km²)
+- Water-ever area (any pixel with water history)
+- **Permanent water** (occurrence > 90 %)
+- **Seasonal water** (5 % < occurrence ≤ 90 %)
+- Water percent of polygon
+- Area-weighted mean occurrence and change in occurrence
+
+Great for reservoirs, lakes, wetlands, and river-corridor
+monitoring at national or watershed scale.
+"""),
+)
+
+register(
+    "soil_moisture", "Soil Moisture (SMAP)", "soil_moisture", "fetch_smap_data",
+    # SMAP L4 has ~7-day latency; default to a 3-year window.
+    latency_days=7,
+    window=_years_back(3),
+    sidebar=("success", """
+🌊 **Soil Moisture (SMAP L4)**
+
+Monthly-mean **surface (0–5 cm)** and **root-zone (0–100 cm)**
+soil moisture at each point, plus anomalies against the 2015–2024
+per-calendar-month climatology.
+
+**Source:** SMAP L4 Global 9 km 3-hourly Soil Moisture (SPL4SMGP v7),
+aggregated to monthly means server-side.
+
+**Coverage:** 2015-04 → present, global.
+
+**Requires:** Earth Engine credentials.
+"""),
+)
+
+register(
+    "land_degradation", "Fire + Forest Loss (MODIS + FIRMS + Hansen)",
+    "land_degradation", "fetch_burned_area_from_gdf",
+    input="polygons",
+    # MCD64A1 typically has ~60-90 day latency.
+    latency_days=90,
+    window=_years_back(2),
+    sidebar=("success", """
+🔥 **Fire + Forest Loss (MODIS + FIRMS + Hansen)**
+
+Three complementary products, requestable together or
+independently. All emit one row per polygon per time step.
+
+**MODIS MCD64A1 (monthly burned area, ~60–90 day latency):**
+- `BURNED_AREA_KM2`, `PERCENT_BURNED`
+
+**FIRMS active fires (monthly aggregate, ~3-hour latency):**
+- `FIRE_DETECTIONS`, `MEAN_BRIGHTNESS_K`, `MEAN_CONFIDENCE`
+
+**Hansen Global Forest Change (annual, 30 m):**
+- `TREE_LOSS_KM2`, `PERCENT_LOSS`
+- `FOREST_2000_KM2`, `PERCENT_FOREST_2000` (year-2000 baseline
+  at >30 % canopy cover)
+- Coverage: 2001–2025 loss years, refreshed annually.
+
+**Input:** upload a shapefile / KML polygon, or pick an African
+country / division. Point-only input is not supported for this
+source — these statistics need a real polygon.
+"""),
+)
+
+register(
+    "productivity", "Vegetation Productivity (LAI/FAPAR/ET/GPP)",
+    "productivity", "fetch_productivity_data",
+    # MOD15A2H / MOD16A2 latency ~30-60 days.
+    latency_days=45,
+    window=_years_back(3),
+    sidebar=("success", """
+🌿 **Vegetation Productivity (LAI / FAPAR / ET / GPP)**
+
+Monthly per-location time series from three complementary MODIS
+products, requestable together or independently.
+
+**MOD15A2H (structure):**
+- `LAI_M2M2` — Leaf Area Index (m²/m², monthly mean)
+- `FAPAR` — Fraction of Absorbed PAR (0–1, monthly mean)
+
+**MOD16A2 gap-filled (water flux):**
+- `ET_MM` — actual evapotranspiration (mm/month)
+- `PET_MM_MODIS` — potential evapotranspiration (mm/month)
+
+**PML_V2 (carbon flux):**
+- `GPP_GC_M2` — Gross Primary Productivity (gC/m²/month)
+
+**Coverage:** 2000–present, 500 m native, monthly aggregate.
+"""),
+)
+
+register(
+    "forest_biomass", "Forest Biomass & Structure", "forest_biomass", "fetch_biomass_stats_from_gdf",
+    input="polygons",
+    form="dataset",
+    sidebar=("success", """
+🌳 **Forest Biomass & Structure**
+
+Static per-polygon statistics from three global forest datasets:
+
+- **ESA CCI Biomass v6.1** (100 m, 2015 or 2022 epoch) — mean AGB
+  in t/ha, total biomass in megatonnes, area with biomass.
+- **Potapov Canopy Height 2020** (30 m) — mean tree-canopy height
+  in metres, area with trees > 3 m.
+- **Global Mangrove Watch v3** (30 m, 2020) — mangrove area (km²)
+  and percent of polygon.
+
+Input: upload a shapefile / KML polygon, or pick an African
+country / division.
+"""),
+)
+
+register(
+    "africa_stack", "Africa Stack (iSDA soils + WorldCereal)", "africa_stack", "fetch_africa_stack_from_gdf",
+    input="polygons",
+    sidebar=("success", """
+🌍 **Africa Stack** — iSDA soils + ESA WorldCereal
+
+Per-polygon summary of Africa-tuned reference layers:
+
+- **iSDA-Africa soils** (30 m, 2021 v2): pH, organic carbon,
+  nitrogen, sand/clay/silt (0–20 cm topsoil; pH and OC also
+  available at 20–50 cm subsoil).
+- **ESA WorldCereal 2021** (10 m): cropland area, active vs
+  irrigated cropland, cropland percent of polygon.
+
+Input: upload a shapefile / KML polygon, or pick an African
+country / division.
+"""),
+)
+
+register(
+    "population", "Population & Built-up", "population", "fetch_population_stats_from_gdf",
+    input="polygons",
+    form="dataset",
+    sidebar=("success", """
+👥 **Population & Built-up**
+
+Per-polygon summary of three human-footprint gridded datasets:
+
+- **WorldPop 2020** (100 m) — population count and density.
+- **GHS-BUILT-S R2023A** (100 m, 2000 or 2020 epoch) — built-up
+  surface area (km²) and percent of polygon.
+- **VIIRS nighttime lights** (500 m, monthly) — mean radiance
+  as a proxy for electrification / economic activity.
+
+Input: upload a shapefile / KML polygon or pick an African
+country / division.
+"""),
+)
+
+register(
+    "air_quality", "Air Quality (TROPOMI + MODIS AOD)", "air_quality", "fetch_air_quality_data",
+    # TROPOMI has ~7-day latency; default to a 3-year window.
+    latency_days=14,
+    window=_years_back(3, floor=2019),
+    sidebar=("success", """
+🏭 **Air Quality (TROPOMI + MODIS AOD)**
+
+Monthly per-location time series of:
+- **NO₂, SO₂, CO** — Sentinel-5P TROPOMI tropospheric column
+  densities (mol/m²).
+- **CH₄** — column volume mixing ratio (ppb).
+- **AOD 550 nm** — MODIS MCD19A2 daily AOD, aggregated monthly.
+
+**Coverage:** TROPOMI Sept 2018 → present, MODIS AOD 2000 →
+present. Point time series, weather-schema output.
+"""),
+)
+
+
+# ---------------------------------------------------------------------------
+# Lookups
+# ---------------------------------------------------------------------------
+
+def get(key: str) -> Dict[str, Any]:
+    try:
+        return SOURCES[key]
+    except KeyError:
+        raise KeyError(f"unknown data source {key!r}") from None
+
+
+def labels() -> Dict[str, str]:
+    """{label: key} in registration order, for the source selectbox."""
+    return {spec["label"]: key for key, spec in SOURCES.items()}
+
+
+def point_sources() -> List[str]:
+    """Sources whose fetcher takes a list of points (batch CLI / API)."""
+    return [key for key, spec in SOURCES.items() if spec["input"] == "points"]
+
+
+def module(name: str):
+    """Import data_sources.<name> on first use (a source key or any helper
+    module such as 'earth_engine_utils')."""
+    if name in SOURCES:
+        name = SOURCES[name]["module"]
+    return importlib.import_module(f"data_sources.{name}")
+
+
+def fetcher(key: str) -> Callable:
+    spec = get(key)
+    return getattr(module(spec["module"]), spec["fetch"])
+
+
+def get_available_parameters(key: str) -> Dict[str, Dict[str, str]]:
+    return module(key).get_available_parameters()
+
+
+def get_temporal_resolutions(key: str) -> List[str]:
+    return module(key).get_temporal_resolutions()
+
+
+def date_window(key: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Date-picker bounds and defaults for a series source.
+
+    Returns:
+        Dict with latency_days, max_date, default_start, default_end
+    """
+    spec = get(key)
+    now = now or datetime.now()
+    if spec["lead_days"]:
+        max_date = now + timedelta(days=spec["lead_days"])
+    else:
+        max_date = now - timedelta(days=spec["latency_days"])
+    default_start, default_end = spec["window"](now, max_date)
+    return {
+        "latency_days": spec["latency_days"],
+        "max_date": max_date,
+        "default_start": default_start,
+        "default_end": default_end,
+    }
+
+
+class LazyModule:
+    """Stand-in for a data_sources module that imports it on first
+    attribute access, so `lulc = registry.lazy("lulc")` keeps call sites
+    like `lulc.get_dataset_info(...)` unchanged."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr: str):
+        return getattr(module(self._name), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy data_sources.{self._name}>"
+
+
+def lazy(name: str) -> LazyModule:
+    return LazyModule(name)
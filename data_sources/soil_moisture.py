@@ -23,6 +23,7 @@ whenever SMAP produces a longer record).
 
 from __future__ import annotations
 
+import logging
 from datetime import datetime
 from typing import Dict, List, Tuple
 
@@ -30,7 +31,13 @@ import ee
 import numpy as np
 import pandas as pd
 
-from .earth_engine_utils import EarthEngineClient
+from utils import checkpoint, progress
+
+from .earth_engine_utils import (
+    EarthEngineClient, get_features, monthly_windows, reduce_if_nonempty,
+)
+
+log = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
@@ -89,41 +96,47 @@ def _monthly_smap_series(
     fc = ee.FeatureCollection(feats)
 
     rows: List[Dict] = []
-    for year in range(start_year, end_year + 1):
-        for month in range(1, 13):
-            m_start = ee.Date.fromYMD(year, month, 1)
-            m_end = m_start.advance(1, "month")
-            monthly_img = coll.filterDate(m_start, m_end).mean().rename(band)
-
-            try:
-                reduced = monthly_img.reduceRegions(
-                    collection=fc,
-                    reducer=ee.Reducer.mean().setOutputs([out_field]),
-                    scale=11000,  # SMAP native ~9 km; 11 km gives safety
-                )
-                server_feats = reduced.getInfo().get("features", [])
-            except Exception as e:
-                print(f"[WARN] SMAP {band} {year}-{month:02d}: {e}")
-                continue
-
-            for feat in server_feats:
-                props = feat.get("properties") or {}
-                val = props.get(out_field)
-                if val is None:
+    loc_key = checkpoint.digest(locations)
+    months = monthly_windows(start_year, end_year)
+    progress.add_total(len(months), "months")
+    for year, month in months:
+        m_start = ee.Date.fromYMD(year, month, 1)
+        m_end = m_start.advance(1, "month")
+        month_images = coll.filterDate(m_start, m_end)
+        monthly_img = month_images.mean().rename(band)
+
+        try:
+            reduced = monthly_img.reduceRegions(
+                collection=fc,
+                reducer=ee.Reducer.mean().setOutputs([out_field]),
+                scale=11000,  # SMAP native ~9 km; 11 km gives safety
+            )
+            server_feats = checkpoint.fetch_chunk(
+                f"smap/{band}/{loc_key}/{year}-{month:02d}",
+                lambda: get_features(reduce_if_nonempty(month_images, reduced)),
+            )
+        except Exception as e:
+            log.warning(f"SMAP {band} {year}-{month:02d}: {e}")
+            continue
+
+        for feat in server_feats:
+            props = feat.get("properties") or {}
+            val = props.get(out_field)
+            if val is None:
+                sm = np.nan
+            else:
+                try:
+                    sm = float(val)
+                except (TypeError, ValueError):
                     sm = np.nan
-                else:
-                    try:
-                        sm = float(val)
-                    except (TypeError, ValueError):
-                        sm = np.nan
-                rows.append({
-                    "location_id": int(props.get("location_id", -1)),
-                    "latitude": props.get("latitude"),
-                    "longitude": props.get("longitude"),
-                    "year": year,
-                    "month": month,
-                    out_field: sm,
-                })
+            rows.append({
+                "location_id": int(props.get("location_id", -1)),
+                "latitude": props.get("latitude"),
+                "longitude": props.get("longitude"),
+                "year": year,
+                "month": month,
+                out_field: sm,
+            })
 
     if not rows:
         return pd.DataFrame(columns=[
@@ -138,6 +151,7 @@ def _monthly_smap_series(
 # Public fetch entry point (weather-schema compatible)
 # ---------------------------------------------------------------------------
 
+@progress.reporting
 def fetch_smap_data(
     locations: List[Tuple[float, float]],
     parameters: List[str],
@@ -184,7 +198,7 @@ def fetch_smap_data(
     want_surface = any(p.startswith("SM_SURFACE") for p in parameters)
     want_rootzone = any(p.startswith("SM_ROOTZONE") for p in parameters)
 
-    print(
+    log.info(
         f"[SMAP] Locations={len(locations)}  "
         f"target={start_dt.date()}..{end_dt.date()}  "
         f"pulling {fetch_start_year}-{fetch_end_year}  "
@@ -265,5 +279,5 @@ def fetch_smap_data(
 
     result = pd.concat(out_frames, ignore_index=True)
     result = result.sort_values(["location_id", "date"]).reset_index(drop=True)
-    print(f"[SUCCESS] SMAP: {len(result)} rows across {len(locations)} location(s).")
+    log.info(f"SMAP: {len(result)} rows across {len(locations)} location(s).")
     return result
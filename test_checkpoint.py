@@ -0,0 +1,127 @@
+"""
+Checks for utils/checkpoint.py: a fetch with a failed chunk raises
+IncompleteFetchError and keeps what it got, the retry only requests the
+missing chunks, and a clean run removes its checkpoints. Runs offline in
+a temporary directory with a fake chunked fetcher.
+
+    python test_checkpoint.py
+"""
+
+import os
+import sys
+import tempfile
+import traceback
+
+from utils import checkpoint
+
+MONTHS = [f"2024-{m:02d}" for m in range(1, 7)]
+
+
+def fake_fetch(requested: list, fail: set):
+    """Fetch every month through fetch_chunk, logging and skipping failed
+    months the way the fetchers do. Returns the payloads it got."""
+    rows = {}
+    for month in MONTHS:
+        def call(month=month):
+            requested.append(month)
+            if month in fail:
+                raise ConnectionError(f"timeout for {month}")
+            return {"month": month, "values": [1.0, 2.0]}
+        try:
+            rows[month] = checkpoint.fetch_chunk(f"chirps|{month}", call)
+        except ConnectionError:
+            continue
+    return rows
+
+
+def check_job_id_is_canonical(root: str) -> None:
+    a = checkpoint.job_id_for("era5", parameters=["t2m", "tp"], start_date="2024-01-01")
+    b = checkpoint.job_id_for("era5", start_date="2024-01-01", parameters=["t2m", "tp"])
+    c = checkpoint.job_id_for("era5", parameters=["t2m"], start_date="2024-01-01")
+    assert a == b and a != c
+    assert a.startswith("era5-")
+
+
+def check_outside_job_passes_through(root: str) -> None:
+    requested = []
+    rows = fake_fetch(requested, fail=set())
+    assert len(rows) == len(MONTHS) and requested == MONTHS
+    assert checkpoint.current_store() is None
+
+
+def check_failed_chunk_then_resume(root: str) -> None:
+    job_id = checkpoint.job_id_for("chirps", start_date="2024-01-01", end_date="2024-06-30")
+
+    requested = []
+    try:
+        with checkpoint.resumable_job(job_id, root=root):
+            fake_fetch(requested, fail={"2024-03", "2024-05"})
+        raise AssertionError("expected IncompleteFetchError")
+    except checkpoint.IncompleteFetchError as e:
+        assert sorted(e.outstanding) == ["chirps|2024-03", "chirps|2024-05"], e.outstanding
+    assert requested == MONTHS
+
+    # The retry requests only the two missing months and reuses the rest.
+    requested = []
+    with checkpoint.resumable_job(job_id, root=root, keep=True) as store:
+        rows = fake_fetch(requested, fail=set())
+    assert requested == ["2024-03", "2024-05"], requested
+    assert store.reused == len(MONTHS) - 2
+    assert sorted(rows) == MONTHS
+    assert rows["2024-01"] == {"month": "2024-01", "values": [1.0, 2.0]}
+
+
+def check_clean_run_removes_checkpoints(root: str) -> None:
+    job_id = checkpoint.job_id_for("chirps", start_date="2024-07-01")
+    with checkpoint.resumable_job(job_id, root=root) as store:
+        fake_fetch([], fail=set())
+    assert not os.path.exists(store.path)
+
+
+def check_unreadable_chunk_is_refetched(root: str) -> None:
+    job_id = checkpoint.job_id_for("chirps", start_date="2024-08-01")
+    with checkpoint.resumable_job(job_id, root=root, keep=True) as store:
+        fake_fetch([], fail=set())
+    # A torn / corrupt file is fetched again rather than failing the job.
+    with open(store._chunk_path("chirps|2024-02"), "wb") as f:
+        f.write(b"not gzip")
+    requested = []
+    with checkpoint.resumable_job(job_id, root=root):
+        rows = fake_fetch(requested, fail=set())
+    assert requested == ["2024-02"], requested
+    assert sorted(rows) == MONTHS
+
+
+CHECKS = [
+    check_job_id_is_canonical,
+    check_outside_job_passes_through,
+    check_failed_chunk_then_resume,
+    check_clean_run_removes_checkpoints,
+    check_unreadable_chunk_is_refetched,
+]
+
+
+def main() -> int:
+    print("=" * 60)
+    print("Checkpoint checks")
+    print("=" * 60)
+    failed = 0
+    for check in CHECKS:
+        with tempfile.TemporaryDirectory() as root:
+            try:
+                check(root)
+                print(f"  ✓ {check.__name__}")
+            except Exception:
+                failed += 1
+                print(f"  ✗ {check.__name__}")
+                traceback.print_exc()
+    print()
+    if failed:
+        print(f"[ERROR] {failed} of {len(CHECKS)} check(s) failed")
+        return 1
+    print(f"[SUCCESS] {len(CHECKS)} checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Checks for utils/result_store.py: results survive a spill to disk with
+their dtypes, reference counting keeps shared results alive, and evicted
+results come back as None. Runs offline in a temporary directory.
+
+    python test_result_store.py
+"""
+
+import os
+import sys
+import tempfile
+import traceback
+
+import numpy as np
+import pandas as pd
+
+from utils.result_store import ResultStore, frame_nbytes
+
+
+def sample_frame(n: int = 1000, seed: int = 0) -> pd.DataFrame:
+    """Weather-shaped frame with the dtypes the canonical schema produces."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "location_id": np.arange(n, dtype="int32") % 10,
+        "location_name": pd.Categorical([f"LGA {i % 10}" for i in range(n)]),
+        "date": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "T2M": rng.normal(27, 3, n).astype("float32"),
+        "PRECTOTCORR": rng.gamma(1.0, 2.0, n),
+    })
+
+
+def make_store(root: str, **budgets) -> ResultStore:
+    return ResultStore(root=root, **budgets)
+
+
+def check_spill_round_trip(root: str) -> None:
+    df = sample_frame()
+    # Session budget fits one frame, so the second put spills the first.
+    store = make_store(root, session_max_bytes=int(frame_nbytes(df) * 1.5))
+    first = store.put("s1", df)
+    second = store.put("s1", sample_frame(seed=1))
+
+    usage = store.usage("s1")
+    assert usage["spilled"] == 1 and usage["resident"] == 1, usage
+
+    back = store.get(first)
+    pd.testing.assert_frame_equal(back, df)
+    assert isinstance(back["location_name"].dtype, pd.CategoricalDtype)
+    assert back["T2M"].dtype == np.float32
+    assert pd.api.types.is_datetime64_any_dtype(back["date"])
+    # Loading the first back put it over budget again: the second spilled.
+    assert store.get(second) is not None
+    assert store.usage("s1")["spilled"] >= 1
+
+
+def check_refcount(root: str) -> None:
+    store = make_store(root)
+    key = store.put("s1", sample_frame())
+    assert store.retain(key) == key            # snapshot shares the result
+    store.release(key)                          # result replaced
+    assert store.get(key) is not None, "released while still referenced"
+    store.release(key)                          # snapshot deleted
+    assert store.get(key) is None
+    assert store.retain(key) is None
+    assert store.usage()["entries"] == 0
+
+
+def check_release_removes_spill_file(root: str) -> None:
+    df = sample_frame()
+    store = make_store(root, session_max_bytes=int(frame_nbytes(df) * 1.5))
+    first = store.put("s1", df)
+    store.put("s1", sample_frame(seed=1))
+    path = store._entries[first]["path"]
+    assert path is not None and os.path.exists(path)
+    store.release(first)
+    assert not os.path.exists(path)
+
+
+def check_eviction(root: str) -> None:
+    df = sample_frame()
+    # Nothing fits in memory or on disk: every spilled entry is evicted.
+    store = make_store(root, session_max_bytes=int(frame_nbytes(df) * 1.5), disk_max_bytes=1)
+    first = store.put("s1", df)
+    second = store.put("s1", sample_frame(seed=1))
+    assert store.get(first) is None, "evicted result should be gone"
+    assert store.get(second) is not None
+    assert store.usage()["disk_bytes"] == 0
+
+
+def check_drop_session(root: str) -> None:
+    store = make_store(root)
+    store.put("s1", sample_frame())
+    keep = store.put("s2", sample_frame())
+    store.drop_session("s1")
+    assert store.usage("s1")["entries"] == 0
+    assert store.get(keep) is not None
+
+
+CHECKS = [
+    check_spill_round_trip,
+    check_refcount,
+    check_release_removes_spill_file,
+    check_eviction,
+    check_drop_session,
+]
+
+
+def main() -> int:
+    print("=" * 60)
+    print("Result store checks")
+    print("=" * 60)
+    failed = 0
+    for check in CHECKS:
+        with tempfile.TemporaryDirectory() as root:
+            try:
+                check(root)
+                print(f"  ✓ {check.__name__}")
+            except Exception:
+                failed += 1
+                print(f"  ✗ {check.__name__}")
+                traceback.print_exc()
+    print()
+    if failed:
+        print(f"[ERROR] {failed} of {len(CHECKS)} check(s) failed")
+        return 1
+    print(f"[SUCCESS] {len(CHECKS)} checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Checks for utils/singleflight.py: concurrent callers of one key share a
+single call, errors reach every waiter, a waiter takes over when the
+leader is cancelled, and a waiter's own cancellation still works.
+Runs offline with threads and fake fetches.
+
+    python test_singleflight.py
+"""
+
+import sys
+import threading
+import time
+import traceback
+
+from utils import progress, tracing
+from utils.singleflight import Group
+
+N_CALLERS = 8
+
+
+def run_concurrently(target, n: int = N_CALLERS):
+    """Start `n` threads on target(i) and return (results, errors) by index."""
+    results, errors = [None] * n, [None] * n
+
+    def worker(i):
+        try:
+            results[i] = target(i)
+        except BaseException as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results, errors
+
+
+def check_coalesces_concurrent_calls() -> None:
+    group = Group()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"rows": 42}
+
+    def traced(i):
+        with tracing.trace_fetch("era5") as trace:
+            return group.do("era5|2024-01", fetch) + (trace,)
+
+    threading.Timer(0.5, release.set).start()
+    results, errors = run_concurrently(traced)
+    assert not any(errors), errors
+    assert len(calls) == 1, f"{len(calls)} upstream calls"
+    assert all(r[0] == {"rows": 42} for r in results)
+    leaders = [r for r in results if not r[1]]
+    assert len(leaders) == 1, "exactly one leader"
+    # The leader's trace counts every caller that waited on its call.
+    assert leaders[0][2].counters["waiters_served"] == N_CALLERS - 1
+    assert group.in_flight() == 0
+
+
+def check_distinct_keys_not_shared() -> None:
+    group = Group()
+    results, errors = run_concurrently(lambda i: group.do(f"key-{i}", lambda i=i: i))
+    assert not any(errors), errors
+    assert [r for r, shared in results] == list(range(N_CALLERS))
+    assert not any(shared for _, shared in results)
+
+
+def check_key_forgotten_after_call() -> None:
+    group = Group()
+    calls = []
+    for _ in range(3):
+        group.do("same", lambda: calls.append(1))
+    assert len(calls) == 3, "nothing should be cached between calls"
+
+
+def check_error_reaches_waiters() -> None:
+    group = Group()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ValueError("upstream 500")
+
+    threading.Timer(0.5, release.set).start()
+    _, errors = run_concurrently(lambda i: group.do("bad", fetch))
+    assert all(isinstance(e, ValueError) for e in errors), errors
+    assert group.in_flight() == 0
+
+
+def check_waiter_takes_over_cancelled_leader() -> None:
+    group = Group()
+    leader_started = threading.Event()
+    calls = []
+    token = progress.CancelToken()
+
+    def leader_fetch():
+        calls.append("leader")
+        leader_started.set()
+        time.sleep(0.3)
+        token.cancel()
+        progress.check_cancelled()
+
+    def leader():
+        with progress.track(cancel_token=token):
+            return group.do("chunk", leader_fetch)
+
+    def waiter():
+        leader_started.wait(5)
+        return group.do("chunk", lambda: calls.append("waiter") or "fresh")
+
+    results, errors = run_concurrently(lambda i: leader() if i == 0 else waiter(), n=2)
+    assert isinstance(errors[0], progress.FetchCancelled), errors
+    assert errors[1] is None, errors
+    assert results[1] == ("fresh", False), results
+    assert calls == ["leader", "waiter"], calls
+
+
+def check_waiter_honours_own_cancel() -> None:
+    group = Group()
+    started, release = threading.Event(), threading.Event()
+    token = progress.CancelToken()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "late"
+
+    def waiter():
+        started.wait(5)
+        with progress.track(cancel_token=token):
+            return group.do("slow", slow)
+
+    threading.Timer(0.2, token.cancel).start()
+    threading.Timer(2.0, release.set).start()
+    t0 = time.perf_counter()
+    results, errors = run_concurrently(lambda i: group.do("slow", slow) if i == 0 else waiter(), n=2)
+    assert results[0] == ("late", False), results
+    assert isinstance(errors[1], progress.FetchCancelled), errors
+    assert time.perf_counter() - t0 < 5
+
+
+CHECKS = [
+    check_coalesces_concurrent_calls,
+    check_distinct_keys_not_shared,
+    check_key_forgotten_after_call,
+    check_error_reaches_waiters,
+    check_waiter_takes_over_cancelled_leader,
+    check_waiter_honours_own_cancel,
+]
+
+
+def main() -> int:
+    print("=" * 60)
+    print("Singleflight checks")
+    print("=" * 60)
+    failed = 0
+    for check in CHECKS:
+        try:
+            check()
+            print(f"  ✓ {check.__name__}")
+        except Exception:
+            failed += 1
+            print(f"  ✗ {check.__name__}")
+            traceback.print_exc()
+    print()
+    if failed:
+        print(f"[ERROR] {failed} of {len(CHECKS)} check(s) failed")
+        return 1
+    print(f"[SUCCESS] {len(CHECKS)} checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
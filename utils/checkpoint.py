@@ -0,0 +1,265 @@
+"""
+Checkpointed, resumable fetches.
+
+Long fetches are made of many independent upstream calls: ERA5 pulls one
+(point batch, date window) at a time, the monthly EE series one month at
+a time, NASA POWER one location at a time. Inside a `resumable_job(job_id)`
+block every such call goes through `fetch_chunk(key, fn)`, which writes the
+raw upstream payload to a per-job directory as soon as it arrives and
+serves it from there on the next attempt. A retried job therefore only
+re-requests the chunks it does not have yet.
+
+Fetchers keep their existing "log and skip a failed month" behaviour, but
+inside a job the failure is recorded, and when the block exits the job
+raises `IncompleteFetchError` listing the outstanding chunk keys instead of
+letting a frame with silent holes through. Outside a job `fetch_chunk`
+just calls `fn()`, so scripts that use the fetchers directly are unchanged.
+
+Job ids are derived from the canonical request (`job_id_for`), so clicking
+Fetch again with the same selection resumes the same job. The default
+CHECKPOINT_DIR is a private (0700) per-user directory under the system
+temp dir.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from utils import progress, singleflight, tracing
+
+
+def _config(name: str, default):
+    try:
+        import config
+        return getattr(config, name, default)
+    except Exception:
+        return default
+
+
+def default_root() -> str:
+    configured = os.getenv("CHECKPOINT_DIR") or _config("CHECKPOINT_DIR", "")
+    if configured:
+        return configured
+    uid = os.getuid() if hasattr(os, "getuid") else os.getpid()
+    return private_dir(
+        os.path.join(tempfile.gettempdir(), f"weather_portal_checkpoints-{uid}"), "CHECKPOINT_DIR"
+    )
+
+
+def private_dir(path: str, setting: str) -> str:
+    """Create `path` readable by this user only, refusing a directory
+    that another user owns (the system temp dir is shared). `setting` is
+    the config name to suggest for choosing another location."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        st = os.stat(path)
+        if st.st_uid != os.getuid():
+            raise PermissionError(f"{path} is owned by another user; set {setting}")
+        if st.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    return path
+
+
+_active_store: contextvars.ContextVar = contextvars.ContextVar(
+    "weather_portal_checkpoint_store", default=None
+)
+
+
+class IncompleteFetchError(RuntimeError):
+    """Some chunks of a checkpointed job are still missing."""
+
+    def __init__(self, job_id: str, outstanding: Dict[str, str], completed: int):
+        self.job_id = job_id
+        self.outstanding = outstanding
+        self.completed = completed
+        keys = sorted(outstanding)
+        preview = ", ".join(keys[:5]) + (f" (+{len(keys) - 5} more)" if len(keys) > 5 else "")
+        super().__init__(
+            f"{len(keys)} chunk(s) still outstanding for job {job_id}: {preview}. "
+            f"{completed} completed chunk(s) are saved; retry to fetch only the missing ones."
+        )
+
+
+def job_id_for(source: str, **request: Any) -> str:
+    """Stable id for a request: same source + canonical arguments, same id."""
+    canonical = json.dumps(request, sort_keys=True, default=str, separators=(",", ":"))
+    digest = hashlib.sha1(f"{source}|{canonical}".encode("utf-8")).hexdigest()[:16]
+    return f"{source}-{digest}"
+
+
+def digest(obj: Any) -> str:
+    """Short stable hash of a JSON-able value, for building chunk keys
+    (e.g. the location list a batched reduction runs over)."""
+    canonical = json.dumps(obj, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def _safe_name(key: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", key)
+    if len(name) > 120:
+        name = name[:100] + "_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return name
+
+
+class CheckpointStore:
+    """On-disk chunk payloads for one job: <root>/<job_id>/<chunk>.json.gz."""
+
+    def __init__(self, job_id: str, root: Optional[str] = None):
+        self.job_id = job_id
+        self.root = root or default_root()
+        self.path = os.path.join(self.root, _safe_name(job_id))
+        os.makedirs(self.path, exist_ok=True)
+        self.failed: Dict[str, str] = {}
+        self.saved = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    def _chunk_path(self, key: str) -> str:
+        return os.path.join(self.path, _safe_name(key) + ".json.gz")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._chunk_path(key))
+
+    def load(self, key: str) -> Any:
+        with gzip.open(self._chunk_path(key), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, key: str, payload: Any) -> None:
+        final = self._chunk_path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        os.close(fd)
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, final)  # atomic: a crash never leaves half a chunk
+        with self._lock:
+            self.saved += 1
+            self.failed.pop(key, None)
+
+    def mark_failed(self, key: str, error: BaseException) -> None:
+        with self._lock:
+            self.failed[key] = f"{type(error).__name__}: {error}"
+
+    def completed_keys(self) -> List[str]:
+        return sorted(n[:-len(".json.gz")] for n in os.listdir(self.path) if n.endswith(".json.gz"))
+
+    def manifest(self) -> Dict[str, Any]:
+        with self._lock:
+            failed = dict(self.failed)
+        return {
+            "job_id": self.job_id,
+            "completed": len(self.completed_keys()),
+            "reused": self.reused,
+            "outstanding": failed,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def write_manifest(self) -> None:
+        with open(os.path.join(self.path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(self.manifest(), f, indent=2)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def current_store() -> Optional[CheckpointStore]:
+    return _active_store.get()
+
+
+def fetch_chunk(key: str, fetch: Callable[[], Any]) -> Any:
+    """Return the payload for one upstream chunk, from the active job's
+    checkpoint if it is there, else by calling `fetch()` and saving the
+    (JSON-serialisable) result. No-op wrapper outside a job.
+
+    Concurrent calls for the same `key`, from any session or job, share
+    one upstream call (utils.singleflight), so keys must be canonical:
+    built from everything that shapes the request, see `digest()`.
+
+    Also the fetchers' chunk boundary for utils.progress: raises
+    FetchCancelled before the chunk if the fetch was cancelled, and counts
+    the chunk as one unit done afterwards, whether it succeeded or not.
+    """
+    progress.check_cancelled()
+    try:
+        return _fetch_chunk(key, fetch)
+    finally:
+        progress.advance()
+
+
+def _coalesced(key: str, fetch: Callable[[], Any]) -> Any:
+    payload, shared = singleflight.chunks().do(key, fetch)
+    if shared:
+        tracing.count("coalesced")
+    return payload
+
+
+def _fetch_chunk(key: str, fetch: Callable[[], Any]) -> Any:
+    store = _active_store.get()
+    if store is None:
+        return _coalesced(key, fetch)
+    if store.has(key):
+        try:
+            payload = store.load(key)
+        except (OSError, ValueError):
+            payload = None  # unreadable checkpoint: fetch it again
+        else:
+            with store._lock:
+                store.reused += 1
+            tracing.count("cache_hits")
+            return payload
+    try:
+        payload = _coalesced(key, fetch)
+    except Exception as e:
+        store.mark_failed(key, e)
+        raise
+    store.save(key, payload)
+    return payload
+
+
+def prune(root: Optional[str] = None, max_age_s: Optional[float] = None) -> None:
+    """Remove job directories untouched for longer than `max_age_s`."""
+    root = root or default_root()
+    max_age_s = max_age_s if max_age_s is not None else _config("CHECKPOINT_MAX_AGE_S", 7 * 86400)
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - max_age_s
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+@contextmanager
+def resumable_job(job_id: str, root: Optional[str] = None,
+                  keep: bool = False) -> Iterator[CheckpointStore]:
+    """Run the enclosed fetch as checkpointed job `job_id`.
+
+    On a clean exit with no failed chunks the checkpoints are deleted
+    (unless `keep`); otherwise they stay on disk for the retry and
+    IncompleteFetchError lists what is missing.
+    """
+    prune(root)
+    store = CheckpointStore(job_id, root)
+    token = _active_store.set(store)
+    try:
+        yield store
+    finally:
+        _active_store.reset(token)
+        store.write_manifest()
+    if store.failed:
+        raise IncompleteFetchError(job_id, dict(store.failed), len(store.completed_keys()))
+    if not keep:
+        store.clear()
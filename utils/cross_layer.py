@@ -147,7 +147,7 @@ def derive_zscore(df: pd.DataFrame, col: str, group_cols: Optional[List[str]] =
         return (x - x.mean()) / x.std(ddof=1)
     grp = df[group_cols].copy()
     grp["__x__"] = x
-    z = grp.groupby(group_cols)["__x__"].transform(
+    z = grp.groupby(group_cols, observed=True)["__x__"].transform(
         lambda s: (s - s.mean()) / s.std(ddof=1)
     )
     return z
@@ -167,7 +167,7 @@ def per_location_correlation(
             return np.nan
         return float(np.corrcoef(a[valid], b[valid])[0, 1])
 
-    out = df.groupby(group_col).apply(_r).rename(f"corr_{a_col}_{b_col}")
+    out = df.groupby(group_col, observed=True).apply(_r).rename(f"corr_{a_col}_{b_col}")
     return out.reset_index()
 
 
@@ -180,7 +180,7 @@ def summarise_over_time(
     """One row per location with time-series summary stats per value col."""
     if not value_cols:
         return pd.DataFrame()
-    grouped = df.groupby(group_col)[value_cols].agg(list(stats))
+    grouped = df.groupby(group_col, observed=True)[value_cols].agg(list(stats))
     grouped.columns = [f"{c}_{s}" for c, s in grouped.columns]
     return grouped.reset_index()
 
@@ -207,7 +207,7 @@ def anomaly_vs_baseline(
     means = (
         df.assign(__x__=x, __m__=month)
         .loc[baseline_mask]
-        .groupby([group_col, "__m__"])["__x__"]
+        .groupby([group_col, "__m__"], observed=True)["__x__"]
         .mean()
         .to_dict()
     )
@@ -0,0 +1,246 @@
+"""
+Data-cube export (NetCDF4 / Zarr) for multi-location time series.
+
+Point and gridded results come back as long tables, one row per
+(location, timestamp). Climate users load them into xarray, where the
+natural shape is a cube: one variable per parameter over (time, location)
+or, when the locations form a full lat/lon grid, over (time, lat, lon).
+
+`to_cube` builds that cube without a per-row loop: the time and location
+keys are factorised once and every variable is scattered into a
+preallocated array with a single fancy-indexing assignment. Metadata
+follows CF-1.8: point sets use the discrete-sampling-geometry
+`timeSeries` layout (a `location` dimension with latitude / longitude /
+name as coordinates), grids use plain lat / lon dimensions.
+
+NetCDF4 output is zlib-compressed and chunked along time and space. Zarr
+is offered when the optional `zarr` package is installed; the store is
+shipped as a ZIP.
+
+xarray is imported lazily: it is only needed when a cube is exported.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.export_handler import split_locations
+
+TIME_COLUMNS = ("date", "datetime", "time", "timestamp")
+
+# Target chunk shape: a year of daily steps by a few hundred locations
+# (~0.5 MB of float32), small enough to read one series cheaply.
+TIME_CHUNK = 366
+SPACE_CHUNK = 256
+COMPRESSION_LEVEL = 4
+
+
+def zarr_available() -> bool:
+    try:
+        import zarr  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def time_column(df: pd.DataFrame) -> Optional[str]:
+    """The result's time column, or None when it has none."""
+    return next((c for c in TIME_COLUMNS if c in df.columns), None)
+
+
+def _units_from_label(label: str) -> Optional[str]:
+    # Parameter labels end with their unit, e.g. "Temperature at 2 Meters (°C)".
+    m = re.search(r"\(([^()]+)\)\s*$", label)
+    return m.group(1) if m else None
+
+
+def _regular_grid(locations: pd.DataFrame):
+    """(lat values, lon values, lat index, lon index) when the locations are
+    exactly one point per cell of a lat x lon grid, else None."""
+    lats, lat_idx = np.unique(locations["latitude"].to_numpy(), return_inverse=True)
+    lons, lon_idx = np.unique(locations["longitude"].to_numpy(), return_inverse=True)
+    if len(lats) < 2 or len(lons) < 2 or len(lats) * len(lons) != len(locations):
+        return None
+    if len(np.unique(lat_idx * len(lons) + lon_idx)) != len(locations):
+        return None
+    return lats, lons, lat_idx, lon_idx
+
+
+def to_cube(df: pd.DataFrame, variable_attrs: Optional[Dict[str, Dict]] = None,
+            title: str = "", source: str = ""):
+    """
+    Pivot a long result into an xarray Dataset.
+
+    Args:
+        df: Result with a time column, a location key or coordinates, and
+            one column per variable
+        variable_attrs: Optional per-variable attributes (long_name, units)
+        title: Global `title` attribute
+        source: Global `source` attribute
+
+    Returns:
+        xarray.Dataset with dims (time, location) or (time, lat, lon)
+    """
+    import xarray as xr
+
+    tcol = time_column(df)
+    if tcol is None:
+        raise ValueError("result has no time column (date / datetime / time)")
+    if df.empty:
+        raise ValueError("result is empty")
+    if "latitude" not in df.columns or "longitude" not in df.columns:
+        raise ValueError("result has no latitude / longitude columns")
+
+    locations, observations, key = split_locations(df)
+    locations = pd.DataFrame(locations.drop(columns="geometry"))
+    variables = [
+        c for c, dtype in observations.dtypes.items()
+        if c not in (key, tcol) and pd.api.types.is_numeric_dtype(dtype)
+        and not pd.api.types.is_bool_dtype(dtype)
+    ]
+    if not variables:
+        raise ValueError("result has no numeric variables")
+
+    times, t_idx = np.unique(pd.to_datetime(observations[tcol]).to_numpy(), return_inverse=True)
+    loc_pos = pd.Index(locations[key].to_numpy()).get_indexer(observations[key].to_numpy())
+
+    grid = _regular_grid(locations)
+    if grid is not None:
+        lats, lons, lat_of_loc, lon_of_loc = grid
+        dims = ("time", "lat", "lon")
+        shape = (len(times), len(lats), len(lons))
+        index = (t_idx, lat_of_loc[loc_pos], lon_of_loc[loc_pos])
+        coords = {
+            "time": ("time", times),
+            "lat": ("lat", lats, {"standard_name": "latitude", "units": "degrees_north"}),
+            "lon": ("lon", lons, {"standard_name": "longitude", "units": "degrees_east"}),
+        }
+    else:
+        dims = ("time", "location")
+        shape = (len(times), len(locations))
+        index = (t_idx, loc_pos)
+        coords = {
+            "time": ("time", times),
+            "location": ("location", np.arange(len(locations), dtype=np.int32)),
+            key: ("location", locations[key].to_numpy(), {"cf_role": "timeseries_id"}),
+            "latitude": ("location", locations["latitude"].to_numpy(dtype=np.float64),
+                         {"standard_name": "latitude", "units": "degrees_north"}),
+            "longitude": ("location", locations["longitude"].to_numpy(dtype=np.float64),
+                          {"standard_name": "longitude", "units": "degrees_east"}),
+        }
+        for name_col in ("location_name", "polygon_name", "name"):
+            if name_col in locations.columns:
+                coords[name_col] = ("location", locations[name_col].astype(str).to_numpy(),
+                                    {"long_name": "location name"})
+                break
+
+    data_vars = {}
+    for var in variables:
+        values = observations[var].to_numpy(dtype=np.float64, na_value=np.nan)
+        dtype = np.float32 if observations[var].dtype == np.float32 else np.float64
+        cube = np.full(shape, np.nan, dtype=dtype)
+        cube[index] = values
+        attrs = {"coordinates": "latitude longitude"} if grid is None else {}
+        attrs.update((variable_attrs or {}).get(var, {}))
+        data_vars[var] = (dims, cube, attrs)
+
+    ds = xr.Dataset(data_vars, coords=coords)
+    ds["time"].attrs.update({"standard_name": "time", "axis": "T"})
+    ds.attrs.update({
+        "Conventions": "CF-1.8",
+        "title": title or "Weather Data Portal export",
+        "source": source,
+        "history": f"{datetime.now(timezone.utc):%Y-%m-%dT%H:%M:%SZ} created by Weather Data Portal",
+    })
+    if grid is None:
+        ds.attrs["featureType"] = "timeSeries"
+    return ds
+
+
+def variable_attrs_from_labels(labels: Dict[str, str]) -> Dict[str, Dict]:
+    """CF long_name / units from the portal's parameter labels."""
+    out = {}
+    for code, label in labels.items():
+        attrs = {"long_name": label}
+        units = _units_from_label(label)
+        if units:
+            attrs["units"] = units
+        out[code] = attrs
+    return out
+
+
+def _encoding(ds) -> Dict[str, Dict]:
+    encoding = {}
+    for var in ds.data_vars:
+        chunks = tuple(
+            min(n, TIME_CHUNK if dim == "time" else SPACE_CHUNK)
+            for dim, n in zip(ds[var].dims, ds[var].shape)
+        )
+        encoding[var] = {"zlib": True, "complevel": COMPRESSION_LEVEL,
+                         "chunksizes": chunks, "_FillValue": np.nan}
+    return encoding
+
+
+def export_to_netcdf(df: pd.DataFrame, **cube_kwargs) -> bytes:
+    """
+    Export a result as a chunked, compressed NetCDF4 cube.
+
+    Args:
+        df: Result (see to_cube)
+        **cube_kwargs: Passed to to_cube
+
+    Returns:
+        NetCDF4 data as bytes
+    """
+    ds = to_cube(df, **cube_kwargs)
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "cube.nc")
+    try:
+        ds.to_netcdf(path, engine="netcdf4", format="NETCDF4", encoding=_encoding(ds))
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def export_to_zarr(df: pd.DataFrame, **cube_kwargs) -> bytes:
+    """
+    Export a result as a Zarr store, zipped (requires `zarr`).
+
+    Args:
+        df: Result (see to_cube)
+        **cube_kwargs: Passed to to_cube
+
+    Returns:
+        ZIP of the Zarr store as bytes
+    """
+    ds = to_cube(df, **cube_kwargs)
+    for var in ds.data_vars:
+        ds[var].encoding["chunks"] = tuple(
+            min(n, TIME_CHUNK if dim == "time" else SPACE_CHUNK)
+            for dim, n in zip(ds[var].dims, ds[var].shape)
+        )
+    temp_dir = tempfile.mkdtemp()
+    store = os.path.join(temp_dir, "cube.zarr")
+    try:
+        ds.to_zarr(store, mode="w")
+        buf = io.BytesIO()
+        # Chunks are already compressed by zarr's default codec.
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            for root, _, files in os.walk(store):
+                for name in files:
+                    full = os.path.join(root, name)
+                    zf.write(full, os.path.relpath(full, temp_dir))
+        return buf.getvalue()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,163 @@
+"""
+Multi-format download bundle.
+
+Users often download one result as CSV, GeoJSON, Shapefile and the
+reproducibility files one after another, each built on its own click.
+`build_bundle` builds all of the selected formats at once, each in a
+worker thread, and writes every file into a single ZIP as soon as it is
+ready. The bundle takes roughly as long as its slowest format, not the
+sum of all of them.
+
+Threads rather than processes: the heavy writers (Arrow / Parquet,
+GDAL via pyogrio, netCDF, zlib) release the GIL, and handing the
+DataFrame to a thread costs nothing, where a process would have to
+pickle it.
+
+A format that fails does not sink the bundle. The error goes into
+`manifest.json` next to the per-file sizes and build times.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Optional, Union
+
+import pandas as pd
+
+from utils import cube_export, export_handler
+
+# Format -> writer taking the result DataFrame and returning bytes.
+BUILDERS: Dict[str, Callable[[pd.DataFrame], bytes]] = {
+    "CSV": export_handler.export_to_csv,
+    "JSON": export_handler.export_to_json,
+    "JSONL": export_handler.export_to_jsonl,
+    "Excel": export_handler.export_to_excel,
+    "Parquet": export_handler.export_to_parquet,
+    "Feather": export_handler.export_to_feather,
+    "GeoJSON": export_handler.export_to_geojson,
+    "GeoJSONSeq": export_handler.export_to_geojson_seq,
+    "Shapefile": export_handler.export_to_shapefile_bytes,
+    "GeoParquet": export_handler.export_to_geoparquet,
+    "GeoPackage": export_handler.export_to_geopackage_normalized,
+    "NormalizedParquet": export_handler.export_to_parquet_normalized,
+    "NetCDF": cube_export.export_to_netcdf,
+}
+
+# These need latitude / longitude columns; NetCDF also a time column.
+SPATIAL_FORMATS = ("GeoJSON", "GeoJSONSeq", "Shapefile", "GeoParquet",
+                   "GeoPackage", "NormalizedParquet", "NetCDF")
+
+# Already compressed: stored as-is rather than deflated a second time.
+# (GeoPackage is an uncompressed SQLite file, so it is deflated.)
+_STORED = ("Parquet", "Feather", "GeoParquet", "Shapefile", "NormalizedParquet",
+           "NetCDF", "Excel")
+
+
+
+def _config(name: str, default):
+    try:
+        import config
+        return getattr(config, name, default)
+    except Exception:
+        return default
+
+
+def entry_name(base_name: str, fmt: str) -> str:
+    """File name of `fmt` inside the bundle. Formats that are ZIPs of their
+    own (Shapefile, NormalizedParquet) get the format in the name so they
+    cannot collide."""
+    name = export_handler.get_export_filename(base_name, fmt)
+    if name.endswith(".zip"):
+        name = export_handler.get_export_filename(f"{base_name}_{fmt.lower()}", fmt)
+    return name
+
+
+def available_formats(df: pd.DataFrame) -> list:
+    """Bundle formats that apply to `df`."""
+    spatial = "latitude" in df.columns and "longitude" in df.columns
+    out = []
+    for fmt in BUILDERS:
+        if fmt in SPATIAL_FORMATS and not spatial:
+            continue
+        if fmt == "NetCDF" and cube_export.time_column(df) is None:
+            continue
+        out.append(fmt)
+    return out
+
+
+def build_bundle(df: pd.DataFrame, formats: Iterable[str], base_name: str,
+                 extras: Optional[Dict[str, Union[bytes, Callable[[], bytes]]]] = None,
+                 format_kwargs: Optional[Dict[str, Dict]] = None,
+                 max_workers: Optional[int] = None) -> bytes:
+    """
+    Build `formats` concurrently and ZIP them together.
+
+    Args:
+        df: Result to export
+        formats: Keys of BUILDERS
+        base_name: File name stem inside the ZIP
+        extras: Additional files, name -> bytes or a no-argument callable
+            returning bytes (e.g. provenance.json), built in the same pool
+        format_kwargs: Optional keyword arguments per format, e.g.
+            {"NetCDF": {"variable_attrs": ...}}
+        max_workers: Worker threads (default BUNDLE_WORKERS)
+
+    Returns:
+        ZIP data as bytes
+    """
+    tasks: Dict[str, Callable[[], bytes]] = {}
+    stored = set()
+    for fmt in formats:
+        if fmt not in BUILDERS:
+            raise ValueError(f"unknown bundle format: {fmt}")
+        name = entry_name(base_name, fmt)
+        kwargs = (format_kwargs or {}).get(fmt, {})
+        tasks[name] = (lambda builder=BUILDERS[fmt], kwargs=kwargs: builder(df, **kwargs))
+        if fmt in _STORED:
+            stored.add(name)
+    for name, data in (extras or {}).items():
+        tasks[name] = data if callable(data) else (lambda data=data: data)
+
+    workers = max(1, min(len(tasks), max_workers or _config("BUNDLE_WORKERS", 4)))
+    manifest = {"files": {}, "errors": {}}
+    t0 = time.perf_counter()
+    # The caller needs the ZIP as bytes (st.download_button), so it is built
+    # in memory: getvalue() hands over BytesIO's buffer without a copy,
+    # where a spooled temp file would have to be read back in full.
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf, \
+            ThreadPoolExecutor(max_workers=workers,
+                               thread_name_prefix="weather-portal-bundle") as pool:
+        futures = {pool.submit(_timed, fn): name for name, fn in tasks.items()}
+        # Written in completion order, so a slow format never holds
+        # finished ones in memory.
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                data, seconds = future.result()
+            except Exception as e:
+                manifest["errors"][name] = f"{type(e).__name__}: {e}"
+                continue
+            compress = zipfile.ZIP_STORED if name in stored else zipfile.ZIP_DEFLATED
+            zf.writestr(name, data, compress_type=compress)
+            manifest["files"][name] = {"bytes": len(data), "seconds": round(seconds, 3)}
+        manifest["rows"] = int(len(df))
+        manifest["seconds"] = round(time.perf_counter() - t0, 3)
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return buf.getvalue()
+
+
+def read_manifest(data: bytes) -> Dict:
+    """The manifest of a bundle built by build_bundle."""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return json.loads(zf.read("manifest.json"))
+
+
+def _timed(fn: Callable[[], bytes]):
+    t0 = time.perf_counter()
+    data = fn()
+    return data, time.perf_counter() - t0
@@ -1,47 +1,193 @@
 import pandas as pd
 import geopandas as gpd
+import gzip
+import io
 import json
+import numpy as np
+import shutil
 import tempfile
 import os
-from typing import Dict, Any
+import re
+import zipfile
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List
+from .schema import TIME_COLUMNS, widen_floats
 from .shapefile_handler import create_geodataframe_from_data, create_shapefile_zip
 
 
-def export_to_csv(df: pd.DataFrame) -> bytes:
+# Text formats are written in row slices into a spooled buffer (memory up
+# to SPOOL_MAX_BYTES, then a temp file), optionally through gzip, so the
+# peak is one slice of formatted text rather than the whole payload as a
+# string, its encoded bytes and a stringified copy of the frame.
+EXPORT_CHUNK_ROWS = 50_000
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def _chunks(df: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _datetime_formats(df: pd.DataFrame) -> Dict[str, str]:
+    """strftime format per datetime column, chosen once for the whole
+    column (date-only when every value is midnight) so all slices agree."""
+    formats = {}
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            values = df[col]
+            dates_only = bool((values.dropna() == values.dropna().dt.normalize()).all())
+            formats[col] = "%Y-%m-%d" if dates_only else "%Y-%m-%d %H:%M:%S"
+    return formats
+
+
+def _json_ready(chunk: pd.DataFrame, formats: Dict[str, str]) -> pd.DataFrame:
+    """Slice with datetimes as strings and float32 widened for JSON writers."""
+    chunk = widen_floats(chunk)
+    if formats:
+        chunk = chunk.copy()
+        for col, fmt in formats.items():
+            chunk[col] = chunk[col].dt.strftime(fmt)
+    return chunk
+
+
+def iter_csv(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """CSV text in row slices; the first carries the header. Datetime
+    columns use one format for the whole column, as in iter_json."""
+    if df.empty:
+        yield df.to_csv(index=False)
+        return
+    formats = _datetime_formats(df)
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        if formats:
+            chunk = chunk.assign(**{
+                col: chunk[col].dt.strftime(fmt) for col, fmt in formats.items()
+            })
+        yield chunk.to_csv(index=False, header=i == 0)
+
+
+def iter_json(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """A JSON array of records (indented), in row slices."""
+    formats = _datetime_formats(df)
+    yield "["
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        body = _json_ready(chunk, formats).to_json(orient="records", indent=2)
+        # "[\n  {...},\n  {...}\n]" -> "\n  {...},\n  {...}"
+        yield ("," if i else "") + body[1:-1].rstrip("\n")
+    yield "\n]" if len(df) else "]"
+
+
+def iter_jsonl(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """JSON Lines: one record object per line."""
+    formats = _datetime_formats(df)
+    for chunk in _chunks(df, chunk_rows):
+        body = _json_ready(chunk, formats).to_json(orient="records", lines=True)
+        yield body if body.endswith("\n") else body + "\n"
+
+
+def _iter_features(df: pd.DataFrame, lat_col: str, lon_col: str,
+                   chunk_rows: int) -> Iterator[List[str]]:
+    """Serialised GeoJSON point features, one list per row slice."""
+    formats = _datetime_formats(df)
+    for chunk in _chunks(df, chunk_rows):
+        gdf = create_geodataframe_from_data(_json_ready(chunk, formats), lat_col, lon_col)
+        yield [json.dumps(feature) for feature in gdf.iterfeatures(na="null")]
+
+
+def iter_geojson(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude",
+                 chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """A GeoJSON FeatureCollection of points, in row slices."""
+    yield '{"type": "FeatureCollection", "features": ['
+    first = True
+    for features in _iter_features(df, lat_col, lon_col, chunk_rows):
+        if features:
+            yield ("" if first else ", ") + ", ".join(features)
+            first = False
+    yield "]}"
+
+
+def iter_geojson_seq(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude",
+                     chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """GeoJSON text sequence (RFC 8142): each feature prefixed with RS and
+    ended with a newline, so readers can stream it feature by feature."""
+    for features in _iter_features(df, lat_col, lon_col, chunk_rows):
+        yield "".join(f"\x1e{feature}\n" for feature in features)
+
+
+def write_text(pieces: Iterable[str], fileobj: BinaryIO, compress: bool = False) -> None:
+    """Encode `pieces` as UTF-8 into `fileobj`, optionally gzip-compressed."""
+    if not compress:
+        for piece in pieces:
+            fileobj.write(piece.encode("utf-8"))
+        return
+    # mtime=0 keeps the output identical for identical data.
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", mtime=0) as gz:
+        for piece in pieces:
+            gz.write(piece.encode("utf-8"))
+
+
+def spool_text(pieces: Iterable[str], compress: bool = False) -> BinaryIO:
+    """Write `pieces` into a spooled temp file and return it rewound."""
+    buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    write_text(pieces, buf, compress)
+    buf.seek(0)
+    return buf
+
+
+def _spooled_bytes(pieces: Iterable[str], compress: bool) -> bytes:
+    with spool_text(pieces, compress) as buf:
+        return buf.read()
+
+
+def export_to_csv(df: pd.DataFrame, compress: bool = False) -> bytes:
     """
     Export DataFrame to CSV format.
     
     Args:
         df: DataFrame to export
+        compress: gzip the output
     
     Returns:
         CSV data as bytes
     """
-    return df.to_csv(index=False).encode("utf-8")
+    return _spooled_bytes(iter_csv(df), compress)
 
 
-def export_to_json(df: pd.DataFrame, orient: str = "records") -> bytes:
+def export_to_json(df: pd.DataFrame, orient: str = "records", compress: bool = False) -> bytes:
     """
     Export DataFrame to JSON format.
     
     Args:
         df: DataFrame to export
         orient: JSON orientation ('records', 'split', 'index', 'columns', 'values')
+        compress: gzip the output
     
     Returns:
         JSON data as bytes
     """
-    # Handle datetime columns
-    df_copy = df.copy()
-    for col in df_copy.columns:
-        if pd.api.types.is_datetime64_any_dtype(df_copy[col]):
-            df_copy[col] = df_copy[col].astype(str)
+    if orient == "records":
+        return _spooled_bytes(iter_json(df), compress)
+
+    # Other orients are one JSON object and can't be written in slices.
+    json_str = _json_ready(df, _datetime_formats(df)).to_json(orient=orient, indent=2)
+    return _spooled_bytes([json_str], compress)
+
+
+def export_to_jsonl(df: pd.DataFrame, compress: bool = False) -> bytes:
+    """
+    Export DataFrame to JSON Lines (one record per line).
+    
+    Args:
+        df: DataFrame to export
+        compress: gzip the output
     
-    json_str = df_copy.to_json(orient=orient, indent=2)
-    return json_str.encode("utf-8")
+    Returns:
+        JSON Lines data as bytes
+    """
+    return _spooled_bytes(iter_jsonl(df), compress)
 
 
-def export_to_geojson(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude") -> bytes:
+def export_to_geojson(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude",
+                      compress: bool = False) -> bytes:
     """
     Export DataFrame to GeoJSON format.
     
@@ -49,16 +195,29 @@ def export_to_geojson(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str
         df: DataFrame to export
         lat_col: Name of latitude column
         lon_col: Name of longitude column
+        compress: gzip the output
     
     Returns:
         GeoJSON data as bytes
     """
-    # Create GeoDataFrame
-    gdf = create_geodataframe_from_data(df, lat_col, lon_col)
+    return _spooled_bytes(iter_geojson(df, lat_col, lon_col), compress)
+
+
+def export_to_geojson_seq(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude",
+                          compress: bool = False) -> bytes:
+    """
+    Export DataFrame to a GeoJSON text sequence (RFC 8142).
+    
+    Args:
+        df: DataFrame to export
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+        compress: gzip the output
     
-    # Convert to GeoJSON
-    geojson_str = gdf.to_json()
-    return geojson_str.encode("utf-8")
+    Returns:
+        GeoJSON-seq data as bytes
+    """
+    return _spooled_bytes(iter_geojson_seq(df, lat_col, lon_col), compress)
 
 
 def export_to_shapefile(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude") -> str:
@@ -78,7 +237,7 @@ def export_to_shapefile(df: pd.DataFrame, lat_col: str = "latitude", lon_col: st
     output_path = os.path.join(temp_dir, "export")
     
     # Create GeoDataFrame
-    gdf = create_geodataframe_from_data(df, lat_col, lon_col)
+    gdf = create_geodataframe_from_data(widen_floats(df), lat_col, lon_col)
 
     # Shapefile (.dbf) has a 10-char column name limit. Naive truncation can
     # collide (e.g. ALLSKY_SFC_SW_DWN and ALLSKY_SFC_LW_DWN both -> ALLSKY_SFC).
@@ -116,47 +275,388 @@ def export_to_shapefile(df: pd.DataFrame, lat_col: str = "latitude", lon_col: st
     
     # Create ZIP file
     zip_path = create_shapefile_zip(output_path)
-    
+
     return zip_path
 
 
-def export_to_excel(df: pd.DataFrame) -> bytes:
+def export_to_shapefile_bytes(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude") -> bytes:
+    """
+    Export DataFrame to a zipped Shapefile and return its bytes.
+
+    Args:
+        df: DataFrame to export
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+
+    Returns:
+        ZIP data as bytes (the temporary files are removed)
+    """
+    zip_path = export_to_shapefile(df, lat_col, lon_col)
+    try:
+        with open(zip_path, "rb") as f:
+            return f.read()
+    finally:
+        shutil.rmtree(os.path.dirname(zip_path), ignore_errors=True)
+
+
+# Excel. Rows are streamed through openpyxl's write-only mode, which keeps
+# one row in memory instead of a cell object per value. A sheet holds at
+# most EXCEL_MAX_ROWS rows including the header; longer results are split
+# across sheets, at location boundaries when the result has a location key.
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_SHEETS = 250
+
+
+def _excel_shards(df: pd.DataFrame, key: str, rows_per_sheet: int) -> List[Dict[str, Any]]:
+    """Plan sheets as row ranges of `df` (sorted by `key` when given),
+    packing whole locations into a sheet while they fit."""
+    n = len(df)
+    if n <= rows_per_sheet:
+        return [{"start": 0, "stop": n}]
+    if not key:
+        return [{"start": i, "stop": min(i + rows_per_sheet, n)} for i in range(0, n, rows_per_sheet)]
+    keys = df[key].to_numpy()
+    # Start of each location's run of rows, plus the end.
+    bounds = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]).tolist() + [n]
+    shards = []
+    start = 0
+    for b0, b1 in zip(bounds[:-1], bounds[1:]):
+        if b1 - start > rows_per_sheet and b0 > start:
+            shards.append({"start": start, "stop": b0})
+            start = b0
+        while b1 - start > rows_per_sheet:  # one location longer than a sheet
+            shards.append({"start": start, "stop": start + rows_per_sheet})
+            start += rows_per_sheet
+    shards.append({"start": start, "stop": n})
+    for shard in shards:
+        shard["first"], shard["last"] = keys[shard["start"]], keys[shard["stop"] - 1]
+    return shards
+
+
+def _excel_rows(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[tuple]:
+    """Rows as tuples of plain Python values, with missing values as None
+    (openpyxl would otherwise write NaN, which Excel rejects)."""
+    for chunk in _chunks(widen_floats(df), chunk_rows):
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def export_to_excel(df: pd.DataFrame, max_rows: int = EXCEL_MAX_ROWS) -> bytes:
     """
     Export DataFrame to Excel format.
     
+    A 'Summary' sheet comes first; the data follows on one sheet, or on
+    several when it exceeds Excel's row limit.
+    
     Args:
         df: DataFrame to export
+        max_rows: Rows per sheet including the header
     
     Returns:
         Excel data as bytes
     """
-    # Create temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp_file:
-        tmp_path = tmp_file.name
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    key = next((k for k in LOCATION_KEYS if k in df.columns), "")
+    if key and len(df) > max_rows - 1:
+        df = df.sort_values(key, kind="stable")
+    shards = _excel_shards(df, key, max_rows - 1)
+    if len(shards) > EXCEL_MAX_SHEETS:
+        raise ValueError(
+            f"{len(df):,} rows would need {len(shards)} sheets; use CSV or Parquet instead"
+        )
+    for i, shard in enumerate(shards, 1):
+        if len(shards) == 1:
+            shard["name"] = "Data"
+        elif key:
+            span = re.sub(r"[\[\]:*?/\\]", "_", f"{shard['first']}-{shard['last']}")
+            shard["name"] = f"Data {i} ({span})"[:31]
+        else:
+            shard["name"] = f"Data {i}"
+
+    wb = Workbook(write_only=True)
+    bold = Font(bold=True)
+
+    def header(ws, values):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = bold
+            cells.append(cell)
+        ws.append(cells)
+
+    summary = wb.create_sheet("Summary")
+    header(summary, ["Item", "Value"])
+    summary.append(["Rows", len(df)])
+    summary.append(["Columns", ", ".join(map(str, df.columns))])
+    if key:
+        summary.append([f"Distinct {key}", int(df[key].nunique())])
+    for col in ("date", "datetime"):
+        if col in df.columns and len(df):
+            summary.append([f"First {col}", df[col].min()])
+            summary.append([f"Last {col}", df[col].max()])
+            break
+    summary.append(["Generated", datetime.now().replace(microsecond=0)])
+    summary.append([])
+    header(summary, ["Sheet", "Rows"] + ([f"First {key}", f"Last {key}"] if key and len(shards) > 1 else []))
+    for shard in shards:
+        row = [shard["name"], shard["stop"] - shard["start"]]
+        if key and len(shards) > 1:
+            row += [_plain(shard["first"]), _plain(shard["last"])]
+        summary.append(row)
+
+    for shard in shards:
+        ws = wb.create_sheet(shard["name"])
+        header(ws, [str(c) for c in df.columns])
+        for row in _excel_rows(df.iloc[shard["start"]:shard["stop"]]):
+            ws.append(row)
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+# Columnar formats. zstd compresses these tables several times smaller than
+# snappy at a similar write speed; row groups of this many rows keep reader
+# memory bounded and let Arrow/DuckDB skip groups by their min/max stats.
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 250_000
+
+
+def export_to_parquet(df: pd.DataFrame, compression: str = PARQUET_COMPRESSION,
+                      row_group_size: int = PARQUET_ROW_GROUP_SIZE) -> bytes:
+    """
+    Export DataFrame to Parquet format.
     
-    try:
-        # Write to Excel
-        df.to_excel(tmp_path, index=False, engine="openpyxl")
-        
-        # Read back as bytes
-        with open(tmp_path, "rb") as f:
-            data = f.read()
-        
-        return data
+    Args:
+        df: DataFrame to export
+        compression: Parquet codec ('zstd', 'snappy', 'gzip', 'none')
+        row_group_size: Maximum rows per row group
+    
+    Returns:
+        Parquet data as bytes
+    """
+    buf = io.BytesIO()
+    df.to_parquet(buf, engine="pyarrow", index=False,
+                  compression=compression, row_group_size=row_group_size)
+    return buf.getvalue()
+
+
+def geodataframe_to_geoparquet(gdf: gpd.GeoDataFrame, compression: str = PARQUET_COMPRESSION,
+                               row_group_size: int = PARQUET_ROW_GROUP_SIZE) -> bytes:
+    """
+    Write a GeoDataFrame (points or polygons) as GeoParquet.
+    
+    Args:
+        gdf: GeoDataFrame to export
+        compression: Parquet codec
+        row_group_size: Maximum rows per row group
+    
+    Returns:
+        GeoParquet data as bytes (WKB geometry, CRS in the file metadata)
+    """
+    buf = io.BytesIO()
+    gdf.to_parquet(buf, index=False, compression=compression, row_group_size=row_group_size)
+    return buf.getvalue()
+
+
+def export_to_geoparquet(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude") -> bytes:
+    """
+    Export a point result to GeoParquet.
+    
+    Args:
+        df: DataFrame to export
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+    
+    Returns:
+        GeoParquet data as bytes
+    """
+    return geodataframe_to_geoparquet(create_geodataframe_from_data(df, lat_col, lon_col))
+
+
+def export_to_feather(df: pd.DataFrame, compression: str = PARQUET_COMPRESSION) -> bytes:
+    """
+    Export DataFrame to Arrow IPC / Feather v2 format.
+    
+    Args:
+        df: DataFrame to export
+        compression: 'zstd', 'lz4' or 'uncompressed'
+    
+    Returns:
+        Feather data as bytes
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    buf = io.BytesIO()
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), buf,
+                          compression=compression)
+    return buf.getvalue()
+
+
+# Location-normalized exports. A long time-series result repeats each
+# location's coordinates and name on every row, so a point export carries
+# one identical geometry per (location, timestamp). These split it into a
+# point layer with one feature per location and an attribute table keyed
+# by the location key, or pack each location's series into array columns.
+LOCATION_KEYS = ("location_id", "polygon_id")
+LOCATION_ATTRIBUTES = ("latitude", "longitude", "location_name", "polygon_name", "name")
+
+
+def split_locations(df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude"):
+    """
+    Split a long result into a location layer and an observation table.
+    
+    Args:
+        df: Result with one row per (location, timestamp)
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+    
+    Returns:
+        Tuple of (locations GeoDataFrame, one point per location;
+        observations DataFrame without the per-location columns; key column)
+    """
+    key = next((k for k in LOCATION_KEYS if k in df.columns), None)
+    if key is None:
+        key = "location_id"
+        codes = df.groupby([lat_col, lon_col], sort=False, observed=True).ngroup()
+        df = df.assign(location_id=codes.astype("int32"))
+    location_cols = [key] + [c for c in LOCATION_ATTRIBUTES if c in df.columns and c != key]
+    locations = df[location_cols].drop_duplicates(subset=key).reset_index(drop=True)
+    locations = gpd.GeoDataFrame(
+        locations,
+        geometry=gpd.points_from_xy(locations[lon_col], locations[lat_col]),
+        crs="EPSG:4326",
+    )
+    observations = df.drop(columns=location_cols[1:])
+    return locations, observations, key
+
+
+def location_arrays(df: pd.DataFrame, lat_col: str = "latitude",
+                    lon_col: str = "longitude") -> gpd.GeoDataFrame:
+    """
+    One feature per location with its series packed into array columns
+    (date -> list of dates, T2M -> list of values, ...), in time order.
+    
+    Args:
+        df: Result with one row per (location, timestamp)
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+    
+    Returns:
+        GeoDataFrame with list-valued columns
+    """
+    locations, observations, key = split_locations(df, lat_col, lon_col)
+    time_col = next((c for c in TIME_COLUMNS if c in observations.columns), None)
+    order = [key, time_col] if time_col else key
+    observations = observations.sort_values(order, kind="stable")
+    keys, counts = np.unique(observations[key].to_numpy(), return_counts=True)
+    bounds = np.cumsum(counts)[:-1]
+    out = locations.set_index(key).loc[keys].reset_index()
+    for col in observations.columns:
+        if col != key:
+            out[col] = np.split(observations[col].to_numpy(), bounds)
+    return out
+
+
+def _gis_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """Categories as plain strings, which every OGR driver accepts, and
+    float32 widened (OGR stores REAL as double)."""
+    df = widen_floats(df)
+    cats = [c for c, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    if not cats:
+        return df
+    df = df.copy()
+    for col in cats:
+        df[col] = df[col].astype(str)
+    return df
+
+
+def export_to_geopackage_normalized(df: pd.DataFrame, lat_col: str = "latitude",
+                                    lon_col: str = "longitude") -> bytes:
+    """
+    Export to a GeoPackage with a `locations` point layer and an
+    `observations` attribute table that joins to it on the location key.
     
+    Args:
+        df: Result with one row per (location, timestamp)
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+    
+    Returns:
+        GeoPackage data as bytes
+    """
+    locations, observations, _ = split_locations(df, lat_col, lon_col)
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "export.gpkg")
+    try:
+        _gis_ready(locations).to_file(path, layer="locations", driver="GPKG")
+        gpd.GeoDataFrame(_gis_ready(observations)).to_file(
+            path, layer="observations", driver="GPKG"
+        )
+        with open(path, "rb") as f:
+            return f.read()
     finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def export_to_parquet_normalized(df: pd.DataFrame, lat_col: str = "latitude",
+                                 lon_col: str = "longitude") -> bytes:
+    """
+    Export to a ZIP of `locations.geoparquet` (one point per location) and
+    `observations.parquet` (keyed by the location key).
+    
+    Args:
+        df: Result with one row per (location, timestamp)
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+    
+    Returns:
+        ZIP data as bytes
+    """
+    locations, observations, _ = split_locations(df, lat_col, lon_col)
+    buf = io.BytesIO()
+    # Parquet is already compressed; storing avoids a second pass.
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("locations.geoparquet", geodataframe_to_geoparquet(locations))
+        zf.writestr("observations.parquet", export_to_parquet(observations))
+    return buf.getvalue()
+
+
+def export_to_location_arrays(df: pd.DataFrame, lat_col: str = "latitude",
+                              lon_col: str = "longitude") -> bytes:
+    """
+    Export to GeoParquet with one feature per location and each variable
+    as an array column (see location_arrays).
+    
+    Args:
+        df: Result with one row per (location, timestamp)
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+    
+    Returns:
+        GeoParquet data as bytes
+    """
+    return geodataframe_to_geoparquet(location_arrays(df, lat_col, lon_col))
 
 
-def get_export_filename(base_name: str, format: str) -> str:
+def get_export_filename(base_name: str, format: str, compress: bool = False) -> str:
     """
     Generate export filename based on format.
     
     Args:
         base_name: Base name for the file
-        format: Export format ('CSV', 'JSON', 'GeoJSON', 'Shapefile', 'Excel')
+        format: Export format ('CSV', 'JSON', 'JSONL', 'GeoJSON', 'GeoJSONSeq',
+            'Shapefile', 'Excel', 'Parquet', 'GeoParquet', 'Feather',
+            'GeoPackage', 'NormalizedParquet', 'LocationArrays', 'NetCDF', 'Zarr')
+        compress: The file is gzip-compressed (adds '.gz')
     
     Returns:
         Filename with appropriate extension
@@ -164,21 +664,34 @@ def get_export_filename(base_name: str, format: str) -> str:
     format_extensions = {
         "CSV": ".csv",
         "JSON": ".json",
+        "JSONL": ".jsonl",
         "GeoJSON": ".geojson",
+        "GeoJSONSeq": ".geojsons",
         "Shapefile": ".zip",
         "Excel": ".xlsx",
+        "Parquet": ".parquet",
+        "GeoParquet": ".geoparquet",
+        "Feather": ".feather",
+        "GeoPackage": ".gpkg",
+        "NormalizedParquet": ".zip",
+        "LocationArrays": ".geoparquet",
+        "NetCDF": ".nc",
+        "Zarr": ".zarr.zip",
     }
     
     extension = format_extensions.get(format, ".txt")
+    if compress:
+        extension += ".gz"
     return f"{base_name}{extension}"
 
 
-def get_export_mime_type(format: str) -> str:
+def get_export_mime_type(format: str, compress: bool = False) -> str:
     """
     Get MIME type for export format.
     
     Args:
         format: Export format
+        compress: The file is gzip-compressed
     
     Returns:
         MIME type string
@@ -186,9 +699,21 @@ def get_export_mime_type(format: str) -> str:
     mime_types = {
         "CSV": "text/csv",
         "JSON": "application/json",
+        "JSONL": "application/x-ndjson",
         "GeoJSON": "application/geo+json",
+        "GeoJSONSeq": "application/geo+json-seq",
         "Shapefile": "application/zip",
         "Excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "Parquet": "application/vnd.apache.parquet",
+        "GeoParquet": "application/vnd.apache.parquet",
+        "Feather": "application/vnd.apache.arrow.file",
+        "GeoPackage": "application/geopackage+sqlite3",
+        "NormalizedParquet": "application/zip",
+        "LocationArrays": "application/vnd.apache.parquet",
+        "NetCDF": "application/x-netcdf",
+        "Zarr": "application/zip",
     }
     
+    if compress:
+        return "application/gzip"
     return mime_types.get(format, "application/octet-stream")
@@ -0,0 +1,342 @@
+"""
+Background fetch jobs.
+
+Streamlit re-executes app.py on every widget interaction, so a fetch run
+inside the `st.button(...)` branch blocks the session, and touching any
+widget mid-fetch can abort or re-trigger it. Instead the app hands the
+fetch to a process-wide `JobRunner`: a small thread pool that outlives
+reruns and sessions. Each submission gets a job id; the UI keeps the ids
+in session state and polls `runner.get(job_id)` until the job finishes,
+then loads the result.
+
+Job state is a plain dict, mirrored to `<JOBS_DIR>/<job_id>/status.json`
+on every transition; a finished job's DataFrame is written next to it as
+`result.parquet` (never a pickle: loading one runs code, and job ids come
+from API URLs). The default JOBS_DIR is a private (0700) directory owned
+by the current user; ids that are not in the runner's own format are
+refused. A job the status file says is queued/running but that this
+process does not know about (the server restarted) is reported as
+"interrupted"; resubmitting the same request resumes it from its
+checkpointed chunks (see utils/checkpoint.py), because the checkpoint job
+id is derived from the request, not from the run.
+
+States: queued -> running -> done | incomplete | cancelled | failed, or
+interrupted. Finished jobs are forgotten, and their files removed, once
+they are older than JOB_MAX_AGE_S; until then a "done" job is reused for
+an identical request. While a job runs its `progress` field holds the latest
+utils.progress snapshot (units done / total, bytes, ETA); `cancel(job_id)`
+stops it at the next chunk boundary, keeping the chunks already fetched.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from utils import checkpoint, profiling, progress, schema, tracing
+
+log = logging.getLogger("weather_portal.jobs")
+
+ACTIVE_STATES = ("queued", "running")
+FINAL_STATES = ("done", "incomplete", "cancelled", "failed", "interrupted")
+
+_DEFAULT_WORKERS = 2
+
+# Job ids as JobRunner.submit generates them: <YYYYmmdd-HHMMSS>-<6 hex>.
+_JOB_ID_RE = re.compile(r"^\d{8}-\d{6}-[0-9a-f]{6}$")
+
+
+def _config(name: str, default):
+    try:
+        import config
+        return getattr(config, name, default)
+    except Exception:
+        return default
+
+
+# How often the app's jobs panel re-polls while a job is active.
+POLL_SECONDS = _config("JOB_POLL_SECONDS", 2)
+
+
+def default_root() -> str:
+    configured = os.getenv("JOBS_DIR") or _config("JOBS_DIR", "")
+    if configured:
+        return configured
+    uid = os.getuid() if hasattr(os, "getuid") else os.getpid()
+    return checkpoint.private_dir(
+        os.path.join(tempfile.gettempdir(), f"weather_portal_jobs-{uid}"), "JOBS_DIR"
+    )
+
+
+def valid_job_id(job_id: str) -> bool:
+    """True if `job_id` has the format JobRunner.submit generates."""
+    return isinstance(job_id, str) and bool(_JOB_ID_RE.match(job_id))
+
+
+class JobRunner:
+    """Thread-pool runner for fetch jobs with on-disk status and results."""
+
+    def __init__(self, root: Optional[str] = None, max_workers: Optional[int] = None):
+        self.root = root or default_root()
+        os.makedirs(self.root, exist_ok=True)
+        self.max_workers = int(max_workers or _config("JOB_WORKERS", _DEFAULT_WORKERS))
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="weather-portal-job"
+        )
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # In-memory extras that do not go to status.json.
+        self._traces: Dict[str, tracing.FetchTrace] = {}
+        self._profiles: Dict[str, profiling.ProfileReport] = {}
+        self._cancel_tokens: Dict[str, progress.CancelToken] = {}
+        self.max_age_s = _config("JOB_MAX_AGE_S", 7 * 86400)
+        checkpoint.prune(self.root, self.max_age_s)
+
+    # -- submission ---------------------------------------------------------
+
+    def submit(self, source: str, fn: Callable[[], Optional[pd.DataFrame]],
+               request_key: str, label: str = "", attrs: Optional[Dict] = None,
+               profile: bool = False) -> str:
+        """Queue `fn` (a no-argument fetch returning a DataFrame) as a job.
+
+        `request_key` identifies the request (checkpoint.job_id_for); while
+        a job for the same request is queued or running, its id is returned
+        instead of starting a duplicate.
+        """
+        self.expire()
+        with self._lock:
+            for job in self._jobs.values():
+                if job["request_key"] == request_key and job["status"] in ACTIVE_STATES:
+                    # Identical request already in flight (possibly from
+                    # another session): share it rather than fetch twice.
+                    log.info(f"job {job['job_id']} coalesced a duplicate request")
+                    return job["job_id"]
+            job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            job = {
+                "job_id": job_id,
+                "request_key": request_key,
+                "source": source,
+                "label": label or source,
+                "attrs": dict(attrs or {}),
+                "status": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "rows": None,
+                "error": None,
+                "outstanding": None,
+                "progress": None,
+                "trace": None,
+            }
+            self._jobs[job_id] = job
+            self._cancel_tokens[job_id] = progress.CancelToken()
+            self._persist(job)
+        self._pool.submit(self._run, job_id, fn, profile)
+        log.info(f"job {job_id} queued: {job['label']}")
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[[], Optional[pd.DataFrame]],
+             profile: bool) -> None:
+        job = self._jobs[job_id]
+        self._update(job_id, status="running", started_at=time.time())
+        prof = None
+        df = None
+        final: Dict[str, Any] = {}
+        try:
+            with profiling.maybe_profile("fetch", job["source"], enabled=profile) as prof:
+                with tracing.trace_fetch(job["source"], job_id=job_id, **job["attrs"]) as trace:
+                    self._traces[job_id] = trace
+                    with progress.track(
+                        lambda snap: self._update(job_id, progress=snap),
+                        self._cancel_tokens[job_id],
+                    ), checkpoint.resumable_job(job["request_key"]):
+                        df = fn()
+                    df = self._save_result(job_id, df)
+            final = {"status": "done", "rows": None if df is None else int(len(df))}
+        except checkpoint.IncompleteFetchError as e:
+            # The fetcher returned what it got before the failed chunks were
+            # counted: keep it so the partial frame can be shown meanwhile.
+            try:
+                df = self._save_result(job_id, df)
+            except Exception as save_error:
+                log.warning(f"job {job_id}: could not save partial result: {save_error}")
+                df = None
+            final = {
+                "status": "incomplete", "error": str(e), "outstanding": e.outstanding,
+                "rows": None if df is None else int(len(df)),
+            }
+        except progress.FetchCancelled:
+            log.info(f"job {job_id} cancelled")
+            final = {"status": "cancelled"}
+        except Exception as e:
+            log.error(f"job {job_id} failed: {e}\n{traceback.format_exc()}")
+            final = {"status": "failed", "error": str(e)}
+        finally:
+            self._cancel_tokens.pop(job_id, None)
+            if prof is not None and prof.report is not None:
+                self._profiles[job_id] = prof.report
+            trace = self._traces.get(job_id)
+            final.setdefault("status", "failed")
+            self._update(
+                job_id, finished_at=time.time(),
+                trace=trace.summary() if trace is not None else None,
+                **final,
+            )
+
+    def _save_result(self, job_id: str,
+                     df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """Normalize `df` and write it as the job's result; returns it."""
+        if df is None:
+            return None
+        tracing.count("rows", len(df))
+        with tracing.span("normalize"):
+            df = schema.normalize(df)
+        path = self._result_path(job_id)
+        df.to_parquet(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return df
+
+    # -- state --------------------------------------------------------------
+
+    def _job_dir(self, job_id: str) -> str:
+        if not valid_job_id(job_id):
+            raise ValueError(f"invalid job id: {job_id!r}")
+        return os.path.join(self.root, job_id)
+
+    def _result_path(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), "result.parquet")
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            self._persist(job)
+
+    def _persist(self, job: Dict[str, Any]) -> None:
+        path = self._job_dir(job["job_id"])
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, "status.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, default=str)
+        os.replace(tmp, os.path.join(path, "status.json"))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job's state, from memory or from its status file."""
+        if not valid_job_id(job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        try:
+            with open(os.path.join(self._job_dir(job_id), "status.json"), encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job.get("status") in ACTIVE_STATES:
+            # Not ours: the process that owned it is gone.
+            job["status"] = "interrupted"
+        return job
+
+    def find(self, request_key: str, states=ACTIVE_STATES + ("done",)) -> Optional[Dict[str, Any]]:
+        """Newest job in this process for `request_key` in one of `states`.
+
+        Finished jobs older than JOB_MAX_AGE_S are expired first, so a
+        "done" result is reused only while it is fresh.
+        """
+        self.expire()
+        with self._lock:
+            matches = [
+                dict(job) for job in self._jobs.values()
+                if job["request_key"] == request_key and job["status"] in states
+            ]
+        return max(matches, key=lambda j: j["submitted_at"]) if matches else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            out: Dict[str, int] = {}
+            for job in self._jobs.values():
+                out[job["status"]] = out.get(job["status"], 0) + 1
+        return out
+
+    def jobs(self, job_ids: List[str]) -> List[Dict[str, Any]]:
+        return [job for job in (self.get(j) for j in job_ids) if job is not None]
+
+    def result(self, job_id: str) -> Optional[pd.DataFrame]:
+        if not valid_job_id(job_id):
+            return None
+        path = self._result_path(job_id)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)
+
+    def trace(self, job_id: str) -> Optional[tracing.FetchTrace]:
+        return self._traces.get(job_id)
+
+    def profile(self, job_id: str) -> Optional[profiling.ProfileReport]:
+        return self._profiles.get(job_id)
+
+    def cancel(self, job_id: str) -> None:
+        """Ask a queued or running job to stop at its next chunk boundary."""
+        token = self._cancel_tokens.get(job_id)
+        if token is not None:
+            token.cancel()
+
+    def discard(self, job_id: str) -> None:
+        """Forget a finished job and delete its files."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job["status"] in ACTIVE_STATES:
+                return
+            self._jobs.pop(job_id, None)
+        self._forget(job_id)
+
+    def expire(self) -> int:
+        """Discard jobs that finished more than JOB_MAX_AGE_S ago; returns
+        how many. Keeps a long-running server's job table (and the traces
+        and profiles held beside it) from growing without bound."""
+        cutoff = time.time() - self.max_age_s
+        with self._lock:
+            old = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINAL_STATES and (job["finished_at"] or cutoff) < cutoff
+            ]
+            for job_id in old:
+                del self._jobs[job_id]
+        for job_id in old:
+            self._forget(job_id)
+        if old:
+            log.info(f"expired {len(old)} finished job(s)")
+        return len(old)
+
+    def _forget(self, job_id: str) -> None:
+        self._traces.pop(job_id, None)
+        self._profiles.pop(job_id, None)
+        self._cancel_tokens.pop(job_id, None)
+        if valid_job_id(job_id):
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    """Process-wide runner (module state survives Streamlit reruns)."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+    return _runner
@@ -0,0 +1,327 @@
+"""
+Pre-flight cost estimates for a point/AOI fetch.
+
+Before the user clicks "Fetch Weather Data" the app asks `estimate_fetch()`
+what the request will cost: upstream round-trips, Earth Engine elements
+materialised by getInfo(), bytes on the wire, output rows and expected
+wall time. Each source has a small cost model below that mirrors the loop
+structure of its fetcher (calls per location for NASA POWER, one
+reduceRegions per month for the monthly EE series, batch x chunk for
+ERA5, ...). Where a fetcher has tunable sizing (ERA5 chunk_days /
+batch_size) the model also picks the values and returns them in
+`fetch_options`, which the app passes straight through to the fetcher.
+
+Wall time is `round_trips * seconds_per_call + elements * seconds_per_element`
+from the constants below, unless utils.tracing has already observed a few
+round-trips for the source in this process, in which case the observed
+mean wins. Figures are estimates meant for ordering of magnitude, not
+billing.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from data_sources import registry
+from utils import tracing
+
+
+# Order-of-magnitude per-call latency and per-element cost. Only used
+# until tracing has real numbers for the source.
+_HTTP_SECONDS_PER_CALL = 1.5
+_EE_SECONDS_PER_CALL = 2.5
+_EE_SECONDS_PER_ELEMENT = 0.0004
+_NASA_SECONDS_PER_VALUE = 0.00002
+
+# Approximate JSON size per returned element.
+_NASA_BYTES_PER_VALUE = 20
+_EE_BYTES_PER_FEATURE = 250
+_EE_BYTES_PER_BAND = 30
+
+# Requests past these get a warning next to the estimate.
+WARN_WALL_SECONDS = 300
+WARN_ROUND_TRIPS = 500
+
+
+def _n_days(start_date: str, end_date: str) -> int:
+    s = datetime.strptime(start_date, "%Y-%m-%d")
+    e = datetime.strptime(end_date, "%Y-%m-%d")
+    return max((e - s).days + 1, 0)
+
+
+def _years(start_date: str, end_date: str):
+    return (
+        datetime.strptime(start_date, "%Y-%m-%d").year,
+        datetime.strptime(end_date, "%Y-%m-%d").year,
+    )
+
+
+def _ee_cost(round_trips: int, elements: int, max_per_call: int, n_bands: int, rows: int,
+             **extra) -> Dict:
+    cost = {
+        "round_trips": round_trips,
+        "ee_elements": elements,
+        "max_elements_per_call": max_per_call,
+        "bytes": elements * (_EE_BYTES_PER_FEATURE + _EE_BYTES_PER_BAND * max(n_bands, 1)),
+        "rows": rows,
+        "seconds_model": round_trips * _EE_SECONDS_PER_CALL + elements * _EE_SECONDS_PER_ELEMENT,
+    }
+    cost.update(extra)
+    return cost
+
+
+def _monthly_series_cost(n_locations: int, n_series: int, start_year: int, end_year: int,
+                         rows: int, n_bands: int = 1) -> Dict:
+    # One reduceRegions over all points per (series, year, month).
+    months = 12 * max(end_year - start_year + 1, 0)
+    calls = n_series * months
+    return _ee_cost(calls, calls * n_locations, n_locations, n_bands, rows)
+
+
+# ---------------------------------------------------------------------------
+# Per-source cost models
+# ---------------------------------------------------------------------------
+
+def _nasa_power(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    steps = _n_days(start_date, end_date) * (24 if resolution == "Hourly" else 1)
+    values = n_locations * steps * len(parameters)
+    return {
+        "round_trips": n_locations,  # one GET per location, all params in it
+        "ee_elements": 0,
+        "max_elements_per_call": 0,
+        "bytes": values * _NASA_BYTES_PER_VALUE,
+        "rows": n_locations * steps,
+        "seconds_model": n_locations * _HTTP_SECONDS_PER_CALL + values * _NASA_SECONDS_PER_VALUE,
+    }
+
+
+def _openweather(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    return {
+        "round_trips": n_locations,
+        "ee_elements": 0,
+        "max_elements_per_call": 0,
+        "bytes": n_locations * 20_000,
+        "rows": n_locations * (40 if resolution == "Hourly" else 8),
+        "seconds_model": n_locations * _HTTP_SECONDS_PER_CALL,
+    }
+
+
+def _era5(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    daily = resolution == "Daily"
+    # The fetcher treats end_date as exclusive.
+    n_days = max(_n_days(start_date, end_date) - 1, 0)
+    ee_utils = registry.module("earth_engine_utils")
+    plan = ee_utils.plan_era5_chunks(n_locations, n_days, use_daily_aggregate=daily)
+    elements = n_locations * n_days * (1 if daily else 24)
+    rows = elements
+    if resolution == "Monthly":
+        rows = n_locations * max(math.ceil(n_days / 30.4), 1)
+    notes = [
+        f"{plan['n_batches']} point batch(es) of {plan['batch_size']} x "
+        f"{plan['n_chunks']} window(s) of {plan['chunk_days']} day(s)"
+    ]
+    return _ee_cost(
+        plan["round_trips"], elements, plan["max_elements_per_call"], len(parameters), rows,
+        fetch_options={"chunk_days": plan["chunk_days"], "batch_size": plan["batch_size"]},
+        notes=notes,
+    )
+
+
+def _modis(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    getinfo_max = registry.module("earth_engine_utils").EE_GETINFO_MAX
+    n_days = _n_days(start_date, end_date)
+    calls = elements = max_per_call = 0
+    for p in parameters:
+        if "LST" in p:
+            # size() then toList() per location; daily MOD11A1, capped at 5000.
+            per_loc = min(n_days, getinfo_max)
+            calls += 2 * n_locations
+        elif "NDVI" in p or "EVI" in p:
+            per_loc = min(math.ceil(n_days / 16), 1000)
+            calls += n_locations
+        else:
+            continue
+        elements += per_loc * n_locations
+        max_per_call = max(max_per_call, per_loc)
+    return _ee_cost(calls, elements, max_per_call, 1, elements)
+
+
+def _chirps(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    per_loc = min(_n_days(start_date, end_date), 10000)
+    return _ee_cost(n_locations, per_loc * n_locations, per_loc, 1, per_loc * n_locations)
+
+
+def _drought(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    drought_indices = registry.module("drought_indices")
+    y0, y1 = _years(start_date, end_date)
+    clim0, clim1 = drought_indices.CLIMATOLOGY_START, drought_indices.CLIMATOLOGY_END
+    out_rows = n_locations * 12 * (y1 - y0 + 1)
+    total = _ee_cost(0, 0, 0, 1, out_rows)
+    series: List[tuple] = []
+
+    def _window(prefix):
+        windows = [
+            int(p.split("_")[1]) for p in parameters
+            if p.startswith(prefix) and p.split("_")[1].isdigit()
+        ]
+        return max(windows) if windows else 1
+
+    if any(p.startswith(drought_indices._SPI_PARAM_PREFIXES) for p in parameters):
+        start = min(clim0, y0 - _window("SPI_") // 12 - 1, y0)
+        series.append((1, start, max(y1, clim1)))
+    if any(p.startswith(drought_indices._SPEI_PARAM_PREFIXES) for p in parameters):
+        start = min(clim0, y0 - _window("SPEI_") // 12 - 1, y0)
+        series.append((2, start, max(y1, clim1)))  # CHIRPS P + TerraClimate PET
+    veg = set(parameters) & drought_indices._VEG_HEALTH_PARAMS
+    if veg:
+        n_veg = int(bool(veg & {"VCI", "VHI", "NDVI_MEAN"})) + int(bool(veg & {"TCI", "VHI", "LST_DAY_C"}))
+        series.append((n_veg, min(drought_indices.MODIS_CLIMATOLOGY_START, y0 - 1),
+                       max(y1, drought_indices.MODIS_CLIMATOLOGY_END)))
+    for n_series, a, b in series:
+        part = _monthly_series_cost(n_locations, n_series, a, b, 0)
+        for k in ("round_trips", "ee_elements", "bytes", "seconds_model"):
+            total[k] += part[k]
+        total["max_elements_per_call"] = max(total["max_elements_per_call"], n_locations)
+    if series:
+        total["notes"] = [
+            f"includes {min(a for _, a, _ in series)}-{max(b for *_, b in series)} "
+            "climatology history"
+        ]
+    return total
+
+
+def _phenology(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    y0, y1 = _years(start_date, end_date)
+    # One flattened collection.map(sample): 23 MOD13A1 composites a year.
+    elements = n_locations * 23 * (y1 - y0 + 1)
+    return _ee_cost(1, elements, elements, 1, n_locations * (y1 - y0 + 1))
+
+
+def _soil_moisture(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    y0, y1 = _years(start_date, end_date)
+    if any("_ANOM" in p for p in parameters):
+        soil_moisture = registry.module("soil_moisture")
+        y0, y1 = min(soil_moisture.BASELINE_START, y0), max(soil_moisture.BASELINE_END, y1)
+    n_series = int(any(p.startswith("SM_SURFACE") for p in parameters)) + \
+        int(any(p.startswith("SM_ROOTZONE") for p in parameters))
+    rows_y0, rows_y1 = _years(start_date, end_date)
+    return _monthly_series_cost(n_locations, n_series, y0, y1,
+                                n_locations * 12 * (rows_y1 - rows_y0 + 1))
+
+
+def _per_param_monthly(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    # air_quality / productivity: one monthly series per parameter.
+    y0, y1 = _years(start_date, end_date)
+    return _monthly_series_cost(n_locations, len(parameters), y0, y1,
+                                n_locations * 12 * (y1 - y0 + 1), n_bands=len(parameters))
+
+
+def _land_degradation(n_locations, parameters, start_date, end_date, resolution) -> Dict:
+    y0, y1 = _years(start_date, end_date)
+    months = 12 * (y1 - y0 + 1)
+    land_degradation = registry.module("land_degradation")
+    params = set(parameters)
+    calls = 0
+    if params & land_degradation._BURNED_AREA_PARAM_KEYS:
+        calls += 1 + 2 * months  # AOI areas, then size() + reduce per month
+    if params & land_degradation._FIRMS_PARAM_KEYS:
+        calls += 2 * months
+    if params & land_degradation._HANSEN_PARAM_KEYS:
+        calls += 3
+    return _ee_cost(calls, calls * n_locations, n_locations, len(parameters),
+                    n_locations * months)
+
+
+_COST_MODELS: Dict[str, Callable[..., Dict]] = {
+    "nasa_power": _nasa_power,
+    "openweather": _openweather,
+    "era5": _era5,
+    "modis": _modis,
+    "chirps": _chirps,
+    "drought_indices": _drought,
+    "phenology": _phenology,
+    "soil_moisture": _soil_moisture,
+    "air_quality": _per_param_monthly,
+    "productivity": _per_param_monthly,
+    "land_degradation": _land_degradation,
+}
+
+
+def estimate_fetch(
+    source_key: str,
+    n_locations: int,
+    parameters: List[str],
+    start_date: str,
+    end_date: str,
+    temporal_resolution: str,
+) -> Optional[Dict]:
+    """Estimate what a fetch will cost and choose its sizing knobs.
+
+    Args:
+        source_key: data source key as used in app.py (e.g. 'era5')
+        n_locations: number of points (or AOI polygons for land_degradation)
+        parameters: requested parameter codes
+        start_date / end_date: 'YYYY-MM-DD'
+        temporal_resolution: resolution label selected in the UI
+
+    Returns:
+        Dict with round_trips, ee_elements, max_elements_per_call, bytes,
+        rows, wall_s, basis ('model' or 'observed'), fetch_options (kwargs
+        for the fetcher), notes and warnings; None for sources without a
+        cost model.
+    """
+    model = _COST_MODELS.get(source_key)
+    if model is None or not parameters or n_locations <= 0:
+        return None
+
+    est = model(n_locations, list(parameters), start_date, end_date, temporal_resolution)
+    est.setdefault("fetch_options", {})
+    est.setdefault("notes", [])
+    est["source"] = source_key
+
+    observed = tracing.observed_seconds_per_round_trip(source_key)
+    if observed is not None and est["round_trips"]:
+        est["wall_s"] = est["round_trips"] * observed
+        est["basis"] = "observed"
+    else:
+        est["wall_s"] = est["seconds_model"]
+        est["basis"] = "model"
+    del est["seconds_model"]
+
+    warnings = []
+    # Only Earth Engine sources report elements per call; skip the ee import otherwise.
+    getinfo_max = (
+        registry.module("earth_engine_utils").EE_GETINFO_MAX
+        if est["max_elements_per_call"] else 0
+    )
+    if est["max_elements_per_call"] > getinfo_max:
+        warnings.append(
+            f"One Earth Engine call would return ~{est['max_elements_per_call']:,} elements, "
+            f"over the {getinfo_max:,} limit. Shorten the date range or use fewer locations."
+        )
+    if est["round_trips"] > WARN_ROUND_TRIPS:
+        warnings.append(f"{est['round_trips']:,} upstream calls; consider splitting the request.")
+    if est["wall_s"] > WARN_WALL_SECONDS:
+        warnings.append(
+            f"Expected to take about {est['wall_s'] / 60:.0f} minutes; "
+            "a coarser resolution or shorter range will be much faster."
+        )
+    est["warnings"] = warnings
+    return est
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"~{max(seconds, 1):.0f} s"
+    if seconds < 3600:
+        return f"~{seconds / 60:.0f} min"
+    return f"~{seconds / 3600:.1f} h"
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
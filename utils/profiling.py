@@ -0,0 +1,344 @@
+"""
+On-demand profiling for fetches and Streamlit reruns.
+
+Profiling is opt-in. It is switched on per scope ("fetch" or "rerun") by
+the PROFILE_MODE environment variable (see config.py) or by the admin
+toggle in the app sidebar. When it is off, `maybe_profile()` hands back a
+bare `nullcontext`, so the instrumented code pays one function call and
+nothing else: no sampler thread, no tracemalloc.
+
+When it is on, a profiled block records:
+  - a sampling CPU profile: a daemon thread snapshots the profiled thread's
+    stack every PROFILE_SAMPLE_INTERVAL_MS via sys._current_frames(), so
+    the cost does not grow with the number of Python calls the way
+    cProfile's does. Exported as a speedscope JSON file
+    (https://www.speedscope.app) or, with mode="deterministic", as a
+    cProfile .pstats dump for snakeviz / pstats.
+  - tracemalloc peak traced memory and the top-N allocation sites still
+    alive at the end of the block. tracemalloc is process-wide, so
+    overlapping profilers (concurrent sessions, background jobs) share
+    it: the first to start turns it on, the last to stop turns it off.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+PROFILE_SCOPES = ("fetch", "rerun")
+
+_DEFAULT_INTERVAL_MS = 5
+_DEFAULT_TOP_N = 25
+
+# Profilers currently using tracemalloc, and whether this module started
+# it (if it was already tracing, e.g. PYTHONTRACEMALLOC, it is left on).
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users: set = set()
+_tracemalloc_started = False
+
+
+def _config(name: str, default):
+    try:
+        import config
+        return getattr(config, name, default)
+    except Exception:
+        return default
+
+
+def profile_mode() -> set:
+    """Scopes enabled from the environment: PROFILE_MODE=fetch|rerun|all."""
+    raw = (os.getenv("PROFILE_MODE") or _config("PROFILE_MODE", "") or "").strip().lower()
+    if not raw:
+        return set()
+    if raw in ("1", "true", "all"):
+        return set(PROFILE_SCOPES)
+    return {s.strip() for s in raw.split(",") if s.strip() in PROFILE_SCOPES}
+
+
+def admin_enabled() -> bool:
+    """PORTAL_ADMIN set: show the diagnostics toggles in the sidebar."""
+    raw = os.getenv("PORTAL_ADMIN") or _config("PORTAL_ADMIN", "") or ""
+    return raw.strip().lower() not in ("", "0", "false", "no")
+
+
+def profiling_enabled(scope: str, override: Optional[bool] = None) -> bool:
+    """True if `scope` should be profiled. `override` (the admin toggle)
+    wins over the environment when it is not None."""
+    if override is not None:
+        return bool(override)
+    return scope in profile_mode()
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+class ProfileReport:
+    """Result of one profiled block."""
+
+    def __init__(self, label: str, scope: str, mode: str):
+        self.label = label
+        self.scope = scope
+        self.mode = mode
+        self.created_at = time.strftime("%Y%m%d_%H%M%S")
+        self.wall_s = 0.0
+        # Sampled mode: frame table + one stack (tuple of frame indices,
+        # root first) per sample, weighted by the wall time it stands for.
+        self.frames: List[Tuple[str, str, int]] = []
+        self.samples: List[Tuple[int, ...]] = []
+        self.weights: List[float] = []
+        # Deterministic mode: cProfile stats dict (what pstats marshals).
+        self.pstats_data: Optional[dict] = None
+        self.alloc_peak_bytes = 0
+        self.alloc_top: List[Dict] = []
+
+    def filename(self, ext: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in self.label)
+        return f"profile_{self.scope}_{safe}_{self.created_at}.{ext}"
+
+    def speedscope_bytes(self) -> bytes:
+        """Sampled profile in speedscope's file format."""
+        weights = [round(w, 6) for w in self.weights]
+        doc = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.label,
+            "exporter": "weather_portal.profiling",
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [
+                    {"name": name, "file": file, "line": line}
+                    for name, file, line in self.frames
+                ]
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": f"{self.scope}: {self.label}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": [list(s) for s in self.samples],
+                "weights": weights,
+            }],
+        }
+        return json.dumps(doc).encode("utf-8")
+
+    def pstats_bytes(self) -> bytes:
+        """cProfile dump loadable with pstats.Stats(path) / snakeviz."""
+        return marshal.dumps(self.pstats_data or {})
+
+    def top_functions(self, n: int = 20) -> List[Dict]:
+        """Functions ranked by inclusive sampled time (or cumtime)."""
+        rows: List[Dict] = []
+        if self.mode == "deterministic" and self.pstats_data:
+            for (file, line, name), (cc, nc, tt, ct, _callers) in self.pstats_data.items():
+                rows.append({
+                    "function": name, "file": _short_path(file), "line": line,
+                    "calls": nc, "self_s": round(tt, 4), "total_s": round(ct, 4),
+                })
+            rows.sort(key=lambda r: -r["total_s"])
+            return rows[:n]
+
+        hits: Dict[int, int] = {}
+        total_s: Dict[int, float] = {}
+        self_s: Dict[int, float] = {}
+        for stack, w in zip(self.samples, self.weights):
+            if not stack:
+                continue
+            self_s[stack[-1]] = self_s.get(stack[-1], 0.0) + w
+            for idx in set(stack):
+                hits[idx] = hits.get(idx, 0) + 1
+                total_s[idx] = total_s.get(idx, 0.0) + w
+        for idx, count in hits.items():
+            name, file, line = self.frames[idx]
+            rows.append({
+                "function": name, "file": _short_path(file), "line": line,
+                "samples": count,
+                "self_s": round(self_s.get(idx, 0.0), 4),
+                "total_s": round(total_s[idx], 4),
+            })
+        rows.sort(key=lambda r: -r["total_s"])
+        return rows[:n]
+
+
+def _short_path(path: str) -> str:
+    parts = path.replace("\\", "/").split("/")
+    return "/".join(parts[-2:])
+
+
+# ---------------------------------------------------------------------------
+# Profilers
+# ---------------------------------------------------------------------------
+
+class _StackSampler:
+    """Samples one thread's Python stack on a daemon thread."""
+
+    def __init__(self, thread_id: int, interval_s: float, report: ProfileReport):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.report = report
+        self._frame_index: Dict[Tuple[str, str, int], int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="weather-portal-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        frames_of = sys._current_frames
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_s):
+            frame = frames_of().get(self.thread_id)
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_name, code.co_filename, code.co_firstlineno)
+                idx = self._frame_index.get(key)
+                if idx is None:
+                    idx = len(self.report.frames)
+                    self._frame_index[key] = idx
+                    self.report.frames.append(key)
+                stack.append(idx)
+                frame = frame.f_back
+            stack.reverse()
+            self.report.samples.append(tuple(stack))
+            self.report.weights.append(elapsed)
+
+
+class Profiler:
+    """Start/stop profiler for a block that cannot be wrapped in a `with`
+    (a whole Streamlit rerun). Use `maybe_profile()` everywhere else."""
+
+    def __init__(self, label: str, scope: str = "fetch", mode: str = "sampled",
+                 interval_ms: Optional[float] = None, top_n: Optional[int] = None):
+        if mode not in ("sampled", "deterministic"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.report = ProfileReport(label, scope, mode)
+        self.interval_s = (interval_ms or _config("PROFILE_SAMPLE_INTERVAL_MS", _DEFAULT_INTERVAL_MS)) / 1000.0
+        self.top_n = top_n or _config("PROFILE_TOP_ALLOCATIONS", _DEFAULT_TOP_N)
+        self._sampler: Optional[_StackSampler] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._peak = 0
+        self._stopped = False
+        self._t0 = 0.0
+
+    def start(self) -> "Profiler":
+        _acquire_tracemalloc(self)
+        if self.report.mode == "deterministic":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            self._sampler = _StackSampler(threading.get_ident(), self.interval_s, self.report)
+            self._sampler.start()
+        self._t0 = time.perf_counter()
+        return self
+
+    def stop(self) -> ProfileReport:
+        if self._stopped:
+            return self.report
+        self._stopped = True
+        self.report.wall_s = time.perf_counter() - self._t0
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.create_stats()
+            self.report.pstats_data = self._cprofile.stats
+        if self._sampler is not None:
+            self._sampler.stop()
+
+        peak, snapshot = _release_tracemalloc(self)
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        self.report.alloc_peak_bytes = peak
+        self.report.alloc_top = [
+            {
+                "location": f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                "size_kb": round(stat.size / 1024, 1),
+                "blocks": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[: self.top_n]
+        ]
+        return self.report
+
+
+def _acquire_tracemalloc(profiler: Profiler) -> None:
+    """Register `profiler` as a tracemalloc user, starting it if needed.
+
+    The peak is reset so the new profiler measures its own window, but
+    first folded into every profiler already running, so their peaks
+    still cover everything since they started.
+    """
+    global _tracemalloc_started
+    with _tracemalloc_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_started = True
+        _current, peak = tracemalloc.get_traced_memory()
+        for other in _tracemalloc_users:
+            other._peak = max(other._peak, peak)
+        tracemalloc.reset_peak()
+        _tracemalloc_users.add(profiler)
+
+
+def _release_tracemalloc(profiler: Profiler):
+    """Unregister `profiler`; returns (its peak bytes, a snapshot). The last
+    user stops tracemalloc if this module started it."""
+    global _tracemalloc_started
+    with _tracemalloc_lock:
+        _current, peak = tracemalloc.get_traced_memory()
+        peak = max(profiler._peak, peak)
+        snapshot = tracemalloc.take_snapshot()
+        _tracemalloc_users.discard(profiler)
+        if not _tracemalloc_users and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+    return peak, snapshot
+
+
+class _ProfileHandle:
+    """What `maybe_profile()` yields; `.report` is set when the block exits."""
+
+    def __init__(self):
+        self.report: Optional[ProfileReport] = None
+
+
+@contextmanager
+def _profile_block(label: str, scope: str, mode: str) -> Iterator[_ProfileHandle]:
+    handle = _ProfileHandle()
+    profiler = Profiler(label, scope=scope, mode=mode).start()
+    try:
+        yield handle
+    finally:
+        handle.report = profiler.stop()
+
+
+def maybe_profile(scope: str, label: str, enabled: Optional[bool] = None,
+                  mode: str = "sampled"):
+    """Profile the enclosed block if `scope` is enabled, else do nothing.
+
+    Yields a handle whose `.report` holds the ProfileReport after the
+    block exits, or None when profiling is off.
+    """
+    if not profiling_enabled(scope, enabled):
+        return nullcontext(None)
+    return _profile_block(label, scope, mode)
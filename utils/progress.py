@@ -0,0 +1,180 @@
+"""
+Fetch progress reporting and cooperative cancellation.
+
+Every public `fetch_*` function in data_sources is wrapped with
+`@reporting`, which makes it accept two optional keyword arguments:
+
+    progress_callback   called with a progress dict after every unit of
+                        work (see `Progress.snapshot()`)
+    cancel_token        a `CancelToken`; once cancelled, the fetch stops at
+                        the next chunk / batch boundary by raising
+                        `FetchCancelled`
+
+As with tracing, the active reporter travels in a context variable, so the
+chunk loops deep inside the fetchers report through module functions
+(`add_total`, `advance`, `check_cancelled`, `iterate`) without a handle
+being passed down. `checkpoint.fetch_chunk()` is the main chunk boundary
+and does both the cancellation check and the `advance()`; fetchers using
+it only declare how many units they are about to run with `add_total()`.
+Plain per-location / per-parameter loops use `iterate()` instead. Fetchers
+that finish in a single upstream call report 1/1 when they return. Outside
+a reporter every call here is a no-op.
+
+`FetchCancelled` derives from BaseException, like asyncio.CancelledError,
+so the fetchers' "log and skip a failed month" `except Exception` handlers
+do not swallow it.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from utils import tracing
+
+
+class FetchCancelled(BaseException):
+    """Raised at a chunk boundary once the fetch's CancelToken is set."""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag shared between the UI and a fetch."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar(
+    "weather_portal_fetch_progress", default=None
+)
+
+
+class Progress:
+    """Units done / total for one fetch, with elapsed time and ETA."""
+
+    def __init__(self, callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 cancel_token: Optional[CancelToken] = None):
+        self.callback = callback
+        self.cancel_token = cancel_token
+        self.total = 0
+        self.done = 0
+        self.unit = "requests"
+        self.message = ""
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """{done, total, unit, bytes, elapsed_s, eta_s, message}; eta_s is
+        None until at least one unit has finished."""
+        with self._lock:
+            done, total = self.done, self.total
+        elapsed = time.perf_counter() - self._t0
+        eta = None
+        if done and total > done:
+            eta = elapsed / done * (total - done)
+        elif total and done >= total:
+            eta = 0.0
+        trace = tracing.current_trace()
+        return {
+            "done": done,
+            "total": total,
+            "unit": self.unit,
+            "bytes": trace.counters.get("bytes", 0) if trace is not None else 0,
+            "elapsed_s": round(elapsed, 2),
+            "eta_s": round(eta, 1) if eta is not None else None,
+            "message": self.message,
+        }
+
+    def _emit(self) -> None:
+        if self.callback is not None:
+            self.callback(self.snapshot())
+
+
+def current() -> Optional[Progress]:
+    return _current.get()
+
+
+def add_total(n: int, unit: Optional[str] = None) -> None:
+    """Declare `n` more units of work (no-op without a reporter)."""
+    p = _current.get()
+    if p is None:
+        return
+    with p._lock:
+        p.total += int(n)
+        if unit:
+            p.unit = unit
+    p._emit()
+
+
+def advance(n: int = 1, message: Optional[str] = None) -> None:
+    """Mark `n` units finished (no-op without a reporter)."""
+    p = _current.get()
+    if p is None:
+        return
+    with p._lock:
+        p.done += int(n)
+        if p.done > p.total:
+            p.total = p.done
+        if message is not None:
+            p.message = message
+    p._emit()
+
+
+def iterate(items, unit: Optional[str] = None) -> Iterator[Any]:
+    """Loop over `items` as units of work: declares the total, checks for
+    cancellation before each item and counts it done after its body."""
+    items = list(items)
+    add_total(len(items), unit)
+    for item in items:
+        check_cancelled()
+        yield item
+        advance()
+
+
+def check_cancelled() -> None:
+    """Raise FetchCancelled if the active fetch has been cancelled."""
+    p = _current.get()
+    if p is not None and p.cancel_token is not None and p.cancel_token.cancelled:
+        raise FetchCancelled("Fetch cancelled")
+
+
+@contextmanager
+def track(callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+          cancel_token: Optional[CancelToken] = None) -> Iterator[Progress]:
+    """Install a reporter for the enclosed fetch."""
+    p = Progress(callback, cancel_token)
+    token = _current.set(p)
+    try:
+        check_cancelled()
+        yield p
+        if p.total == 0:
+            # Single-call fetcher: nothing was declared, report it complete.
+            advance(1)
+    finally:
+        _current.reset(token)
+
+
+def reporting(fn: Callable) -> Callable:
+    """Decorator for public fetch_* functions: adds the `progress_callback`
+    and `cancel_token` keyword arguments. A fetcher called from inside
+    another reporting fetcher (or a job) reports into the outer one."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, progress_callback=None, cancel_token=None, **kwargs):
+        if progress_callback is None and cancel_token is None:
+            return fn(*args, **kwargs)
+        with track(progress_callback, cancel_token):
+            return fn(*args, **kwargs)
+
+    return wrapper
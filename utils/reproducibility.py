@@ -13,9 +13,8 @@ third party re-run the query on their own machine:
      a `.ipynb` string so the Streamlit UI can offer it as a download.
 
 These artefacts don't need a running API server — they document a
-single fetch in a portable way. A full REST API + STAC catalog is a
-larger deployment concern and is intentionally out of scope for this
-in-app phase.
+single fetch in a portable way. For programmatic access to the fetchers
+themselves see api_server.py; a STAC catalog remains out of scope.
 """
 
 from __future__ import annotations
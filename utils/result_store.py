@@ -0,0 +1,342 @@
+"""
+Session result store.
+
+Every session used to keep its fetched result, plus a full `.copy()` of
+each cross-layer snapshot, as pandas frames in `st.session_state`, so a
+server with a few sessions holding large fetches grew without bound. The
+app now keeps only keys in session state and the frames live here, in a
+process-wide `ResultStore`:
+
+- Every entry's in-memory footprint is measured once, on `put`, and
+  totalled per session and for the process.
+- When a session goes over RESULT_STORE_SESSION_MAX_MB, or the process
+  over RESULT_STORE_MAX_MB, the least recently used entries are spilled
+  to uncompressed Arrow IPC (Feather v2) files under RESULT_STORE_DIR and
+  dropped from memory.
+- `get` on a spilled entry reads the file back memory-mapped, so numeric
+  and Arrow-backed string columns are views of the page cache rather than
+  private copies, and the entry counts as resident again.
+- Spilled files over RESULT_STORE_DISK_MAX_MB are evicted oldest first; a
+  key whose entry has been evicted returns None.
+
+Entries are reference counted: saving the current result as a snapshot
+`retain`s its key instead of copying the frame, and the frame goes away
+once both the result and the snapshot `release` it. Frames handed out by
+the store are shared and must be treated as read-only.
+
+A session's entries are dropped when its `SessionResults` handle (kept in
+`st.session_state`) is garbage-collected, i.e. when Streamlit forgets the
+session.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from utils import checkpoint
+
+log = logging.getLogger("weather_portal.result_store")
+
+_MB = 1024 * 1024
+
+
+def _config(name: str, default):
+    try:
+        import config
+        return getattr(config, name, default)
+    except Exception:
+        return default
+
+
+def default_root() -> str:
+    return (
+        os.getenv("RESULT_STORE_DIR")
+        or _config("RESULT_STORE_DIR", "")
+        or os.path.join(tempfile.gettempdir(), "weather_portal_results")
+    )
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """In-memory size of `df`, including the payload of object columns."""
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+
+class ResultStore:
+    """LRU store of DataFrames with memory budgets and spill-to-disk."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None,
+                 session_max_bytes: Optional[int] = None,
+                 disk_max_bytes: Optional[int] = None):
+        self.root = os.path.join(root or default_root(), f"{os.getpid()}-{uuid.uuid4().hex[:6]}")
+        self.max_bytes = int(max_bytes or _config("RESULT_STORE_MAX_MB", 1024) * _MB)
+        self.session_max_bytes = int(
+            session_max_bytes or _config("RESULT_STORE_SESSION_MAX_MB", 256) * _MB
+        )
+        self.disk_max_bytes = int(disk_max_bytes or _config("RESULT_STORE_DISK_MAX_MB", 10240) * _MB)
+        self._lock = threading.Lock()
+        # key -> entry dict; order is least recently used first.
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Directories of earlier processes are left behind on a hard exit.
+        checkpoint.prune(os.path.dirname(self.root), _config("RESULT_STORE_MAX_AGE_S", 7 * 86400))
+
+    # -- public API ---------------------------------------------------------
+
+    def put(self, session_id: str, df: pd.DataFrame) -> str:
+        """Add `df` for `session_id` and return its key (reference count 1)."""
+        key = uuid.uuid4().hex
+        entry = {
+            "key": key,
+            "session": session_id,
+            "df": df,
+            "nbytes": frame_nbytes(df),
+            "rows": int(len(df)),
+            "path": None,
+            "disk_bytes": 0,
+            "refs": 1,
+            "last_used": time.time(),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            spill = self._over_budget(session_id, keep=key)
+        self._spill(spill)
+        return key
+
+    def get(self, key: Optional[str]) -> Optional[pd.DataFrame]:
+        """The frame for `key`, loading it back if it was spilled."""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            entry["last_used"] = time.time()
+            df = entry["df"]
+            path = entry["path"]
+        if df is not None:
+            return df
+        try:
+            df = _read_spilled(path)
+        except Exception as e:
+            log.warning(f"result {key} could not be read back: {e}")
+            self._drop(key)
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return df
+            if entry["df"] is None:
+                entry["df"] = df
+            df = entry["df"]
+            spill = self._over_budget(entry["session"], keep=key)
+        self._spill(spill)
+        return df
+
+    def retain(self, key: Optional[str]) -> Optional[str]:
+        """Add a reference to `key`; returns it, or None if it is gone."""
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                return None
+            entry["refs"] += 1
+            return key
+
+    def release(self, key: Optional[str]) -> None:
+        """Drop a reference to `key`, deleting the entry at zero."""
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] > 0:
+                return
+        self._drop(key)
+
+    def drop_session(self, session_id: str) -> None:
+        """Delete every entry owned by `session_id`."""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if e["session"] == session_id]
+        for key in keys:
+            self._drop(key)
+
+    def usage(self, session_id: Optional[str] = None) -> Dict[str, int]:
+        """Resident / spilled totals for the process, or for one session."""
+        with self._lock:
+            entries = [
+                e for e in self._entries.values()
+                if session_id is None or e["session"] == session_id
+            ]
+            sessions = {e["session"] for e in entries}
+        return {
+            "entries": len(entries),
+            "sessions": len(sessions),
+            "resident": sum(1 for e in entries if e["df"] is not None),
+            "resident_bytes": sum(e["nbytes"] for e in entries if e["df"] is not None),
+            "spilled": sum(1 for e in entries if e["path"] is not None),
+            "disk_bytes": sum(e["disk_bytes"] for e in entries),
+        }
+
+    # -- budgets ------------------------------------------------------------
+
+    def _over_budget(self, session_id: str, keep: str) -> list:
+        """Entries to spill, least recently used first, so that `session_id`
+        and the process fit their budgets. Never picks `keep`, the entry
+        being handed out. Caller holds the lock."""
+        resident = [e for e in self._entries.values() if e["df"] is not None]
+        total = sum(e["nbytes"] for e in resident)
+        session_total = sum(e["nbytes"] for e in resident if e["session"] == session_id)
+        picked = []
+        for entry in resident:
+            if total <= self.max_bytes and session_total <= self.session_max_bytes:
+                break
+            if entry["key"] == keep:
+                continue
+            if entry["session"] != session_id and total <= self.max_bytes:
+                continue
+            picked.append(entry)
+            total -= entry["nbytes"]
+            if entry["session"] == session_id:
+                session_total -= entry["nbytes"]
+        return picked
+
+    def _spill(self, entries: list) -> None:
+        for entry in entries:
+            key = entry["key"]
+            df = entry["df"]
+            if df is None:
+                continue
+            path = entry["path"]
+            if path is None:
+                path = os.path.join(self.root, f"{key}.arrow")
+                try:
+                    os.makedirs(self.root, exist_ok=True)
+                    _write_spilled(df, path)
+                except Exception as e:
+                    # Not representable in Arrow (mixed object columns, ...):
+                    # keep it in memory rather than lose it.
+                    log.warning(f"result {key} could not be spilled, keeping it resident: {e}")
+                    _remove(path)
+                    continue
+            with self._lock:
+                if key not in self._entries:
+                    _remove(path)
+                    continue
+                entry["path"] = path
+                entry["disk_bytes"] = _file_size(path)
+                entry["df"] = None
+            log.info(f"spilled result {key} ({entry['nbytes'] / _MB:.1f} MB)")
+        if entries:
+            self._enforce_disk_budget()
+
+    def _enforce_disk_budget(self) -> None:
+        with self._lock:
+            spilled = [e for e in self._entries.values() if e["path"] is not None]
+            total = sum(e["disk_bytes"] for e in spilled)
+            evict = []
+            for entry in spilled:
+                if total <= self.disk_max_bytes:
+                    break
+                if entry["df"] is not None:
+                    # Loaded back: deleting the file just means it is
+                    # rewritten if it has to spill again.
+                    _remove(entry["path"])
+                    total -= entry["disk_bytes"]
+                    entry["path"], entry["disk_bytes"] = None, 0
+                    continue
+                evict.append(entry["key"])
+                total -= entry["disk_bytes"]
+        for key in evict:
+            log.info(f"evicted spilled result {key}: disk budget exceeded")
+            self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None and entry["path"] is not None:
+            _remove(entry["path"])
+
+
+# -- spill files --------------------------------------------------------------
+
+def _write_spilled(df: pd.DataFrame, path: str) -> None:
+    import pyarrow.feather as feather
+
+    tmp = path + ".tmp"
+    # Uncompressed so the file can be memory-mapped on the way back.
+    feather.write_feather(df, tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+
+def _read_spilled(path: str) -> pd.DataFrame:
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# -- per-session handle -------------------------------------------------------
+
+class SessionResults:
+    """One session's view of the store. Keep it in `st.session_state`: when
+    the session is discarded the handle is collected and its entries go
+    with it."""
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+        self.session_id = uuid.uuid4().hex
+        weakref.finalize(self, store.drop_session, self.session_id)
+
+    def put(self, df: pd.DataFrame) -> str:
+        return self.store.put(self.session_id, df)
+
+    def get(self, key: Optional[str]) -> Optional[pd.DataFrame]:
+        return self.store.get(key)
+
+    def retain(self, key: Optional[str]) -> Optional[str]:
+        return self.store.retain(key)
+
+    def release(self, key: Optional[str]) -> None:
+        self.store.release(key)
+
+    def usage(self) -> Dict[str, int]:
+        return self.store.usage(self.session_id)
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ResultStore:
+    """Process-wide store (module state survives Streamlit reruns)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+    return _store
@@ -0,0 +1,145 @@
+"""
+Canonical dtypes for fetch results.
+
+Sources hand back whatever their parsers produce: float64 for every
+measurement, int64 ids, one Python string per row for `location_name`,
+and object columns wherever a fill value was swapped for a missing
+marker. `normalize` maps a result onto a compact schema once, right after
+the fetch, so everything downstream (result store, joins, exports)
+works on the smaller frame:
+
+- time columns (date, datetime, time, timestamp) -> datetime64
+- numeric object columns -> numeric
+- integer columns (ids, years, counts) -> int32 when the range fits
+- name / source / class label columns -> category
+- measurement float64 -> float32 where no value loses precision that
+  matters (see _fits_float32); coordinates stay float64
+
+`normalize` is idempotent, so it can run both in the job runner and when
+the app takes the result. Writers that print floats through Python
+(JSON, GeoJSON, Excel, Shapefile) should pass the frame through `widen_floats` first, or float32 values
+come out as 23.450000762939453.
+"""
+
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger("weather_portal.schema")
+
+TIME_COLUMNS = ("date", "datetime", "time", "timestamp")
+# Kept at float64: they are join keys and 7 significant digits is ~1 m.
+COORDINATE_COLUMNS = ("latitude", "longitude", "lat", "lon", "centroid_lat", "centroid_lon")
+CATEGORY_COLUMNS = ("location_name", "polygon_name", "name", "source", "dataset",
+                    "unit", "parameter", "class_name", "from_class", "to_class")
+
+_INT32 = np.iinfo(np.int32)
+# Whole numbers above this are not exact in float32.
+_FLOAT32_EXACT_INT = 2 ** 24
+_FLOAT32_RTOL = 1e-6
+
+
+def _is_category_column(col: str) -> bool:
+    return col in CATEGORY_COLUMNS or col.endswith("_name") or col.endswith("_class")
+
+
+def _fits_float32(values: np.ndarray) -> bool:
+    """True if float32 keeps `values` to within _FLOAT32_RTOL, and keeps
+    whole numbers (counts, populations, areas in m2) exact."""
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return True
+    if np.abs(finite).max() > np.finfo(np.float32).max:
+        return False
+    if np.array_equal(finite, np.round(finite)) and np.abs(finite).max() > _FLOAT32_EXACT_INT:
+        return False
+    narrowed = finite.astype(np.float32).astype(np.float64)
+    return bool(np.all(np.abs(narrowed - finite) <= _FLOAT32_RTOL * np.abs(finite)))
+
+
+def _normalize_column(col: str, s: pd.Series) -> pd.Series:
+    dtype = s.dtype
+    if isinstance(dtype, pd.CategoricalDtype) or dtype == np.float32 or dtype == np.int32:
+        return s
+
+    if col in TIME_COLUMNS and not pd.api.types.is_datetime64_any_dtype(dtype):
+        if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            parsed = pd.to_datetime(s, errors="coerce")
+            if parsed.notna().sum() == s.notna().sum():
+                return parsed
+        return s
+
+    if _is_category_column(col):
+        if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            return s.astype("category")
+        return s
+
+    if pd.api.types.is_object_dtype(dtype):
+        # e.g. a float column after replace(fill, pd.NA)
+        numeric = pd.to_numeric(s, errors="coerce")
+        if numeric.notna().sum() != s.notna().sum():
+            return s
+        s = numeric
+        dtype = s.dtype
+
+    if pd.api.types.is_bool_dtype(dtype):
+        return s
+
+    if pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+        if s.empty or (s.min() >= _INT32.min and s.max() <= _INT32.max):
+            return s.astype(np.int32)
+        return s
+
+    if dtype == np.float64 and col not in COORDINATE_COLUMNS:
+        values = s.to_numpy()
+        if _fits_float32(values):
+            return s.astype(np.float32)
+    return s
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Return `df` with the canonical compact dtypes (see module docstring).
+
+    Args:
+        df: A fetch result
+
+    Returns:
+        A new DataFrame (or `df` itself when nothing changed)
+    """
+    if df is None or df.empty:
+        return df
+    changed = {}
+    for col in df.columns:
+        if not isinstance(col, str):
+            continue
+        s = df[col]
+        if isinstance(s, pd.DataFrame):  # duplicated column name
+            continue
+        try:
+            out = _normalize_column(col, s)
+        except (TypeError, ValueError) as e:
+            log.debug(f"left {col} as {s.dtype}: {e}")
+            continue
+        if out is not s:
+            changed[col] = out
+    if not changed:
+        return df
+    out = df.copy(deep=False)
+    for col, s in changed.items():
+        out[col] = s
+    return out
+
+
+def widen_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Return `df` with float32 columns as the float64 of their shortest
+    decimal form (23.45f -> 23.45), for writers that print Python floats."""
+    cols = [c for c, dtype in df.dtypes.items() if dtype == np.float32]
+    if not cols:
+        return df
+    out = df.copy()
+    for col in cols:
+        out[col] = out[col].to_numpy().astype(str).astype(np.float64)
+    return out
@@ -158,8 +158,8 @@ def create_geodataframe_from_data(
     Returns:
         GeoDataFrame
     """
-    # Create geometry column
-    geometry = [Point(xy) for xy in zip(df[lon_col], df[lat_col])]
+    # Create geometry column (vectorised; a Point() per row is slow on big tables)
+    geometry = gpd.points_from_xy(df[lon_col], df[lat_col])
     
     # Create GeoDataFrame
     gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
@@ -0,0 +1,106 @@
+"""
+In-flight request coalescing ("singleflight").
+
+On a shared deployment several sessions often ask for the same chunk at
+the same moment (the same state for the same month during a drought
+bulletin, say). `Group.do(key, fn)` lets the first caller for `key` run
+`fn` while every concurrent caller with the same key waits for it and
+gets the same result, so the upstream API sees one call instead of N.
+Nothing is cached: once the call finishes the key is forgotten, and the
+next caller starts a fresh one. Durable reuse is the checkpoint store's
+job (utils/checkpoint.py).
+
+Keys must be canonical: two calls share a key only if they would send the
+same upstream request. `checkpoint.fetch_chunk()` coalesces on its chunk
+key, so fetchers build chunk keys from everything that shapes the request
+(asset, band, scale, the location list digest, the date window).
+
+Whole requests are coalesced one level up, by the job runner: submitting
+a request whose key matches a queued or running job returns that job.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils import progress, tracing
+
+log = logging.getLogger("weather_portal.singleflight")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+        self.waiters = 0      # callers that joined this call instead of fetching
+
+
+class Group:
+    """Coalesces concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run `fn` once for all concurrent callers of `key`.
+
+        Returns (result, shared), where `shared` is True for callers that
+        received another caller's result. The leader's exception is
+        re-raised in every waiter, except cancellation: if the leader's
+        own fetch was cancelled, a waiter takes over and runs `fn` itself.
+        Waiters still honour their own cancellation token while waiting.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                else:
+                    call.waiters += 1
+
+            if leader:
+                try:
+                    call.result = fn()
+                except progress.FetchCancelled:
+                    call.cancelled = True
+                    raise
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        self._calls.pop(key, None)
+                        waiters = call.waiters
+                    call.done.set()
+                    if waiters:
+                        # The leader's trace records the upstream calls it saved.
+                        tracing.count("waiters_served", waiters)
+                        log.debug(f"{key}: one call served {waiters} waiting caller(s)")
+                return call.result, False
+
+            while not call.done.wait(0.5):
+                progress.check_cancelled()
+            if call.cancelled:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+_chunks = Group()
+
+
+def chunks() -> Group:
+    """Process-wide group used by checkpoint.fetch_chunk()."""
+    return _chunks
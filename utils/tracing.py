@@ -0,0 +1,294 @@
+"""
+Lightweight per-fetch performance tracing.
+
+Every fetch runs inside a `trace_fetch(...)` block. Code underneath it
+(the data_sources fetchers) marks where time goes with `span(...)` and
+bumps counters with `count(...)`; neither needs a handle to the trace
+object, the active trace is carried in a context variable. Outside a
+trace both calls are no-ops, so scripts and notebooks that call the
+fetchers directly pay nothing.
+
+Span names used across the fetchers:
+
+    auth            Earth Engine initialisation
+    request_build   URL / ee.FeatureCollection construction
+    server_compute  time to first byte (HTTP) or the full getInfo() call (EE)
+    network_wait    response body transfer (HTTP only)
+    decode          JSON -> Python / pandas
+    merge           joining per-parameter / per-chunk frames
+    post_process    unit conversion, derived columns, final sort
+
+Counters: round_trips, bytes, rows, cache_hits, coalesced (chunks served
+by another session's identical in-flight call), waiters_served (other
+sessions' callers that waited on this fetch's chunk calls).
+
+When a trace finishes it is:
+  - emitted as one structured JSON line on the `weather_portal.trace` logger,
+  - folded into process-wide totals exposed in Prometheus text format by
+    `render_prometheus()` (and over HTTP by `start_metrics_server()`),
+  - returned to the caller, which the app renders as a per-fetch summary.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional
+
+
+SPAN_NAMES = (
+    "auth", "request_build", "server_compute", "network_wait",
+    "decode", "merge", "post_process",
+)
+COUNTER_NAMES = ("round_trips", "bytes", "rows", "cache_hits", "coalesced", "waiters_served")
+
+trace_logger = logging.getLogger("weather_portal.trace")
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar(
+    "weather_portal_fetch_trace", default=None
+)
+
+
+class FetchTrace:
+    """Accumulates span timings and counters for one fetch."""
+
+    def __init__(self, source: str, **attrs: Any):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.attrs = attrs
+        self.started_at = datetime.utcnow().isoformat() + "Z"
+        self.total_s: Optional[float] = None
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {name: 0 for name in COUNTER_NAMES}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **counters: int) -> Iterator[None]:
+        for counter, n in counters.items():
+            self.add(counter, n)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                entry = self.spans.setdefault(name, {"seconds": 0.0, "count": 0})
+                entry["seconds"] += elapsed
+                entry["count"] += 1
+
+    def add(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + int(n)
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-serialisable snapshot of this trace."""
+        with self._lock:
+            spans = {
+                k: {"seconds": round(v["seconds"], 4), "count": int(v["count"])}
+                for k, v in self.spans.items()
+            }
+            counters = dict(self.counters)
+        return {
+            "trace_id": self.trace_id,
+            "source": self.source,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "status": self.status,
+            "error": self.error,
+            "total_s": round(self.total_s, 4) if self.total_s is not None else None,
+            "spans": spans,
+            "counters": counters,
+        }
+
+
+def current_trace() -> Optional[FetchTrace]:
+    return _current_trace.get()
+
+
+def span(name: str, **counters: int):
+    """Time a block against the active trace (no-op without one)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return nullcontext()
+    return trace.span(name, **counters)
+
+
+def count(counter: str, n: int = 1) -> None:
+    """Bump a counter on the active trace (no-op without one)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(counter, n)
+
+
+@contextmanager
+def trace_fetch(source: str, **attrs: Any) -> Iterator[FetchTrace]:
+    """Open a trace for one fetch; emits and records it on exit."""
+    trace = FetchTrace(source, **attrs)
+    token = _current_trace.set(trace)
+    t0 = time.perf_counter()
+    try:
+        yield trace
+        trace.status = "ok"
+    except BaseException as e:
+        trace.status = "error"
+        trace.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.total_s = time.perf_counter() - t0
+        _current_trace.reset(token)
+        _record(trace)
+
+
+def _record(trace: FetchTrace) -> None:
+    summary = trace.summary()
+    trace_logger.info(json.dumps({"event": "fetch_trace", **summary}, default=str))
+    _registry.observe(summary)
+
+
+# ---------------------------------------------------------------------------
+# Logging setup
+# ---------------------------------------------------------------------------
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Attach a stderr handler to the `weather_portal` and `data_sources`
+    loggers once. Safe to call on every Streamlit rerun."""
+    if level is None:
+        try:
+            import config
+            level = config.LOG_LEVEL
+        except Exception:
+            level = "INFO"
+    for name in ("weather_portal", "data_sources"):
+        lg = logging.getLogger(name)
+        lg.setLevel(level)
+        if not any(getattr(h, "_weather_portal", False) for h in lg.handlers):
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            handler._weather_portal = True
+            lg.addHandler(handler)
+            lg.propagate = False
+
+
+# ---------------------------------------------------------------------------
+# Prometheus text exposition
+# ---------------------------------------------------------------------------
+
+class _MetricsRegistry:
+    """Process-wide totals across all finished traces."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fetches: Dict[tuple, int] = {}
+        self.fetch_seconds: Dict[str, float] = {}
+        self.span_seconds: Dict[tuple, float] = {}
+        self.counters: Dict[tuple, int] = {}
+
+    def observe(self, summary: Dict[str, Any]) -> None:
+        source = summary["source"]
+        with self._lock:
+            key = (source, summary["status"])
+            self.fetches[key] = self.fetches.get(key, 0) + 1
+            self.fetch_seconds[source] = (
+                self.fetch_seconds.get(source, 0.0) + (summary["total_s"] or 0.0)
+            )
+            for name, entry in summary["spans"].items():
+                k = (source, name)
+                self.span_seconds[k] = self.span_seconds.get(k, 0.0) + entry["seconds"]
+            for name, n in summary["counters"].items():
+                k = (source, name)
+                self.counters[k] = self.counters.get(k, 0) + n
+
+    def seconds_per_round_trip(self, source: str, min_round_trips: int = 3) -> Optional[float]:
+        with self._lock:
+            trips = self.counters.get((source, "round_trips"), 0)
+            seconds = self.fetch_seconds.get(source, 0.0)
+        if trips < min_round_trips:
+            return None
+        return seconds / trips
+
+    def render(self) -> str:
+        lines = [
+            "# HELP weather_portal_fetches_total Finished fetches by source and status.",
+            "# TYPE weather_portal_fetches_total counter",
+        ]
+        with self._lock:
+            for (source, status), n in sorted(self.fetches.items()):
+                lines.append(f'weather_portal_fetches_total{{source="{source}",status="{status}"}} {n}')
+            lines += [
+                "# HELP weather_portal_fetch_seconds_total Wall time spent in fetches.",
+                "# TYPE weather_portal_fetch_seconds_total counter",
+            ]
+            for source, s in sorted(self.fetch_seconds.items()):
+                lines.append(f'weather_portal_fetch_seconds_total{{source="{source}"}} {s:.6f}')
+            lines += [
+                "# HELP weather_portal_span_seconds_total Wall time per fetch phase.",
+                "# TYPE weather_portal_span_seconds_total counter",
+            ]
+            for (source, name), s in sorted(self.span_seconds.items()):
+                lines.append(
+                    f'weather_portal_span_seconds_total{{source="{source}",span="{name}"}} {s:.6f}'
+                )
+            lines += [
+                "# HELP weather_portal_fetch_events_total Round-trips, bytes, rows, cache hits, coalesced chunks and waiters served.",
+                "# TYPE weather_portal_fetch_events_total counter",
+            ]
+            for (source, name), n in sorted(self.counters.items()):
+                lines.append(
+                    f'weather_portal_fetch_events_total{{source="{source}",event="{name}"}} {n}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+_registry = _MetricsRegistry()
+_metrics_server: Optional[ThreadingHTTPServer] = None
+_metrics_server_lock = threading.Lock()
+
+
+def render_prometheus() -> str:
+    return _registry.render()
+
+
+def observed_seconds_per_round_trip(source: str) -> Optional[float]:
+    """Mean wall time per upstream round-trip seen for `source` in this
+    process, or None until a few round-trips have been traced."""
+    return _registry.seconds_per_round_trip(source)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics on a daemon thread. Idempotent per process, so it
+    can be called from the top of app.py on every rerun."""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            threading.Thread(
+                target=_metrics_server.serve_forever,
+                name="weather-portal-metrics",
+                daemon=True,
+            ).start()
+    return _metrics_server